@@ -0,0 +1,112 @@
+"""In-process bundle catalog.
+
+Bundles change a few times a month, but every catalog page load, signup and
+provision read them, JSON ``prompts``/``mcp_servers``/``skills`` included.
+Each API process keeps all bundles in memory along with the pre-serialized
+bodies of ``GET /bundles`` and ``GET /bundles/{slug}``, so those endpoints
+make no database queries.
+
+The admin endpoints call ``bundles_changed`` after every write. It marks the
+local copy stale and publishes on ``api:bundles:changed``. Every process runs
+``listen``, which marks its own copy stale when a message arrives. The next
+request reloads it. A process also marks its copy stale whenever it
+(re)subscribes, since it may have missed messages, and reloads it at least
+every ``bundle_catalog_max_age`` seconds in case a publish was lost.
+"""
+
+import asyncio
+import logging
+import time
+
+import redis.asyncio as aioredis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from openclaw_api.config import settings
+from openclaw_api.models import Bundle
+from openclaw_api.schemas import BundleListItem, BundleListResponse, BundleResponse
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "api:bundles:changed"
+
+
+class BundleCatalog:
+    def __init__(self) -> None:
+        # Bumped on every change notification. A load only counts as fresh
+        # if no notification arrived while it was running.
+        self.version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._by_id: dict[str, BundleResponse] = {}
+        self._slug_json: dict[str, bytes] = {}
+        self._list_json = b""
+
+    def invalidate(self) -> None:
+        self.version += 1
+
+    def _fresh(self) -> bool:
+        return (
+            self._loaded_version == self.version
+            and time.monotonic() - self._loaded_at < settings.bundle_catalog_max_age
+        )
+
+    async def _ensure(self, db: AsyncSession) -> None:
+        if self._fresh():
+            return
+        version = self.version
+        result = await db.execute(select(Bundle).order_by(Bundle.sort_order, Bundle.name))
+        bundles = [BundleResponse.model_validate(b) for b in result.scalars().all()]
+        published = [b for b in bundles if b.status == "published"]
+
+        self._by_id = {b.id: b for b in bundles}
+        self._slug_json = {b.slug: b.model_dump_json().encode() for b in published}
+        self._list_json = BundleListResponse(
+            bundles=[BundleListItem.model_validate(b) for b in published]
+        ).model_dump_json().encode()
+        self._loaded_version = version
+        self._loaded_at = time.monotonic()
+
+    async def list_json(self, db: AsyncSession) -> bytes:
+        """Serialized ``BundleListResponse`` of the published bundles."""
+        await self._ensure(db)
+        return self._list_json
+
+    async def published_json(self, db: AsyncSession, slug: str) -> bytes | None:
+        """Serialized ``BundleResponse`` for a published bundle, or None."""
+        await self._ensure(db)
+        return self._slug_json.get(slug)
+
+    async def get(self, db: AsyncSession, bundle_id: str) -> BundleResponse | None:
+        """Any bundle by id, whatever its status."""
+        await self._ensure(db)
+        return self._by_id.get(bundle_id)
+
+
+catalog = BundleCatalog()
+
+
+async def bundles_changed(r: aioredis.Redis) -> None:
+    """Tell every API process, this one included, to reload the catalog."""
+    catalog.invalidate()
+    try:
+        await r.publish(CHANNEL, str(catalog.version))
+    except Exception:
+        logger.warning("Could not publish bundle catalog change")
+
+
+async def listen(r: aioredis.Redis) -> None:
+    """Mark the catalog stale on every change notification, until cancelled."""
+    while True:
+        try:
+            async with r.pubsub() as pubsub:
+                await pubsub.subscribe(CHANNEL)
+                catalog.invalidate()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        catalog.invalidate()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Bundle catalog subscription lost, retrying")
+        await asyncio.sleep(5)
@@ -0,0 +1,139 @@
+"""Per-customer response cache for the dashboard's polled endpoints.
+
+Responses are kept in one Redis hash per customer, ``api:cache:{customer_id}``,
+one field per endpoint and query string, each with its own TTL. Anything that
+changes a customer's box deletes the hash (``invalidate``). The API does so
+after its own writes, the operator after every job and the billing worker
+after every Stripe event it applies.
+
+Invalidating also bumps the customer's generation, ``api:cache:{id}:gen``. A
+miss reads the generation before building the response and stores the
+response only if the generation has not moved since (``_FILL``). A response
+built from rows read before an invalidation is therefore never cached after
+it.
+
+Every cached response carries an ETag. A request whose ``If-None-Match``
+matches gets a 304 straight from the cached entry. With
+``Cache-Control: no-cache`` the browser revalidates every poll, so a poll that
+changed nothing costs one HGET and no body.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as aioredis
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# Seconds each endpoint may be served from cache.
+TTLS = {
+    "analytics": 60,
+    # Short, so the gauge follows the live token counters.
+    "usage": 5,
+    "boxes": 15,
+    "me": 60,
+}
+
+_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+# Generations outlive any response build by far; an expired one reads as 0,
+# which at worst skips a fill.
+GENERATION_TTL = 86400
+
+# KEYS: hash, generation. ARGV: generation read before the build, field,
+# entry, hash TTL.
+_FILL = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+def cache_key(customer_id: str) -> str:
+    # Must match openclaw_operator.main.api_cache_key and
+    # billing_worker.handlers.API_CACHE_KEY.
+    return f"api:cache:{customer_id}"
+
+
+def generation_key(customer_id: str) -> str:
+    # Must match openclaw_operator.main.api_cache_generation_key and
+    # billing_worker.handlers.API_CACHE_GENERATION_KEY.
+    return f"api:cache:{customer_id}:gen"
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag in tags or "*" in tags
+
+
+def _respond(request: Request, body: bytes, etag: str) -> Response:
+    headers = {**_HEADERS, "ETag": etag}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def cached(
+    request: Request,
+    r: aioredis.Redis,
+    customer_id: str,
+    endpoint: str,
+    build: Callable[[], Awaitable[BaseModel]],
+) -> Response:
+    """Serve ``endpoint`` for ``customer_id`` from cache, or ``build`` and cache it.
+
+    Redis errors fall back to building the response uncached.
+    """
+    key = cache_key(customer_id)
+    field = f"{endpoint}?{request.url.query}"
+    generation = None
+    try:
+        raw = await r.hget(key, field)
+        if raw:
+            entry = json.loads(raw)
+            if entry["expires_at"] > time.time():
+                return _respond(request, entry["body"].encode(), entry["etag"])
+        # Read before the build, so an invalidation during it is noticed.
+        generation = await r.get(generation_key(customer_id)) or "0"
+    except Exception:
+        logger.warning("Response cache read failed for %s", key)
+
+    body = (await build()).model_dump_json().encode()
+    etag = _etag(body)
+    if generation is not None:
+        ttl = TTLS[endpoint]
+        entry = json.dumps({"etag": etag, "body": body.decode(), "expires_at": time.time() + ttl})
+        try:
+            await r.eval(
+                _FILL, 2, key, generation_key(customer_id),
+                generation, field, entry, max(TTLS.values()),
+            )
+        except Exception:
+            logger.warning("Response cache write failed for %s", key)
+    return _respond(request, body, etag)
+
+
+async def invalidate(r: aioredis.Redis, customer_id: str) -> None:
+    try:
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.incr(generation_key(customer_id))
+            pipe.expire(generation_key(customer_id), GENERATION_TTL)
+            pipe.delete(cache_key(customer_id))
+            await pipe.execute()
+    except Exception:
+        logger.warning("Could not invalidate response cache for customer %s", customer_id)
@@ -57,7 +57,7 @@ async def get_active_box_or_none(customer_id: str, db: AsyncSession):
     result = await db.execute(
         select(Box)
         .where(Box.customer_id == customer_id)
-        .where(Box.status == BoxStatus.active)
+        .where(Box.status.in_((BoxStatus.active, BoxStatus.sleeping)))
         .limit(1)
     )
     return result.scalar_one_or_none()
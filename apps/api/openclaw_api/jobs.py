@@ -1,7 +1,19 @@
 import json
+import time
 
 import redis.asyncio as aioredis
 
+OPERATOR_QUEUE = "operator:jobs"
+
+
+def lane_key(lane: str) -> str:
+    return OPERATOR_QUEUE if lane == "normal" else f"{OPERATOR_QUEUE}:{lane}"
+
+
+def order_key(customer_id: str) -> str:
+    # Must match openclaw_operator.jobqueue.order_key.
+    return f"{OPERATOR_QUEUE}:order:{customer_id}"
+
 
 async def enqueue_job(
     r: aioredis.Redis,
@@ -11,10 +23,21 @@ async def enqueue_job(
     customer_id: str,
     box_id: str | None = None,
     payload: dict | None = None,
+    lane: str = "normal",
 ) -> None:
+    """Queue a job for the operator on ``lane`` ("high", "normal" or "low").
+
+    The job id also goes into the customer's sequence, so the operator runs
+    the customer's jobs in the order they were enqueued whatever their lanes.
+    """
     msg = {"job_id": job_id, "type": job_type, "customer_id": customer_id}
     if box_id is not None:
         msg["box_id"] = box_id
     if payload is not None:
         msg["payload"] = payload
-    await r.rpush("operator:jobs", json.dumps(msg, default=str))
+    msg["lane"] = lane
+    msg["enqueued_at"] = time.time()
+    pipe = r.pipeline(transaction=True)
+    pipe.zadd(order_key(str(customer_id)), {str(job_id): msg["enqueued_at"]})
+    pipe.rpush(lane_key(lane), json.dumps(msg, default=str))
+    await pipe.execute()
@@ -1,17 +1,21 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from openclaw_api import bundle_catalog
 from openclaw_api.config import settings
 from openclaw_api.database import engine
-from openclaw_api.deps import close_redis
+from openclaw_api.deps import close_redis, get_redis
 from openclaw_api.routes import analytics, auth, billing, boxes, bundles, connections, health, internal, usage
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    catalog_listener = asyncio.create_task(bundle_catalog.listen(await get_redis()))
     yield
+    catalog_listener.cancel()
     await close_redis()
     await engine.dispose()
 
@@ -3,8 +3,10 @@ from datetime import datetime
 
 from sqlalchemy import (
     BigInteger,
+    Boolean,
     DateTime,
     Enum,
+    Float,
     ForeignKey,
     Index,
     Integer,
@@ -44,6 +46,7 @@ class BoxStatus(str, enum.Enum):
     active = "active"
     updating = "updating"
     suspended = "suspended"
+    sleeping = "sleeping"
     unhealthy = "unhealthy"
     destroying = "destroying"
     destroyed = "destroyed"
@@ -72,6 +75,10 @@ class JobType(str, enum.Enum):
     resize = "resize"
     health_check = "health_check"
     update_connections = "update_connections"
+    rollout = "rollout"
+    sleep = "sleep"
+    wake = "wake"
+    rightsize = "rightsize"
 
 
 class JobStatus(str, enum.Enum):
@@ -102,6 +109,7 @@ class Bundle(Base):
     mcp_servers: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default="'{}'")
     skills: Mapped[list] = mapped_column(JSONB, nullable=False, server_default="'[]'")
     sort_order: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -169,10 +177,15 @@ class Box(Base):
     niche: Mapped[str | None] = mapped_column(Text)
     bundle_id: Mapped[str | None] = mapped_column(UUID(as_uuid=False), ForeignKey("bundles.id"))
     health_failures: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    cpu_request: Mapped[str | None] = mapped_column(Text)
+    memory_request: Mapped[str | None] = mapped_column(Text)
+    image: Mapped[str | None] = mapped_column(Text)
     last_seen: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     activated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     last_updated: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    slept_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    woke_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     destroyed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
     customer: Mapped["Customer"] = relationship(back_populates="boxes")
@@ -289,6 +302,7 @@ class OperatorJob(Base):
     )
     payload: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default="'{}'")
     error_log: Mapped[str | None] = mapped_column(Text)
+    step_timings: Mapped[dict | None] = mapped_column(JSONB)
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -297,3 +311,39 @@ class OperatorJob(Base):
         Index("ix_operator_jobs_customer_created", "customer_id", "created_at"),
         Index("ix_operator_jobs_status_active", "status", postgresql_where="status IN ('queued', 'running')"),
     )
+
+
+class FleetRollout(Base):
+    __tablename__ = "fleet_rollouts"
+
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True, server_default=func.gen_random_uuid())
+    image: Mapped[str | None] = mapped_column(Text)
+    restart: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
+    status: Mapped[str] = mapped_column(Text, nullable=False, server_default="running")
+    max_in_flight: Mapped[int] = mapped_column(Integer, nullable=False, server_default="50")
+    max_failure_ratio: Mapped[float] = mapped_column(Float, nullable=False, server_default="0.05")
+    total: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    succeeded: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    paused_reason: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class FleetRolloutBox(Base):
+    __tablename__ = "fleet_rollout_boxes"
+
+    rollout_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey("fleet_rollouts.id", ondelete="CASCADE"), primary_key=True,
+    )
+    box_id: Mapped[str] = mapped_column(UUID(as_uuid=False), ForeignKey("boxes.id"), primary_key=True)
+    customer_id: Mapped[str] = mapped_column(UUID(as_uuid=False), ForeignKey("customers.id"), nullable=False)
+    status: Mapped[str] = mapped_column(Text, nullable=False, server_default="pending")
+    generation: Mapped[int | None] = mapped_column(BigInteger)
+    error: Mapped[str | None] = mapped_column(Text)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_fleet_rollout_boxes_status", "rollout_id", "status"),
+    )
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, Query
+import json
+
+import redis.asyncio as aioredis
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from openclaw_api.deps import get_current_customer_id, get_db
+from openclaw_api.cache import cached
+from openclaw_api.deps import get_current_customer_id, get_db, get_redis
+from openclaw_api.routes.usage import unflushed_tokens
 from openclaw_api.schemas import (
     AnalyticsResponse,
     BrowserSessionsSummary,
@@ -12,82 +17,113 @@ from openclaw_api.schemas import (
 
 router = APIRouter(prefix="/me", tags=["analytics"])
 
-
-@router.get("/analytics", response_model=AnalyticsResponse)
-async def get_analytics(
-    hours: int = Query(default=24, ge=1, le=168),
-    customer_id: str = Depends(get_current_customer_id),
-    db: AsyncSession = Depends(get_db),
-):
-    # Token usage — current period
-    row = (await db.execute(text("""
+# Everything the dashboard needs in one round-trip. Pod metrics come from
+# recent snapshots and hourly rollups alike, averaged (weighted by sample
+# count) into at most :points equal-width buckets, so the response size does
+# not depend on the window or on how far behind the rollup is.
+ANALYTICS = text("""
+    WITH bounds AS (
+        SELECT now() - make_interval(hours => :hours) AS since, CAST(:width AS double precision) AS width
+    ),
+    period AS (
         SELECT tokens_used, tokens_limit, period_start, period_end
         FROM usage_monthly
         WHERE customer_id = :cid AND period_start <= now() AND period_end > now()
         ORDER BY period_start DESC LIMIT 1
-    """), {"cid": customer_id})).first()
-
-    token_usage = TokenUsageSummary(
-        tokens_used=row.tokens_used if row else 0,
-        tokens_limit=row.tokens_limit if row else 0,
-        period_start=row.period_start if row else None,
-        period_end=row.period_end if row else None,
-    )
-
-    # Browser sessions — last N hours
-    brow = (await db.execute(text("""
-        SELECT count(*)::int AS cnt, coalesce(sum(duration_ms), 0)::bigint AS total_ms
-        FROM browser_sessions
-        WHERE customer_id = :cid AND started_at > now() - make_interval(hours => :hours)
-    """), {"cid": customer_id, "hours": hours})).first()
-
-    browser_sessions = BrowserSessionsSummary(
-        session_count=brow.cnt if brow else 0,
-        total_duration_ms=brow.total_ms if brow else 0,
-    )
-
-    # Tier — from active subscription
-    tier_row = (await db.execute(text("""
+    ),
+    browser AS (
+        SELECT count(*)::int AS session_count, coalesce(sum(duration_ms), 0)::bigint AS total_duration_ms
+        FROM browser_sessions, bounds
+        WHERE customer_id = :cid AND started_at > bounds.since
+    ),
+    tier AS (
         SELECT s.tier FROM subscriptions s
         JOIN boxes b ON b.subscription_id = s.id
         WHERE b.customer_id = :cid AND b.status != 'destroyed'
         ORDER BY b.created_at DESC LIMIT 1
-    """), {"cid": customer_id})).first()
-    tier = tier_row.tier if tier_row else "starter"
+    ),
+    samples AS (
+        SELECT hour AS ts, avg_cpu AS cpu, avg_memory AS memory, sample_count AS n
+        FROM pod_metrics_hourly, bounds
+        WHERE customer_id = :cid AND hour > bounds.since
+        UNION ALL
+        SELECT collected_at, cpu_millicores, memory_bytes, 1
+        FROM pod_metrics_snapshots, bounds
+        WHERE customer_id = :cid AND collected_at > bounds.since
+    ),
+    buckets AS (
+        SELECT least(floor(extract(epoch FROM ts - bounds.since)::float8 / bounds.width)::int,
+                     CAST(:points AS int) - 1) AS bucket,
+               (sum(cpu::bigint * n) / sum(n))::int AS cpu_millicores,
+               (sum(memory * n) / sum(n))::bigint AS memory_bytes
+        FROM samples, bounds
+        GROUP BY 1
+    ),
+    latest AS (
+        SELECT ts, cpu, memory FROM samples ORDER BY ts DESC LIMIT 1
+    )
+    SELECT period.tokens_used, period.tokens_limit, period.period_start, period.period_end,
+           browser.session_count, browser.total_duration_ms, tier.tier,
+           latest.ts AS latest_ts, latest.cpu AS latest_cpu, latest.memory AS latest_memory,
+           (SELECT coalesce(json_agg(json_build_object(
+                        'ts', bounds.since + make_interval(secs => buckets.bucket * bounds.width),
+                        'cpu_millicores', buckets.cpu_millicores,
+                        'memory_bytes', buckets.memory_bytes) ORDER BY buckets.bucket), '[]')
+            FROM buckets, bounds) AS series
+    FROM browser
+    LEFT JOIN period ON true
+    LEFT JOIN tier ON true
+    LEFT JOIN latest ON true
+""")
+
+
+@router.get("/analytics", response_model=AnalyticsResponse)
+async def get_analytics(
+    request: Request,
+    hours: int = Query(default=24, ge=1, le=168),
+    points: int = Query(default=200, ge=10, le=1000),
+    customer_id: str = Depends(get_current_customer_id),
+    db: AsyncSession = Depends(get_db),
+    r: aioredis.Redis = Depends(get_redis),
+):
+    return await cached(request, r, customer_id, "analytics", lambda: _analytics(db, r, customer_id, hours, points))
+
 
-    # Pod metrics — combine recent snapshots + hourly history
-    # Recent snapshots (last 2h, raw)
-    snap_rows = (await db.execute(text("""
-        SELECT cpu_millicores, memory_bytes, collected_at AS ts
-        FROM pod_metrics_snapshots
-        WHERE customer_id = :cid AND collected_at > now() - make_interval(hours => :hours)
-        ORDER BY collected_at
-    """), {"cid": customer_id, "hours": hours})).all()
+async def _analytics(
+    db: AsyncSession, r: aioredis.Redis, customer_id: str, hours: int, points: int,
+) -> AnalyticsResponse:
+    bucket_seconds = hours * 3600 / points
+    row = (await db.execute(ANALYTICS, {
+        "cid": customer_id, "hours": hours, "points": points, "width": bucket_seconds,
+    })).mappings().one()
 
-    # Hourly buckets (older data)
-    hourly_rows = (await db.execute(text("""
-        SELECT avg_cpu AS cpu_millicores, avg_memory AS memory_bytes, hour AS ts
-        FROM pod_metrics_hourly
-        WHERE customer_id = :cid AND hour > now() - make_interval(hours => :hours)
-        ORDER BY hour
-    """), {"cid": customer_id, "hours": hours})).all()
+    series = row["series"]
+    if isinstance(series, str):
+        series = json.loads(series)
 
-    series = [
-        PodMetricsPoint(cpu_millicores=r.cpu_millicores, memory_bytes=r.memory_bytes, ts=r.ts)
-        for r in hourly_rows
-    ] + [
-        PodMetricsPoint(cpu_millicores=r.cpu_millicores, memory_bytes=r.memory_bytes, ts=r.ts)
-        for r in snap_rows
-    ]
-    # Sort combined series by timestamp
-    series.sort(key=lambda p: p.ts)
+    latest = None
+    if row["latest_ts"] is not None:
+        latest = PodMetricsPoint(
+            cpu_millicores=row["latest_cpu"], memory_bytes=row["latest_memory"], ts=row["latest_ts"],
+        )
 
-    latest = series[-1] if series else None
+    tokens_used = row["tokens_used"] or 0
+    if row["period_start"] is not None:
+        tokens_used += await unflushed_tokens(r, customer_id, row["period_start"])
 
     return AnalyticsResponse(
-        token_usage=token_usage,
-        browser_sessions=browser_sessions,
+        token_usage=TokenUsageSummary(
+            tokens_used=tokens_used,
+            tokens_limit=row["tokens_limit"] or 0,
+            period_start=row["period_start"],
+            period_end=row["period_end"],
+        ),
+        browser_sessions=BrowserSessionsSummary(
+            session_count=row["session_count"],
+            total_duration_ms=row["total_duration_ms"],
+        ),
         pod_metrics_latest=latest,
-        pod_metrics_series=series,
-        tier=tier,
+        pod_metrics_series=[PodMetricsPoint(**p) for p in series],
+        pod_metrics_bucket_seconds=bucket_seconds,
+        tier=row["tier"] or "starter",
     )
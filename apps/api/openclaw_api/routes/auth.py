@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 import redis.asyncio as aioredis
 
+from openclaw_api.cache import cached
 from openclaw_api.config import settings
 from openclaw_api.deps import get_db, get_redis
 from openclaw_api.models import Box, BoxStatus, Customer
@@ -266,6 +267,7 @@ async def dev_login(
 async def get_me(
     request: Request,
     db: AsyncSession = Depends(get_db),
+    r: aioredis.Redis = Depends(get_redis),
 ):
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
@@ -278,6 +280,10 @@ async def get_me(
     except (JWTError, KeyError):
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
+    return await cached(request, r, customer_id, "me", lambda: _me(db, customer_id))
+
+
+async def _me(db: AsyncSession, customer_id: str) -> MeResponse:
     result = await db.execute(select(Customer).where(Customer.id == customer_id))
     customer = result.scalar_one_or_none()
     if not customer:
@@ -1,16 +1,17 @@
 from datetime import datetime, timedelta, timezone
 
 import redis.asyncio as aioredis
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from openclaw_api.bundle_catalog import catalog
+from openclaw_api.cache import cached, invalidate
 from openclaw_api.deps import get_current_customer_id, get_db, get_redis
 from openclaw_api.jobs import enqueue_job
 from openclaw_api.models import (
     Box,
     BoxStatus,
-    Bundle,
     Customer,
     JobStatus,
     JobType,
@@ -34,9 +35,15 @@ router = APIRouter(prefix="/me", tags=["boxes"])
 
 @router.get("/boxes", response_model=BoxListResponse)
 async def get_my_boxes(
+    request: Request,
     customer_id: str = Depends(get_current_customer_id),
     db: AsyncSession = Depends(get_db),
+    r: aioredis.Redis = Depends(get_redis),
 ):
+    return await cached(request, r, customer_id, "boxes", lambda: _boxes(db, customer_id))
+
+
+async def _boxes(db: AsyncSession, customer_id: str) -> BoxListResponse:
     result = await db.execute(
         select(Box)
         .where(Box.customer_id == customer_id)
@@ -97,8 +104,10 @@ async def update_box_by_id(
         payload=updates,
     )
     db.add(job)
-    box.status = BoxStatus.updating
+    if box.status != BoxStatus.sleeping:
+        box.status = BoxStatus.updating
     await db.commit()
+    await invalidate(r, customer_id)
     await db.refresh(job)
 
     await enqueue_job(
@@ -120,7 +129,7 @@ async def update_my_box_legacy(
     result = await db.execute(
         select(Box)
         .where(Box.customer_id == customer_id)
-        .where(Box.status == BoxStatus.active)
+        .where(Box.status.in_((BoxStatus.active, BoxStatus.sleeping)))
         .order_by(Box.created_at.desc())
         .limit(1)
     )
@@ -143,8 +152,10 @@ async def update_my_box_legacy(
         payload=updates,
     )
     db.add(job)
-    box.status = BoxStatus.updating
+    if box.status != BoxStatus.sleeping:
+        box.status = BoxStatus.updating
     await db.commit()
+    await invalidate(r, customer_id)
     await db.refresh(job)
 
     await enqueue_job(
@@ -170,11 +181,8 @@ async def setup_box(
     r: aioredis.Redis = Depends(get_redis),
 ):
     # Validate bundle
-    result = await db.execute(
-        select(Bundle).where(Bundle.id == body.bundle_id, Bundle.status == "published")
-    )
-    bundle = result.scalar_one_or_none()
-    if not bundle:
+    bundle = await catalog.get(db, body.bundle_id)
+    if not bundle or bundle.status != "published":
         raise HTTPException(status_code=400, detail="Invalid or unpublished bundle")
 
     # Apply bundle defaults for optional fields
@@ -241,20 +249,20 @@ async def setup_box(
             "model": model,
             "thinking_level": thinking_level,
             "language": language,
-            "bundle_prompts": bundle.prompts,
-            "bundle_mcp_servers": bundle.mcp_servers,
-            "bundle_skills": bundle.skills,
+            "bundle_id": bundle.id,
+            "bundle_version": bundle.version,
         },
     )
     db.add(job)
     await db.commit()
+    await invalidate(r, customer_id)
     await db.refresh(box)
     await db.refresh(job)
 
     # Enqueue to Redis for operator
     await enqueue_job(
         r, job_id=job.id, job_type="provision",
-        customer_id=customer_id, box_id=box.id, payload=job.payload,
+        customer_id=customer_id, box_id=box.id, payload=job.payload, lane="high",
     )
 
     return ProvisionResponse(customer_id=customer_id, box_id=box.id, job_id=job.id)
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+import redis.asyncio as aioredis
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from openclaw_api.deps import get_db
+from openclaw_api.bundle_catalog import bundles_changed, catalog
+from openclaw_api.deps import get_db, get_redis
 from openclaw_api.models import Bundle
 from openclaw_api.schemas import (
-    BundleListItem,
     BundleListResponse,
     BundleResponse,
     CreateBundleRequest,
@@ -20,24 +21,15 @@ router = APIRouter(tags=["bundles"])
 
 @router.get("/bundles", response_model=BundleListResponse)
 async def list_published_bundles(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Bundle)
-        .where(Bundle.status == "published")
-        .order_by(Bundle.sort_order, Bundle.name)
-    )
-    bundles = result.scalars().all()
-    return BundleListResponse(bundles=[BundleListItem.model_validate(b) for b in bundles])
+    return Response(await catalog.list_json(db), media_type="application/json")
 
 
 @router.get("/bundles/{slug}", response_model=BundleResponse)
 async def get_bundle(slug: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Bundle).where(Bundle.slug == slug))
-    bundle = result.scalar_one_or_none()
-    if not bundle:
-        raise HTTPException(status_code=404, detail="Bundle not found")
-    if bundle.status != "published":
+    body = await catalog.published_json(db, slug)
+    if body is None:
         raise HTTPException(status_code=404, detail="Bundle not found")
-    return BundleResponse.model_validate(bundle)
+    return Response(body, media_type="application/json")
 
 
 # --- Admin endpoints ---
@@ -53,7 +45,11 @@ async def list_all_bundles(db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/internal/bundles", response_model=BundleResponse, status_code=201)
-async def create_bundle(body: CreateBundleRequest, db: AsyncSession = Depends(get_db)):
+async def create_bundle(
+    body: CreateBundleRequest,
+    db: AsyncSession = Depends(get_db),
+    r: aioredis.Redis = Depends(get_redis),
+):
     # Check slug uniqueness
     existing = await db.execute(select(Bundle).where(Bundle.slug == body.slug))
     if existing.scalar_one_or_none():
@@ -77,6 +73,7 @@ async def create_bundle(body: CreateBundleRequest, db: AsyncSession = Depends(ge
     )
     db.add(bundle)
     await db.commit()
+    await bundles_changed(r)
     await db.refresh(bundle)
     return BundleResponse.model_validate(bundle)
 
@@ -86,6 +83,7 @@ async def update_bundle(
     bundle_id: str,
     body: UpdateBundleRequest,
     db: AsyncSession = Depends(get_db),
+    r: aioredis.Redis = Depends(get_redis),
 ):
     result = await db.execute(select(Bundle).where(Bundle.id == bundle_id))
     bundle = result.scalar_one_or_none()
@@ -97,17 +95,25 @@ async def update_bundle(
         updates["providers"] = [p.model_dump() for p in body.providers]
     for key, value in updates.items():
         setattr(bundle, key, value)
+    # Queued provision jobs reference the bundle by (id, version).
+    bundle.version += 1
 
     await db.commit()
+    await bundles_changed(r)
     await db.refresh(bundle)
     return BundleResponse.model_validate(bundle)
 
 
 @router.delete("/internal/bundles/{bundle_id}", status_code=204)
-async def archive_bundle(bundle_id: str, db: AsyncSession = Depends(get_db)):
+async def archive_bundle(
+    bundle_id: str,
+    db: AsyncSession = Depends(get_db),
+    r: aioredis.Redis = Depends(get_redis),
+):
     result = await db.execute(select(Bundle).where(Bundle.id == bundle_id))
     bundle = result.scalar_one_or_none()
     if not bundle:
         raise HTTPException(status_code=404, detail="Bundle not found")
     bundle.status = "archived"
     await db.commit()
+    await bundles_changed(r)
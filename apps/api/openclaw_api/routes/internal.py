@@ -2,16 +2,19 @@ from datetime import datetime, timedelta, timezone
 
 import redis.asyncio as aioredis
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, literal, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from openclaw_api.bundle_catalog import catalog
+from openclaw_api.cache import invalidate
 from openclaw_api.deps import get_db, get_redis
 from openclaw_api.jobs import enqueue_job
 from openclaw_api.models import (
     Box,
     BoxStatus,
-    Bundle,
     Customer,
+    FleetRollout,
+    FleetRolloutBox,
     JobStatus,
     JobType,
     OperatorJob,
@@ -25,6 +28,8 @@ from openclaw_api.schemas import (
     BoxListResponse,
     CustomerListResponse,
     CustomerResponse,
+    FleetRolloutRequest,
+    FleetRolloutResponse,
     JobEnqueuedResponse,
     ProvisionRequest,
     ProvisionResponse,
@@ -57,10 +62,7 @@ async def provision_box(
         await db.flush()
 
     # Validate bundle
-    bundle_result = await db.execute(
-        select(Bundle).where(Bundle.id == body.bundle_id)
-    )
-    bundle = bundle_result.scalar_one_or_none()
+    bundle = await catalog.get(db, body.bundle_id)
     if not bundle:
         raise HTTPException(status_code=400, detail="Invalid bundle")
 
@@ -128,13 +130,13 @@ async def provision_box(
             "model": model,
             "thinking_level": thinking_level,
             "language": language,
-            "bundle_prompts": bundle.prompts,
-            "bundle_mcp_servers": bundle.mcp_servers,
-            "bundle_skills": bundle.skills,
+            "bundle_id": bundle.id,
+            "bundle_version": bundle.version,
         },
     )
     db.add(job)
     await db.commit()
+    await invalidate(r, customer.id)
     await db.refresh(customer)
     await db.refresh(box)
     await db.refresh(job)
@@ -142,7 +144,7 @@ async def provision_box(
     # Enqueue to Redis for operator
     await enqueue_job(
         r, job_id=job.id, job_type="provision",
-        customer_id=customer.id, box_id=box.id, payload=job.payload,
+        customer_id=customer.id, box_id=box.id, payload=job.payload, lane="high",
     )
 
     return ProvisionResponse(customer_id=customer.id, box_id=box.id, job_id=job.id)
@@ -170,6 +172,7 @@ async def destroy_box(
     db.add(job)
     box.status = BoxStatus.destroying
     await db.commit()
+    await invalidate(r, box.customer_id)
     await db.refresh(job)
 
     await enqueue_job(
@@ -190,7 +193,7 @@ async def suspend_box(
     box = result.scalar_one_or_none()
     if not box:
         raise HTTPException(status_code=404, detail="Box not found")
-    if box.status != BoxStatus.active:
+    if box.status not in (BoxStatus.active, BoxStatus.sleeping):
         raise HTTPException(status_code=409, detail=f"Box must be active to suspend, current status: {box.status}")
 
     job = OperatorJob(
@@ -236,7 +239,7 @@ async def reactivate_box(
 
     await enqueue_job(
         r, job_id=job.id, job_type="reactivate",
-        customer_id=box.customer_id, box_id=box.id,
+        customer_id=box.customer_id, box_id=box.id, lane="high",
     )
 
     return JobEnqueuedResponse(job_id=job.id, box_id=box.id)
@@ -253,7 +256,7 @@ async def update_box(
     box = result.scalar_one_or_none()
     if not box:
         raise HTTPException(status_code=404, detail="Box not found")
-    if box.status not in (BoxStatus.active, BoxStatus.updating):
+    if box.status not in (BoxStatus.active, BoxStatus.updating, BoxStatus.sleeping):
         raise HTTPException(status_code=409, detail=f"Box must be active to update, current status: {box.status}")
 
     updates = body.model_dump(exclude_none=True)
@@ -279,8 +282,11 @@ async def update_box(
         payload={"box_id": box.id, "secret_data": secret_data},
     )
     db.add(job)
-    box.status = BoxStatus.updating
+    # A sleeping box gets the new config at zero replicas and stays asleep.
+    if box.status != BoxStatus.sleeping:
+        box.status = BoxStatus.updating
     await db.commit()
+    await invalidate(r, box.customer_id)
     await db.refresh(job)
 
     await enqueue_job(
@@ -303,7 +309,7 @@ async def resize_box(
     box = result.scalar_one_or_none()
     if not box:
         raise HTTPException(status_code=404, detail="Box not found")
-    if box.status not in (BoxStatus.active, BoxStatus.updating):
+    if box.status not in (BoxStatus.active, BoxStatus.updating, BoxStatus.sleeping):
         raise HTTPException(status_code=409, detail=f"Box must be active to resize, current status: {box.status}")
 
     # Look up current subscription tier
@@ -328,6 +334,7 @@ async def resize_box(
     )
     db.add(job)
     await db.commit()
+    await invalidate(r, box.customer_id)
     await db.refresh(job)
 
     await enqueue_job(
@@ -355,3 +362,96 @@ async def list_all_customers(db: AsyncSession = Depends(get_db)):
     )
     customers = result.scalars().all()
     return CustomerListResponse(customers=[CustomerResponse.model_validate(c) for c in customers])
+
+
+async def _rollout_response(db: AsyncSession, rollout: FleetRollout) -> FleetRolloutResponse:
+    result = await db.execute(
+        select(FleetRolloutBox.status, func.count())
+        .where(FleetRolloutBox.rollout_id == rollout.id)
+        .group_by(FleetRolloutBox.status)
+    )
+    response = FleetRolloutResponse.model_validate(rollout)
+    response.boxes = {status: count for status, count in result.all()}
+    return response
+
+
+async def _get_rollout(db: AsyncSession, rollout_id: str) -> FleetRollout:
+    result = await db.execute(select(FleetRollout).where(FleetRollout.id == rollout_id))
+    rollout = result.scalar_one_or_none()
+    if not rollout:
+        raise HTTPException(status_code=404, detail="Rollout not found")
+    return rollout
+
+
+@router.post("/fleet/rollouts", response_model=FleetRolloutResponse)
+async def create_fleet_rollout(body: FleetRolloutRequest, db: AsyncSession = Depends(get_db)):
+    """Roll ``image`` and the current tier resources out to every active box.
+
+    The operator's fleet coordinator picks the rollout up and enqueues
+    ``rollout`` jobs, ``max_in_flight`` boxes at a time.
+    """
+    result = await db.execute(
+        select(FleetRollout.id).where(FleetRollout.status.in_(("running", "paused")))
+    )
+    if result.first() is not None:
+        raise HTTPException(status_code=409, detail="Another fleet rollout is in progress")
+
+    rollout = FleetRollout(
+        image=body.image,
+        restart=body.restart,
+        status="running",
+        max_in_flight=body.max_in_flight,
+        max_failure_ratio=body.max_failure_ratio,
+    )
+    db.add(rollout)
+    await db.flush()
+
+    inserted = await db.execute(
+        insert(FleetRolloutBox).from_select(
+            ["rollout_id", "box_id", "customer_id"],
+            select(literal(rollout.id, FleetRolloutBox.rollout_id.type), Box.id, Box.customer_id)
+            .where(Box.status.in_((BoxStatus.active, BoxStatus.sleeping))),
+        )
+    )
+    rollout.total = inserted.rowcount
+    await db.commit()
+    await db.refresh(rollout)
+
+    return await _rollout_response(db, rollout)
+
+
+@router.get("/fleet/rollouts/{rollout_id}", response_model=FleetRolloutResponse)
+async def get_fleet_rollout(rollout_id: str, db: AsyncSession = Depends(get_db)):
+    return await _rollout_response(db, await _get_rollout(db, rollout_id))
+
+
+@router.post("/fleet/rollouts/{rollout_id}/pause", response_model=FleetRolloutResponse)
+async def pause_fleet_rollout(rollout_id: str, db: AsyncSession = Depends(get_db)):
+    """Stop enqueueing boxes. Boxes already queued or rolling finish."""
+    rollout = await _get_rollout(db, rollout_id)
+    if rollout.status != "running":
+        raise HTTPException(status_code=409, detail=f"Rollout must be running to pause, current status: {rollout.status}")
+    rollout.status = "paused"
+    rollout.paused_reason = "paused via API"
+    await db.commit()
+    await db.refresh(rollout)
+    return await _rollout_response(db, rollout)
+
+
+@router.post("/fleet/rollouts/{rollout_id}/resume", response_model=FleetRolloutResponse)
+async def resume_fleet_rollout(rollout_id: str, db: AsyncSession = Depends(get_db)):
+    """Resume a paused rollout. Failed boxes are retried."""
+    rollout = await _get_rollout(db, rollout_id)
+    if rollout.status != "paused":
+        raise HTTPException(status_code=409, detail=f"Rollout must be paused to resume, current status: {rollout.status}")
+    await db.execute(
+        update(FleetRolloutBox)
+        .where(FleetRolloutBox.rollout_id == rollout.id, FleetRolloutBox.status == "failed")
+        .values(status="pending", error=None)
+    )
+    rollout.status = "running"
+    rollout.paused_reason = None
+    rollout.failed = 0
+    await db.commit()
+    await db.refresh(rollout)
+    return await _rollout_response(db, rollout)
@@ -1,20 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from datetime import datetime
+
+import redis.asyncio as aioredis
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
 
-from openclaw_api.deps import get_current_customer_id, get_db
+from openclaw_api.cache import cached
+from openclaw_api.deps import get_current_customer_id, get_db, get_redis
 from openclaw_api.models import UsageMonthly
 from openclaw_api.schemas import UsageResponse
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/me", tags=["usage"])
 
+# Tokens the proxy has counted but billing-worker hasn't yet added to
+# usage_monthly. Must match PENDING_KEY / FLUSHING_KEY in billing_worker.usage.
+USAGE_COUNTER_KEYS = ("usage:pending", "usage:flushing")
+
+
+def usage_field(customer_id: str, period_start: datetime) -> str:
+    """The counter field for a billing period. Must match usageField in token-proxy/src/limits.js."""
+    return f"{customer_id}:{int(period_start.timestamp())}"
+
+
+async def unflushed_tokens(r: aioredis.Redis, customer_id: str, period_start: datetime) -> int:
+    field = usage_field(customer_id, period_start)
+    # Both counters in one MULTI: read apart, a flush renaming pending to
+    # flushing in between would be counted twice or not at all.
+    try:
+        async with r.pipeline(transaction=True) as pipe:
+            for key in USAGE_COUNTER_KEYS:
+                pipe.hget(key, field)
+            counts = await pipe.execute()
+    except Exception:
+        logger.warning("Could not read live token counters for customer %s", customer_id)
+        return 0
+    return sum(int(n) for n in counts if n)
+
 
 @router.get("/usage", response_model=UsageResponse)
 async def get_my_usage(
+    request: Request,
     customer_id: str = Depends(get_current_customer_id),
     db: AsyncSession = Depends(get_db),
+    r: aioredis.Redis = Depends(get_redis),
 ):
+    return await cached(request, r, customer_id, "usage", lambda: _usage(db, r, customer_id))
+
+
+async def _usage(db: AsyncSession, r: aioredis.Redis, customer_id: str) -> UsageResponse:
     now = func.now()
     result = await db.execute(
         select(UsageMonthly)
@@ -28,10 +65,11 @@ async def get_my_usage(
     if not usage:
         raise HTTPException(status_code=404, detail="No usage data for current period")
 
-    pct = round(usage.tokens_used / usage.tokens_limit * 100, 1) if usage.tokens_limit > 0 else 0.0
+    tokens_used = usage.tokens_used + await unflushed_tokens(r, customer_id, usage.period_start)
+    pct = round(tokens_used / usage.tokens_limit * 100, 1) if usage.tokens_limit > 0 else 0.0
 
     return UsageResponse(
-        tokens_used=usage.tokens_used,
+        tokens_used=tokens_used,
         tokens_limit=usage.tokens_limit,
         pct_used=pct,
         period_start=usage.period_start,
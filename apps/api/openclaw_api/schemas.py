@@ -109,6 +109,32 @@ class JobEnqueuedResponse(BaseModel):
     box_id: str
 
 
+class FleetRolloutRequest(BaseModel):
+    image: str | None = Field(default=None, min_length=1)
+    restart: bool = False
+    max_in_flight: int = Field(default=50, ge=1, le=1000)
+    max_failure_ratio: float = Field(default=0.05, ge=0, le=1)
+
+
+class FleetRolloutResponse(BaseModel):
+    id: str
+    image: str | None
+    restart: bool
+    status: str
+    max_in_flight: int
+    max_failure_ratio: float
+    total: int
+    succeeded: int
+    failed: int
+    paused_reason: str | None = None
+    boxes: dict[str, int] = {}
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+    completed_at: datetime | None = None
+
+    model_config = {"from_attributes": True}
+
+
 class ConnectionResponse(BaseModel):
     id: str
     provider: str
@@ -164,6 +190,7 @@ class AnalyticsResponse(BaseModel):
     browser_sessions: BrowserSessionsSummary
     pod_metrics_latest: PodMetricsPoint | None = None
     pod_metrics_series: list[PodMetricsPoint]
+    pod_metrics_bucket_seconds: float
     tier: str
 
 
@@ -191,6 +218,7 @@ class BundleResponse(BaseModel):
     mcp_servers: dict
     skills: list[str]
     sort_order: int
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -0,0 +1,166 @@
+"""Benchmark GET /me/analytics against Postgres, before and after the single query.
+
+Not collected by pytest. Run from apps/api with a scratch-able database:
+
+    TEST_POSTGRES_URL=postgresql://localhost/openclaw_test python -m tests.bench_analytics
+
+It seeds a fleet of customers the way the operator leaves them: 30 days of
+hourly rollups plus the last 2h of per-minute snapshots. One customer instead
+has a week of snapshots that were never rolled up, which is the case where a
+stalled rollup made the old endpoint return one point per minute. For each
+window it reports the median latency over ``RUNS`` calls and the size of the
+JSON body, for the previous four-query implementation and for ``ANALYTICS``.
+"""
+
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from openclaw_api.routes import analytics
+from openclaw_api.schemas import (
+    AnalyticsResponse,
+    BrowserSessionsSummary,
+    PodMetricsPoint,
+    TokenUsageSummary,
+)
+from tests.pg import PG_URL, scratch_schema
+
+FLEET = 200
+RUNS = 20
+WINDOWS = (1, 24, 168)
+
+SEED = """
+    WITH c AS (
+        INSERT INTO customers (id, email)
+        SELECT gen_random_uuid(), 'bench' || n || '@example.com' FROM generate_series(1, $1) n
+        RETURNING id
+    ), s AS (
+        INSERT INTO subscriptions (customer_id, tier, tokens_limit, current_period_start, current_period_end)
+        SELECT id, 'pro', 5000000, now() - interval '10 days', now() + interval '20 days' FROM c
+        RETURNING id, customer_id
+    ), b AS (
+        INSERT INTO boxes (customer_id, subscription_id, k8s_namespace, status)
+        SELECT customer_id, id, 'customer-' || customer_id, 'active' FROM s
+    )
+    INSERT INTO usage_monthly (customer_id, period_start, period_end, tokens_used, tokens_limit)
+    SELECT id, now() - interval '10 days', now() + interval '20 days', 123456, 5000000 FROM c
+"""
+
+SEED_METRICS = """
+    INSERT INTO pod_metrics_hourly (customer_id, box_id, hour, avg_cpu, max_cpu, avg_memory, max_memory, sample_count)
+    SELECT id, 'box', date_trunc('hour', now()) - h * interval '1 hour', 10 + h % 7, 40, 300000000, 400000000, 60
+    FROM customers, generate_series(2, 720) h;
+
+    INSERT INTO pod_metrics_snapshots (customer_id, box_id, namespace, cpu_millicores, memory_bytes, collected_at)
+    SELECT id, 'box', 'customer-' || id, 12, 310000000, now() - m * interval '1 minute'
+    FROM customers, generate_series(0, 119) m;
+
+    INSERT INTO browser_sessions (id, customer_id, started_at, duration_ms)
+    SELECT gen_random_uuid(), id, now() - s * interval '6 hours', 60000
+    FROM customers, generate_series(1, 28) s;
+"""
+
+# A week of raw snapshots for one customer, as if the hourly rollup had stalled.
+SEED_BACKLOG = """
+    INSERT INTO pod_metrics_snapshots (customer_id, box_id, namespace, cpu_millicores, memory_bytes, collected_at)
+    SELECT $1::uuid, 'box', 'customer-' || $1::text, 12, 310000000, now() - m * interval '1 minute'
+    FROM generate_series(120, 168 * 60) m
+"""
+
+
+async def _before(db: AsyncSession, customer_id: str, hours: int) -> AnalyticsResponse:
+    """The endpoint as it was: four queries, one point per stored row."""
+    params = {"cid": customer_id, "hours": hours}
+    row = (await db.execute(text("""
+        SELECT tokens_used, tokens_limit, period_start, period_end
+        FROM usage_monthly
+        WHERE customer_id = :cid AND period_start <= now() AND period_end > now()
+        ORDER BY period_start DESC LIMIT 1
+    """), {"cid": customer_id})).first()
+    brow = (await db.execute(text("""
+        SELECT count(*)::int AS cnt, coalesce(sum(duration_ms), 0)::bigint AS total_ms
+        FROM browser_sessions
+        WHERE customer_id = :cid AND started_at > now() - make_interval(hours => :hours)
+    """), params)).first()
+    tier_row = (await db.execute(text("""
+        SELECT s.tier FROM subscriptions s
+        JOIN boxes b ON b.subscription_id = s.id
+        WHERE b.customer_id = :cid AND b.status != 'destroyed'
+        ORDER BY b.created_at DESC LIMIT 1
+    """), {"cid": customer_id})).first()
+    snap_rows = (await db.execute(text("""
+        SELECT cpu_millicores, memory_bytes, collected_at AS ts
+        FROM pod_metrics_snapshots
+        WHERE customer_id = :cid AND collected_at > now() - make_interval(hours => :hours)
+        ORDER BY collected_at
+    """), params)).all()
+    hourly_rows = (await db.execute(text("""
+        SELECT avg_cpu AS cpu_millicores, avg_memory AS memory_bytes, hour AS ts
+        FROM pod_metrics_hourly
+        WHERE customer_id = :cid AND hour > now() - make_interval(hours => :hours)
+        ORDER BY hour
+    """), params)).all()
+    series = sorted(
+        (PodMetricsPoint(cpu_millicores=r.cpu_millicores, memory_bytes=r.memory_bytes, ts=r.ts)
+         for r in [*hourly_rows, *snap_rows]),
+        key=lambda p: p.ts,
+    )
+    return AnalyticsResponse(
+        token_usage=TokenUsageSummary(
+            tokens_used=row.tokens_used, tokens_limit=row.tokens_limit,
+            period_start=row.period_start, period_end=row.period_end,
+        ),
+        browser_sessions=BrowserSessionsSummary(session_count=brow.cnt, total_duration_ms=brow.total_ms),
+        pod_metrics_latest=series[-1] if series else None,
+        pod_metrics_series=series,
+        pod_metrics_bucket_seconds=0,
+        tier=tier_row.tier,
+    )
+
+
+async def _after(db: AsyncSession, customer_id: str, hours: int) -> AnalyticsResponse:
+    return await analytics._analytics(db, None, customer_id, hours, 200)
+
+
+async def _measure(session_factory, build, customer_id: str, hours: int) -> tuple[float, int]:
+    samples = []
+    async with session_factory() as db:
+        body = (await build(db, customer_id, hours)).model_dump_json()  # warm-up
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            body = (await build(db, customer_id, hours)).model_dump_json()
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, len(body)
+
+
+async def main() -> None:
+    async def no_counters(r, customer_id):
+        return 0
+
+    analytics.unflushed_tokens = no_counters
+
+    async with scratch_schema() as (conn, session_factory):
+        await conn.execute(SEED, FLEET)
+        await conn.execute(SEED_METRICS)
+        steady, backlog = [str(r["id"]) for r in await conn.fetch("SELECT id FROM customers LIMIT 2")]
+        await conn.execute(SEED_BACKLOG, backlog)
+        await conn.execute("ANALYZE")
+
+        print(f"{'customer':<16}{'window':>7}{'before ms':>11}{'after ms':>10}{'before B':>11}{'after B':>10}")
+        for name, customer_id in (("steady state", steady), ("rollup stalled", backlog)):
+            for hours in WINDOWS:
+                before_ms, before_size = await _measure(session_factory, _before, customer_id, hours)
+                after_ms, after_size = await _measure(session_factory, _after, customer_id, hours)
+                print(
+                    f"{name:<16}{str(hours) + 'h':>7}{before_ms:>11.2f}{after_ms:>10.2f}"
+                    f"{before_size:>11}{after_size:>10}"
+                )
+
+
+if __name__ == "__main__":
+    if not PG_URL:
+        raise SystemExit("Set TEST_POSTGRES_URL")
+    asyncio.run(main())
@@ -15,6 +15,7 @@ from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID as PG_UUID
 from sqlalchemy.types import TypeDecorator
 
+from openclaw_api.bundle_catalog import catalog
 from openclaw_api.config import Settings
 from openclaw_api.deps import get_current_customer_id, get_db, get_redis
 from openclaw_api.main import app
@@ -122,6 +123,8 @@ test_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=
 async def setup_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # The bundle catalog outlives the database; start each test from a fresh one.
+    catalog.invalidate()
     yield
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -141,6 +144,11 @@ async def _reset_redis():
     """Reset the mock redis before each test so call counts are isolated."""
     mock_redis.reset_mock()
     mock_redis.rpush = AsyncMock()
+    # Empty response cache; writes go through a pipeline.
+    mock_redis.hget = AsyncMock(return_value=None)
+    pipe = MagicMock(execute=AsyncMock())
+    pipe.__aenter__.return_value = pipe
+    mock_redis.pipeline = MagicMock(return_value=pipe)
     yield
 
 
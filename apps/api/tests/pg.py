@@ -0,0 +1,38 @@
+"""Scratch Postgres schemas for the queries SQLite can't run.
+
+Set TEST_POSTGRES_URL (postgresql://...) to enable them. ``scratch_schema``
+applies every migration in db/migrations to a fresh schema and drops it
+afterwards, so any database the URL points at is left as it was.
+"""
+
+import os
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import asyncpg
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+PG_URL = os.environ.get("TEST_POSTGRES_URL")
+MIGRATIONS = Path(__file__).resolve().parents[3] / "db" / "migrations"
+
+
+@asynccontextmanager
+async def scratch_schema() -> AsyncIterator[tuple[asyncpg.Connection, async_sessionmaker[AsyncSession]]]:
+    """A migrated schema: a raw connection for seeding and sessions bound to it."""
+    schema = f"scratch_{uuid.uuid4().hex[:8]}"
+    conn = await asyncpg.connect(PG_URL)
+    engine = create_async_engine(
+        PG_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+        connect_args={"server_settings": {"search_path": schema}},
+    )
+    try:
+        await conn.execute(f"CREATE SCHEMA {schema}; SET search_path TO {schema}")
+        for migration in sorted(MIGRATIONS.glob("*.sql")):
+            await conn.execute(migration.read_text())
+        yield conn, async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+        await conn.execute(f"DROP SCHEMA {schema} CASCADE")
+        await conn.close()
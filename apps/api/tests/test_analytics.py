@@ -0,0 +1,150 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from openclaw_api.deps import get_db
+from openclaw_api.main import app
+from openclaw_api.routes import analytics
+from tests.conftest import override_get_db
+from tests.pg import PG_URL, scratch_schema
+
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+ROW = {
+    "tokens_used": 500_000, "tokens_limit": 1_000_000, "period_start": NOW, "period_end": NOW,
+    "session_count": 3, "total_duration_ms": 42_000, "tier": "pro",
+    "latest_ts": NOW, "latest_cpu": 12, "latest_memory": 2048,
+    "series": json.dumps([
+        {"ts": "2026-01-01T11:00:00+00:00", "cpu_millicores": 10, "memory_bytes": 1024},
+        {"ts": "2026-01-01T11:30:00+00:00", "cpu_millicores": 12, "memory_bytes": 2048},
+    ]),
+}
+
+
+@pytest.fixture
+def analytics_db():
+    """The analytics query is Postgres-only; stand in for its single result row."""
+    session = AsyncMock()
+    result = MagicMock()
+    result.mappings.return_value.one.return_value = ROW
+    session.execute.return_value = result
+
+    async def _get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = _get_db
+    yield session
+    app.dependency_overrides[get_db] = override_get_db
+
+
+@pytest.mark.anyio
+async def test_analytics_single_round_trip(client, analytics_db):
+    resp = await client.get("/me/analytics?hours=168&points=100")
+    assert resp.status_code == 200
+    data = resp.json()
+
+    analytics_db.execute.assert_called_once()
+    params = analytics_db.execute.call_args[0][1]
+    assert params["points"] == 100
+    assert params["width"] == 168 * 3600 / 100
+    assert data["pod_metrics_bucket_seconds"] == 6048.0
+    assert [p["cpu_millicores"] for p in data["pod_metrics_series"]] == [10, 12]
+    assert data["pod_metrics_latest"]["memory_bytes"] == 2048
+    assert data["token_usage"]["tokens_used"] == 500_000
+    assert data["browser_sessions"]["session_count"] == 3
+    assert data["tier"] == "pro"
+
+
+@pytest.mark.anyio
+async def test_analytics_empty_customer(client, analytics_db):
+    analytics_db.execute.return_value.mappings.return_value.one.return_value = {
+        **ROW, "tokens_used": None, "tokens_limit": None, "period_start": None, "period_end": None,
+        "session_count": 0, "total_duration_ms": 0, "tier": None,
+        "latest_ts": None, "latest_cpu": None, "latest_memory": None, "series": [],
+    }
+    resp = await client.get("/me/analytics")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["pod_metrics_series"] == []
+    assert data["pod_metrics_latest"] is None
+    assert data["token_usage"]["tokens_limit"] == 0
+    assert data["tier"] == "starter"
+    assert analytics_db.execute.call_args[0][1]["points"] == 200
+
+
+@pytest.mark.anyio
+async def test_analytics_points_bounds(client, analytics_db):
+    assert (await client.get("/me/analytics?points=5")).status_code == 422
+    assert (await client.get("/me/analytics?points=5000")).status_code == 422
+
+
+# --- Against Postgres ---------------------------------------------------------
+#
+# The query above is Postgres-only. CI runs this against a Postgres service;
+# locally, set TEST_POSTGRES_URL (see tests/pg.py).
+
+PG_CUSTOMER = uuid.UUID("00000000-0000-4000-8000-0000000000a1")
+
+
+async def _seed(conn) -> None:
+    """A week of hourly rollups at 10m CPU plus the last hour's snapshots at 40m."""
+    await conn.execute("INSERT INTO customers (id, email) VALUES ($1, 'pg@example.com')", PG_CUSTOMER)
+    sub_id = await conn.fetchval(
+        "INSERT INTO subscriptions (customer_id, tier, tokens_limit, current_period_start, current_period_end)"
+        " VALUES ($1, 'pro', 1000000, now() - interval '1 day', now() + interval '29 days') RETURNING id",
+        PG_CUSTOMER,
+    )
+    await conn.execute(
+        "INSERT INTO boxes (customer_id, subscription_id, k8s_namespace, status)"
+        " VALUES ($1, $2, 'customer-pg', 'active')",
+        PG_CUSTOMER, sub_id,
+    )
+    await conn.execute(
+        "INSERT INTO usage_monthly (customer_id, period_start, period_end, tokens_used, tokens_limit)"
+        " VALUES ($1, now() - interval '1 day', now() + interval '29 days', 1234, 1000000)",
+        PG_CUSTOMER,
+    )
+    await conn.execute(
+        "INSERT INTO browser_sessions (id, customer_id, started_at, duration_ms)"
+        " SELECT gen_random_uuid(), $1, now() - n * interval '1 hour', 1000 FROM generate_series(1, 3) n",
+        PG_CUSTOMER,
+    )
+    await conn.execute(
+        "INSERT INTO pod_metrics_hourly"
+        " (customer_id, box_id, hour, avg_cpu, max_cpu, avg_memory, max_memory, sample_count)"
+        " SELECT $1, 'box', date_trunc('hour', now()) - n * interval '1 hour', 10, 20, 1024, 2048, 60"
+        " FROM generate_series(2, 160) n",
+        PG_CUSTOMER,
+    )
+    await conn.execute(
+        "INSERT INTO pod_metrics_snapshots (customer_id, box_id, namespace, cpu_millicores, memory_bytes, collected_at)"
+        " SELECT $1, 'box', 'customer-pg', 40, 4096, now() - n * interval '1 minute' FROM generate_series(0, 59) n",
+        PG_CUSTOMER,
+    )
+
+
+@pytest.mark.skipif(not PG_URL, reason="TEST_POSTGRES_URL not set")
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+@pytest.mark.anyio
+async def test_analytics_query_on_postgres(monkeypatch):
+    monkeypatch.setattr(analytics, "unflushed_tokens", AsyncMock(return_value=0))
+    async with scratch_schema() as (conn, session_factory):
+        await _seed(conn)
+        async with session_factory() as db:
+            data = await analytics._analytics(db, AsyncMock(), str(PG_CUSTOMER), 168, 100)
+
+    assert 0 < len(data.pod_metrics_series) <= 100
+    timestamps = [p.ts for p in data.pod_metrics_series]
+    assert timestamps == sorted(timestamps)
+    # Buckets holding only hourly rollups average to the rollups' CPU, and
+    # the last bucket is dominated by the snapshots.
+    assert data.pod_metrics_series[0].cpu_millicores == 10
+    assert data.pod_metrics_series[-1].cpu_millicores > 10
+    assert data.pod_metrics_latest.cpu_millicores == 40
+    assert data.token_usage.tokens_used == 1234
+    assert data.browser_sessions.session_count == 3
+    assert data.browser_sessions.total_duration_ms == 3000
+    assert data.tier == "pro"
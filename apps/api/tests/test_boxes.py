@@ -85,7 +85,8 @@ async def test_update_box_by_id(client, seed_box):
     data = resp.json()
     assert data["box_id"] == TEST_BOX_ID
     assert "job_id" in data
-    mock_redis.rpush.assert_called_once()
+    mock_redis.pipeline.return_value.rpush.assert_called_once()
+    assert mock_redis.pipeline.return_value.rpush.call_args[0][0] == "operator:jobs"
 
 
 @pytest.mark.anyio
@@ -119,7 +120,7 @@ async def test_setup_first_box(client, seed_customer, seed_bundle):
     assert data["customer_id"] == TEST_CUSTOMER_ID
     assert "box_id" in data
     assert "job_id" in data
-    mock_redis.rpush.assert_called_once()
+    mock_redis.pipeline.return_value.rpush.assert_called_once()
 
 
 @pytest.mark.anyio
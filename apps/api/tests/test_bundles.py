@@ -180,6 +180,7 @@ async def test_update_bundle(client, seed_bundle):
     assert resp.status_code == 200
     assert resp.json()["name"] == "Updated Name"
     assert resp.json()["status"] == "draft"
+    assert resp.json()["version"] == 2
 
 
 @pytest.mark.anyio
@@ -214,3 +215,65 @@ async def test_archive_bundle(client, seed_bundle):
 async def test_archive_bundle_not_found(client):
     resp = await client.delete("/internal/bundles/00000000-0000-0000-0000-nonexistent00")
     assert resp.status_code == 404
+
+
+# --- In-process catalog ---
+
+
+@pytest.mark.anyio
+async def test_catalog_served_from_memory_until_changed(client, seed_bundle, db):
+    from openclaw_api.bundle_catalog import catalog
+
+    assert (await client.get("/bundles")).json()["bundles"][0]["name"] == "General Assistant"
+
+    seed_bundle.name = "Renamed Behind Our Back"
+    await db.commit()
+    assert (await client.get("/bundles")).json()["bundles"][0]["name"] == "General Assistant"
+
+    catalog.invalidate()
+    assert (await client.get("/bundles")).json()["bundles"][0]["name"] == "Renamed Behind Our Back"
+
+
+@pytest.mark.anyio
+async def test_admin_write_publishes_change(client, seed_bundle):
+    from openclaw_api.bundle_catalog import CHANNEL
+    from tests.conftest import mock_redis
+
+    assert (await client.get("/bundles/general-assistant")).status_code == 200
+
+    resp = await client.patch(f"/internal/bundles/{TEST_BUNDLE_ID}", json={"status": "draft"})
+    assert resp.status_code == 200
+    assert mock_redis.publish.await_args.args[0] == CHANNEL
+    assert (await client.get("/bundles/general-assistant")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_listen_invalidates_on_message():
+    import asyncio
+
+    from openclaw_api.bundle_catalog import catalog, listen
+
+    class FakePubSub:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def subscribe(self, channel):
+            pass
+
+        async def listen(self):
+            yield {"type": "subscribe", "data": 1}
+            yield {"type": "message", "data": "7"}
+            raise asyncio.CancelledError
+
+    class FakeRedis:
+        def pubsub(self):
+            return FakePubSub()
+
+    version = catalog.version
+    with pytest.raises(asyncio.CancelledError):
+        await listen(FakeRedis())
+    # Once for subscribing, once for the message.
+    assert catalog.version == version + 2
@@ -0,0 +1,178 @@
+import time
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import update
+
+from openclaw_api import cache
+from openclaw_api.models import UsageMonthly
+from openclaw_api.schemas import UsageResponse
+from tests.conftest import TEST_BOX_ID, TEST_CUSTOMER_ID, mock_redis
+
+
+class FakeHashes:
+    """Just enough of redis.asyncio for the response cache."""
+
+    def __init__(self):
+        self.data: dict[str, dict[str, str]] = {}
+        self.strings: dict[str, str] = {}
+
+    async def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def eval(self, script, numkeys, key, gen_key, generation, field, entry, ttl):
+        assert script is cache._FILL
+        if self.strings.get(gen_key, "0") != generation:
+            return 0
+        self.data.setdefault(key, {})[field] = entry
+        return 1
+
+    def pipeline(self, transaction=True):
+        fake = self
+
+        class Pipe:
+            def __init__(self):
+                self.results = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def hset(self, key, field, value):
+                fake.data.setdefault(key, {})[field] = value
+
+            def expire(self, key, ttl):
+                pass
+
+            def hget(self, key, field):
+                self.results.append(fake.data.get(key, {}).get(field))
+
+            def incr(self, key):
+                fake.strings[key] = str(int(fake.strings.get(key, "0")) + 1)
+
+            def delete(self, key):
+                fake.data.pop(key, None)
+
+            def zadd(self, key, mapping):
+                pass
+
+            def rpush(self, key, *values):
+                pass
+
+            async def execute(self):
+                return self.results
+
+        return Pipe()
+
+
+@pytest.fixture
+def hashes():
+    fake = FakeHashes()
+    mock_redis.hget = AsyncMock(side_effect=fake.hget)
+    mock_redis.get = AsyncMock(side_effect=fake.get)
+    mock_redis.eval = AsyncMock(side_effect=fake.eval)
+    mock_redis.delete = AsyncMock(side_effect=fake.delete)
+    mock_redis.pipeline = fake.pipeline
+    return fake
+
+
+async def _set_tokens_used(db, n):
+    await db.execute(update(UsageMonthly).values(tokens_used=n))
+    await db.commit()
+
+
+@pytest.mark.anyio
+async def test_served_from_cache_until_ttl(client, db, seed_usage, hashes):
+    first = await client.get("/me/usage")
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+    await _set_tokens_used(db, 600_000)
+
+    second = await client.get("/me/usage")
+    assert second.json()["tokens_used"] == 500_000
+    assert second.headers["etag"] == first.headers["etag"]
+
+    # Expire the entry in place.
+    key = cache.cache_key(TEST_CUSTOMER_ID)
+    field = next(iter(hashes.data[key]))
+    entry = cache.json.loads(hashes.data[key][field])
+    hashes.data[key][field] = cache.json.dumps({**entry, "expires_at": time.time() - 1})
+
+    third = await client.get("/me/usage")
+    assert third.json()["tokens_used"] == 600_000
+    assert third.headers["etag"] != first.headers["etag"]
+
+
+@pytest.mark.anyio
+async def test_if_none_match_returns_304(client, seed_usage, hashes):
+    first = await client.get("/me/usage")
+    etag = first.headers["etag"]
+
+    resp = await client.get("/me/usage", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
+
+    resp = await client.get("/me/usage", headers={"If-None-Match": '"stale"'})
+    assert resp.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_query_string_cached_separately(client, seed_box, hashes):
+    await client.get("/me/boxes")
+    await client.get("/me/boxes?x=1")
+    assert set(hashes.data[cache.cache_key(TEST_CUSTOMER_ID)]) == {"boxes?", "boxes?x=1"}
+
+
+@pytest.mark.anyio
+async def test_box_update_invalidates(client, seed_box, hashes):
+    before = await client.get("/me/boxes")
+    assert before.json()["boxes"][0]["model"] != "gpt-4o"
+
+    resp = await client.patch(f"/internal/update/{TEST_BOX_ID}", json={"model": "gpt-4o"})
+    assert resp.status_code == 200
+    assert cache.cache_key(TEST_CUSTOMER_ID) not in hashes.data
+
+    after = await client.get("/me/boxes")
+    assert after.json()["boxes"][0]["model"] == "gpt-4o"
+
+
+@pytest.mark.anyio
+async def test_invalidation_during_build_is_not_overwritten(hashes):
+    async def build():
+        # A write lands and invalidates while the response is being built.
+        await cache.invalidate(mock_redis, TEST_CUSTOMER_ID)
+        return UsageResponse(
+            tokens_used=1, tokens_limit=1, pct_used=100.0,
+            period_start=datetime.now(timezone.utc), period_end=datetime.now(timezone.utc),
+        )
+
+    request = MagicMock(url=MagicMock(query=""), headers={})
+    resp = await cache.cached(request, mock_redis, TEST_CUSTOMER_ID, "usage", build)
+
+    assert resp.status_code == 200
+    assert cache.cache_key(TEST_CUSTOMER_ID) not in hashes.data
+    assert hashes.strings[cache.generation_key(TEST_CUSTOMER_ID)] == "1"
+
+
+@pytest.mark.anyio
+async def test_errors_are_not_cached(client, seed_customer, hashes):
+    assert (await client.get("/me/usage")).status_code == 404
+    assert hashes.data == {}
+
+
+@pytest.mark.anyio
+async def test_redis_down_falls_back(client, seed_usage):
+    mock_redis.hget = AsyncMock(side_effect=ConnectionError("redis down"))
+    resp = await client.get("/me/usage")
+    assert resp.status_code == 200
+    assert resp.json()["tokens_used"] == 500_000
@@ -2,7 +2,9 @@ import json
 from unittest.mock import AsyncMock
 
 import pytest
+from sqlalchemy import update
 
+from openclaw_api.models import BoxStatus, FleetRolloutBox
 from tests.conftest import TEST_BOX_ID, TEST_BUNDLE_ID, TEST_CUSTOMER_ID, mock_redis
 
 
@@ -23,7 +25,28 @@ async def test_provision_creates_customer_and_box(client, db, seed_bundle):
     assert "customer_id" in data
     assert "box_id" in data
     assert "job_id" in data
-    mock_redis.rpush.assert_called_once()
+    pipe = mock_redis.pipeline.return_value
+    pipe.rpush.assert_called_once()
+    assert pipe.rpush.call_args[0][0] == "operator:jobs:high"
+    order_key, entry = pipe.zadd.call_args[0]
+    assert order_key == f"operator:jobs:order:{data['customer_id']}"
+    assert list(entry) == [data["job_id"]]
+
+
+@pytest.mark.anyio
+async def test_provision_job_references_bundle(client, seed_bundle):
+    resp = await client.post("/internal/provision", json={
+        "telegram_bot_token": "tok_123",
+        "telegram_user_id": 99999,
+        "tier": "starter",
+        "customer_email": "new@example.com",
+        "bundle_id": TEST_BUNDLE_ID,
+    })
+    assert resp.status_code == 200
+    payload = json.loads(mock_redis.pipeline.return_value.rpush.call_args[0][1])["payload"]
+    assert payload["bundle_id"] == TEST_BUNDLE_ID
+    assert payload["bundle_version"] == 1
+    assert not {"bundle_prompts", "bundle_mcp_servers", "bundle_skills"} & payload.keys()
 
 
 @pytest.mark.anyio
@@ -128,6 +151,20 @@ async def test_suspend_non_active_box(client, seed_box, db):
     assert resp.status_code == 409
 
 
+@pytest.mark.anyio
+async def test_suspend_sleeping_box(client, seed_box, db):
+    from openclaw_api.models import Box, BoxStatus
+    from sqlalchemy import select
+
+    result = await db.execute(select(Box).where(Box.id == TEST_BOX_ID))
+    box = result.scalar_one()
+    box.status = BoxStatus.sleeping
+    await db.commit()
+
+    resp = await client.post(f"/internal/suspend/{TEST_BOX_ID}")
+    assert resp.status_code == 200
+
+
 # --- Reactivate ---
 
 
@@ -200,6 +237,23 @@ async def test_update_box_wrong_status(client, seed_box, db):
     assert resp.status_code == 409
 
 
+@pytest.mark.anyio
+async def test_update_sleeping_box_stays_asleep(client, seed_box, db):
+    from openclaw_api.models import Box, BoxStatus
+    from sqlalchemy import select
+
+    result = await db.execute(select(Box).where(Box.id == TEST_BOX_ID))
+    box = result.scalar_one()
+    box.status = BoxStatus.sleeping
+    await db.commit()
+
+    resp = await client.patch(f"/internal/update/{TEST_BOX_ID}", json={"model": "gpt-4o"})
+    assert resp.status_code == 200
+
+    await db.refresh(box)
+    assert box.status == BoxStatus.sleeping
+
+
 @pytest.mark.anyio
 async def test_update_box_telegram_user_ids(client, seed_box):
     resp = await client.patch(f"/internal/update/{TEST_BOX_ID}", json={
@@ -285,3 +339,74 @@ async def test_list_all_customers_empty(client):
     resp = await client.get("/internal/customers")
     assert resp.status_code == 200
     assert resp.json()["customers"] == []
+
+
+# --- Fleet rollouts ---
+
+
+@pytest.mark.anyio
+async def test_create_fleet_rollout(client, seed_box):
+    resp = await client.post("/internal/fleet/rollouts", json={
+        "image": "openclaw-gateway:v2",
+        "max_in_flight": 100,
+    })
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["status"] == "running"
+    assert data["image"] == "openclaw-gateway:v2"
+    assert data["total"] == 1
+    assert data["boxes"] == {"pending": 1}
+    # The operator's coordinator enqueues the per-box jobs.
+    mock_redis.pipeline.return_value.rpush.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_create_fleet_rollout_skips_inactive_boxes(client, seed_box, db):
+    seed_box.status = BoxStatus.suspended
+    db.add(seed_box)
+    await db.commit()
+
+    resp = await client.post("/internal/fleet/rollouts", json={"restart": True})
+    assert resp.status_code == 200
+    assert resp.json()["total"] == 0
+
+
+@pytest.mark.anyio
+async def test_create_fleet_rollout_conflict(client, seed_box):
+    assert (await client.post("/internal/fleet/rollouts", json={})).status_code == 200
+    resp = await client.post("/internal/fleet/rollouts", json={})
+    assert resp.status_code == 409
+
+
+@pytest.mark.anyio
+async def test_create_fleet_rollout_invalid_ratio(client):
+    resp = await client.post("/internal/fleet/rollouts", json={"max_failure_ratio": 2})
+    assert resp.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_pause_and_resume_fleet_rollout(client, seed_box, db):
+    rollout_id = (await client.post("/internal/fleet/rollouts", json={})).json()["id"]
+    await db.execute(
+        update(FleetRolloutBox).where(FleetRolloutBox.rollout_id == rollout_id).values(status="failed", error="boom")
+    )
+    await db.commit()
+
+    resp = await client.post(f"/internal/fleet/rollouts/{rollout_id}/pause")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "paused"
+    assert (await client.post(f"/internal/fleet/rollouts/{rollout_id}/pause")).status_code == 409
+
+    resp = await client.post(f"/internal/fleet/rollouts/{rollout_id}/resume")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["status"] == "running"
+    assert data["paused_reason"] is None
+    # Failed boxes are retried.
+    assert data["boxes"] == {"pending": 1}
+
+
+@pytest.mark.anyio
+async def test_get_fleet_rollout_not_found(client):
+    resp = await client.get("/internal/fleet/rollouts/00000000-0000-0000-0000-000000000099")
+    assert resp.status_code == 404
@@ -17,3 +17,39 @@ async def test_get_my_usage(client, seed_usage):
 async def test_get_my_usage_not_found(client, seed_customer):
     resp = await client.get("/me/usage")
     assert resp.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_get_my_usage_includes_unflushed_tokens(client, seed_usage):
+    from unittest.mock import AsyncMock
+
+    from openclaw_api.routes.usage import usage_field
+    from tests.conftest import mock_redis
+
+    pipe = mock_redis.pipeline.return_value
+    pipe.execute = AsyncMock(return_value=["1200", "300"])
+
+    resp = await client.get("/me/usage")
+    assert resp.status_code == 200
+    assert resp.json()["tokens_used"] == 501_500
+    # Both counters are read in one transaction, for the current period only.
+    field = usage_field(TEST_CUSTOMER_ID, seed_usage.period_start)
+    mock_redis.pipeline.assert_called_with(transaction=True)
+    assert [c.args for c in pipe.hget.call_args_list] == [
+        ("usage:pending", field),
+        ("usage:flushing", field),
+    ]
+
+
+@pytest.mark.anyio
+async def test_get_my_usage_without_redis(client, seed_usage):
+    from unittest.mock import AsyncMock
+
+    from tests.conftest import mock_redis
+
+    mock_redis.hget = AsyncMock(side_effect=ConnectionError("redis down"))
+    mock_redis.pipeline.return_value.execute = AsyncMock(side_effect=ConnectionError("redis down"))
+
+    resp = await client.get("/me/usage")
+    assert resp.status_code == 200
+    assert resp.json()["tokens_used"] == 500_000
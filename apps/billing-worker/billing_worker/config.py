@@ -8,6 +8,7 @@ class Settings(BaseSettings):
     stripe_secret_key: str = Field(default="")
     stripe_webhook_secret: str = Field(default="")
     port: int = Field(default=8082)
+    usage_flush_interval: float = Field(default=10.0)
 
     model_config = {"env_prefix": "", "case_sensitive": False, "extra": "ignore"}
 
@@ -1,5 +1,6 @@
 import json
 import logging
+import time
 import uuid
 from datetime import datetime, timezone
 
@@ -18,6 +19,12 @@ TIER_TOKEN_LIMITS = {
 
 REDIS_JOB_QUEUE = "operator:jobs"
 
+# The API's per-customer response cache. Must match openclaw_api.cache
+# (cache_key, generation_key and GENERATION_TTL).
+API_CACHE_KEY = "api:cache:{}"
+API_CACHE_GENERATION_KEY = "api:cache:{}:gen"
+API_CACHE_GENERATION_TTL = 86400
+
 
 async def _enqueue_job(
     r: aioredis.Redis,
@@ -26,6 +33,7 @@ async def _enqueue_job(
     customer_id: str,
     box_id: str | None = None,
     payload: dict | None = None,
+    lane: str = "normal",
 ) -> str:
     job_id = str(uuid.uuid4())
     msg: dict = {"job_id": job_id, "type": job_type, "customer_id": customer_id}
@@ -33,11 +41,32 @@ async def _enqueue_job(
         msg["box_id"] = box_id
     if payload is not None:
         msg["payload"] = payload
-    await r.rpush(REDIS_JOB_QUEUE, json.dumps(msg, default=str))
+    msg["lane"] = lane
+    msg["enqueued_at"] = time.time()
+    # The normal lane keeps the bare queue name. The customer's sequence lets
+    # the operator run their jobs in enqueue order across lanes. Must match
+    # openclaw_operator.jobqueue.lane_key and order_key.
+    queue = REDIS_JOB_QUEUE if lane == "normal" else f"{REDIS_JOB_QUEUE}:{lane}"
+    pipe = r.pipeline(transaction=True)
+    pipe.zadd(f"{REDIS_JOB_QUEUE}:order:{customer_id}", {job_id: msg["enqueued_at"]})
+    pipe.rpush(queue, json.dumps(msg, default=str))
+    await pipe.execute()
     logger.info("Enqueued %s job %s for customer %s", job_type, job_id, customer_id)
     return job_id
 
 
+async def _invalidate_api_cache(r: aioredis.Redis, customer_id: str) -> None:
+    """Drop the dashboard's cached responses after a committed billing change."""
+    try:
+        pipe = r.pipeline(transaction=True)
+        pipe.incr(API_CACHE_GENERATION_KEY.format(customer_id))
+        pipe.expire(API_CACHE_GENERATION_KEY.format(customer_id), API_CACHE_GENERATION_TTL)
+        pipe.delete(API_CACHE_KEY.format(customer_id))
+        await pipe.execute()
+    except Exception:
+        logger.warning("Could not invalidate API response cache for customer %s", customer_id)
+
+
 def _get_tier_from_metadata(metadata: dict) -> str | None:
     return metadata.get("tier")
 
@@ -119,6 +148,7 @@ async def handle_checkout_session_completed(
     )
 
     await db.commit()
+    await _invalidate_api_cache(r, customer_id)
 
     # Enqueue provision job
     await _enqueue_job(
@@ -126,6 +156,7 @@ async def handle_checkout_session_completed(
         job_type="provision",
         customer_id=customer_id,
         payload={"tier": tier, "subscription_id": sub_id},
+        lane="high",
     )
 
     logger.info(
@@ -215,10 +246,12 @@ async def handle_invoice_payment_succeeded(
             job_type="reactivate",
             customer_id=customer_id,
             box_id=box_id,
+            lane="high",
         )
         logger.info("Reactivated suspended subscription %s", sub_id)
     else:
         await db.commit()
+    await _invalidate_api_cache(r, customer_id)
 
     logger.info("Payment succeeded for subscription %s, token counter reset", sub_id)
 
@@ -252,10 +285,11 @@ async def handle_invoice_payment_failed(
             {"id": sub_id},
         )
         await db.commit()
+        await _invalidate_api_cache(r, customer_id)
 
         # Find box to suspend
         box_result = await db.execute(
-            text("SELECT id FROM boxes WHERE customer_id = :cid AND status IN ('active', 'unhealthy') LIMIT 1"),
+            text("SELECT id FROM boxes WHERE customer_id = :cid AND status IN ('active', 'sleeping', 'unhealthy') LIMIT 1"),
             {"cid": customer_id},
         )
         box_row = box_result.fetchone()
@@ -315,6 +349,7 @@ async def handle_subscription_updated(
             {"ps": period_start, "pe": period_end, "id": sub_id},
         )
         await db.commit()
+        await _invalidate_api_cache(r, customer_id)
         logger.info("Subscription %s updated (no tier change)", sub_id)
         return
 
@@ -346,6 +381,7 @@ async def handle_subscription_updated(
     )
 
     await db.commit()
+    await _invalidate_api_cache(r, customer_id)
 
     # Find box and enqueue resize
     box_result = await db.execute(
@@ -393,6 +429,7 @@ async def handle_subscription_deleted(
         {"id": sub_id},
     )
     await db.commit()
+    await _invalidate_api_cache(r, customer_id)
 
     # Find box and enqueue destroy
     box_result = await db.execute(
@@ -1,3 +1,5 @@
+import asyncio
+import contextlib
 import logging
 
 import redis.asyncio as aioredis
@@ -8,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_asyn
 
 from .config import settings
 from .handlers import EVENT_HANDLERS
+from .usage import flush_usage, usage_flush_loop
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,21 +23,32 @@ app = FastAPI(title="OpenClaw Billing Worker", docs_url=None, redoc_url=None)
 _engine = None
 _session_factory: async_sessionmaker[AsyncSession] | None = None
 _redis: aioredis.Redis | None = None
+_usage_flusher: asyncio.Task | None = None
 
 
 @app.on_event("startup")
 async def startup() -> None:
-    global _engine, _session_factory, _redis
+    global _engine, _session_factory, _redis, _usage_flusher
     stripe.api_key = settings.stripe_secret_key
     _engine = create_async_engine(settings.database_url, pool_size=5, max_overflow=2)
     _session_factory = async_sessionmaker(_engine, expire_on_commit=False)
     _redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+    _usage_flusher = asyncio.create_task(usage_flush_loop(_session_factory, _redis))
     logger.info("Billing worker started")
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
     global _engine, _redis
+    if _usage_flusher:
+        _usage_flusher.cancel()
+        # Let an in-flight flush unwind before the final one starts.
+        with contextlib.suppress(asyncio.CancelledError):
+            await _usage_flusher
+        try:
+            await flush_usage(_session_factory, _redis)
+        except Exception:
+            logger.exception("Final token usage flush failed")
     if _redis:
         await _redis.aclose()
     if _engine:
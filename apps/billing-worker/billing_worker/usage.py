@@ -0,0 +1,140 @@
+"""Flush live token counters into ``usage_monthly``.
+
+The token proxy adds every request's tokens to the ``usage:pending`` hash
+instead of writing to Postgres, one field per customer and billing period:
+``{customer_id}:{period_start}``, the start in epoch seconds of the
+``usage_monthly`` row the request was admitted against. Every
+``usage_flush_interval`` seconds this loop renames the hash to
+``usage:flushing``, which atomically hands new tokens to a fresh
+``usage:pending``. It adds the snapshot to those ``usage_monthly`` rows in
+one statement, then deletes the snapshot. Tokens counted just before a period
+ends are flushed into that period, not the one that has started since.
+
+Until it is deleted, readers count the snapshot on top of ``usage_monthly``,
+so the totals they show never go backwards. A snapshot whose flush failed is
+kept and retried on the next pass, before a new one is taken.
+
+Each snapshot gets an id (the ``_snapshot`` field) when it is taken. The id
+goes into ``usage_flushes`` in the same transaction as the update, so a
+snapshot that is flushed again after its delete failed is not counted twice.
+Flushes also hold ``usage:flush:lock``, so only one worker flushes at a time.
+"""
+
+import asyncio
+import logging
+import uuid
+
+import redis.asyncio as aioredis
+from redis.exceptions import LockError, ResponseError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Must match USAGE_PENDING_KEY / USAGE_FLUSHING_KEY in token-proxy/src/usage.js
+# and openclaw_api.routes.usage.
+PENDING_KEY = "usage:pending"
+FLUSHING_KEY = "usage:flushing"
+# Not a customer id, so readers summing a customer's field never see it.
+SNAPSHOT_FIELD = "_snapshot"
+FLUSH_LOCK_KEY = "usage:flush:lock"
+FLUSH_LOCK_TIMEOUT = 60
+
+RECORD_FLUSH = text("""
+    INSERT INTO usage_flushes (snapshot_id) VALUES (:snapshot_id)
+    ON CONFLICT (snapshot_id) DO NOTHING
+    RETURNING snapshot_id
+""")
+
+PRUNE_FLUSHES = text("DELETE FROM usage_flushes WHERE applied_at < now() - interval '7 days'")
+
+# Fields without a period were counted before the proxy keyed them by period;
+# they go to the customer's current row.
+ADD_USAGE = text("""
+    UPDATE usage_monthly um
+    SET tokens_used = um.tokens_used + t.tokens
+    FROM unnest(CAST(:customer_ids AS uuid[]), CAST(:periods AS bigint[]), CAST(:tokens AS bigint[]))
+        AS t(customer_id, period, tokens)
+    WHERE um.customer_id = t.customer_id
+      AND CASE WHEN t.period IS NULL
+          THEN um.period_start <= now() AND um.period_end > now()
+          ELSE um.period_start >= to_timestamp(t.period) AND um.period_start < to_timestamp(t.period + 1)
+      END
+    RETURNING um.customer_id, t.period
+""")
+
+
+async def flush_usage(session_factory: async_sessionmaker[AsyncSession], r: aioredis.Redis) -> int:
+    """Move the pending counters into ``usage_monthly``. Returns the number of customers.
+
+    Returns 0 without flushing while another worker holds the flush lock.
+    """
+    lock = r.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+    if not await lock.acquire(blocking=False):
+        return 0
+    try:
+        return await _flush(session_factory, r)
+    finally:
+        try:
+            await lock.release()
+        except LockError:
+            logger.warning("Token usage flush outlived its lock")
+
+
+async def _flush(session_factory: async_sessionmaker[AsyncSession], r: aioredis.Redis) -> int:
+    if not await r.exists(FLUSHING_KEY):
+        try:
+            await r.rename(PENDING_KEY, FLUSHING_KEY)
+        except ResponseError:
+            # Nothing pending.
+            return 0
+    # Kept if the snapshot already has one, so a retry reuses it.
+    await r.hsetnx(FLUSHING_KEY, SNAPSHOT_FIELD, uuid.uuid4().hex)
+
+    snapshot = await r.hgetall(FLUSHING_KEY)
+    snapshot_id = snapshot.pop(SNAPSHOT_FIELD)
+    totals = {_parse_field(field): int(n) for field, n in snapshot.items() if int(n)}
+    applied = False
+    if totals:
+        async with session_factory() as db:
+            applied = (await db.execute(RECORD_FLUSH, {"snapshot_id": snapshot_id})).scalar() is not None
+            if applied:
+                result = await db.execute(ADD_USAGE, {
+                    "customer_ids": [cid for cid, _ in totals],
+                    "periods": [period for _, period in totals],
+                    "tokens": list(totals.values()),
+                })
+                unmatched = set(totals) - {(str(cid), period) for cid, period in result.all()}
+                if unmatched:
+                    logger.warning(
+                        "No usage_monthly row for %d token counters, dropped %d tokens: %s",
+                        len(unmatched), sum(totals[key] for key in unmatched), sorted(unmatched, key=str),
+                    )
+                await db.execute(PRUNE_FLUSHES)
+            await db.commit()
+    await r.delete(FLUSHING_KEY)
+    if applied:
+        logger.info("Flushed token usage for %d customers", len(totals))
+    elif totals:
+        logger.warning("Token usage snapshot %s was already flushed, dropped it", snapshot_id)
+    return len(totals) if applied else 0
+
+
+def _parse_field(field: str) -> tuple[str, int | None]:
+    """Split a counter field into the customer id and period start (None if unkeyed)."""
+    customer_id, _, period = field.partition(":")
+    return customer_id, int(period) if period else None
+
+
+async def usage_flush_loop(session_factory: async_sessionmaker[AsyncSession], r: aioredis.Redis) -> None:
+    """Flush every ``usage_flush_interval`` seconds, until cancelled."""
+    while True:
+        await asyncio.sleep(settings.usage_flush_interval)
+        try:
+            await flush_usage(session_factory, r)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error flushing token usage")
@@ -45,7 +45,10 @@ async def mock_db():
 async def mock_redis():
     """Mock async Redis client."""
     r = AsyncMock()
-    r.rpush = AsyncMock()
+    # Jobs are enqueued through a transaction pipeline.
+    r.pipeline = MagicMock(return_value=MagicMock(execute=AsyncMock()))
+    # Usage flushes run under a redis-py lock.
+    r.lock = MagicMock(return_value=MagicMock(acquire=AsyncMock(return_value=True), release=AsyncMock()))
     return r
 
 
@@ -55,14 +55,21 @@ class TestCheckoutSessionCompleted:
         mock_db.commit.assert_called_once()
 
         # Verify provision job enqueued
-        mock_redis.rpush.assert_called_once()
-        call_args = mock_redis.rpush.call_args
-        assert call_args[0][0] == "operator:jobs"
+        mock_redis.pipeline.return_value.rpush.assert_called_once()
+        call_args = mock_redis.pipeline.return_value.rpush.call_args
+        assert call_args[0][0] == "operator:jobs:high"
         import json
         job = json.loads(call_args[0][1])
         assert job["type"] == "provision"
+        assert job["lane"] == "high"
         assert job["customer_id"] == "cust-001"
         assert job["payload"]["tier"] == "pro"
+        mock_redis.pipeline.return_value.zadd.assert_called_once_with(
+            "operator:jobs:order:cust-001", {job["job_id"]: job["enqueued_at"]},
+        )
+        # The dashboard stops serving the pre-checkout responses.
+        mock_redis.pipeline.return_value.incr.assert_called_once_with("api:cache:cust-001:gen")
+        mock_redis.pipeline.return_value.delete.assert_called_once_with("api:cache:cust-001")
 
     @pytest.mark.asyncio
     @patch("billing_worker.handlers.stripe")
@@ -92,7 +99,7 @@ class TestCheckoutSessionCompleted:
 
         # Should NOT insert subscription or enqueue job
         assert mock_db.execute.call_count == 2
-        mock_redis.rpush.assert_not_called()
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_missing_customer_id_in_metadata(self, mock_db, mock_redis):
@@ -105,7 +112,7 @@ class TestCheckoutSessionCompleted:
         await handle_checkout_session_completed(event, mock_db, mock_redis)
 
         mock_db.execute.assert_not_called()
-        mock_redis.rpush.assert_not_called()
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
 
 
 # ---------------------------------------------------------------------------
@@ -139,7 +146,7 @@ class TestInvoicePaymentSucceeded:
 
         assert mock_db.commit.call_count == 1
         # Not suspended, so no reactivate job
-        mock_redis.rpush.assert_not_called()
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
 
     @pytest.mark.asyncio
     @patch("billing_worker.handlers.stripe")
@@ -168,8 +175,8 @@ class TestInvoicePaymentSucceeded:
         await handle_invoice_payment_succeeded(event, mock_db, mock_redis)
 
         import json
-        mock_redis.rpush.assert_called_once()
-        job = json.loads(mock_redis.rpush.call_args[0][1])
+        mock_redis.pipeline.return_value.rpush.assert_called_once()
+        job = json.loads(mock_redis.pipeline.return_value.rpush.call_args[0][1])
         assert job["type"] == "reactivate"
         assert job["customer_id"] == "cust-001"
 
@@ -222,8 +229,8 @@ class TestInvoicePaymentFailed:
         await handle_invoice_payment_failed(event, mock_db, mock_redis)
 
         import json
-        mock_redis.rpush.assert_called_once()
-        job = json.loads(mock_redis.rpush.call_args[0][1])
+        mock_redis.pipeline.return_value.rpush.assert_called_once()
+        job = json.loads(mock_redis.pipeline.return_value.rpush.call_args[0][1])
         assert job["type"] == "suspend"
         assert job["customer_id"] == "cust-001"
 
@@ -242,7 +249,7 @@ class TestInvoicePaymentFailed:
         await handle_invoice_payment_failed(event, mock_db, mock_redis)
 
         # No suspend job enqueued
-        mock_redis.rpush.assert_not_called()
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_skips_invoice_without_subscription(self, mock_db, mock_redis):
@@ -288,8 +295,8 @@ class TestSubscriptionUpdated:
         await handle_subscription_updated(event, mock_db, mock_redis)
 
         import json
-        mock_redis.rpush.assert_called_once()
-        job = json.loads(mock_redis.rpush.call_args[0][1])
+        mock_redis.pipeline.return_value.rpush.assert_called_once()
+        job = json.loads(mock_redis.pipeline.return_value.rpush.call_args[0][1])
         assert job["type"] == "resize"
         assert job["payload"]["new_tier"] == "team"
         assert job["payload"]["old_tier"] == "pro"
@@ -316,7 +323,8 @@ class TestSubscriptionUpdated:
 
         await handle_subscription_updated(event, mock_db, mock_redis)
 
-        mock_redis.rpush.assert_not_called()
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
+        mock_redis.pipeline.return_value.delete.assert_called_once_with("api:cache:cust-001")
 
     @pytest.mark.asyncio
     @patch("billing_worker.handlers.stripe")
@@ -333,7 +341,7 @@ class TestSubscriptionUpdated:
 
         await handle_subscription_updated(event, mock_db, mock_redis)
 
-        mock_redis.rpush.assert_not_called()
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
 
 
 # ---------------------------------------------------------------------------
@@ -356,8 +364,8 @@ class TestSubscriptionDeleted:
         await handle_subscription_deleted(event, mock_db, mock_redis)
 
         import json
-        mock_redis.rpush.assert_called_once()
-        job = json.loads(mock_redis.rpush.call_args[0][1])
+        mock_redis.pipeline.return_value.rpush.assert_called_once()
+        job = json.loads(mock_redis.pipeline.return_value.rpush.call_args[0][1])
         assert job["type"] == "destroy"
         assert job["customer_id"] == "cust-001"
         assert job["box_id"] == "box-001"
@@ -372,7 +380,7 @@ class TestSubscriptionDeleted:
 
         await handle_subscription_deleted(event, mock_db, mock_redis)
 
-        mock_redis.rpush.assert_not_called()
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_handles_no_active_box(self, mock_db, mock_redis):
@@ -389,8 +397,8 @@ class TestSubscriptionDeleted:
         await handle_subscription_deleted(event, mock_db, mock_redis)
 
         import json
-        mock_redis.rpush.assert_called_once()
-        job = json.loads(mock_redis.rpush.call_args[0][1])
+        mock_redis.pipeline.return_value.rpush.assert_called_once()
+        job = json.loads(mock_redis.pipeline.return_value.rpush.call_args[0][1])
         assert job["type"] == "destroy"
         # box_id should not be in message when None
         assert "box_id" not in job
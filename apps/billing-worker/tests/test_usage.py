@@ -0,0 +1,169 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from redis.exceptions import ResponseError
+
+from billing_worker import main
+from billing_worker.usage import (
+    ADD_USAGE,
+    FLUSH_LOCK_KEY,
+    FLUSHING_KEY,
+    PENDING_KEY,
+    RECORD_FLUSH,
+    SNAPSHOT_FIELD,
+    flush_usage,
+)
+
+
+def _applied(*rows, snapshot_id="snap-1"):
+    """A result for both RECORD_FLUSH and ADD_USAGE's matched (customer_id, period) rows."""
+    return MagicMock(scalar=MagicMock(return_value=snapshot_id), all=MagicMock(return_value=list(rows)))
+
+
+def _session_factory(db):
+    ctx = AsyncMock()
+    ctx.__aenter__ = AsyncMock(return_value=db)
+    ctx.__aexit__ = AsyncMock(return_value=False)
+    return MagicMock(return_value=ctx)
+
+
+class TestFlushUsage:
+    @pytest.mark.asyncio
+    async def test_flushes_snapshot_in_one_statement(self, mock_db, mock_redis):
+        mock_redis.exists.return_value = 0
+        mock_redis.hgetall.return_value = {
+            SNAPSHOT_FIELD: "snap-1",
+            "cust-1:1788220800": "1500",
+            "cust-1:1790812800": "30",
+            "cust-2:1790812800": "20",
+            "cust-3:1790812800": "0",
+        }
+        mock_db.execute.return_value = _applied(
+            ("cust-1", 1788220800), ("cust-1", 1790812800), ("cust-2", 1790812800),
+        )
+
+        assert await flush_usage(_session_factory(mock_db), mock_redis) == 3
+
+        mock_redis.rename.assert_awaited_once_with(PENDING_KEY, FLUSHING_KEY)
+        mock_redis.hsetnx.assert_awaited_once()
+        record, add, _prune = mock_db.execute.call_args_list
+        assert record[0] == (RECORD_FLUSH, {"snapshot_id": "snap-1"})
+        # Each counter goes to the period it was counted in, not the current one.
+        assert add[0] == (ADD_USAGE, {
+            "customer_ids": ["cust-1", "cust-1", "cust-2"],
+            "periods": [1788220800, 1790812800, 1790812800],
+            "tokens": [1500, 30, 20],
+        })
+        mock_db.commit.assert_awaited_once()
+        mock_redis.delete.assert_awaited_once_with(FLUSHING_KEY)
+        mock_redis.lock.assert_called_once_with(FLUSH_LOCK_KEY, timeout=60)
+        mock_redis.lock.return_value.release.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_nothing_pending(self, mock_db, mock_redis):
+        mock_redis.exists.return_value = 0
+        mock_redis.rename.side_effect = ResponseError("no such key")
+
+        assert await flush_usage(_session_factory(mock_db), mock_redis) == 0
+
+        mock_db.execute.assert_not_called()
+        mock_redis.delete.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_retries_leftover_snapshot_first(self, mock_db, mock_redis):
+        mock_redis.exists.return_value = 1
+        mock_redis.hgetall.return_value = {SNAPSHOT_FIELD: "snap-1", "cust-1:1790812800": "7"}
+        mock_db.execute.return_value = _applied(("cust-1", 1790812800))
+
+        assert await flush_usage(_session_factory(mock_db), mock_redis) == 1
+
+        mock_redis.rename.assert_not_called()
+        mock_redis.delete.assert_awaited_once_with(FLUSHING_KEY)
+
+    @pytest.mark.asyncio
+    async def test_unkeyed_counters_go_to_current_period(self, mock_db, mock_redis):
+        # Counted by a proxy from before the fields were keyed by period.
+        mock_redis.exists.return_value = 0
+        mock_redis.hgetall.return_value = {SNAPSHOT_FIELD: "snap-1", "cust-1": "7"}
+        mock_db.execute.return_value = _applied(("cust-1", None))
+
+        assert await flush_usage(_session_factory(mock_db), mock_redis) == 1
+
+        add = mock_db.execute.call_args_list[1]
+        assert add[0] == (ADD_USAGE, {"customer_ids": ["cust-1"], "periods": [None], "tokens": [7]})
+
+    @pytest.mark.asyncio
+    async def test_logs_counters_without_a_usage_row(self, mock_db, mock_redis, caplog):
+        mock_redis.exists.return_value = 0
+        mock_redis.hgetall.return_value = {
+            SNAPSHOT_FIELD: "snap-1", "cust-1:1790812800": "7", "cust-2:1790812800": "5",
+        }
+        mock_db.execute.return_value = _applied(("cust-1", 1790812800))
+
+        await flush_usage(_session_factory(mock_db), mock_redis)
+
+        assert "dropped 5 tokens" in caplog.text
+        assert "cust-2" in caplog.text
+        mock_redis.delete.assert_awaited_once_with(FLUSHING_KEY)
+
+    @pytest.mark.asyncio
+    async def test_failed_write_keeps_snapshot(self, mock_db, mock_redis):
+        mock_redis.exists.return_value = 0
+        mock_redis.hgetall.return_value = {SNAPSHOT_FIELD: "snap-1", "cust-1:1790812800": "7"}
+        mock_db.execute.side_effect = Exception("db down")
+
+        with pytest.raises(Exception, match="db down"):
+            await flush_usage(_session_factory(mock_db), mock_redis)
+
+        mock_redis.delete.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_already_applied_snapshot_is_not_counted_again(self, mock_db, mock_redis):
+        # The last flush committed but its delete failed.
+        mock_redis.exists.return_value = 1
+        mock_redis.hgetall.return_value = {SNAPSHOT_FIELD: "snap-1", "cust-1:1790812800": "7"}
+        mock_db.execute.return_value = _applied(snapshot_id=None)
+
+        assert await flush_usage(_session_factory(mock_db), mock_redis) == 0
+
+        assert mock_db.execute.call_args[0][0] is RECORD_FLUSH
+        mock_db.commit.assert_awaited_once()
+        mock_redis.delete.assert_awaited_once_with(FLUSHING_KEY)
+
+    @pytest.mark.asyncio
+    async def test_skips_while_another_worker_flushes(self, mock_db, mock_redis):
+        mock_redis.lock.return_value.acquire.return_value = False
+
+        assert await flush_usage(_session_factory(mock_db), mock_redis) == 0
+
+        mock_redis.rename.assert_not_called()
+        mock_redis.lock.return_value.release.assert_not_called()
+
+
+class TestShutdown:
+    @pytest.mark.asyncio
+    async def test_final_flush_waits_for_cancelled_loop(self, mock_redis):
+        order: list[str] = []
+
+        async def loop():
+            try:
+                await asyncio.sleep(3600)
+            finally:
+                await asyncio.sleep(0)
+                order.append("loop exited")
+
+        async def final_flush(*args):
+            order.append("final flush")
+
+        task = asyncio.create_task(loop())
+        await asyncio.sleep(0)
+        with (
+            patch.object(main, "_usage_flusher", task),
+            patch.object(main, "_redis", None),
+            patch.object(main, "_engine", None),
+            patch.object(main, "flush_usage", final_flush),
+        ):
+            await main.shutdown()
+
+        assert order == ["loop exited", "final flush"]
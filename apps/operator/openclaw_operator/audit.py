@@ -0,0 +1,122 @@
+"""Job audit rows in ``operator_jobs``, one per job id.
+
+The API inserts a ``queued`` row when it enqueues a job and puts that row's
+id in the message as ``job_id``. The operator upserts the same row for every
+status change, so a job keeps one row however many times it is retried.
+
+``AuditWriter`` buffers status changes and writes them in batches. When
+several changes for one job are pending, only the latest is written.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+JOB_UPSERT = text("""
+    INSERT INTO operator_jobs (id, customer_id, box_id, job_type, status, payload, error_log, started_at, completed_at, step_timings)
+    VALUES (:id, :customer_id, :box_id, :job_type, :status, :payload, :error_log, :started_at, :completed_at, :step_timings)
+    ON CONFLICT (id) DO UPDATE SET
+        status = EXCLUDED.status,
+        payload = EXCLUDED.payload,
+        error_log = EXCLUDED.error_log,
+        started_at = EXCLUDED.started_at,
+        completed_at = EXCLUDED.completed_at,
+        step_timings = EXCLUDED.step_timings
+""")
+
+TERMINAL = frozenset({"complete", "failed"})
+
+
+def job_row(
+    *,
+    job_id: str,
+    customer_id: str,
+    box_id: str | None,
+    job_type: str,
+    status: str,
+    payload: dict,
+    started_at: datetime,
+    error_log: str | None = None,
+    step_timings: dict[str, float] | None = None,
+) -> dict:
+    """Bind parameters for ``JOB_UPSERT``."""
+    return {
+        "id": job_id,
+        "customer_id": customer_id,
+        "box_id": box_id,
+        "job_type": job_type,
+        "status": status,
+        "payload": json.dumps(payload),
+        "error_log": error_log,
+        "started_at": started_at,
+        "completed_at": datetime.now(timezone.utc) if status in TERMINAL else None,
+        "step_timings": json.dumps(step_timings) if step_timings else None,
+    }
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        *,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+    ) -> None:
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: dict[str, dict] = {}
+        self._wake = asyncio.Event()
+
+    def record(self, row: dict) -> None:
+        """Queue a row from ``job_row``; it replaces any pending row for the same job."""
+        self._pending.pop(row["id"], None)
+        self._pending[row["id"]] = row
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Write everything pending in one statement. Returns the number of rows."""
+        if not self._pending:
+            return 0
+        rows, self._pending = list(self._pending.values()), {}
+        try:
+            async with self._session_factory() as db:
+                await db.execute(JOB_UPSERT, rows)
+                await db.commit()
+        except Exception:
+            logger.exception("Batched audit write of %d rows failed, writing them one by one", len(rows))
+            await self._write_each(rows)
+        return len(rows)
+
+    async def _write_each(self, rows: list[dict]) -> None:
+        async with self._session_factory() as db:
+            for row in rows:
+                try:
+                    await db.execute(JOB_UPSERT, row)
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    logger.exception("Dropping audit row for job %s", row["id"])
+
+    async def run(self) -> None:
+        """Flush every ``flush_interval`` seconds, or as soon as a batch fills."""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("Error flushing job audit rows")
+        finally:
+            await self.flush()
@@ -0,0 +1,58 @@
+"""Bundles referenced by provision jobs.
+
+The API puts ``bundle_id`` and ``bundle_version`` in a provision job rather
+than the bundle's prompts, MCP servers and skills. The operator resolves the
+reference here and keeps each bundle in memory. A cached bundle is reused
+as long as it is at least the version the job asks for. An admin update
+bumps the version, so the first job after it reads the row again.
+"""
+
+import logging
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_BY_ID = text("""
+    SELECT id, slug, version, prompts, mcp_servers, skills
+    FROM bundles
+    WHERE id = :bundle_id
+""")
+
+
+@dataclass(frozen=True)
+class BundleSpec:
+    id: str
+    slug: str
+    version: int
+    prompts: dict = field(default_factory=dict)
+    mcp_servers: dict = field(default_factory=dict)
+    skills: list = field(default_factory=list)
+
+
+_cache: dict[str, BundleSpec] = {}
+
+
+async def resolve_bundle(db: AsyncSession, bundle_id: str, version: int = 0) -> BundleSpec | None:
+    """The bundle ``bundle_id`` at ``version`` or newer, or None if it is gone."""
+    cached = _cache.get(bundle_id)
+    if cached is not None and cached.version >= version:
+        return cached
+
+    result = await db.execute(BUNDLE_BY_ID, {"bundle_id": bundle_id})
+    row = result.fetchone()
+    if row is None:
+        logger.warning("Bundle %s not found", bundle_id)
+        return None
+    spec = BundleSpec(
+        id=str(row[0]),
+        slug=row[1],
+        version=row[2],
+        prompts=row[3] or {},
+        mcp_servers=row[4] or {},
+        skills=row[5] or [],
+    )
+    _cache[bundle_id] = spec
+    return spec
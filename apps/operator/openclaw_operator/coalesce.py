@@ -0,0 +1,125 @@
+"""Debounce repeated config-refresh jobs for the same box.
+
+``update`` and ``update_connections`` jobs each end in a secret patch and a
+rollout restart. When several arrive for one box within
+``job_coalesce_window`` seconds of the first, they are merged into a single
+job: later payload keys win, and dict-valued keys such as ``secret_data`` are
+merged key by key. The merged job restarts the pod once.
+
+Every original delivery stays in the processing list until the merged job
+settles, and then each one is acked or retried with it.
+"""
+
+import asyncio
+import json
+import logging
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+COALESCIBLE = frozenset({"update", "update_connections"})
+
+Delivery = tuple[str, int]  # (raw message, delivery number)
+
+
+@dataclass
+class CoalesceStats:
+    released: int = 0
+    collapsed: Counter = field(default_factory=Counter)
+
+
+@dataclass
+class _Held:
+    customer_id: str
+    job: dict
+    deliveries: list[Delivery]
+    timer: asyncio.TimerHandle | None = None
+
+
+def _payload(job: dict) -> dict:
+    payload = job.get("payload") or {}
+    if isinstance(payload, str):
+        payload = json.loads(payload) if payload else {}
+    return payload
+
+
+def merge(earlier: dict, later: dict) -> dict:
+    """Fold ``later`` into ``earlier``; the later job wins key by key."""
+    payload = _payload(earlier)
+    for key, value in _payload(later).items():
+        if isinstance(value, dict) and isinstance(payload.get(key), dict):
+            payload[key] = {**payload[key], **value}
+        else:
+            payload[key] = value
+    merged = {**later, "payload": payload}
+    merged["coalesced"] = [*earlier.get("coalesced", []), earlier.get("job_id")]
+    return merged
+
+
+class Coalescer:
+    """Holds coalescible jobs for a window, then hands the merge to ``release``.
+
+    ``release(raw, deliveries)`` must schedule the job synchronously so it
+    keeps its place ahead of later jobs for the same customer.
+    """
+
+    def __init__(self, window: float, release: Callable[[str, list[Delivery]], object]) -> None:
+        self.window = window
+        self._release_fn = release
+        self._held: dict[tuple[str, str], _Held] = {}
+        self._stats = CoalesceStats()
+
+    def hold(self, raw: str, attempt: int) -> bool:
+        """Take the job if it can be coalesced. Returns False if the caller should run it now."""
+        try:
+            job = json.loads(raw)
+            job_type = job.get("job_type") or job.get("type")
+            customer_id = str(job["customer_id"])
+            box_id = job.get("box_id") or _payload(job).get("box_id")
+        except Exception:
+            return False
+
+        if self.window <= 0 or job_type not in COALESCIBLE or not box_id:
+            # Anything else for this customer must not overtake what is held.
+            self.flush(customer_id)
+            return False
+
+        key = (job_type, str(box_id))
+        held = self._held.get(key)
+        if held is None:
+            held = self._held[key] = _Held(customer_id, job, [(raw, attempt)])
+            held.timer = asyncio.get_running_loop().call_later(self.window, self._release, key)
+        else:
+            held.job = merge(held.job, job)
+            held.deliveries.append((raw, attempt))
+            self._stats.collapsed[job_type] += 1
+        return True
+
+    def _release(self, key: tuple[str, str]) -> None:
+        held = self._held.pop(key, None)
+        if held is None:
+            return
+        if held.timer is not None:
+            held.timer.cancel()
+        self._stats.released += 1
+        if len(held.deliveries) > 1:
+            logger.info("Coalesced %d %s jobs for box %s", len(held.deliveries), key[0], key[1])
+        self._release_fn(json.dumps(held.job, default=str), held.deliveries)
+
+    def flush(self, customer_id: str) -> None:
+        """Release everything held for ``customer_id`` now."""
+        for key in [k for k, h in self._held.items() if h.customer_id == customer_id]:
+            self._release(key)
+
+    def flush_all(self) -> None:
+        for key in list(self._held):
+            self._release(key)
+
+    def stats(self) -> dict:
+        return {
+            "held": len(self._held),
+            "released": self._stats.released,
+            "collapsed": dict(self._stats.collapsed),
+        }
@@ -11,6 +11,44 @@ class Settings(BaseSettings):
     job_queue: str = Field(default="operator:jobs")
     health_port: int = Field(default=8081)
     pod_ready_timeout: int = Field(default=60)
+    job_concurrency: int = Field(default=8)
+    job_visibility_timeout: float = Field(default=300)
+    job_max_attempts: int = Field(default=3)
+    job_retry_backoff: float = Field(default=10)
+    job_retry_backoff_max: float = Field(default=300)
+    job_sweep_interval: float = Field(default=5)
+    job_poll_interval: float = Field(default=0.2)
+    job_lock_timeout: float = Field(default=60)
+    job_coalesce_window: float = Field(default=3)
+    job_lane_weights: dict[str, int] = Field(default_factory=lambda: {"high": 6, "normal": 3, "low": 1})
+    audit_batch_size: int = Field(default=100)
+    audit_flush_interval: float = Field(default=0.5)
+    k8s_threads: int = Field(default=16)
+    k8s_call_timeout: float = Field(default=30)
+    warm_pool: dict[str, int] = Field(default_factory=dict)
+    warm_pool_refill: int = Field(default=2)
+    warm_pool_interval: float = Field(default=30)
+    reconcile_interval: float = Field(default=300)
+    reconcile_max_jobs: int = Field(default=20)
+    reconcile_cooldown: float = Field(default=900)
+    fleet_interval: float = Field(default=5)
+    fleet_box_timeout: float = Field(default=600)
+    sleep_idle_after: float = Field(default=21600)
+    sleep_cpu_threshold: int = Field(default=25)
+    sleep_check_interval: float = Field(default=300)
+    sleep_max_jobs: int = Field(default=50)
+    wake_poll_interval: float = Field(default=3)
+    telegram_api_url: str = Field(default="https://api.telegram.org")
+    rightsize_interval: float = Field(default=3600)
+    rightsize_window_days: int = Field(default=7)
+    rightsize_percentile: float = Field(default=0.95)
+    rightsize_headroom: float = Field(default=0.3)
+    rightsize_min_samples: int = Field(default=24)
+    rightsize_min_cpu: int = Field(default=50)
+    rightsize_min_memory: int = Field(default=128 * 1024**2)
+    rightsize_tolerance: float = Field(default=0.15)
+    rightsize_apply: bool = Field(default=False)
+    rightsize_max_jobs: int = Field(default=20)
     nango_server_url: str = Field(default="http://nango-server.platform.svc.cluster.local:8080")
     nango_secret_key: str = Field(default="")
     agent_api_secret: str = Field(default="")
@@ -0,0 +1,221 @@
+"""Fleet rollouts: roll a new gateway image or tier resources across every box.
+
+The API creates a ``fleet_rollouts`` row and one ``fleet_rollout_boxes`` row
+per active or sleeping box. Every ``fleet_interval`` seconds the coordinator advances each
+running rollout:
+
+1. Boxes whose Deployment finished rolling out are marked ``complete``. Boxes
+   stuck ``queued`` or ``rolling`` for ``fleet_box_timeout`` are ``failed``.
+2. If failures exceed ``max_failure_ratio`` of the finished boxes (counting at
+   least one full batch), the rollout is paused.
+3. Otherwise ``rollout`` jobs are enqueued on the low lane until
+   ``max_in_flight`` boxes are queued or rolling.
+
+A ``rollout`` job only patches the Deployment and returns, and completion is
+read from the informer cache. So a box holds a worker slot for a few API calls
+rather than for its whole rollout, and ``max_in_flight`` can be far larger
+than ``job_concurrency``.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+
+import redis.asyncio as aioredis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .config import settings
+from .jobqueue import enqueue
+from .k8s import read_gateway, rollout_done
+
+logger = logging.getLogger(__name__)
+
+
+async def _finished(box: tuple[str, str, int | None]) -> bool:
+    _, customer_id, generation = box
+    try:
+        dep = await read_gateway(customer_id)
+    except Exception:
+        logger.warning("Could not read gateway for customer %s", customer_id)
+        return False
+    return dep is not None and rollout_done(dep, generation)
+
+
+async def _settle(db: AsyncSession, rollout_id: str) -> None:
+    """Mark finished, timed-out and no longer active boxes."""
+    result = await db.execute(
+        text("""
+            SELECT box_id, customer_id, generation FROM fleet_rollout_boxes
+            WHERE rollout_id = :rollout_id AND status = 'rolling'
+        """),
+        {"rollout_id": rollout_id},
+    )
+    rolling = [(str(box_id), str(customer_id), generation) for box_id, customer_id, generation in result.fetchall()]
+    finished = await asyncio.gather(*(_finished(box) for box in rolling))
+    done = [box_id for (box_id, _, _), ok in zip(rolling, finished) if ok]
+    if done:
+        await db.execute(
+            text("""
+                UPDATE fleet_rollout_boxes SET status = 'complete', updated_at = now()
+                WHERE rollout_id = :rollout_id AND box_id = ANY(:box_ids)
+            """),
+            {"rollout_id": rollout_id, "box_ids": done},
+        )
+    await db.execute(
+        text("""
+            UPDATE fleet_rollout_boxes
+            SET status = 'failed', updated_at = now(),
+                error = CASE status WHEN 'queued' THEN 'rollout job did not run in time'
+                                    ELSE 'rollout did not finish in time' END
+            WHERE rollout_id = :rollout_id AND status IN ('queued', 'rolling')
+              AND updated_at < now() - make_interval(secs => :timeout)
+        """),
+        {"rollout_id": rollout_id, "timeout": float(settings.fleet_box_timeout)},
+    )
+    await db.execute(
+        text("""
+            UPDATE fleet_rollout_boxes f SET status = 'skipped', updated_at = now()
+            FROM boxes b
+            WHERE f.rollout_id = :rollout_id AND f.status = 'pending'
+              AND b.id = f.box_id AND b.status NOT IN ('active', 'sleeping')
+        """),
+        {"rollout_id": rollout_id},
+    )
+
+
+async def _counts(db: AsyncSession, rollout_id: str) -> dict[str, int]:
+    result = await db.execute(
+        text("SELECT status, count(*) FROM fleet_rollout_boxes WHERE rollout_id = :rollout_id GROUP BY status"),
+        {"rollout_id": rollout_id},
+    )
+    return {status: int(n) for status, n in result.fetchall()}
+
+
+async def _next_batch(db: AsyncSession, rollout: dict, limit: int) -> list[dict]:
+    """Mark up to ``limit`` pending boxes queued and return their job messages."""
+    result = await db.execute(
+        text("""
+            SELECT f.box_id, f.customer_id, s.tier
+            FROM fleet_rollout_boxes f
+            JOIN boxes b ON b.id = f.box_id
+            JOIN subscriptions s ON s.id = b.subscription_id
+            WHERE f.rollout_id = :rollout_id AND f.status = 'pending'
+            ORDER BY f.box_id
+            LIMIT :limit
+        """),
+        {"rollout_id": rollout["id"], "limit": limit},
+    )
+    rows = [(str(box_id), str(customer_id), str(tier)) for box_id, customer_id, tier in result.fetchall()]
+    if not rows:
+        return []
+    await db.execute(
+        text("""
+            UPDATE fleet_rollout_boxes SET status = 'queued', updated_at = now()
+            WHERE rollout_id = :rollout_id AND box_id = ANY(:box_ids)
+        """),
+        {"rollout_id": rollout["id"], "box_ids": [box_id for box_id, _, _ in rows]},
+    )
+    return [
+        {
+            "job_id": str(uuid.uuid4()),
+            "type": "rollout",
+            "customer_id": customer_id,
+            "box_id": box_id,
+            "payload": {
+                "box_id": box_id,
+                "rollout_id": rollout["id"],
+                "tier": tier,
+                "image": rollout["image"],
+                "restart": rollout["restart"],
+            },
+            "lane": "low",
+            "enqueued_at": time.time(),
+        }
+        for box_id, customer_id, tier in rows
+    ]
+
+
+async def advance_rollout(
+    session_factory: async_sessionmaker[AsyncSession],
+    r: aioredis.Redis,
+    rollout_id: str,
+) -> dict | None:
+    """Move one rollout forward. Returns its box counts, or None if it is not
+    running or another operator replica is advancing it."""
+    messages: list[dict] = []
+    async with session_factory() as db:
+        result = await db.execute(
+            text("""
+                SELECT id, image, restart, max_in_flight, max_failure_ratio FROM fleet_rollouts
+                WHERE id = :rollout_id AND status = 'running'
+                FOR UPDATE SKIP LOCKED
+            """),
+            {"rollout_id": rollout_id},
+        )
+        row = result.fetchone()
+        if row is None:
+            return None
+        rollout = {
+            "id": str(row[0]), "image": row[1], "restart": row[2],
+            "max_in_flight": row[3], "max_failure_ratio": row[4],
+        }
+
+        await _settle(db, rollout_id)
+        counts = await _counts(db, rollout_id)
+        complete, failed = counts.get("complete", 0), counts.get("failed", 0)
+        in_flight = counts.get("queued", 0) + counts.get("rolling", 0)
+
+        status, reason = "running", None
+        if failed > rollout["max_failure_ratio"] * max(complete + failed, rollout["max_in_flight"]):
+            status = "paused"
+            reason = f"{failed} of {complete + failed} boxes failed"
+            logger.error("Pausing fleet rollout %s: %s", rollout_id, reason)
+        elif not counts.get("pending") and not in_flight:
+            status = "complete"
+            logger.info("Fleet rollout %s complete: %d succeeded, %d failed", rollout_id, complete, failed)
+        elif in_flight < rollout["max_in_flight"]:
+            messages = await _next_batch(db, rollout, rollout["max_in_flight"] - in_flight)
+
+        await db.execute(
+            text("""
+                UPDATE fleet_rollouts
+                SET status = :status, succeeded = :succeeded, failed = :failed,
+                    paused_reason = COALESCE(:reason, paused_reason), updated_at = now(),
+                    completed_at = CASE WHEN CAST(:status AS TEXT) = 'complete' THEN now() END
+                WHERE id = :rollout_id
+            """),
+            {"rollout_id": rollout_id, "status": status, "succeeded": complete, "failed": failed, "reason": reason},
+        )
+        await db.commit()
+
+    # Boxes are marked queued first: if this push fails they time out and
+    # count as failed instead of being lost.
+    if messages:
+        await enqueue(r, settings.job_queue, messages)
+        counts["queued"] = counts.get("queued", 0) + len(messages)
+        counts["pending"] = counts.get("pending", 0) - len(messages)
+    return counts
+
+
+async def fleet_once(session_factory: async_sessionmaker[AsyncSession], r: aioredis.Redis) -> None:
+    async with session_factory() as db:
+        result = await db.execute(
+            text("SELECT id FROM fleet_rollouts WHERE status = 'running' ORDER BY created_at"),
+        )
+        rollout_ids = [str(row[0]) for row in result.fetchall()]
+    for rollout_id in rollout_ids:
+        await advance_rollout(session_factory, r, rollout_id)
+
+
+async def fleet_loop(session_factory: async_sessionmaker[AsyncSession], r: aioredis.Redis) -> None:
+    """Advance running fleet rollouts every ``fleet_interval`` seconds."""
+    while True:
+        await asyncio.sleep(settings.fleet_interval)
+        try:
+            await fleet_once(session_factory, r)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error advancing fleet rollouts")
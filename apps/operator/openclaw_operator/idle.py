@@ -0,0 +1,302 @@
+"""Scale idle gateways to zero and wake them on the next Telegram update.
+
+Every ``sleep_check_interval`` seconds the operator looks for active boxes with
+no token-proxy usage (``usage_events``) and no gateway CPU above
+``sleep_cpu_threshold`` millicores (``pod_metrics_*``) for ``sleep_idle_after``
+seconds. It enqueues a ``sleep`` job for each one on the low lane. The job scales
+the gateway to zero and marks the box ``sleeping``.
+
+A sleeping gateway does not poll Telegram, so updates wait on Telegram's side.
+Every ``wake_poll_interval`` seconds the operator asks Telegram for each
+sleeping bot's ``pending_update_count`` (``getWebhookInfo``, which does not
+consume updates). When it is non-zero, a ``wake`` job goes on the high lane.
+The woken gateway then picks the waiting updates up itself. Only the replica
+holding the ``operator:wake:leader`` key polls, so the Telegram traffic does
+not grow with the number of operator replicas.
+
+Config changes to a sleeping box are applied to the scaled-down Deployment and
+take effect when it wakes.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Collection
+from dataclasses import asdict, dataclass
+
+import httpx
+import redis.asyncio as aioredis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .config import settings
+from .jobqueue import enqueue
+from .k8s import read_config_secret
+from .metrics import parse_cpu, parse_memory
+from .telemetry import BOX_WAKE, RECLAIMED_REQUESTS, SLEEPING_BOXES
+from .tiers import TIER_RESOURCES
+
+logger = logging.getLogger(__name__)
+
+WAKE_LEADER_KEY = "operator:wake:leader"
+
+# Telegram calls in flight at once while checking sleeping bots.
+_WAKE_CONCURRENCY = 32
+
+IDLE_BOXES = text("""
+    SELECT b.id, b.customer_id FROM boxes b
+    WHERE b.status = 'active'
+      AND GREATEST(b.created_at, b.activated_at, b.last_updated, b.woke_at)
+          < now() - make_interval(secs => :idle)
+      AND NOT EXISTS (
+          SELECT 1 FROM usage_events u
+          WHERE u.customer_id = b.customer_id AND u.timestamp > now() - make_interval(secs => :idle)
+      )
+      AND NOT EXISTS (
+          SELECT 1 FROM pod_metrics_snapshots p
+          WHERE p.customer_id = b.customer_id AND p.collected_at > now() - make_interval(secs => :idle)
+            AND p.cpu_millicores > :cpu
+      )
+      AND NOT EXISTS (
+          SELECT 1 FROM pod_metrics_hourly h
+          WHERE h.customer_id = b.customer_id AND h.hour > now() - make_interval(secs => :idle)
+            AND h.max_cpu > :cpu
+      )
+    ORDER BY b.id
+    LIMIT :limit
+""")
+
+SLEEPING_REQUESTS = text("""
+    SELECT s.tier, b.cpu_request, b.memory_request, count(*) FROM boxes b
+    JOIN subscriptions s ON s.id = b.subscription_id
+    WHERE b.status = 'sleeping'
+    GROUP BY s.tier, b.cpu_request, b.memory_request
+""")
+
+
+@dataclass
+class SleepReport:
+    idle: int = 0
+    enqueued: int = 0
+    sleeping: int = 0
+    reclaimed_cpu_millicores: int = 0
+    reclaimed_memory_bytes: int = 0
+    woken: int = 0
+    wake_seconds_avg: float | None = None
+    wake_seconds_max: float = 0.0
+    finished_at: float = 0.0
+
+
+_report = SleepReport()
+_wake_seconds_total = 0.0
+
+
+def record_wake(seconds: float) -> None:
+    """Called by the ``wake`` job once the gateway is ready again."""
+    global _wake_seconds_total
+    seconds = max(0.0, seconds)
+    BOX_WAKE.observe(seconds)
+    _report.woken += 1
+    _wake_seconds_total += seconds
+    _report.wake_seconds_avg = round(_wake_seconds_total / _report.woken, 3)
+    _report.wake_seconds_max = round(max(_report.wake_seconds_max, seconds), 3)
+
+
+def last_report() -> dict:
+    return asdict(_report)
+
+
+def reclaimed(sleeping: list[tuple[str, str | None, str | None, int]]) -> tuple[int, int]:
+    """CPU millicores and memory bytes requested by the sleeping boxes' gateways.
+
+    ``sleeping`` holds ``(tier, cpu_request, memory_request, count)`` rows, with
+    right-sized requests or None for the tier's.
+    """
+    cpu = memory = 0
+    for tier, cpu_request, memory_request, count in sleeping:
+        res = TIER_RESOURCES.get(tier)
+        if res is None:
+            continue
+        cpu += parse_cpu(cpu_request or res.cpu_request) * count
+        memory += parse_memory(memory_request or res.memory_request) * count
+    return cpu, memory
+
+
+def _message(job_type: str, customer_id: str, box_id: str, lane: str, **payload) -> dict:
+    return {
+        "job_id": str(uuid.uuid4()),
+        "type": job_type,
+        "customer_id": customer_id,
+        "box_id": box_id,
+        "payload": {"box_id": box_id, **payload},
+        "lane": lane,
+        "enqueued_at": time.time(),
+    }
+
+
+async def sleep_once(
+    session_factory: async_sessionmaker[AsyncSession],
+    r: aioredis.Redis,
+    *,
+    busy: Collection[str] = (),
+) -> SleepReport:
+    """Enqueue ``sleep`` jobs for idle boxes and refresh the reclaimed-resources report.
+
+    Customers in ``busy`` have a job in flight and are left alone this pass.
+    """
+    async with session_factory() as db:
+        result = await db.execute(IDLE_BOXES, {
+            "idle": float(settings.sleep_idle_after),
+            "cpu": settings.sleep_cpu_threshold,
+            "limit": settings.sleep_max_jobs,
+        })
+        idle = [(str(box_id), str(customer_id)) for box_id, customer_id in result.fetchall()]
+        result = await db.execute(SLEEPING_REQUESTS)
+        sleeping = [(str(tier), cpu, memory, int(count)) for tier, cpu, memory, count in result.fetchall()]
+
+    messages = [
+        _message("sleep", customer_id, box_id, "low")
+        for box_id, customer_id in idle if customer_id not in busy
+    ]
+    if messages:
+        await enqueue(r, settings.job_queue, messages)
+
+    _report.idle = len(idle)
+    _report.enqueued = len(messages)
+    _report.sleeping = sum(count for *_, count in sleeping)
+    _report.reclaimed_cpu_millicores, _report.reclaimed_memory_bytes = reclaimed(sleeping)
+    _report.finished_at = time.time()
+    SLEEPING_BOXES.set(_report.sleeping)
+    RECLAIMED_REQUESTS.labels("cpu").set(_report.reclaimed_cpu_millicores)
+    RECLAIMED_REQUESTS.labels("memory").set(_report.reclaimed_memory_bytes)
+    if messages:
+        logger.info("Putting %d idle boxes to sleep (%d already sleeping)", len(messages), _report.sleeping)
+    return _report
+
+
+class WakeWatcher:
+    """Polls Telegram for updates waiting on sleeping bots."""
+
+    def __init__(self) -> None:
+        self._id = uuid.uuid4().hex
+        self._tokens: dict[str, str] = {}
+        # box_id -> time its wake job was enqueued
+        self._waking: dict[str, float] = {}
+
+    async def _token(self, customer_id: str) -> str | None:
+        if customer_id not in self._tokens:
+            data = await read_config_secret(customer_id)
+            token = data.get("TELEGRAM_BOT_TOKEN")
+            if not token:
+                return None
+            self._tokens[customer_id] = token
+        return self._tokens[customer_id]
+
+    async def _pending_updates(self, client: httpx.AsyncClient, customer_id: str) -> int:
+        token = await self._token(customer_id)
+        if token is None:
+            return 0
+        resp = await client.get(f"{settings.telegram_api_url}/bot{token}/getWebhookInfo")
+        resp.raise_for_status()
+        return int(resp.json()["result"].get("pending_update_count", 0))
+
+    async def _lead(self, r: aioredis.Redis) -> bool:
+        """Take or renew the poll lease. The lease outlives a few missed polls."""
+        ttl = max(1, int(settings.wake_poll_interval * 3))
+        if await r.set(WAKE_LEADER_KEY, self._id, nx=True, ex=ttl):
+            return True
+        holder = await r.get(WAKE_LEADER_KEY)
+        if isinstance(holder, bytes):
+            holder = holder.decode()
+        if holder != self._id:
+            return False
+        await r.expire(WAKE_LEADER_KEY, ttl)
+        return True
+
+    async def poll_once(self, session_factory: async_sessionmaker[AsyncSession], r: aioredis.Redis) -> int:
+        """Enqueue a ``wake`` job for each sleeping box with Telegram updates waiting.
+
+        Does nothing unless this replica holds the poll lease.
+        """
+        if not await self._lead(r):
+            self._tokens.clear()
+            self._waking.clear()
+            return 0
+        async with session_factory() as db:
+            result = await db.execute(text("SELECT id, customer_id FROM boxes WHERE status = 'sleeping'"))
+            sleeping = [(str(box_id), str(customer_id)) for box_id, customer_id in result.fetchall()]
+
+        # Forget boxes that woke up or went away.
+        customers = {customer_id for _, customer_id in sleeping}
+        for customer_id in [c for c in self._tokens if c not in customers]:
+            del self._tokens[customer_id]
+        now = time.monotonic()
+        box_ids = {box_id for box_id, _ in sleeping}
+        self._waking = {
+            box_id: at for box_id, at in self._waking.items()
+            if box_id in box_ids and now - at < settings.pod_ready_timeout * 2
+        }
+
+        candidates = [(box_id, customer_id) for box_id, customer_id in sleeping if box_id not in self._waking]
+        sem = asyncio.Semaphore(_WAKE_CONCURRENCY)
+
+        async def check(customer_id: str) -> int:
+            async with sem:
+                try:
+                    return await self._pending_updates(client, customer_id)
+                except Exception as exc:
+                    # Not the exception itself: its message may carry the URL,
+                    # and with it the bot token.
+                    status = exc.response.status_code if isinstance(exc, httpx.HTTPStatusError) else None
+                    logger.warning(
+                        "Could not check Telegram updates for customer %s: %s%s",
+                        customer_id, type(exc).__name__, f" ({status})" if status else "",
+                    )
+                    return 0
+
+        async with httpx.AsyncClient(timeout=5) as client:
+            pending = await asyncio.gather(*(check(customer_id) for _, customer_id in candidates))
+
+        detected_at = time.time()
+        messages = []
+        for (box_id, customer_id), count in zip(candidates, pending):
+            if count > 0:
+                messages.append(_message("wake", customer_id, box_id, "high", detected_at=detected_at))
+                self._waking[box_id] = now
+                logger.info("Waking box %s: %d Telegram updates waiting", box_id, count)
+        if messages:
+            await enqueue(r, settings.job_queue, messages)
+        return len(messages)
+
+
+async def sleep_loop(
+    session_factory: async_sessionmaker[AsyncSession],
+    r: aioredis.Redis,
+    busy: Collection[str] = (),
+) -> None:
+    """Look for idle boxes every ``sleep_check_interval`` seconds."""
+    if settings.sleep_idle_after <= 0:
+        logger.info("Scale-to-zero disabled")
+        return
+    while True:
+        await asyncio.sleep(settings.sleep_check_interval)
+        try:
+            await sleep_once(session_factory, r, busy=busy)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error looking for idle boxes")
+
+
+async def wake_loop(session_factory: async_sessionmaker[AsyncSession], r: aioredis.Redis) -> None:
+    """Check sleeping bots for Telegram updates every ``wake_poll_interval`` seconds."""
+    watcher = WakeWatcher()
+    while True:
+        await asyncio.sleep(settings.wake_poll_interval)
+        try:
+            await watcher.poll_once(session_factory, r)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error checking sleeping boxes for updates")
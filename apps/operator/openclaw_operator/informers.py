@@ -0,0 +1,173 @@
+"""In-memory caches of gateway Deployments and pods, kept current by watches.
+
+Each ``Informer`` lists its kind across all namespaces once, then follows a
+watch from the listed resourceVersion on a dedicated thread. Events are
+applied on the event loop, so reads (``get``, ``values``, ``wait_for``) are
+plain dict lookups with no API-server round-trip.
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import Callable
+from typing import Any
+
+from kubernetes import watch
+from kubernetes.client.exceptions import ApiException
+
+from .config import settings
+from .k8s import apps_v1, core_v1, namespace_name
+
+logger = logging.getLogger(__name__)
+
+GATEWAY = "openclaw-gateway"
+GATEWAY_SELECTOR = f"app={GATEWAY}"
+# Server-side cap on a single watch request; the stream is resumed after.
+WATCH_SECONDS = 300
+
+
+class Informer:
+    def __init__(self, kind: str, list_fn: Callable[[], Callable], label_selector: str) -> None:
+        self.kind = kind
+        self._list_fn = list_fn
+        self._label_selector = label_selector
+        self._items: dict[tuple[str, str], Any] = {}
+        self._synced = False
+        self._changed = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop = threading.Event()
+        self._watch: watch.Watch | None = None
+        self._thread: threading.Thread | None = None
+
+    # -- queries (event loop only) -------------------------------------------
+
+    @property
+    def synced(self) -> bool:
+        return self._synced
+
+    def get(self, namespace: str, name: str) -> Any | None:
+        return self._items.get((namespace, name))
+
+    def values(self, namespace: str | None = None) -> list[Any]:
+        if namespace is None:
+            return list(self._items.values())
+        return [obj for (ns, _), obj in self._items.items() if ns == namespace]
+
+    async def wait_for(self, namespace: str, name: str, condition, timeout: float) -> bool:
+        """Wait until ``condition(obj)`` holds for the cached object."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            changed = self._changed
+            obj = self.get(namespace, name)
+            if obj is not None and condition(obj):
+                return True
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+
+    # -- updates (event loop only) -------------------------------------------
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _replace(self, items: list[Any]) -> None:
+        self._items = {(o.metadata.namespace, o.metadata.name): o for o in items}
+        if not self._synced:
+            logger.info("%s informer synced with %d objects", self.kind, len(self._items))
+        self._synced = True
+        self._notify()
+
+    def _apply(self, event_type: str, obj: Any) -> None:
+        key = (obj.metadata.namespace, obj.metadata.name)
+        if event_type == "DELETED":
+            self._items.pop(key, None)
+        else:
+            self._items[key] = obj
+        self._notify()
+
+    # -- list + watch (informer thread) --------------------------------------
+
+    def _post(self, fn, *args) -> None:
+        assert self._loop is not None
+        self._loop.call_soon_threadsafe(fn, *args)
+
+    def _run(self) -> None:
+        resource_version = None
+        while not self._stop.is_set():
+            self._watch = w = watch.Watch()
+            try:
+                list_fn = self._list_fn()
+                if resource_version is None:
+                    listing = list_fn(
+                        label_selector=self._label_selector,
+                        _request_timeout=settings.k8s_call_timeout,
+                    )
+                    resource_version = listing.metadata.resource_version
+                    self._post(self._replace, listing.items)
+                for event in w.stream(
+                    list_fn,
+                    label_selector=self._label_selector,
+                    resource_version=resource_version,
+                    timeout_seconds=WATCH_SECONDS,
+                    _request_timeout=WATCH_SECONDS + settings.k8s_call_timeout,
+                ):
+                    obj = event["object"]
+                    resource_version = obj.metadata.resource_version
+                    self._post(self._apply, event["type"], obj)
+            except ApiException as e:
+                if e.status == 410:
+                    resource_version = None
+                else:
+                    logger.warning("%s watch failed: %s", self.kind, e)
+                    self._stop.wait(1)
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning("%s watch dropped: %s", self.kind, e)
+                    self._stop.wait(1)
+            finally:
+                w.stop()
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"informer-{self.kind}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+
+deployments = Informer(
+    "deployments", lambda: apps_v1().list_deployment_for_all_namespaces, GATEWAY_SELECTOR,
+)
+pods = Informer(
+    "pods", lambda: core_v1().list_pod_for_all_namespaces, GATEWAY_SELECTOR,
+)
+
+
+def gateway_deployment(customer_id: str) -> Any | None:
+    """The customer's cached gateway Deployment, or None if absent or not synced."""
+    return deployments.get(namespace_name(customer_id), GATEWAY)
+
+
+def gateway_pods(customer_id: str) -> list[Any]:
+    return pods.values(namespace_name(customer_id))
+
+
+def start_informers() -> None:
+    deployments.start()
+    pods.start()
+
+
+def stop_informers() -> None:
+    deployments.stop()
+    pods.stop()
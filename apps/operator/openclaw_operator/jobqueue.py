@@ -0,0 +1,496 @@
+"""Reliable consumption of the operator job lists.
+
+Producers RPUSH each job onto one of three priority lanes: ``<queue>:high``
+(provision, reactivate), ``<queue>`` (everything else a user or billing
+triggers) and ``<queue>:low`` (background work such as reconciler fixes).
+The producer picks the lane and records it in the job's ``lane`` field.
+A consumer LMOVEs each job from a lane into ``<queue>:processing`` and gives
+it a visibility deadline in ``<queue>:deadlines``; the job stays there until
+it is acked. Lanes are served by smooth weighted round-robin over
+``job_lane_weights``, so a burst in one lane delays the others but never
+starves them.
+
+Jobs that fail, or whose consumer dies and lets the deadline lapse, are
+parked in ``<queue>:delayed`` with exponential backoff and moved back to
+their lane when due. After ``job_max_attempts`` deliveries a job goes to ``<queue>:dead``.
+
+Lanes reorder jobs, so each customer's jobs also carry a sequence: in the
+same transaction as the RPUSH, the producer adds the job id to
+``<queue>:order:{customer_id}``, scored by ``enqueued_at``. A job may only run
+once it is the oldest entry there; the entry is removed when the job is acked
+or dead-lettered. A reactivate on the high lane therefore cannot overtake a
+suspend enqueued before it on the normal lane. Jobs without an entry (from
+producers that predate the sequence) fall back to the pending-list rule below.
+
+A job whose customer lock is held by another job, or that is not yet next in
+its customer's sequence, is parked at the tail of
+``<queue>:pending:{customer_id}`` instead of waiting. Whoever releases the
+lock, or acks the job it was waiting for, moves the customer's pending jobs
+back to the head of their lanes, in order. Customers with parked jobs are
+listed in ``<queue>:pending``, so the sweep can release jobs left behind by a
+holder that crashed.
+
+Delivery counts live in ``<queue>:attempts`` keyed by the raw message, so the
+message itself is never rewritten. Several operator replicas can share one
+queue: the pop and the sweep run as Lua scripts, so each job goes to exactly
+one of them.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+
+import redis
+import redis.asyncio as aioredis
+
+from .config import settings
+from .locks import lock_key
+from .telemetry import QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+LANES = ("high", "normal", "low")
+DEFAULT_LANE = "normal"
+
+
+def lane_key(queue: str, lane: str) -> str:
+    """Redis list for ``lane``. The normal lane keeps the bare queue name."""
+    return queue if lane == DEFAULT_LANE else f"{queue}:{lane}"
+
+
+def order_key(queue: str, customer_id: str) -> str:
+    """Sorted set of the customer's unsettled job ids, oldest first."""
+    return f"{queue}:order:{customer_id}"
+
+
+async def enqueue(r: aioredis.Redis, queue: str, jobs: list[dict]) -> None:
+    """Push ``jobs`` onto their lanes and into their customers' sequences."""
+    pipe = r.pipeline(transaction=True)
+    for job in jobs:
+        job.setdefault("enqueued_at", time.time())
+        pipe.zadd(order_key(queue, str(job["customer_id"])), {job["job_id"]: job["enqueued_at"]})
+        pipe.rpush(lane_key(queue, job.get("lane", DEFAULT_LANE)), json.dumps(job, default=str))
+    await pipe.execute()
+
+
+# KEYS: processing, deadlines, attempts, lanes in the order to try them
+# ARGV: deadline, job id for a message that has none
+_POP = """
+for i = 4, #KEYS do
+  local raw = redis.call('LMOVE', KEYS[i], KEYS[1], 'LEFT', 'RIGHT')
+  if raw then
+    -- A message enqueued without a job id gets one on its first delivery,
+    -- stored in the message so every retry is audited under the same id.
+    local ok, job = pcall(cjson.decode, raw)
+    if ok and type(job) == 'table' and job.job_id == nil then
+      job.job_id = ARGV[2]
+      raw = cjson.encode(job)
+      redis.call('LSET', KEYS[1], -1, raw)
+    end
+    redis.call('ZADD', KEYS[2], ARGV[1], raw)
+    local attempt = redis.call('HINCRBY', KEYS[3], raw, 1)
+    return {raw, attempt, i - 3}
+  end
+end
+return false
+"""
+
+# KEYS: deadlines, processing, delayed, attempts, dead, default lane, lanes...
+# ARGV: now, visibility, max_attempts, backoff, backoff_max, limit, order key prefix, lane names...
+_SWEEP = """
+local now = tonumber(ARGV[1])
+local lanes = {}
+for i = 8, #ARGV do lanes[ARGV[i]] = KEYS[i - 1] end
+
+-- Adopt jobs moved into processing by a consumer that died before it could
+-- record a deadline.
+for _, raw in ipairs(redis.call('LRANGE', KEYS[2], 0, -1)) do
+  if not redis.call('ZSCORE', KEYS[1], raw) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), raw)
+  end
+end
+
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, ARGV[6])
+local dead = 0
+for _, raw in ipairs(expired) do
+  redis.call('ZREM', KEYS[1], raw)
+  redis.call('LREM', KEYS[2], 1, raw)
+  local attempts = tonumber(redis.call('HGET', KEYS[4], raw) or '0')
+  if attempts >= tonumber(ARGV[3]) then
+    redis.call('HDEL', KEYS[4], raw)
+    redis.call('LPUSH', KEYS[5], cjson.encode({
+      job = raw, error = 'visibility timeout expired', attempts = attempts, failed_at = now,
+    }))
+    -- Settled: later jobs for the customer may run.
+    local ok, job = pcall(cjson.decode, raw)
+    if ok and type(job) == 'table' and job.customer_id and job.job_id then
+      redis.call('ZREM', ARGV[7] .. tostring(job.customer_id), tostring(job.job_id))
+    end
+    dead = dead + 1
+  else
+    local delay = math.min(tonumber(ARGV[5]), tonumber(ARGV[4]) * 2 ^ math.max(attempts - 1, 0))
+    redis.call('ZADD', KEYS[3], now + delay, raw)
+  end
+end
+
+local due = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now, 'LIMIT', 0, ARGV[6])
+for _, raw in ipairs(due) do
+  redis.call('ZREM', KEYS[3], raw)
+  -- Retries go back to the lane they were enqueued on.
+  local ok, job = pcall(cjson.decode, raw)
+  local ready = KEYS[6]
+  if ok and type(job) == 'table' and lanes[job.lane] then ready = lanes[job.lane] end
+  redis.call('RPUSH', ready, raw)
+end
+
+return {#expired, dead, #due}
+"""
+
+
+# Shared by _PARK and _RELEASE.
+# KEYS: lock, pending list, pending set, default lane, order, ..., lanes from key_off
+# ARGV: customer_id, ..., lane names from arg_off
+_FLUSH_PENDING = """
+-- Parked jobs wait while the lock is held, or while the oldest job in the
+-- customer's sequence is somewhere other than the pending list.
+local function blocked()
+  if redis.call('EXISTS', KEYS[1]) == 1 then return true end
+  local head = redis.call('ZRANGE', KEYS[5], 0, 0)[1]
+  if not head then return false end
+  for _, raw in ipairs(redis.call('LRANGE', KEYS[2], 0, -1)) do
+    local ok, job = pcall(cjson.decode, raw)
+    if ok and type(job) == 'table' and tostring(job.job_id) == head then return false end
+  end
+  return true
+end
+
+local function flush(key_off, arg_off)
+  local lanes = {}
+  for i = arg_off, #ARGV do lanes[ARGV[i]] = KEYS[key_off + i - arg_off] end
+  -- Popping from the tail and pushing to the head keeps the parked order.
+  local n = 0
+  local raw = redis.call('RPOP', KEYS[2])
+  while raw do
+    local ok, job = pcall(cjson.decode, raw)
+    local ready = KEYS[4]
+    if ok and type(job) == 'table' and lanes[job.lane] then ready = lanes[job.lane] end
+    redis.call('LPUSH', ready, raw)
+    n = n + 1
+    raw = redis.call('RPOP', KEYS[2])
+  end
+  redis.call('SREM', KEYS[3], ARGV[1])
+  return n
+end
+"""
+
+# KEYS: lock, pending list, pending set, default lane, order, processing, deadlines, attempts, lanes...
+# ARGV: customer_id, raw, lane names...
+_PARK = _FLUSH_PENDING + """
+redis.call('LREM', KEYS[6], 1, ARGV[2])
+redis.call('ZREM', KEYS[7], ARGV[2])
+-- Parking is not a failed delivery.
+if redis.call('HINCRBY', KEYS[8], ARGV[2], -1) <= 0 then redis.call('HDEL', KEYS[8], ARGV[2]) end
+redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('SADD', KEYS[3], ARGV[1])
+-- Whoever we are waiting for releases the pending list when it finishes.
+-- If it already has, nobody else will, so release it now.
+if blocked() then return -1 end
+return flush(9, 3)
+"""
+
+# KEYS: lock, pending list, pending set, default lane, order, lanes...
+# ARGV: customer_id, lane names...
+_RELEASE = _FLUSH_PENDING + """
+if blocked() then return -1 end
+return flush(6, 2)
+"""
+
+
+def backoff(attempt: int) -> float:
+    """Delay before redelivering a job whose ``attempt``-th delivery failed."""
+    return min(settings.job_retry_backoff_max, settings.job_retry_backoff * 2 ** max(attempt - 1, 0))
+
+
+def _job_ids(raw: str) -> tuple[str, str] | None:
+    """``(customer_id, job_id)`` of a raw message, if it has both."""
+    try:
+        job = json.loads(raw)
+        return str(job["customer_id"]), str(job["job_id"])
+    except Exception:
+        return None
+
+
+def _enqueued_at(raw: str) -> float | None:
+    try:
+        return float(json.loads(raw)["enqueued_at"])
+    except Exception:
+        return None
+
+
+@dataclass
+class LaneStats:
+    popped: int = 0
+    waited: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+    def record(self, wait: float | None) -> None:
+        self.popped += 1
+        if wait is not None:
+            self.waited += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+
+class JobQueue:
+    def __init__(self, r: aioredis.Redis, name: str) -> None:
+        self.r = r
+        self.name = name
+        self.lanes = {lane: lane_key(name, lane) for lane in LANES}
+        self.ready = self.lanes[DEFAULT_LANE]
+        self.processing = f"{name}:processing"
+        self.deadlines = f"{name}:deadlines"
+        self.delayed = f"{name}:delayed"
+        self.attempts = f"{name}:attempts"
+        self.dead = f"{name}:dead"
+        self.pending = f"{name}:pending"
+        self.order = f"{name}:order"
+        self.lane_stats = {lane: LaneStats() for lane in LANES}
+        self._credit = {lane: 0 for lane in LANES}
+        self._pop = r.register_script(_POP)
+        self._sweep = r.register_script(_SWEEP)
+        self._park = r.register_script(_PARK)
+        self._release = r.register_script(_RELEASE)
+
+    def _lane_order(self) -> list[str]:
+        """Smooth weighted round-robin: lanes owed the most are tried first."""
+        weights = settings.job_lane_weights
+        for lane in LANES:
+            self._credit[lane] += weights.get(lane, 1)
+        return sorted(LANES, key=lambda lane: -self._credit[lane])
+
+    def _served(self, order: list[str], lane: str) -> None:
+        # Lanes tried before ``lane`` were empty: they bank no credit and the
+        # round is shared among the rest.
+        served = order.index(lane)
+        for empty in order[:served]:
+            self._credit[empty] = 0
+        self._credit[lane] -= sum(settings.job_lane_weights.get(name, 1) for name in order[served:])
+
+    async def pop(self, timeout: float = 1) -> tuple[str, int] | None:
+        """Take the next job, returning it with its delivery number.
+
+        Polls the lanes every ``job_poll_interval`` seconds for up to
+        ``timeout`` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            order = self._lane_order()
+            popped = await self._pop(
+                keys=[self.processing, self.deadlines, self.attempts, *(self.lanes[lane] for lane in order)],
+                args=[time.time() + settings.job_visibility_timeout, str(uuid.uuid4())],
+            )
+            if popped:
+                raw, attempt, index = popped
+                lane = order[int(index) - 1]
+                self._served(order, lane)
+                attempt = int(attempt)
+                # Retries sit out their backoff on purpose; only time first deliveries.
+                wait = None
+                if attempt == 1 and (enqueued_at := _enqueued_at(raw)) is not None:
+                    wait = max(0.0, time.time() - enqueued_at)
+                self.lane_stats[lane].record(wait)
+                if wait is not None:
+                    QUEUE_WAIT.labels(lane).observe(wait)
+                return raw, attempt
+            for lane in LANES:
+                self._credit[lane] = 0
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(remaining, settings.job_poll_interval))
+
+    async def extend(self, raw: str) -> None:
+        """Push the job's visibility deadline out while it is still running."""
+        await self.r.zadd(self.deadlines, {raw: time.time() + settings.job_visibility_timeout}, xx=True)
+
+    def _forget(self, pipe, raw: str) -> None:
+        pipe.lrem(self.processing, 1, raw)
+        pipe.zrem(self.deadlines, raw)
+
+    def _settle(self, pipe, raw: str) -> str | None:
+        """Drop a finished job from its customer's sequence. Returns the customer."""
+        ids = _job_ids(raw)
+        if ids is None:
+            return None
+        customer_id, job_id = ids
+        pipe.zrem(order_key(self.name, customer_id), job_id)
+        return customer_id
+
+    async def _release_next(self, customer_id: str | None) -> None:
+        # Jobs parked until this one settled may run now.
+        if customer_id is not None and await self.has_pending(customer_id):
+            await self.release_pending(customer_id)
+
+    async def ack(self, raw: str) -> None:
+        pipe = self.r.pipeline()
+        self._forget(pipe, raw)
+        pipe.hdel(self.attempts, raw)
+        customer_id = self._settle(pipe, raw)
+        await pipe.execute()
+        await self._release_next(customer_id)
+
+    async def fail(self, raw: str, attempt: int, error: str) -> bool:
+        """Schedule a retry of a failed job; dead-letter it once out of attempts.
+
+        Returns whether the job will be retried.
+        """
+        pipe = self.r.pipeline()
+        self._forget(pipe, raw)
+        retry = attempt < settings.job_max_attempts
+        customer_id = None
+        if retry:
+            delay = backoff(attempt)
+            pipe.zadd(self.delayed, {raw: time.time() + delay})
+            logger.warning("Job failed (attempt %d/%d), retrying in %.0fs", attempt, settings.job_max_attempts, delay)
+        else:
+            pipe.hdel(self.attempts, raw)
+            pipe.lpush(self.dead, json.dumps({
+                "job": raw, "error": error, "attempts": attempt, "failed_at": time.time(),
+            }))
+            customer_id = self._settle(pipe, raw)
+            logger.error("Job failed %d times, moved to %s", attempt, self.dead)
+        await pipe.execute()
+        await self._release_next(customer_id)
+        return retry
+
+    def pending_key(self, customer_id: str) -> str:
+        return f"{self.pending}:{customer_id}"
+
+    def _pending_keys(self, customer_id: str) -> list[str]:
+        return [
+            lock_key(customer_id), self.pending_key(customer_id), self.pending, self.ready,
+            order_key(self.name, customer_id),
+        ]
+
+    async def park(self, raw: str, customer_id: str) -> bool:
+        """Move a delivered job to the customer's pending list.
+
+        Returns True if it is waiting for the lock holder, False if the lock
+        had already been released and the pending jobs went straight back to
+        their lanes.
+        """
+        released = await self._park(
+            keys=[
+                *self._pending_keys(customer_id), self.processing, self.deadlines, self.attempts,
+                *self.lanes.values(),
+            ],
+            args=[customer_id, raw, *self.lanes],
+        )
+        return int(released) < 0
+
+    async def has_pending(self, customer_id: str) -> bool:
+        return bool(await self.r.llen(self.pending_key(customer_id)))
+
+    async def may_run(self, customer_id: str, job_ids: list[str]) -> bool:
+        """Whether a job (with the ids of any jobs coalesced into it) is next for its customer.
+
+        A job in the customer's sequence must be its oldest entry. A job that
+        is not in it only has to wait for jobs parked before it.
+        """
+        key = order_key(self.name, customer_id)
+        pipe = self.r.pipeline()
+        pipe.zrange(key, 0, 0)
+        for job_id in job_ids:
+            pipe.zscore(key, job_id)
+        head, *scores = await pipe.execute()
+        if any(score is not None for score in scores):
+            if not head:
+                return True
+            first = head[0].decode() if isinstance(head[0], bytes) else head[0]
+            return first in job_ids
+        return not await self.has_pending(customer_id)
+
+    async def release_pending(self, customer_id: str) -> int:
+        """Requeue the customer's parked jobs unless the lock is held again.
+
+        Call after releasing the customer lock. Returns the number of jobs
+        requeued.
+        """
+        released = await self._release(
+            keys=[*self._pending_keys(customer_id), *self.lanes.values()],
+            args=[customer_id, *self.lanes],
+        )
+        return max(int(released), 0)
+
+    async def release_orphans(self) -> int:
+        """Requeue jobs parked behind a lock that expired without a release."""
+        released = 0
+        for customer_id in await self.r.smembers(self.pending):
+            if isinstance(customer_id, bytes):
+                customer_id = customer_id.decode()
+            released += await self.release_pending(customer_id)
+        return released
+
+    async def sweep(self, limit: int = 100) -> tuple[int, int, int]:
+        """Redeliver expired and due jobs. Returns (expired, dead-lettered, requeued)."""
+        expired, dead, requeued = await self._sweep(
+            keys=[
+                self.deadlines, self.processing, self.delayed, self.attempts, self.dead, self.ready,
+                *self.lanes.values(),
+            ],
+            args=[
+                time.time(), settings.job_visibility_timeout, settings.job_max_attempts,
+                settings.job_retry_backoff, settings.job_retry_backoff_max, limit,
+                f"{self.order}:", *self.lanes,
+            ],
+        )
+        return int(expired), int(dead), int(requeued)
+
+    async def stats(self) -> dict:
+        """Depth of every lane plus wait times of jobs popped by this process."""
+        pipe = self.r.pipeline()
+        for key in self.lanes.values():
+            pipe.llen(key)
+        pipe.llen(self.processing)
+        pipe.zcard(self.delayed)
+        pipe.llen(self.dead)
+        pipe.scard(self.pending)
+        *depths, processing, delayed, dead, parked = await pipe.execute()
+        lanes = {}
+        for lane, depth in zip(self.lanes, depths):
+            s = self.lane_stats[lane]
+            lanes[lane] = {
+                "depth": int(depth),
+                "popped": s.popped,
+                "wait_seconds_avg": round(s.wait_seconds_total / s.waited, 3) if s.waited else None,
+                "wait_seconds_max": round(s.wait_seconds_max, 3),
+            }
+        return {
+            "lanes": lanes,
+            "processing": int(processing),
+            "delayed": int(delayed),
+            "dead": int(dead),
+            "parked_customers": int(parked),
+        }
+
+
+async def sweep_loop(queue: JobQueue) -> None:
+    """Periodically redeliver jobs whose consumer died, retries that are due and orphaned parked jobs."""
+    while True:
+        try:
+            expired, dead, requeued = await queue.sweep()
+            if expired or requeued:
+                logger.info("Queue sweep: %d expired (%d dead-lettered), %d requeued", expired, dead, requeued)
+            if orphans := await queue.release_orphans():
+                logger.warning("Queue sweep: released %d jobs parked behind an expired lock", orphans)
+        except asyncio.CancelledError:
+            raise
+        except redis.exceptions.ConnectionError:
+            logger.error("Redis connection lost during queue sweep")
+        except Exception:
+            logger.exception("Error in queue sweep")
+        await asyncio.sleep(settings.job_sweep_interval)
@@ -17,7 +17,7 @@ async def handle_destroy(payload: dict, customer_id: str, db: AsyncSession) -> N
     proxy_token_id = payload.get("proxy_token_id")
 
     # 1. Delete K8s namespace (cascades all resources)
-    delete_namespace(customer_id)
+    await delete_namespace(customer_id)
 
     # 2. Revoke proxy token with token-proxy
     if proxy_token_id:
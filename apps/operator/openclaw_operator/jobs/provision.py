@@ -2,81 +2,167 @@ import logging
 from datetime import datetime, timezone
 
 import httpx
+from kubernetes.client.exceptions import ApiException
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..bundles import resolve_bundle
 from ..config import settings
 from ..k8s import (
-    create_config_secret,
-    create_deployment,
-    create_namespace,
-    create_network_policy,
-    create_resource_quota,
+    apply_manifest,
+    bind_namespace,
+    config_secret_data,
+    has_namespace,
+    namespace_name,
+    read_config_secret,
+    render_config_secret,
+    render_customer_objects,
     wait_for_pod_ready,
 )
 from ..niches import NICHES
+from ..pool import claim
+from ..steps import Step, run_graph
 
 logger = logging.getLogger(__name__)
 
+LAST_BOT_TOKEN = text("""
+    SELECT payload->>'telegram_bot_token'
+    FROM operator_jobs
+    WHERE box_id = :box_id AND job_type = 'provision' AND payload ? 'telegram_bot_token'
+    ORDER BY created_at DESC
+    LIMIT 1
+""")
+
+
+# The image the box was last rolled out to, else the one the fleet was last
+# rolled out to. NULL leaves the operator's OPENCLAW_IMAGE.
+BOX_IMAGE = text("""
+    SELECT COALESCE(b.image, (
+        SELECT image FROM fleet_rollouts
+        WHERE status = 'complete' AND image IS NOT NULL
+        ORDER BY completed_at DESC
+        LIMIT 1
+    ))
+    FROM boxes b
+    WHERE b.id = :box_id
+""")
+
+# Requests set by right-sizing. NULL leaves the tier's.
+BOX_REQUESTS = text("SELECT cpu_request, memory_request FROM boxes WHERE id = :box_id")
+
+
+async def _stored_bot_token(customer_id: str, box_id: str, db: AsyncSession) -> str:
+    """The box's bot token, for repair jobs that don't carry one.
+
+    Read from the box's config secret if it is still there, else from the
+    job that first provisioned the box.
+    """
+    if has_namespace(customer_id):
+        try:
+            token = (await read_config_secret(customer_id)).get("TELEGRAM_BOT_TOKEN")
+        except ApiException as e:
+            if e.status != 404:
+                raise
+        else:
+            if token:
+                return token
+    token = (await db.execute(LAST_BOT_TOKEN, {"box_id": box_id})).scalar()
+    if not token:
+        raise ValueError(f"No bot token on record for box {box_id}")
+    return token
+
 
 async def handle_provision(payload: dict, customer_id: str, db: AsyncSession) -> None:
     """Provision a new customer box: namespace, secret, quota, netpol, deployment."""
 
     box_id = payload["box_id"]
     tier = payload["tier"]
-    telegram_bot_token = payload["telegram_bot_token"]
+    telegram_bot_token = payload.get("telegram_bot_token") or await _stored_bot_token(customer_id, box_id, db)
     telegram_allow_from = payload.get("telegram_allow_from") or payload.get("telegram_user_id")
     model = payload.get("model", "kimi-coding/k2p5")
     thinking = payload.get("thinking", "medium")
     niche_slug = payload.get("niche")
     niche_config = NICHES.get(niche_slug) if niche_slug else None
-
-    # 1. Register proxy token with token-proxy (it generates the token for us)
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            f"{settings.token_proxy_url}/internal/tokens",
-            json={
-                "customer_id": customer_id,
-                "box_id": str(box_id),
-            },
-            headers={"X-Internal-Key": settings.internal_api_key},
-            timeout=10,
+    system_prompt = niche_config.system_prompt if niche_config else None
+    # Resolved (and cached) from the reference. The gateway config does not
+    # use the bundle's contents; the prompt still comes from the niche.
+    if payload.get("bundle_id"):
+        await resolve_bundle(db, payload["bundle_id"], payload.get("bundle_version", 0))
+
+    image = (await db.execute(BOX_IMAGE, {"box_id": box_id})).scalar() or settings.openclaw_image
+    row = (await db.execute(BOX_REQUESTS, {"box_id": box_id})).fetchone()
+    requests = {k: v for k, v in zip(("cpu", "memory"), row or ()) if v} or None
+    proxy_token = ""
+    secret_data: dict[str, str] = {}
+
+    async def register_token() -> None:
+        # Token-proxy generates the token for us
+        nonlocal proxy_token
+        async with httpx.AsyncClient() as client:
+            resp = await client.post(
+                f"{settings.token_proxy_url}/internal/tokens",
+                json={
+                    "customer_id": customer_id,
+                    "box_id": str(box_id),
+                },
+                headers={"X-Internal-Key": settings.internal_api_key},
+                timeout=10,
+            )
+            resp.raise_for_status()
+            proxy_token = resp.json()["token"]
+        logger.info("Registered proxy token for customer %s", customer_id)
+
+    async def apply_secret() -> None:
+        nonlocal secret_data
+        secret_data = config_secret_data(
+            customer_id,
+            telegram_bot_token=telegram_bot_token,
+            telegram_allow_from=str(telegram_allow_from),
+            proxy_token=proxy_token,
+            model=model,
+            thinking=thinking,
+            system_prompt=system_prompt,
         )
-        resp.raise_for_status()
-        token_data = resp.json()
-        proxy_token = token_data["token"]
-
-    logger.info("Registered proxy token for customer %s", customer_id)
-
-    # 2. Create K8s namespace
-    create_namespace(customer_id, tier)
-
-    # 3. Create K8s Secret
-    create_config_secret(
-        customer_id,
-        telegram_bot_token=telegram_bot_token,
-        telegram_allow_from=str(telegram_allow_from),
-        proxy_token=proxy_token,
-        model=model,
-        thinking=thinking,
-        system_prompt=niche_config.system_prompt if niche_config else None,
-    )
-
-    # 4. Create ResourceQuota
-    create_resource_quota(customer_id, tier)
-
-    # 5. Create NetworkPolicy
-    create_network_policy(customer_id)
-
-    # 6. Create Deployment
-    create_deployment(customer_id, tier, settings.openclaw_image)
-
-    # 7. Wait for pod ready
-    ready = wait_for_pod_ready(customer_id, timeout=settings.pod_ready_timeout)
-    if not ready:
-        raise TimeoutError(f"Pod not ready within {settings.pod_ready_timeout}s for customer {customer_id}")
-
-    # 8. Update box status
+        await apply_manifest(render_config_secret(customer_id, secret_data))
+
+    async def apply_deployment() -> None:
+        # The pod template records the secret just written, so later updates
+        # compare against it rather than against what the box ran before.
+        deployment = render_customer_objects(
+            customer_id, tier=tier, image=image, secret_data=secret_data, requests=requests,
+        )["deployment"]
+        await apply_manifest(deployment)
+
+    async def apply_namespace() -> None:
+        await apply_manifest(objects["namespace"])
+        bind_namespace(customer_id, namespace_name(customer_id))
+
+    async def wait_ready() -> None:
+        ready = await wait_for_pod_ready(customer_id, timeout=settings.pod_ready_timeout)
+        if not ready:
+            raise TimeoutError(f"Pod not ready within {settings.pod_ready_timeout}s for customer {customer_id}")
+
+    # Every object is server-side applied, so re-running provision for a box
+    # that already exists is a no-op diff rather than a create-409-patch cycle.
+    # Only the namespace is a hard prerequisite. The deployment waits for the
+    # secret it mounts and for the quota and network policy that must be in
+    # place before the pod starts.
+    # A claimed warm-pool namespace already holds the quota, network policy
+    # and a scaled-down gateway, leaving only small diffs to apply.
+    if not has_namespace(customer_id):
+        await claim(customer_id, tier)
+    objects = render_customer_objects(customer_id, tier=tier, image=image)
+    await run_graph({
+        "token": Step(register_token),
+        "namespace": Step(apply_namespace),
+        "secret": Step(apply_secret, after=("token", "namespace")),
+        "quota": Step(lambda: apply_manifest(objects["quota"]), after=("namespace",)),
+        "netpol": Step(lambda: apply_manifest(objects["netpol"]), after=("namespace",)),
+        "deployment": Step(apply_deployment, after=("secret", "quota", "netpol")),
+        "wait_ready": Step(wait_ready, after=("deployment",)),
+    })
+
+    # Update box status
     now = datetime.now(timezone.utc)
     await db.execute(
         text("UPDATE boxes SET status = 'active', activated_at = :now WHERE id = :box_id"),
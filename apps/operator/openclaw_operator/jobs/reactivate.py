@@ -14,7 +14,7 @@ async def handle_reactivate(payload: dict, customer_id: str, db: AsyncSession) -
     box_id = payload["box_id"]
 
     # 1. Scale Deployment back to 1 replica
-    scale_deployment(customer_id, replicas=1)
+    await scale_deployment(customer_id, replicas=1)
 
     # 2. Update box status
     await db.execute(
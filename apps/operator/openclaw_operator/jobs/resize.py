@@ -20,15 +20,15 @@ async def handle_resize(payload: dict, customer_id: str, db: AsyncSession) -> No
     new_tier = payload["new_tier"]
 
     # 1. Patch ResourceQuota with new tier limits
-    patch_resource_quota(customer_id, new_tier)
+    await patch_resource_quota(customer_id, new_tier)
 
     # 2. Patch Deployment resource requests/limits
-    patch_deployment_resources(customer_id, new_tier)
+    await patch_deployment_resources(customer_id, new_tier)
 
     # 3. Rollout restart
-    rollout_restart(customer_id)
+    await rollout_restart(customer_id)
 
-    complete = wait_for_rollout(customer_id, timeout=60)
+    complete = await wait_for_rollout(customer_id, timeout=60)
     if not complete:
         raise TimeoutError(f"Resize rollout not complete within 60s for customer {customer_id}")
 
@@ -40,6 +40,11 @@ async def handle_resize(payload: dict, customer_id: str, db: AsyncSession) -> No
         """),
         {"new_tier": new_tier, "customer_id": customer_id},
     )
+    # The new tier's requests replace any right-sized ones.
+    await db.execute(
+        text("UPDATE boxes SET cpu_request = NULL, memory_request = NULL WHERE id = :box_id"),
+        {"box_id": box_id},
+    )
     await db.commit()
 
     logger.info("Resized customer %s (box %s) to tier %s", customer_id, box_id, new_tier)
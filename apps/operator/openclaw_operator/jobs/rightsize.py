@@ -0,0 +1,44 @@
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..k8s import patch_deployment_resources
+
+logger = logging.getLogger(__name__)
+
+
+async def handle_rightsize(payload: dict, customer_id: str, db: AsyncSession) -> None:
+    """Set a box's gateway requests to the right-sizing recommendation.
+
+    Does not wait for the new pod; the Deployment rolls it like any other
+    spec change.
+    """
+
+    box_id = payload["box_id"]
+    requests = {"cpu": payload["cpu_request"], "memory": payload["memory_request"]}
+
+    # 1. Record the requests, unless the box changed tier or state since the pass
+    result = await db.execute(
+        text("""
+            UPDATE boxes b SET cpu_request = :cpu, memory_request = :memory
+            FROM subscriptions s
+            WHERE b.id = :box_id AND b.status = 'active'
+              AND s.id = b.subscription_id AND s.tier = :tier
+            RETURNING b.id
+        """),
+        {"box_id": box_id, "tier": payload["tier"], **requests},
+    )
+    if result.fetchone() is None:
+        await db.rollback()
+        logger.info("Box %s changed since it was right-sized, skipping", box_id)
+        return
+
+    # 2. Patch Deployment requests; limits stay at the tier's
+    await patch_deployment_resources(customer_id, payload["tier"], requests=requests)
+    await db.commit()
+
+    logger.info(
+        "Right-sized customer %s (box %s) to cpu %s, memory %s",
+        customer_id, box_id, requests["cpu"], requests["memory"],
+    )
@@ -0,0 +1,73 @@
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..k8s import (
+    gateway_outdated,
+    patch_deployment_resources,
+    read_gateway,
+    rollout_restart,
+    written_generation,
+)
+
+logger = logging.getLogger(__name__)
+
+_SET_BOX = text("""
+    UPDATE fleet_rollout_boxes
+    SET status = :status, generation = :generation, error = :error, updated_at = now()
+    WHERE rollout_id = :rollout_id AND box_id = :box_id AND status = 'queued'
+""")
+
+_BOX_REQUESTS = text("SELECT cpu_request, memory_request FROM boxes WHERE id = :box_id")
+
+# Provision reads this back (``provision.BOX_IMAGE``), so re-provisioning the
+# box keeps the rolled-out image.
+_SET_IMAGE = text("UPDATE boxes SET image = :image WHERE id = :box_id")
+
+
+async def handle_rollout(payload: dict, customer_id: str, db: AsyncSession) -> None:
+    """Roll one box of a fleet rollout: patch image/resources, or restart.
+
+    Does not wait for the rollout to finish; the fleet coordinator watches
+    for that, so the job holds a worker slot for a few API calls only.
+    """
+
+    box_id = payload["box_id"]
+    rollout_id = payload["rollout_id"]
+    tier = payload["tier"]
+    image = payload.get("image")
+    params = {"rollout_id": rollout_id, "box_id": box_id, "generation": None, "error": None}
+
+    # 1. Read the current gateway spec
+    dep = await read_gateway(customer_id)
+    if dep is None:
+        await db.execute(_SET_BOX, {**params, "status": "failed", "error": "gateway deployment not found"})
+        await db.commit()
+        logger.warning("Rollout %s: no gateway for customer %s", rollout_id, customer_id)
+        return
+
+    # 2. Patch what differs, restart if asked to, or leave the box alone.
+    #    Right-sized requests are read now, not when the rollout was created.
+    result = await db.execute(_BOX_REQUESTS, {"box_id": box_id})
+    row = result.fetchone()
+    requests = {k: v for k, v in zip(("cpu", "memory"), row or ()) if v} or None
+    if gateway_outdated(dep, tier, image, requests):
+        await patch_deployment_resources(customer_id, tier, image=image, requests=requests)
+    elif payload.get("restart"):
+        await rollout_restart(customer_id)
+    else:
+        if image:
+            await db.execute(_SET_IMAGE, {"image": image, "box_id": box_id})
+        await db.execute(_SET_BOX, {**params, "status": "complete"})
+        await db.commit()
+        logger.info("Rollout %s: customer %s already current", rollout_id, customer_id)
+        return
+
+    # 3. Hand the box to the coordinator
+    if image:
+        await db.execute(_SET_IMAGE, {"image": image, "box_id": box_id})
+    await db.execute(_SET_BOX, {**params, "status": "rolling", "generation": written_generation(customer_id)})
+    await db.commit()
+
+    logger.info("Rollout %s: started for customer %s (box %s)", rollout_id, customer_id, box_id)
@@ -0,0 +1,34 @@
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..k8s import scale_deployment
+
+logger = logging.getLogger(__name__)
+
+
+async def handle_sleep(payload: dict, customer_id: str, db: AsyncSession) -> None:
+    """Put an idle box to sleep: scale deployment to 0 until a message arrives."""
+
+    box_id = payload["box_id"]
+
+    # 1. Mark the box sleeping, unless it changed state since it was found idle
+    result = await db.execute(
+        text("""
+            UPDATE boxes SET status = 'sleeping', slept_at = now()
+            WHERE id = :box_id AND status = 'active'
+            RETURNING id
+        """),
+        {"box_id": box_id},
+    )
+    if result.fetchone() is None:
+        await db.rollback()
+        logger.info("Box %s is no longer active, not putting it to sleep", box_id)
+        return
+
+    # 2. Scale Deployment to 0 replicas
+    await scale_deployment(customer_id, replicas=0)
+    await db.commit()
+
+    logger.info("Put customer %s to sleep (box %s)", customer_id, box_id)
@@ -14,7 +14,7 @@ async def handle_suspend(payload: dict, customer_id: str, db: AsyncSession) -> N
     box_id = payload["box_id"]
 
     # 1. Scale Deployment to 0 replicas
-    scale_deployment(customer_id, replicas=0)
+    await scale_deployment(customer_id, replicas=0)
 
     # 2. Update box status
     await db.execute(
@@ -3,7 +3,7 @@ import logging
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..k8s import patch_config_secret, rollout_restart, wait_for_rollout
+from ..k8s import changed_config, patch_config_secret, rollout_restart, wait_for_rollout
 
 logger = logging.getLogger(__name__)
 
@@ -14,18 +14,23 @@ async def handle_update(payload: dict, customer_id: str, db: AsyncSession) -> No
     box_id = payload["box_id"]
     secret_data = payload["secret_data"]  # dict of env vars to update
 
-    # 1. Patch K8s Secret with new config
-    patch_config_secret(customer_id, secret_data)
+    # 1. Skip the patch and restart if the gateway already runs this config
+    annotations = await changed_config(customer_id, secret_data)
+    if annotations is None:
+        logger.info("Config unchanged for customer %s, skipping restart", customer_id)
+    else:
+        # 2. Patch K8s Secret with new config
+        await patch_config_secret(customer_id, secret_data)
 
-    # 2. Rollout restart Deployment
-    rollout_restart(customer_id)
+        # 3. Rollout restart Deployment, recording the new config hash
+        await rollout_restart(customer_id, annotations)
 
-    # 3. Wait for rollout complete
-    complete = wait_for_rollout(customer_id, timeout=60)
-    if not complete:
-        raise TimeoutError(f"Rollout not complete within 60s for customer {customer_id}")
+        # 4. Wait for rollout complete
+        complete = await wait_for_rollout(customer_id, timeout=60)
+        if not complete:
+            raise TimeoutError(f"Rollout not complete within 60s for customer {customer_id}")
 
-    # 4. Update last_updated
+    # 5. Update last_updated
     await db.execute(
         text("UPDATE boxes SET last_updated = now() WHERE id = :box_id"),
         {"box_id": box_id},
@@ -5,7 +5,7 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
-from ..k8s import patch_config_secret, rollout_restart, wait_for_rollout
+from ..k8s import changed_config, patch_config_secret, rollout_restart, wait_for_rollout
 from ..providers import MCP_SERVERS, NATIVE_PROVIDERS
 
 logger = logging.getLogger(__name__)
@@ -15,7 +15,9 @@ async def handle_update_connections(payload: dict, customer_id: str, db: AsyncSe
     result = await db.execute(
         text(
             "SELECT provider, nango_connection_id FROM customer_connections "
-            "WHERE customer_id = :cid AND status = 'active'"
+            "WHERE customer_id = :cid AND status = 'active' "
+            # Stable order keeps the rendered config, and so its hash, stable.
+            "ORDER BY provider"
         ),
         {"cid": customer_id},
     )
@@ -43,10 +45,16 @@ async def handle_update_connections(payload: dict, customer_id: str, db: AsyncSe
         "connections": connections,
     })
 
-    patch_config_secret(customer_id, {"OPENCLAW_CONNECTIONS": connections_config})
-    rollout_restart(customer_id)
+    secret_data = {"OPENCLAW_CONNECTIONS": connections_config}
+    annotations = await changed_config(customer_id, secret_data)
+    if annotations is None:
+        logger.info("Connections unchanged for customer %s, skipping restart", customer_id)
+        return
 
-    complete = wait_for_rollout(customer_id, timeout=60)
+    await patch_config_secret(customer_id, secret_data)
+    await rollout_restart(customer_id, annotations)
+
+    complete = await wait_for_rollout(customer_id, timeout=60)
     if not complete:
         raise TimeoutError(f"Rollout not complete within 60s for customer {customer_id}")
 
@@ -0,0 +1,46 @@
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..idle import record_wake
+from ..k8s import scale_deployment, wait_for_pod_ready
+from ..steps import step
+
+logger = logging.getLogger(__name__)
+
+
+async def handle_wake(payload: dict, customer_id: str, db: AsyncSession) -> None:
+    """Wake a sleeping box: scale deployment back to 1 and wait for the gateway."""
+
+    box_id = payload["box_id"]
+
+    result = await db.execute(text("SELECT status FROM boxes WHERE id = :box_id"), {"box_id": box_id})
+    row = result.fetchone()
+    if row is None or row[0] != "sleeping":
+        logger.info("Box %s is not sleeping, nothing to wake", box_id)
+        return
+
+    # 1. Scale Deployment back to 1 replica
+    await scale_deployment(customer_id, replicas=1)
+
+    # 2. Wait for the gateway, which then picks up the waiting Telegram updates
+    with step("wait_ready"):
+        ready = await wait_for_pod_ready(customer_id, timeout=settings.pod_ready_timeout)
+    if not ready:
+        raise TimeoutError(f"Pod not ready within {settings.pod_ready_timeout}s for customer {customer_id}")
+
+    # 3. Update box status
+    await db.execute(
+        text("UPDATE boxes SET status = 'active', woke_at = now() WHERE id = :box_id AND status = 'sleeping'"),
+        {"box_id": box_id},
+    )
+    await db.commit()
+
+    detected_at = payload.get("detected_at")
+    if detected_at is not None:
+        record_wake(time.time() - detected_at)
+
+    logger.info("Woke customer %s (box %s)", customer_id, box_id)
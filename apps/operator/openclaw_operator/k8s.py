@@ -1,7 +1,14 @@
+import asyncio
+import base64
+import functools
+import hashlib
 import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from kubernetes import client, config
+from kubernetes import client, config, watch
 from kubernetes.client import (
     AppsV1Api,
     CoreV1Api,
@@ -28,6 +35,7 @@ from kubernetes.client import (
 )
 
 from .config import settings
+from .telemetry import K8S_CALL, k8s_verb
 from .tiers import TIER_RESOURCES, get_quota_hard
 
 logger = logging.getLogger(__name__)
@@ -35,10 +43,34 @@ logger = logging.getLogger(__name__)
 _core_v1: CoreV1Api | None = None
 _apps_v1: AppsV1Api | None = None
 _networking_v1: NetworkingV1Api | None = None
+_executor: ThreadPoolExecutor | None = None
+# Deployment watches block a thread for up to a whole readiness timeout, so
+# they get their own pool and never hold up k8s_call or the informers.
+_watch_executor: ThreadPoolExecutor | None = None
 
+# A watch is opened for at most this many seconds at a time, so a waiter
+# that was cancelled gives its thread back within one chunk.
+WATCH_CHUNK = 5
 
-def init_k8s() -> None:
-    """Load kubeconfig — in-cluster first, then local fallback."""
+# customer_id -> namespace, as last seen in the openclaw/customer label.
+# Claimed warm-pool namespaces keep their pool name, so the label is the only
+# way to find them; unknown customers fall back to the customer-<id> name.
+# Other replicas claim and delete namespaces too, so every job refreshes its
+# customer's entry with ``resolve_namespace`` before it runs.
+_namespaces: dict[str, str] = {}
+
+CUSTOMER_LABEL = "openclaw/customer"
+
+# namespace -> gateway Deployment generation produced by our last write to it.
+# Cached reads older than that describe the spec before the write.
+_generations: dict[str, int] = {}
+
+
+def init_k8s() -> bool:
+    """Load kubeconfig — in-cluster first, then local fallback.
+
+    Returns whether a config was found.
+    """
     global _core_v1, _apps_v1, _networking_v1
     try:
         config.load_incluster_config()
@@ -49,10 +81,11 @@ def init_k8s() -> None:
             logger.info("Loaded local kubeconfig")
         except Exception:
             logger.warning("No K8s config found — operator will fail on K8s operations")
-            return
+            return False
     _core_v1 = CoreV1Api()
     _apps_v1 = AppsV1Api()
     _networking_v1 = NetworkingV1Api()
+    return True
 
 
 def core_v1() -> CoreV1Api:
@@ -70,40 +103,101 @@ def networking_v1() -> NetworkingV1Api:
     return _networking_v1
 
 
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.k8s_threads, thread_name_prefix="k8s")
+    return _executor
+
+
+def _get_watch_executor() -> ThreadPoolExecutor:
+    global _watch_executor
+    if _watch_executor is None:
+        _watch_executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.job_concurrency), thread_name_prefix="k8s-watch",
+        )
+    return _watch_executor
+
+
+def _remember_generation(ns: str, written) -> None:
+    meta = written.get("metadata") if isinstance(written, dict) else getattr(written, "metadata", None)
+    generation = meta.get("generation") if isinstance(meta, dict) else getattr(meta, "generation", None)
+    if isinstance(generation, int):
+        _generations[ns] = generation
+
+
+async def k8s_call(fn, *args, **kwargs):
+    """Run a blocking K8s client call on the K8s thread pool.
+
+    The kubernetes client is synchronous; running it here keeps the event
+    loop (job loop, metrics collector, /healthz) responsive. Each call is
+    bounded by ``k8s_call_timeout`` both on the HTTP request and on the wait.
+    """
+    timeout = settings.k8s_call_timeout
+    kwargs.setdefault("_request_timeout", timeout)
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(
+        loop.run_in_executor(_get_executor(), functools.partial(_timed_call, fn, *args, **kwargs)),
+        timeout=timeout,
+    )
+
+
+def _timed_call(fn, *args, **kwargs):
+    # Timed on the worker thread, so pool queueing is not counted as latency.
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        K8S_CALL.labels(k8s_verb(fn)).observe(time.perf_counter() - start)
+
+
 # ---------------------------------------------------------------------------
 # Namespace helpers
 # ---------------------------------------------------------------------------
 
 def namespace_name(customer_id: str) -> str:
-    return f"customer-{customer_id}"
+    return _namespaces.get(customer_id, f"customer-{customer_id}")
 
 
-def create_namespace(customer_id: str, tier: str) -> None:
-    from kubernetes.client.exceptions import ApiException
-    ns = namespace_name(customer_id)
-    try:
-        core_v1().create_namespace(
-            V1Namespace(
-                metadata=V1ObjectMeta(
-                    name=ns,
-                    labels={
-                        "openclaw/customer": customer_id,
-                        "openclaw/tier": tier,
-                    },
-                )
-            )
-        )
-        logger.info("Created namespace %s", ns)
-    except ApiException as e:
-        if e.status == 409:
-            logger.info("Namespace %s already exists, skipping", ns)
-        else:
-            raise
+def bind_namespace(customer_id: str, ns: str) -> None:
+    _namespaces[customer_id] = ns
 
 
-def delete_namespace(customer_id: str) -> None:
+def has_namespace(customer_id: str) -> bool:
+    return customer_id in _namespaces
+
+
+async def resolve_namespace(customer_id: str) -> str:
+    """Find the customer's namespace by its label and bind it, or unbind it if
+    there is none. Returns ``namespace_name(customer_id)``."""
+    result = await k8s_call(core_v1().list_namespace, label_selector=f"{CUSTOMER_LABEL}={customer_id}")
+    if result.items:
+        _namespaces[customer_id] = result.items[0].metadata.name
+    else:
+        _namespaces.pop(customer_id, None)
+    return namespace_name(customer_id)
+
+
+def customer_for_namespace(ns: str) -> str | None:
+    for customer_id, bound in _namespaces.items():
+        if bound == ns:
+            return customer_id
+    return None
+
+
+def _build_namespace(name: str, labels: dict[str, str]) -> V1Namespace:
+    return V1Namespace(
+        api_version="v1",
+        kind="Namespace",
+        metadata=V1ObjectMeta(name=name, labels=labels),
+    )
+
+
+async def delete_namespace(customer_id: str) -> None:
     ns = namespace_name(customer_id)
-    core_v1().delete_namespace(ns)
+    await k8s_call(core_v1().delete_namespace, ns)
+    _namespaces.pop(customer_id, None)
+    _generations.pop(ns, None)
     logger.info("Deleted namespace %s", ns)
 
 
@@ -111,7 +205,7 @@ def delete_namespace(customer_id: str) -> None:
 # Secret helpers
 # ---------------------------------------------------------------------------
 
-def create_config_secret(
+def config_secret_data(
     customer_id: str,
     *,
     telegram_bot_token: str,
@@ -120,8 +214,7 @@ def create_config_secret(
     model: str,
     thinking: str,
     system_prompt: str | None = None,
-) -> None:
-    ns = namespace_name(customer_id)
+) -> dict[str, str]:
     data = {
         "TELEGRAM_BOT_TOKEN": telegram_bot_token,
         "TELEGRAM_ALLOW_FROM": telegram_allow_from,
@@ -143,27 +236,22 @@ def create_config_secret(
     }
     if system_prompt:
         data["OPENCLAW_SYSTEM_PROMPT"] = system_prompt
-    from kubernetes.client.exceptions import ApiException
-    try:
-        core_v1().create_namespaced_secret(
-            namespace=ns,
-            body=V1Secret(
-                metadata=V1ObjectMeta(name="openclaw-config"),
-                string_data=data,
-            ),
-        )
-        logger.info("Created secret openclaw-config in %s", ns)
-    except ApiException as e:
-        if e.status == 409:
-            patch_config_secret(customer_id, data)
-            logger.info("Patched existing secret openclaw-config in %s", ns)
-        else:
-            raise
+    return data
+
+
+def _build_config_secret(data: dict[str, str]) -> V1Secret:
+    return V1Secret(
+        api_version="v1",
+        kind="Secret",
+        metadata=V1ObjectMeta(name="openclaw-config"),
+        string_data=data,
+    )
 
 
-def patch_config_secret(customer_id: str, data: dict[str, str]) -> None:
+async def patch_config_secret(customer_id: str, data: dict[str, str]) -> None:
     ns = namespace_name(customer_id)
-    core_v1().patch_namespaced_secret(
+    await k8s_call(
+        core_v1().patch_namespaced_secret,
         name="openclaw-config",
         namespace=ns,
         body=V1Secret(string_data=data),
@@ -171,32 +259,30 @@ def patch_config_secret(customer_id: str, data: dict[str, str]) -> None:
     logger.info("Patched secret openclaw-config in %s", ns)
 
 
+async def read_config_secret(customer_id: str) -> dict[str, str]:
+    secret = await k8s_call(
+        core_v1().read_namespaced_secret, name="openclaw-config", namespace=namespace_name(customer_id),
+    )
+    return {key: base64.b64decode(value).decode() for key, value in (secret.data or {}).items()}
+
+
 # ---------------------------------------------------------------------------
 # ResourceQuota helpers
 # ---------------------------------------------------------------------------
 
-def create_resource_quota(customer_id: str, tier: str) -> None:
-    from kubernetes.client.exceptions import ApiException
-    ns = namespace_name(customer_id)
-    try:
-        core_v1().create_namespaced_resource_quota(
-            namespace=ns,
-            body=V1ResourceQuota(
-                metadata=V1ObjectMeta(name="tier-limits"),
-                spec=V1ResourceQuotaSpec(hard=get_quota_hard(tier)),
-            ),
-        )
-        logger.info("Created resource quota tier-limits (%s) in %s", tier, ns)
-    except ApiException as e:
-        if e.status == 409:
-            logger.info("Resource quota already exists in %s, skipping", ns)
-        else:
-            raise
+def _build_resource_quota(tier: str) -> V1ResourceQuota:
+    return V1ResourceQuota(
+        api_version="v1",
+        kind="ResourceQuota",
+        metadata=V1ObjectMeta(name="tier-limits"),
+        spec=V1ResourceQuotaSpec(hard=get_quota_hard(tier)),
+    )
 
 
-def patch_resource_quota(customer_id: str, tier: str) -> None:
+async def patch_resource_quota(customer_id: str, tier: str) -> None:
     ns = namespace_name(customer_id)
-    core_v1().patch_namespaced_resource_quota(
+    await k8s_call(
+        core_v1().patch_namespaced_resource_quota,
         name="tier-limits",
         namespace=ns,
         body=V1ResourceQuota(
@@ -210,125 +296,121 @@ def patch_resource_quota(customer_id: str, tier: str) -> None:
 # NetworkPolicy helpers
 # ---------------------------------------------------------------------------
 
-def create_network_policy(customer_id: str) -> None:
-    from kubernetes.client.exceptions import ApiException
-    ns = namespace_name(customer_id)
-    try:
-        _do_create_network_policy(customer_id, ns)
-    except ApiException as e:
-        if e.status == 409:
-            logger.info("Network policy already exists in %s, skipping", ns)
-        else:
-            raise
-
-
-def _do_create_network_policy(customer_id: str, ns: str) -> None:
-    networking_v1().create_namespaced_network_policy(
-        namespace=ns,
-        body=V1NetworkPolicy(
-            metadata=V1ObjectMeta(name="customer-isolation"),
-            spec=V1NetworkPolicySpec(
-                pod_selector=V1LabelSelector(),
-                policy_types=["Ingress", "Egress"],
-                ingress=[],
-                egress=[
-                    # Rule 1: Allow egress to token-proxy in platform namespace
-                    V1NetworkPolicyEgressRule(
-                        to=[
-                            V1NetworkPolicyPeer(
-                                namespace_selector=V1LabelSelector(
-                                    match_labels={"kubernetes.io/metadata.name": "platform"},
-                                ),
-                                pod_selector=V1LabelSelector(
-                                    match_labels={"app": "token-proxy"},
-                                ),
+def _build_network_policy() -> V1NetworkPolicy:
+    return V1NetworkPolicy(
+        api_version="networking.k8s.io/v1",
+        kind="NetworkPolicy",
+        metadata=V1ObjectMeta(name="customer-isolation"),
+        spec=V1NetworkPolicySpec(
+            pod_selector=V1LabelSelector(),
+            policy_types=["Ingress", "Egress"],
+            ingress=[],
+            egress=[
+                # Rule 1: Allow egress to token-proxy in platform namespace
+                V1NetworkPolicyEgressRule(
+                    to=[
+                        V1NetworkPolicyPeer(
+                            namespace_selector=V1LabelSelector(
+                                match_labels={"kubernetes.io/metadata.name": "platform"},
                             ),
-                        ],
-                        ports=[V1NetworkPolicyPort(port=8080)],
-                    ),
-                    # Rule 2: Allow egress to Nango proxy in platform namespace
-                    V1NetworkPolicyEgressRule(
-                        to=[
-                            V1NetworkPolicyPeer(
-                                namespace_selector=V1LabelSelector(
-                                    match_labels={"kubernetes.io/metadata.name": "platform"},
-                                ),
-                                pod_selector=V1LabelSelector(
-                                    match_labels={"app": "nango-server"},
-                                ),
+                            pod_selector=V1LabelSelector(
+                                match_labels={"app": "token-proxy"},
                             ),
-                        ],
-                        ports=[V1NetworkPolicyPort(port=8080)],
-                    ),
-                    # Rule 3: Allow egress to browser-proxy in platform namespace
-                    V1NetworkPolicyEgressRule(
-                        to=[
-                            V1NetworkPolicyPeer(
-                                namespace_selector=V1LabelSelector(
-                                    match_labels={"kubernetes.io/metadata.name": "platform"},
-                                ),
-                                pod_selector=V1LabelSelector(
-                                    match_labels={"app": "browser-proxy"},
-                                ),
+                        ),
+                    ],
+                    ports=[V1NetworkPolicyPort(port=8080)],
+                ),
+                # Rule 2: Allow egress to Nango proxy in platform namespace
+                V1NetworkPolicyEgressRule(
+                    to=[
+                        V1NetworkPolicyPeer(
+                            namespace_selector=V1LabelSelector(
+                                match_labels={"kubernetes.io/metadata.name": "platform"},
                             ),
-                        ],
-                        ports=[V1NetworkPolicyPort(port=9223)],
-                    ),
-                    # Rule 4: Allow egress to API service in platform namespace
-                    V1NetworkPolicyEgressRule(
-                        to=[
-                            V1NetworkPolicyPeer(
-                                namespace_selector=V1LabelSelector(
-                                    match_labels={"kubernetes.io/metadata.name": "platform"},
-                                ),
-                                pod_selector=V1LabelSelector(
-                                    match_labels={"app": "api"},
-                                ),
+                            pod_selector=V1LabelSelector(
+                                match_labels={"app": "nango-server"},
                             ),
-                        ],
-                        ports=[V1NetworkPolicyPort(port=8000)],
-                    ),
-                    # Rule 4: Allow egress to Telegram (public IPs, port 443)
-                    V1NetworkPolicyEgressRule(
-                        to=[
-                            V1NetworkPolicyPeer(
-                                ip_block=client.V1IPBlock(
-                                    cidr="0.0.0.0/0",
-                                    _except=[
-                                        "10.0.0.0/8",
-                                        "172.16.0.0/12",
-                                        "192.168.0.0/16",
-                                    ],
-                                ),
+                        ),
+                    ],
+                    ports=[V1NetworkPolicyPort(port=8080)],
+                ),
+                # Rule 3: Allow egress to browser-proxy in platform namespace
+                V1NetworkPolicyEgressRule(
+                    to=[
+                        V1NetworkPolicyPeer(
+                            namespace_selector=V1LabelSelector(
+                                match_labels={"kubernetes.io/metadata.name": "platform"},
                             ),
-                        ],
-                        ports=[V1NetworkPolicyPort(port=443)],
-                    ),
-                    # Rule 5: Allow CoreDNS (UDP 53)
-                    V1NetworkPolicyEgressRule(
-                        ports=[V1NetworkPolicyPort(port=53, protocol="UDP")],
-                    ),
-                ],
-            ),
+                            pod_selector=V1LabelSelector(
+                                match_labels={"app": "browser-proxy"},
+                            ),
+                        ),
+                    ],
+                    ports=[V1NetworkPolicyPort(port=9223)],
+                ),
+                # Rule 4: Allow egress to API service in platform namespace
+                V1NetworkPolicyEgressRule(
+                    to=[
+                        V1NetworkPolicyPeer(
+                            namespace_selector=V1LabelSelector(
+                                match_labels={"kubernetes.io/metadata.name": "platform"},
+                            ),
+                            pod_selector=V1LabelSelector(
+                                match_labels={"app": "api"},
+                            ),
+                        ),
+                    ],
+                    ports=[V1NetworkPolicyPort(port=8000)],
+                ),
+                # Rule 4: Allow egress to Telegram (public IPs, port 443)
+                V1NetworkPolicyEgressRule(
+                    to=[
+                        V1NetworkPolicyPeer(
+                            ip_block=client.V1IPBlock(
+                                cidr="0.0.0.0/0",
+                                _except=[
+                                    "10.0.0.0/8",
+                                    "172.16.0.0/12",
+                                    "192.168.0.0/16",
+                                ],
+                            ),
+                        ),
+                    ],
+                    ports=[V1NetworkPolicyPort(port=443)],
+                ),
+                # Rule 5: Allow CoreDNS (UDP 53)
+                V1NetworkPolicyEgressRule(
+                    ports=[V1NetworkPolicyPort(port=53, protocol="UDP")],
+                ),
+            ],
         ),
     )
-    logger.info("Created network policy customer-isolation in %s", ns)
 
 
 # ---------------------------------------------------------------------------
 # Deployment helpers
 # ---------------------------------------------------------------------------
 
-def _build_deployment(customer_id: str, tier: str, image: str) -> V1Deployment:
-    res = TIER_RESOURCES[tier]
-    labels = {"app": "openclaw-gateway", "openclaw/customer": customer_id}
+def _build_deployment(
+    customer_id: str | None,
+    tier: str,
+    image: str,
+    replicas: int = 1,
+    annotations: dict[str, str] | None = None,
+    requests: dict[str, str] | None = None,
+) -> V1Deployment:
+    labels = {"app": "openclaw-gateway"}
+    if customer_id:
+        labels[CUSTOMER_LABEL] = customer_id
     return V1Deployment(
+        api_version="apps/v1",
+        kind="Deployment",
         metadata=V1ObjectMeta(name="openclaw-gateway", labels=labels),
         spec=V1DeploymentSpec(
-            replicas=1,
+            replicas=replicas,
             selector=V1LabelSelector(match_labels={"app": "openclaw-gateway"}),
             template=V1PodTemplateSpec(
-                metadata=V1ObjectMeta(labels=labels),
+                metadata=V1ObjectMeta(labels=labels, annotations=annotations),
                 spec=V1PodSpec(
                     automount_service_account_token=False,
                     containers=[
@@ -341,10 +423,7 @@ def _build_deployment(customer_id: str, tier: str, image: str) -> V1Deployment:
                                     secret_ref=V1SecretEnvSource(name="openclaw-config"),
                                 ),
                             ],
-                            resources=V1ResourceRequirements(
-                                requests={"cpu": res.cpu_request, "memory": res.memory_request},
-                                limits={"cpu": res.cpu_limit, "memory": res.memory_limit},
-                            ),
+                            resources=V1ResourceRequirements(**_tier_resources(tier, requests)),
                         ),
                     ],
                     restart_policy="Always",
@@ -354,65 +433,86 @@ def _build_deployment(customer_id: str, tier: str, image: str) -> V1Deployment:
     )
 
 
-def create_deployment(customer_id: str, tier: str, image: str) -> None:
-    from kubernetes.client.exceptions import ApiException
-    ns = namespace_name(customer_id)
-    try:
-        apps_v1().create_namespaced_deployment(
-            namespace=ns,
-            body=_build_deployment(customer_id, tier, image),
-        )
-        logger.info("Created deployment openclaw-gateway in %s", ns)
-    except ApiException as e:
-        if e.status == 409:
-            logger.info("Deployment already exists in %s, skipping", ns)
-        else:
-            raise
+def _tier_resources(tier: str, requests: dict[str, str] | None = None) -> dict[str, dict[str, str]]:
+    """``tier``'s requests and limits, with right-sized ``requests`` in place of the tier's."""
+    res = TIER_RESOURCES[tier]
+    return {
+        "requests": {"cpu": res.cpu_request, "memory": res.memory_request, **(requests or {})},
+        "limits": {"cpu": res.cpu_limit, "memory": res.memory_limit},
+    }
 
 
-def patch_deployment_resources(customer_id: str, tier: str) -> None:
+async def patch_deployment_resources(
+    customer_id: str,
+    tier: str,
+    image: str | None = None,
+    requests: dict[str, str] | None = None,
+) -> None:
+    """Patch the gateway's resources to ``tier``, and its image if ``image`` is given.
+
+    ``requests`` overrides the tier's requests (see ``rightsize``).
+    """
     ns = namespace_name(customer_id)
-    res = TIER_RESOURCES[tier]
-    apps_v1().patch_namespaced_deployment(
+    container = {"name": "openclaw-gateway", "resources": _tier_resources(tier, requests)}
+    if image:
+        container["image"] = image
+    dep = await k8s_call(
+        apps_v1().patch_namespaced_deployment,
         name="openclaw-gateway",
         namespace=ns,
-        body={
-            "spec": {
-                "template": {
-                    "spec": {
-                        "containers": [
-                            {
-                                "name": "openclaw-gateway",
-                                "resources": {
-                                    "requests": {"cpu": res.cpu_request, "memory": res.memory_request},
-                                    "limits": {"cpu": res.cpu_limit, "memory": res.memory_limit},
-                                },
-                            }
-                        ]
-                    }
-                }
-            }
-        },
+        body={"spec": {"template": {"spec": {"containers": [container]}}}},
     )
-    logger.info("Patched deployment resources to tier %s in %s", tier, ns)
+    _remember_generation(ns, dep)
+    logger.info("Patched deployment resources to tier %s%s in %s", tier, f" and image {image}" if image else "", ns)
+
+
+def gateway_outdated(
+    dep: V1Deployment,
+    tier: str,
+    image: str | None = None,
+    requests: dict[str, str] | None = None,
+) -> bool:
+    """Whether the gateway's container differs from ``tier``'s resources or ``image``."""
+    container = next((c for c in dep.spec.template.spec.containers if c.name == "openclaw-gateway"), None)
+    if container is None:
+        return True
+    if image and container.image != image:
+        return True
+    resources = container.resources
+    current = {
+        "requests": dict(resources.requests or {}) if resources else {},
+        "limits": dict(resources.limits or {}) if resources else {},
+    }
+    return current != _tier_resources(tier, requests)
+
+
+def written_generation(customer_id: str) -> int | None:
+    """Generation of the last gateway Deployment this process wrote for the customer."""
+    return _generations.get(namespace_name(customer_id))
 
 
-def scale_deployment(customer_id: str, replicas: int) -> None:
+async def scale_deployment(customer_id: str, replicas: int) -> None:
     ns = namespace_name(customer_id)
-    apps_v1().patch_namespaced_deployment(
+    dep = await k8s_call(
+        apps_v1().patch_namespaced_deployment,
         name="openclaw-gateway",
         namespace=ns,
         body={"spec": {"replicas": replicas}},
     )
+    _remember_generation(ns, dep)
     logger.info("Scaled deployment in %s to %d replicas", ns, replicas)
 
 
-def rollout_restart(customer_id: str) -> None:
-    """Trigger a rolling restart by patching a restart annotation."""
+async def rollout_restart(customer_id: str, annotations: dict[str, str] | None = None) -> None:
+    """Trigger a rolling restart by patching a restart annotation.
+
+    ``annotations`` are set on the pod template in the same patch.
+    """
     from datetime import datetime, timezone
 
     ns = namespace_name(customer_id)
-    apps_v1().patch_namespaced_deployment(
+    dep = await k8s_call(
+        apps_v1().patch_namespaced_deployment,
         name="openclaw-gateway",
         namespace=ns,
         body={
@@ -420,6 +520,7 @@ def rollout_restart(customer_id: str) -> None:
                 "template": {
                     "metadata": {
                         "annotations": {
+                            **(annotations or {}),
                             "kubectl.kubernetes.io/restartedAt": datetime.now(timezone.utc).isoformat(),
                         }
                     }
@@ -427,52 +528,315 @@ def rollout_restart(customer_id: str) -> None:
             }
         },
     )
+    _remember_generation(ns, dep)
     logger.info("Triggered rollout restart in %s", ns)
 
 
 # ---------------------------------------------------------------------------
-# Pod status helpers
+# Config hashing
 # ---------------------------------------------------------------------------
 
-def wait_for_pod_ready(customer_id: str, timeout: int = 60) -> bool:
-    """Poll until the deployment's pod is ready or timeout is reached."""
-    import time
+# Pod-template annotation holding a hash of every secret key the operator has
+# written since the gateway was created, as JSON ``{key: hash}``.
+CONFIG_HASH_ANNOTATION = "openclaw/config-hashes"
+
+
+def config_hash(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()[:16]
+
+
+def config_annotations(data: dict[str, str]) -> dict[str, str]:
+    """Pod-template annotations recording ``data`` as the whole secret."""
+    hashes = {key: config_hash(value) for key, value in data.items()}
+    return {CONFIG_HASH_ANNOTATION: json.dumps(hashes, sort_keys=True)}
+
+
+async def _template_annotations(customer_id: str) -> dict[str, str]:
+    # Read from the API server, not the informer cache: a cache lagging behind
+    # another replica's X -> Y update would make a revert to X look like a no-op.
+    from kubernetes.client.exceptions import ApiException
 
+    from .informers import GATEWAY
+
+    try:
+        dep = await k8s_call(
+            apps_v1().read_namespaced_deployment, name=GATEWAY, namespace=namespace_name(customer_id),
+        )
+    except ApiException as e:
+        if e.status != 404:
+            raise
+        return {}
+    if dep.spec.template.metadata is None:
+        return {}
+    return dep.spec.template.metadata.annotations or {}
+
+
+async def changed_config(customer_id: str, data: dict[str, str]) -> dict[str, str] | None:
+    """Pod-template annotations recording ``data``, or None if the gateway already runs it.
+
+    Pass the result to ``rollout_restart`` after patching the secret, so the
+    next identical update is recognised as a no-op.
+    """
+    annotations = await _template_annotations(customer_id)
+    try:
+        recorded = json.loads(annotations.get(CONFIG_HASH_ANNOTATION) or "{}")
+    except ValueError:
+        recorded = {}
+    hashes = {**recorded, **{key: config_hash(value) for key, value in data.items()}}
+    if hashes == recorded:
+        return None
+    return {CONFIG_HASH_ANNOTATION: json.dumps(hashes, sort_keys=True)}
+
+
+# ---------------------------------------------------------------------------
+# Server-side apply
+# ---------------------------------------------------------------------------
+
+FIELD_MANAGER = "openclaw-operator"
+
+_APPLY_PATHS = {
+    "Namespace": "/api/v1/namespaces/{name}",
+    "Secret": "/api/v1/namespaces/{namespace}/secrets/{name}",
+    "ResourceQuota": "/api/v1/namespaces/{namespace}/resourcequotas/{name}",
+    "NetworkPolicy": "/apis/networking.k8s.io/v1/namespaces/{namespace}/networkpolicies/{name}",
+    "Deployment": "/apis/apps/v1/namespaces/{namespace}/deployments/{name}",
+}
+
+
+def _manifest(obj, namespace: str | None = None) -> dict:
+    if namespace:
+        obj.metadata.namespace = namespace
+    return client.ApiClient().sanitize_for_serialization(obj)
+
+
+def render_config_secret(customer_id: str, data: dict[str, str]) -> dict:
+    return _manifest(_build_config_secret(data), namespace_name(customer_id))
+
+
+def render_customer_objects(
+    customer_id: str,
+    *,
+    tier: str,
+    image: str,
+    secret_data: dict[str, str] | None = None,
+    requests: dict[str, str] | None = None,
+) -> dict[str, dict]:
+    """Render the per-customer objects as apply manifests.
+
+    Keys are ``namespace``, ``quota``, ``netpol``, ``deployment`` and, when
+    ``secret_data`` is given, ``secret``. Everything but the namespace must be
+    applied after it, and the deployment after the objects its pod relies on.
+
+    With ``secret_data`` the deployment's pod template records its hashes
+    (``CONFIG_HASH_ANNOTATION``), replacing whatever earlier updates recorded.
+    Apply it in the same job as the secret so the two never disagree.
+
+    ``requests`` overrides the tier's requests (see ``rightsize``). Pass the
+    box's stored requests, or applying the deployment resets them.
+    """
     ns = namespace_name(customer_id)
+    labels = {CUSTOMER_LABEL: customer_id, "openclaw/tier": tier}
+    objects = {
+        "namespace": _manifest(_build_namespace(ns, labels)),
+        "quota": _manifest(_build_resource_quota(tier), ns),
+        "netpol": _manifest(_build_network_policy(), ns),
+        "deployment": _manifest(_build_deployment(
+            customer_id, tier, image,
+            annotations=config_annotations(secret_data) if secret_data is not None else None,
+            requests=requests,
+        ), ns),
+    }
+    if secret_data is not None:
+        objects["secret"] = render_config_secret(customer_id, secret_data)
+    return objects
+
+
+def render_pool_objects(ns: str, *, tier: str, image: str) -> dict[str, dict]:
+    """Render an unclaimed warm-pool namespace for ``tier``.
+
+    Same objects as ``render_customer_objects`` minus the secret, with the
+    gateway scaled to zero. Applying a customer's objects over it later drops
+    the pool label and scales the gateway up.
+    """
+    labels = {"openclaw/pool": tier, "openclaw/tier": tier}
+    return {
+        "namespace": _manifest(_build_namespace(ns, labels)),
+        "quota": _manifest(_build_resource_quota(tier), ns),
+        "netpol": _manifest(_build_network_policy(), ns),
+        "deployment": _manifest(_build_deployment(None, tier, image, replicas=0), ns),
+    }
+
+
+async def apply_manifest(manifest: dict) -> dict:
+    """Server-side apply ``manifest``, creating or updating it in one request.
+
+    Fields are owned by ``FIELD_MANAGER`` and conflicts are forced, so
+    re-applying an unchanged manifest is a no-op on the API server. The
+    generated ``patch_*`` methods can't send the apply content type, hence
+    the raw ``call_api``.
+    """
+    meta = manifest["metadata"]
+    path = _APPLY_PATHS[manifest["kind"]].format(
+        name=meta["name"], namespace=meta.get("namespace"),
+    )
+    result = await k8s_call(
+        core_v1().api_client.call_api,
+        path,
+        "PATCH",
+        query_params=[("fieldManager", FIELD_MANAGER), ("force", "true")],
+        header_params={
+            "Accept": "application/json",
+            "Content-Type": "application/apply-patch+yaml",
+        },
+        body=manifest,
+        response_type="object",
+        auth_settings=["BearerToken"],
+        _return_http_data_only=True,
+    )
+    if manifest["kind"] == "Deployment":
+        _remember_generation(meta["namespace"], result)
+    logger.info("Applied %s %s", manifest["kind"], path)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Pod status helpers
+# ---------------------------------------------------------------------------
+
+def _pod_ready(dep: V1Deployment) -> bool:
+    return (dep.status.ready_replicas or 0) >= 1
+
+
+def _rollout_complete(dep: V1Deployment) -> bool:
+    status = dep.status
+    replicas = dep.spec.replicas
+    return (
+        # Status must describe the current spec, not the one before our patch.
+        (status.observed_generation or 0) >= (dep.metadata.generation or 0)
+        # A gateway scaled to zero reports no updated replicas at all.
+        and (status.updated_replicas or 0) == replicas
+        and (status.ready_replicas or 0) >= replicas
+        and (status.unavailable_replicas or 0) == 0
+    )
+
+
+def _watch_deployment(ns: str, condition, timeout: float, stop: threading.Event | None = None) -> bool:
+    """Block until ``condition(deployment)`` holds, ``timeout`` elapses or
+    ``stop`` is set.
+
+    Lists the deployment once, then follows a watch from the listed
+    resourceVersion, reopened every ``WATCH_CHUNK`` seconds. A dropped stream
+    resumes from the last seen version; a 410 Gone falls back to a fresh
+    list. Runs on the watch thread pool.
+    """
+    from kubernetes.client.exceptions import ApiException
+
+    api = apps_v1()
+    selector = "metadata.name=openclaw-gateway"
     deadline = time.monotonic() + timeout
-    while time.monotonic() < deadline:
+    resource_version = None
+    stop = stop or threading.Event()
+    while not stop.is_set() and (remaining := deadline - time.monotonic()) > 0:
+        chunk = min(remaining, WATCH_CHUNK)
+        w = watch.Watch()
         try:
-            dep = apps_v1().read_namespaced_deployment("openclaw-gateway", ns)
-            ready = dep.status.ready_replicas or 0
-            if ready >= 1:
-                logger.info("Pod ready in %s", ns)
-                return True
-        except Exception:
-            pass
-        time.sleep(2)
+            if resource_version is None:
+                deps = api.list_namespaced_deployment(
+                    ns, field_selector=selector, _request_timeout=settings.k8s_call_timeout,
+                )
+                if any(condition(dep) for dep in deps.items):
+                    return True
+                resource_version = deps.metadata.resource_version
+            for event in w.stream(
+                api.list_namespaced_deployment,
+                ns,
+                field_selector=selector,
+                resource_version=resource_version,
+                timeout_seconds=max(1, int(chunk)),
+                _request_timeout=chunk + settings.k8s_call_timeout,
+            ):
+                dep = event["object"]
+                resource_version = dep.metadata.resource_version
+                if event["type"] != "DELETED" and condition(dep):
+                    return True
+                if stop.is_set() or time.monotonic() >= deadline:
+                    break
+        except ApiException as e:
+            if e.status == 410:
+                resource_version = None
+            else:
+                logger.debug("Watch on %s failed: %s", ns, e)
+                time.sleep(min(1, max(0, deadline - time.monotonic())))
+        except Exception as e:
+            logger.debug("Watch on %s dropped: %s", ns, e)
+            time.sleep(min(1, max(0, deadline - time.monotonic())))
+        finally:
+            w.stop()
+    return False
+
+
+async def _wait_for_deployment(customer_id: str, condition, timeout: float) -> bool:
+    from .informers import GATEWAY, deployments
+
+    ns = namespace_name(customer_id)
+    if deployments.synced:
+        written = _generations.get(ns, 0)
+        return await deployments.wait_for(
+            ns, GATEWAY, lambda dep: (dep.metadata.generation or 0) >= written and condition(dep), timeout,
+        )
+
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(_get_watch_executor(), _watch_deployment, ns, condition, timeout, stop),
+            timeout=timeout + settings.k8s_call_timeout,
+        )
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        # Cancelling the future doesn't stop the thread; this does, within a chunk.
+        stop.set()
+
+
+async def read_gateway(customer_id: str) -> V1Deployment | None:
+    """The customer's gateway Deployment, from the informer cache once it has synced."""
+    from kubernetes.client.exceptions import ApiException
+
+    from .informers import GATEWAY, deployments, gateway_deployment
+
+    if deployments.synced:
+        return gateway_deployment(customer_id)
+    try:
+        return await k8s_call(
+            apps_v1().read_namespaced_deployment, name=GATEWAY, namespace=namespace_name(customer_id),
+        )
+    except ApiException as e:
+        if e.status != 404:
+            raise
+        return None
+
+
+def rollout_done(dep: V1Deployment, generation: int | None = None) -> bool:
+    """Whether ``dep`` has finished rolling out ``generation`` (default: its own)."""
+    return (dep.metadata.generation or 0) >= (generation or 0) and _rollout_complete(dep)
+
+
+async def wait_for_pod_ready(customer_id: str, timeout: int = 60) -> bool:
+    """Wait until the deployment's pod is ready or timeout is reached."""
+    ns = namespace_name(customer_id)
+    if await _wait_for_deployment(customer_id, _pod_ready, timeout):
+        logger.info("Pod ready in %s", ns)
+        return True
     logger.error("Pod not ready within %ds in %s", timeout, ns)
     return False
 
 
-def wait_for_rollout(customer_id: str, timeout: int = 60) -> bool:
+async def wait_for_rollout(customer_id: str, timeout: int = 60) -> bool:
     """Wait for a rolling update to complete."""
-    import time
-
     ns = namespace_name(customer_id)
-    deadline = time.monotonic() + timeout
-    while time.monotonic() < deadline:
-        try:
-            dep = apps_v1().read_namespaced_deployment("openclaw-gateway", ns)
-            status = dep.status
-            if (
-                status.updated_replicas == dep.spec.replicas
-                and (status.ready_replicas or 0) >= dep.spec.replicas
-                and (status.unavailable_replicas or 0) == 0
-            ):
-                logger.info("Rollout complete in %s", ns)
-                return True
-        except Exception:
-            pass
-        time.sleep(2)
+    if await _wait_for_deployment(customer_id, _rollout_complete, timeout):
+        logger.info("Rollout complete in %s", ns)
+        return True
     logger.error("Rollout not complete within %ds in %s", timeout, ns)
     return False
@@ -0,0 +1,68 @@
+"""Per-customer job lock on ``operator:lock:{customer_id}``.
+
+The lock is a ``redis.asyncio`` lock taken with a short TTL
+(``job_lock_timeout``) and renewed in the background while held. A job can run
+as long as it needs, and a lock left behind by a crashed operator expires
+within one TTL.
+
+Workers never wait for the lock. A job that finds it taken raises
+``CustomerBusy`` and is parked in the customer's pending list (see
+``JobQueue.park``) until the holder finishes.
+"""
+
+import asyncio
+import logging
+
+import redis.asyncio as aioredis
+from redis.exceptions import LockError
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def lock_key(customer_id: str) -> str:
+    return f"operator:lock:{customer_id}"
+
+
+class CustomerBusy(Exception):
+    """Another job holds the customer's lock."""
+
+    def __init__(self, customer_id: str) -> None:
+        super().__init__(f"customer {customer_id} is busy")
+        self.customer_id = customer_id
+
+
+class CustomerLock:
+    def __init__(self, r: aioredis.Redis, customer_id: str) -> None:
+        self.name = lock_key(customer_id)
+        self._lock = r.lock(self.name, timeout=settings.job_lock_timeout, thread_local=False)
+        self._renewer: asyncio.Task | None = None
+
+    async def acquire(self) -> bool:
+        """Take the lock if it is free. Never waits."""
+        if not await self._lock.acquire(blocking=False):
+            return False
+        self._renewer = asyncio.create_task(self._renew())
+        return True
+
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(settings.job_lock_timeout / 3)
+            try:
+                await self._lock.reacquire()
+            except LockError:
+                logger.error("Lost %s while the job was still running", self.name)
+                return
+            except Exception:
+                # Try again next round; the TTL leaves room for two misses.
+                logger.warning("Could not renew %s", self.name)
+
+    async def release(self) -> None:
+        if self._renewer is not None:
+            self._renewer.cancel()
+            self._renewer = None
+        try:
+            await self._lock.release()
+        except LockError:
+            pass
@@ -1,35 +1,59 @@
 import asyncio
+import functools
 import json
 import logging
 import signal
+import time
 import traceback
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
 import redis
+import redis.asyncio as aioredis
 import uvicorn
-from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from starlette.applications import Starlette
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 from starlette.routing import Route
 
+from .audit import AuditWriter, job_row
 from .config import settings
 from .jobs.destroy import handle_destroy
 from .jobs.provision import handle_provision
 from .jobs.reactivate import handle_reactivate
 from .jobs.resize import handle_resize
+from .jobs.rightsize import handle_rightsize
+from .jobs.rollout import handle_rollout
+from .jobs.sleep import handle_sleep
 from .jobs.suspend import handle_suspend
 from .jobs.update import handle_update
 from .jobs.update_connections import handle_update_connections
-from .k8s import init_k8s
+from .jobs.wake import handle_wake
+from .coalesce import Coalescer, Delivery
+from .fleet import fleet_loop
+from .idle import last_report as sleep_report
+from .idle import sleep_loop, wake_loop
+from .informers import start_informers, stop_informers
+from .jobqueue import JobQueue, sweep_loop
+from .k8s import init_k8s, resolve_namespace
+from .locks import CustomerBusy, CustomerLock
 from .metrics import metrics_loop
+from .pool import pool_loop
+from .pool import stats as pool_stats
+from .reconcile import last_report, reconcile_loop
+from .rightsize import last_report as rightsize_report
+from .rightsize import rightsize_loop
+from .steps import record_steps
+from .telemetry import JOB_DURATION, JOBS_PARKED, LOCK_WAIT, observe_steps, set_queue_depth
+from .telemetry import render as render_metrics
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(name)s: %(message)s",
 )
+# httpx logs every request URL at INFO, and Telegram URLs carry bot tokens.
+logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger("operator")
 
 JOB_HANDLERS = {
@@ -40,19 +64,52 @@ JOB_HANDLERS = {
     "update": handle_update,
     "resize": handle_resize,
     "update_connections": handle_update_connections,
+    "rollout": handle_rollout,
+    "sleep": handle_sleep,
+    "wake": handle_wake,
+    "rightsize": handle_rightsize,
 }
 
+
+def api_cache_key(customer_id: str) -> str:
+    # Must match openclaw_api.cache.cache_key.
+    return f"api:cache:{customer_id}"
+
+
+# Must match openclaw_api.cache.GENERATION_TTL.
+API_CACHE_GENERATION_TTL = 86400
+
+
+def api_cache_generation_key(customer_id: str) -> str:
+    # Must match openclaw_api.cache.generation_key.
+    return f"api:cache:{customer_id}:gen"
+
+
+async def invalidate_api_cache(r: aioredis.Redis, customer_id: str) -> None:
+    """Drop the customer's cached API responses and bump their generation."""
+    pipe = r.pipeline(transaction=True)
+    pipe.incr(api_cache_generation_key(customer_id))
+    pipe.expire(api_cache_generation_key(customer_id), API_CACHE_GENERATION_TTL)
+    pipe.delete(api_cache_key(customer_id))
+    await pipe.execute()
+
+
 # Global state
 _healthy = False
-_redis: redis.Redis | None = None
+_redis: aioredis.Redis | None = None
 _session_factory: async_sessionmaker[AsyncSession] | None = None
 _shutdown_event = asyncio.Event()
+_inflight: set[asyncio.Task] = set()
+_customer_tails: dict[str, asyncio.Task] = {}
+_queue: JobQueue | None = None
+_coalescer: Coalescer | None = None
+_audit: AuditWriter | None = None
 
 
-def get_redis() -> redis.Redis:
+def get_redis() -> aioredis.Redis:
     global _redis
     if _redis is None:
-        _redis = redis.from_url(settings.redis_url, decode_responses=True)
+        _redis = aioredis.from_url(settings.redis_url, decode_responses=True)
     return _redis
 
 
@@ -64,40 +121,30 @@ def get_session_factory() -> async_sessionmaker[AsyncSession]:
     return _session_factory
 
 
-async def log_job(
-    db: AsyncSession,
-    *,
-    customer_id: str,
-    box_id: str | None,
-    job_type: str,
-    status: str,
-    payload: dict,
-    error_log: str | None = None,
-    started_at: datetime,
-) -> None:
-    """Write job result to operator_jobs table for auditing."""
-    now = datetime.now(timezone.utc)
-    await db.execute(
-        text("""
-            INSERT INTO operator_jobs (customer_id, box_id, job_type, status, payload, error_log, started_at, completed_at)
-            VALUES (:customer_id, :box_id, :job_type, :status, :payload, :error_log, :started_at, :completed_at)
-        """),
-        {
-            "customer_id": customer_id,
-            "box_id": box_id,
-            "job_type": job_type,
-            "status": status,
-            "payload": json.dumps(payload),
-            "error_log": error_log,
-            "started_at": started_at,
-            "completed_at": now,
-        },
-    )
-    await db.commit()
+def get_audit_writer() -> AuditWriter:
+    global _audit
+    if _audit is None:
+        _audit = AuditWriter(
+            get_session_factory(),
+            batch_size=settings.audit_batch_size,
+            flush_interval=settings.audit_flush_interval,
+        )
+    return _audit
+
+
+def audit_job(job_ids: list[str], **fields) -> None:
+    """Record a status change for ``job_ids`` through the batched audit writer."""
+    writer = get_audit_writer()
+    for job_id in job_ids:
+        writer.record(job_row(job_id=job_id, **fields))
 
 
-async def process_job(raw: str) -> None:
-    """Parse and dispatch a single job from the queue."""
+async def process_job(raw: str) -> bool:
+    """Parse and dispatch a single job from the queue.
+
+    Returns False if the job should be retried. Raises ``CustomerBusy``
+    when another job holds the customer's lock.
+    """
     job = json.loads(raw)
     job_type = job.get("job_type") or job.get("type")
     customer_id = str(job["customer_id"])
@@ -112,97 +159,226 @@ async def process_job(raw: str) -> None:
     handler = JOB_HANDLERS.get(job_type)
     if handler is None:
         logger.error("Unknown job type: %s", job_type)
-        return
+        return True
 
-    r = get_redis()
-    lock_key = f"operator:lock:{customer_id}"
-    lock = r.lock(lock_key, timeout=300, blocking_timeout=30)
+    lock = CustomerLock(get_redis(), customer_id)
 
     started_at = datetime.now(timezone.utc)
     session_factory = get_session_factory()
 
-    if not lock.acquire(blocking=True):
-        logger.error("Could not acquire lock for customer %s", customer_id)
-        return
+    # The job's own row plus the rows of any jobs coalesced into it. The queue
+    # gives every message an id on its first delivery, so retries share it.
+    job_ids = [*filter(None, [job.get("job_id"), *job.get("coalesced", [])])]
+
+    lock_start = time.monotonic()
+    acquired = await lock.acquire()
+    LOCK_WAIT.labels("true" if acquired else "false").observe(time.monotonic() - lock_start)
+    if acquired and _queue is not None and not await _queue.may_run(customer_id, job_ids):
+        # Jobs enqueued for this customer earlier must run first.
+        await lock.release()
+        acquired = False
+    if not acquired:
+        logger.info("Customer %s is busy, deferring %s job", customer_id, job_type)
+        raise CustomerBusy(customer_id)
+
+    audit = functools.partial(
+        audit_job, job_ids,
+        customer_id=customer_id, box_id=box_id, job_type=job_type, payload=payload, started_at=started_at,
+    )
 
+    timings: dict[str, float] = {}
+    run_start = time.monotonic()
     try:
+        audit(status="running")
+        # Another replica may have claimed or deleted the customer's namespace.
+        await resolve_namespace(customer_id)
         async with session_factory() as db:
-            # Mark job as running
-            await log_job(
-                db,
-                customer_id=customer_id,
-                box_id=box_id,
-                job_type=job_type,
-                status="running",
-                payload=payload,
-                started_at=started_at,
-            )
-
-            await handler(payload, customer_id, db)
-
-            # Mark job as complete
-            await log_job(
-                db,
-                customer_id=customer_id,
-                box_id=box_id,
-                job_type=job_type,
-                status="complete",
-                payload=payload,
-                started_at=started_at,
-            )
+            with record_steps() as timings:
+                await handler(payload, customer_id, db)
+        audit(status="complete", step_timings=timings)
+        JOB_DURATION.labels(job_type, "complete").observe(time.monotonic() - run_start)
+        observe_steps(job_type, timings)
         logger.info("Job %s completed for customer %s", job_type, customer_id)
+        return True
 
     except Exception as exc:
         error = traceback.format_exc()
         logger.error("Job %s failed for customer %s: %s", job_type, customer_id, exc)
+        JOB_DURATION.labels(job_type, "failed").observe(time.monotonic() - run_start)
+        observe_steps(job_type, timings)
         try:
-            async with session_factory() as db:
-                await log_job(
-                    db,
-                    customer_id=customer_id,
-                    box_id=box_id,
-                    job_type=job_type,
-                    status="failed",
-                    payload=payload,
-                    error_log=error,
-                    started_at=started_at,
-                )
+            audit(status="failed", error_log=error, step_timings=timings)
         except Exception:
             logger.exception("Failed to log job failure")
+        return False
     finally:
         try:
-            lock.release()
-        except redis.exceptions.LockNotOwnedError:
-            pass
+            # The job may have changed what the dashboard shows.
+            await invalidate_api_cache(get_redis(), customer_id)
+        except Exception:
+            logger.warning("Could not invalidate API response cache for customer %s", customer_id)
+        await lock.release()
+        if _queue is not None:
+            try:
+                await _queue.release_pending(customer_id)
+            except Exception:
+                # The sweep picks them up.
+                logger.exception("Could not requeue jobs parked for customer %s", customer_id)
 
 
-async def job_loop() -> None:
-    """Main loop: BLPOP jobs from Redis and process them."""
-    global _healthy
+def _job_customer(raw: str) -> str:
+    try:
+        return str(json.loads(raw)["customer_id"])
+    except Exception:
+        return ""
+
+
+async def _heartbeat(queue: JobQueue, raws: list[str]) -> None:
+    while True:
+        await asyncio.sleep(settings.job_visibility_timeout / 3)
+        for raw in raws:
+            try:
+                await queue.extend(raw)
+            except Exception:
+                logger.warning("Could not extend visibility of in-flight job")
+
+
+async def _run_job(
+    raw: str,
+    previous: asyncio.Task | None,
+    slots: asyncio.Semaphore,
+    queue: JobQueue | None,
+    deliveries: list[Delivery],
+    acquired: bool,
+) -> None:
+    holding = acquired
+    if holding and previous is not None:
+        # Don't sit on a worker slot while the customer's earlier job runs,
+        # or one busy customer's backlog can take every slot.
+        slots.release()
+        holding = False
+    heartbeat = (
+        asyncio.create_task(_heartbeat(queue, [r for r, _ in deliveries])) if queue is not None else None
+    )
+    error = ""
+    ok = False
+    busy = False
+    try:
+        # Jobs for the same customer run in the order they were popped.
+        if previous is not None:
+            await asyncio.wait([previous])
+        if not holding:
+            await slots.acquire()
+            holding = True
+        ok = await process_job(raw) is not False
+    except CustomerBusy:
+        busy = True
+    except Exception as exc:
+        error = repr(exc)
+        logger.exception("Unexpected error processing job")
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+        try:
+            if queue is not None:
+                for delivered, attempt in deliveries:
+                    if ok:
+                        await queue.ack(delivered)
+                    elif busy:
+                        await queue.park(delivered, _job_customer(delivered))
+                        JOBS_PARKED.inc()
+                    else:
+                        await queue.fail(delivered, attempt, error or "job failed")
+        except Exception:
+            # The sweep redelivers the job once its visibility deadline passes.
+            logger.exception("Could not settle job in queue")
+        if holding:
+            slots.release()
+
 
-    r = get_redis()
+def dispatch_job(
+    raw: str,
+    slots: asyncio.Semaphore,
+    queue: JobQueue | None = None,
+    attempt: int = 1,
+    *,
+    deliveries: list[Delivery] | None = None,
+    acquired: bool = True,
+) -> asyncio.Task:
+    """Schedule a job, chained behind any in-flight job for the same customer.
+
+    Unless ``acquired`` is False, the caller must have acquired one of
+    ``slots``; it is released when the job finishes. A job chained behind
+    another gives its slot back while it waits and takes one again to run. With a ``queue`` the
+    job's ``deliveries`` (by default just ``raw`` itself) are acked on success,
+    parked while another job holds the customer lock, and retried or
+    dead-lettered on failure.
+    """
+    customer_id = _job_customer(raw)
+    task = asyncio.create_task(_run_job(
+        raw, _customer_tails.get(customer_id), slots, queue, deliveries or [(raw, attempt)], acquired,
+    ))
+    _customer_tails[customer_id] = task
+    _inflight.add(task)
+
+    def _done(t: asyncio.Task) -> None:
+        _inflight.discard(t)
+        if _customer_tails.get(customer_id) is t:
+            del _customer_tails[customer_id]
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def job_loop() -> None:
+    """Main loop: take jobs from Redis and run up to ``job_concurrency`` at once."""
+    global _healthy, _queue, _coalescer
+
+    queue = _queue = JobQueue(get_redis(), settings.job_queue)
+    slots = asyncio.Semaphore(max(1, settings.job_concurrency))
+    # A coalesced job gave its slot back while held and takes a new one to run.
+    coalescer = _coalescer = Coalescer(
+        settings.job_coalesce_window,
+        lambda raw, deliveries: dispatch_job(raw, slots, queue, deliveries=deliveries, acquired=False),
+    )
     _healthy = True
-    logger.info("Operator started, listening on queue: %s", settings.job_queue)
+    logger.info(
+        "Operator started, listening on queue: %s (lanes %s, concurrency %d)",
+        settings.job_queue, ", ".join(queue.lanes.values()), settings.job_concurrency,
+    )
 
-    loop = asyncio.get_running_loop()
-    while not _shutdown_event.is_set():
-        try:
-            # BLPOP with 1s timeout so we can check for shutdown.
-            # Run in executor to avoid blocking the event loop (other async
-            # tasks like metrics_loop need to run concurrently).
-            result = await loop.run_in_executor(
-                None, lambda: r.blpop(settings.job_queue, timeout=1)
-            )
-            if result is None:
-                continue
-            _, raw = result
-            await process_job(raw)
-        except redis.exceptions.ConnectionError:
-            logger.error("Redis connection lost, retrying in 5s...")
-            await asyncio.sleep(5)
-        except Exception:
-            logger.exception("Unexpected error in job loop")
-            await asyncio.sleep(1)
+    sweeper = asyncio.create_task(sweep_loop(queue))
+    try:
+        while not _shutdown_event.is_set():
+            # Only pop when a worker slot is free so unprocessed jobs stay in Redis.
+            await slots.acquire()
+            popped = None
+            try:
+                # Give up after 1s so we can check for shutdown. The job stays
+                # in the processing list until it is acked.
+                popped = await queue.pop(timeout=1)
+            except redis.exceptions.ConnectionError:
+                logger.error("Redis connection lost, retrying in 5s...")
+                await asyncio.sleep(5)
+            except Exception:
+                logger.exception("Unexpected error in job loop")
+                await asyncio.sleep(1)
+            finally:
+                if popped is None:
+                    slots.release()
+            if popped is not None:
+                raw, attempt = popped
+                if coalescer.hold(raw, attempt):
+                    slots.release()
+                else:
+                    dispatch_job(raw, slots, queue, attempt)
+    finally:
+        sweeper.cancel()
+        coalescer.flush_all()
+        if _inflight:
+            logger.info("Waiting for %d in-flight jobs to finish", len(_inflight))
+            await asyncio.gather(*_inflight, return_exceptions=True)
+        _queue = None
 
 
 # ---------------------------------------------------------------------------
@@ -215,25 +391,97 @@ async def health(request: Request) -> JSONResponse:
     return JSONResponse({"status": "not ready"}, status_code=503)
 
 
+async def pool(request: Request) -> JSONResponse:
+    return JSONResponse(pool_stats())
+
+
+async def reconcile(request: Request) -> JSONResponse:
+    return JSONResponse(last_report())
+
+
+async def sleep(request: Request) -> JSONResponse:
+    return JSONResponse(sleep_report())
+
+
+async def rightsize(request: Request) -> JSONResponse:
+    return JSONResponse(rightsize_report())
+
+
+async def queue_stats(request: Request) -> JSONResponse:
+    if _queue is None:
+        return JSONResponse({"status": "not ready"}, status_code=503)
+    stats = await _queue.stats()
+    if _coalescer is not None:
+        stats["coalesced"] = _coalescer.stats()
+    return JSONResponse(stats)
+
+
+async def prometheus(request: Request) -> Response:
+    if _queue is not None:
+        try:
+            set_queue_depth(await _queue.stats())
+        except Exception:
+            logger.warning("Could not read queue depth for /metrics")
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+
 @asynccontextmanager
 async def lifespan(app: Starlette):
     # Start the job loop and metrics collector as background tasks
-    init_k8s()
+    if init_k8s():
+        start_informers()
+    audit_task = asyncio.create_task(get_audit_writer().run())
     job_task = asyncio.create_task(job_loop())
     metrics_task = asyncio.create_task(metrics_loop(get_session_factory()))
+    pool_task = asyncio.create_task(pool_loop())
+    reconcile_task = asyncio.create_task(
+        reconcile_loop(get_session_factory(), get_redis(), busy=_customer_tails),
+    )
+    fleet_task = asyncio.create_task(fleet_loop(get_session_factory(), get_redis()))
+    sleep_task = asyncio.create_task(
+        sleep_loop(get_session_factory(), get_redis(), busy=_customer_tails),
+    )
+    wake_task = asyncio.create_task(wake_loop(get_session_factory(), get_redis()))
+    rightsize_task = asyncio.create_task(
+        rightsize_loop(get_session_factory(), get_redis(), busy=_customer_tails),
+    )
     yield
     _shutdown_event.set()
+    stop_informers()
     job_task.cancel()
     metrics_task.cancel()
-    for t in (job_task, metrics_task):
+    pool_task.cancel()
+    reconcile_task.cancel()
+    fleet_task.cancel()
+    sleep_task.cancel()
+    wake_task.cancel()
+    rightsize_task.cancel()
+    for t in (
+        job_task, metrics_task, pool_task, reconcile_task, fleet_task, sleep_task, wake_task, rightsize_task,
+    ):
         try:
             await t
         except asyncio.CancelledError:
             pass
+    # Stopped last so its final flush sees every job's last status.
+    audit_task.cancel()
+    try:
+        await audit_task
+    except asyncio.CancelledError:
+        pass
 
 
 app = Starlette(
-    routes=[Route("/healthz", health)],
+    routes=[
+        Route("/healthz", health),
+        Route("/pool", pool),
+        Route("/reconcile", reconcile),
+        Route("/sleep", sleep),
+        Route("/rightsize", rightsize),
+        Route("/queue", queue_stats),
+        Route("/metrics", prometheus),
+    ],
     lifespan=lifespan,
 )
 
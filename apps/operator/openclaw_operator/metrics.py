@@ -8,6 +8,10 @@ from kubernetes import client
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from .config import settings
+from .informers import GATEWAY_SELECTOR, pods
+from .k8s import customer_for_namespace, k8s_call
+
 logger = logging.getLogger(__name__)
 
 # Regex to extract customer_id from namespace like "customer-<uuid>"
@@ -40,22 +44,26 @@ def parse_memory(val: str) -> int:
     return int(val)
 
 
-async def collect_pod_metrics(session_factory: async_sessionmaker[AsyncSession]) -> int:
-    """Fetch pod metrics from K8s metrics API, insert snapshots. Returns count."""
-    api = client.CustomObjectsApi()
-    try:
-        result = api.list_cluster_custom_object("metrics.k8s.io", "v1beta1", "pods")
-    except Exception as exc:
-        logger.debug("metrics-server not available: %s", exc)
-        return 0
+_INSERT_SNAPSHOTS = text("""
+    INSERT INTO pod_metrics_snapshots (customer_id, box_id, namespace, cpu_millicores, memory_bytes)
+    VALUES (:customer_id, :box_id, :namespace, :cpu_millicores, :memory_bytes)
+""")
 
+
+def _snapshot_rows(items: list[dict]) -> list[dict]:
     rows = []
-    for item in result.get("items", []):
+    for item in items:
         ns = item["metadata"]["namespace"]
-        m = NS_RE.match(ns)
-        if not m:
-            continue
-        customer_id = m.group(1)
+        pod = pods.get(ns, item["metadata"]["name"])
+        if pods.synced and pod is None:
+            continue  # not a gateway pod
+        customer_id = (pod.metadata.labels or {}).get("openclaw/customer") if pod else None
+        customer_id = customer_id or customer_for_namespace(ns)
+        if customer_id is None:
+            m = NS_RE.match(ns)
+            if not m:
+                continue
+            customer_id = m.group(1)
 
         for container in item.get("containers", []):
             usage = container.get("usage", {})
@@ -68,20 +76,31 @@ async def collect_pod_metrics(session_factory: async_sessionmaker[AsyncSession])
                 "cpu_millicores": parse_cpu(cpu_str),
                 "memory_bytes": parse_memory(mem_str),
             })
+    return rows
 
-    if not rows:
-        return 0
 
-    async with session_factory() as db:
-        await db.execute(
-            text("""
-                INSERT INTO pod_metrics_snapshots (customer_id, box_id, namespace, cpu_millicores, memory_bytes)
-                VALUES (:customer_id, :box_id, :namespace, :cpu_millicores, :memory_bytes)
-            """),
-            rows,
+async def collect_pod_metrics(session_factory: async_sessionmaker[AsyncSession]) -> int:
+    """Fetch gateway pod metrics from the K8s metrics API, insert snapshots. Returns count.
+
+    Only pods labelled ``app=openclaw-gateway`` are listed. metrics-server
+    ignores ``limit`` and ``continue`` and always returns the whole list, so
+    the listing is not paginated.
+    """
+    api = client.CustomObjectsApi()
+    try:
+        listing = await k8s_call(
+            api.list_cluster_custom_object, "metrics.k8s.io", "v1beta1", "pods",
+            label_selector=GATEWAY_SELECTOR,
         )
-        await db.commit()
+    except Exception as exc:
+        logger.debug("metrics-server not available: %s", exc)
+        return 0
 
+    rows = _snapshot_rows(listing.get("items", []))
+    if rows:
+        async with session_factory() as db:
+            await db.execute(_INSERT_SNAPSHOTS, rows)
+            await db.commit()
     return len(rows)
 
 
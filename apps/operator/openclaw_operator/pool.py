@@ -0,0 +1,167 @@
+"""Warm pool: pre-created, scaled-to-zero gateway namespaces per tier.
+
+A provision job claims an idle namespace of its tier instead of creating one.
+Applying the customer's objects over it relabels the namespace, writes the
+secret and scales the gateway up, so only those diffs remain on the critical
+path.
+"""
+
+import asyncio
+import logging
+import secrets
+from dataclasses import dataclass
+
+from kubernetes.client.exceptions import ApiException
+
+from .config import settings
+from .k8s import CUSTOMER_LABEL, apply_manifest, bind_namespace, core_v1, k8s_call, render_pool_objects
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = "openclaw/pool"
+
+
+@dataclass
+class PoolStats:
+    hits: int = 0
+    misses: int = 0
+    created: int = 0
+    refill_failures: int = 0
+
+
+_idle: dict[str, list[str]] = {}
+_stats = PoolStats()
+_synced = False
+
+
+def pool_namespace_name() -> str:
+    return f"openclaw-pool-{secrets.token_hex(4)}"
+
+
+async def claim(customer_id: str, tier: str) -> str | None:
+    """Hand an idle namespace of ``tier`` to ``customer_id``, if there is one.
+
+    Every replica holds the same idle lists, so the namespace is taken by a
+    label patch guarded by its resourceVersion. Of two replicas claiming it,
+    one gets a 409 and moves on to the next. The customer label it sets is
+    how every replica finds the namespace afterwards (``resolve_namespace``).
+    """
+    idle = _idle.get(tier, [])
+    while idle:
+        ns = idle.pop()
+        api = core_v1()
+        try:
+            current = await k8s_call(api.read_namespace, ns)
+            labels = current.metadata.labels or {}
+            if labels.get(POOL_LABEL) != tier or CUSTOMER_LABEL in labels:
+                # Claimed by another replica since we last synced.
+                continue
+            await k8s_call(api.patch_namespace, ns, {"metadata": {
+                "resourceVersion": current.metadata.resource_version,
+                "labels": {POOL_LABEL: None, CUSTOMER_LABEL: customer_id},
+            }})
+        except ApiException as e:
+            if e.status in (404, 409):
+                continue
+            raise
+        bind_namespace(customer_id, ns)
+        _stats.hits += 1
+        logger.info("Claimed warm namespace %s (%s) for customer %s", ns, tier, customer_id)
+        return ns
+    _stats.misses += 1
+    return None
+
+
+async def sync() -> None:
+    """Rebuild the idle lists and the customer namespace map from labels."""
+    global _synced
+    api = core_v1()
+    idle = await k8s_call(api.list_namespace, label_selector=POOL_LABEL)
+    bound = await k8s_call(api.list_namespace, label_selector=CUSTOMER_LABEL)
+
+    _idle.clear()
+    for ns in idle.items:
+        if ns.status is not None and ns.status.phase == "Terminating":
+            continue
+        _idle.setdefault(ns.metadata.labels[POOL_LABEL], []).append(ns.metadata.name)
+    for ns in bound.items:
+        bind_namespace(ns.metadata.labels[CUSTOMER_LABEL], ns.metadata.name)
+    _synced = True
+    logger.info(
+        "Warm pool synced: %s idle, %d customer namespaces",
+        {tier: len(names) for tier, names in _idle.items()}, len(bound.items),
+    )
+
+
+async def _create(tier: str) -> None:
+    ns = pool_namespace_name()
+    objects = render_pool_objects(ns, tier=tier, image=settings.openclaw_image)
+    await apply_manifest(objects["namespace"])
+    await asyncio.gather(*(apply_manifest(objects[k]) for k in ("quota", "netpol", "deployment")))
+    _idle.setdefault(tier, []).append(ns)
+    _stats.created += 1
+
+
+async def refill() -> int:
+    """Create up to ``warm_pool_refill`` namespaces per tier below target.
+
+    Returns the number created.
+    """
+    pending = []
+    for tier, target in settings.warm_pool.items():
+        missing = target - len(_idle.get(tier, []))
+        pending += [tier] * max(0, min(missing, settings.warm_pool_refill))
+    if not pending:
+        return 0
+
+    results = await asyncio.gather(*(_create(tier) for tier in pending), return_exceptions=True)
+    created = 0
+    for tier, result in zip(pending, results):
+        if isinstance(result, BaseException):
+            _stats.refill_failures += 1
+            logger.warning("Failed to create warm namespace for tier %s: %s", tier, result)
+        else:
+            created += 1
+    return created
+
+
+def stats() -> dict:
+    return {
+        "synced": _synced,
+        "tiers": {
+            tier: {"target": settings.warm_pool.get(tier, 0), "idle": len(_idle.get(tier, []))}
+            for tier in sorted(settings.warm_pool.keys() | _idle.keys())
+        },
+        "hits": _stats.hits,
+        "misses": _stats.misses,
+        "created": _stats.created,
+        "refill_failures": _stats.refill_failures,
+    }
+
+
+async def pool_loop() -> None:
+    """Load existing namespaces, then keep the pool topped up."""
+    while not _synced:
+        try:
+            await sync()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to sync warm pool, retrying")
+            await asyncio.sleep(settings.warm_pool_interval)
+
+    if not settings.warm_pool:
+        return
+    logger.info("Warm pool started: %s", settings.warm_pool)
+    while True:
+        try:
+            # Other replicas claim and create pool namespaces too.
+            await sync()
+            created = await refill()
+            if created:
+                logger.info("Warm pool refilled %d namespaces: %s", created, stats()["tiers"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error refilling warm pool")
+        await asyncio.sleep(settings.warm_pool_interval)
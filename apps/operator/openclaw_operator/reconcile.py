@@ -0,0 +1,215 @@
+"""Periodic reconciliation of ``boxes`` rows against cluster state.
+
+One pass reads every active/suspended box in a single query, every customer
+namespace in a single list call and every gateway Deployment from the
+informer cache (or a single list call before it has synced). Boxes whose
+cluster state disagrees with their status get a corrective job, at most
+``reconcile_max_jobs`` per pass and once per ``reconcile_cooldown`` per box.
+The cooldown is a Redis key, so it holds across passes on every replica.
+Corrective jobs go on the low-priority lane so they never hold up jobs users
+are waiting for.
+
+A box missing from the cluster gets a provision job built from its current
+row (tier, model, allowed users, bundle), not a replay of the job that first
+created it. The job carries no bot token; the provision handler looks it up
+when it runs.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Collection
+from dataclasses import asdict, dataclass, field
+
+import redis.asyncio as aioredis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from . import informers
+from .config import settings
+from .jobqueue import enqueue
+from .k8s import apps_v1, bind_namespace, core_v1, k8s_call
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReconcileReport:
+    checked: int = 0
+    missing: int = 0
+    scaled_down: int = 0
+    running_while_suspended: int = 0
+    orphaned: int = 0
+    enqueued: int = 0
+    deferred: int = 0
+    duration_seconds: float = 0.0
+    finished_at: float = 0.0
+    jobs: list[dict] = field(default_factory=list)
+
+
+_last_report: ReconcileReport | None = None
+
+COOLDOWN_PREFIX = "operator:reconcile:cooldown:"
+
+
+async def _cluster_state() -> tuple[dict[str, str], dict[str, int]]:
+    """Return ``customer_id -> namespace`` and ``namespace -> gateway replicas``."""
+    namespaces = await k8s_call(core_v1().list_namespace, label_selector="openclaw/customer")
+    by_customer = {ns.metadata.labels["openclaw/customer"]: ns.metadata.name for ns in namespaces.items}
+
+    if informers.deployments.synced:
+        deployments = informers.deployments.values()
+    else:
+        deployments = (await k8s_call(
+            apps_v1().list_deployment_for_all_namespaces, label_selector=informers.GATEWAY_SELECTOR,
+        )).items
+    replicas = {
+        dep.metadata.namespace: dep.spec.replicas or 0
+        for dep in deployments
+        if dep.metadata.name == informers.GATEWAY
+    }
+    return by_customer, replicas
+
+
+async def _take_cooldown(r: aioredis.Redis, box_id: str) -> bool:
+    """Start the box's cooldown. False if it is already cooling down."""
+    ttl = max(1, int(settings.reconcile_cooldown))
+    return bool(await r.set(f"{COOLDOWN_PREFIX}{box_id}", "1", nx=True, ex=ttl))
+
+
+async def _repair_payloads(db: AsyncSession, box_ids: list[str]) -> dict[str, dict]:
+    """Provision payloads for ``box_ids`` built from their current rows."""
+    if not box_ids:
+        return {}
+    result = await db.execute(
+        text("""
+            SELECT b.id, s.tier, b.telegram_user_ids, b.model, b.thinking_level, b.language,
+                   b.bundle_id, bu.version
+            FROM boxes b
+            JOIN subscriptions s ON s.id = b.subscription_id
+            LEFT JOIN bundles bu ON bu.id = b.bundle_id
+            WHERE b.id = ANY(:box_ids)
+        """),
+        {"box_ids": box_ids},
+    )
+    payloads = {}
+    for box_id, tier, user_ids, model, thinking, language, bundle_id, bundle_version in result.fetchall():
+        payload = {
+            "tier": tier,
+            "telegram_allow_from": ",".join(str(uid) for uid in user_ids or ()),
+            "model": model,
+            "thinking": thinking,
+            "language": language,
+        }
+        if bundle_id is not None:
+            payload["bundle_id"] = str(bundle_id)
+            payload["bundle_version"] = bundle_version or 0
+        payloads[str(box_id)] = payload
+    return payloads
+
+
+async def reconcile_once(
+    session_factory: async_sessionmaker[AsyncSession],
+    r: aioredis.Redis,
+    *,
+    busy: Collection[str] = (),
+) -> ReconcileReport:
+    """Diff boxes against the cluster and enqueue corrective jobs.
+
+    Customers in ``busy`` have a job in flight and are left alone this pass.
+    """
+    global _last_report
+    start = time.monotonic()
+    report = ReconcileReport()
+
+    async with session_factory() as db:
+        result = await db.execute(text("""
+            SELECT id, customer_id, status FROM boxes
+            WHERE status IN ('active', 'suspended')
+        """))
+        boxes = [(str(box_id), str(customer_id), status) for box_id, customer_id, status in result.fetchall()]
+        by_customer, replicas = await _cluster_state()
+        for customer_id, ns in by_customer.items():
+            bind_namespace(customer_id, ns)
+
+        fixes: list[tuple[str, str, str]] = []  # (job_type, customer_id, box_id)
+        for box_id, customer_id, status in boxes:
+            report.checked += 1
+            ns = by_customer.get(customer_id)
+            running = replicas.get(ns) if ns else None
+            if running is None:
+                report.missing += 1
+                if status == "active":
+                    fixes.append(("provision", customer_id, box_id))
+            elif status == "active" and running == 0:
+                report.scaled_down += 1
+                fixes.append(("reactivate", customer_id, box_id))
+            elif status == "suspended" and running > 0:
+                report.running_while_suspended += 1
+                fixes.append(("suspend", customer_id, box_id))
+        known = {customer_id for _, customer_id, _ in boxes}
+        report.orphaned = sum(1 for customer_id in by_customer if customer_id not in known)
+
+        due: list[tuple[str, str, str]] = []
+        for job_type, customer_id, box_id in fixes:
+            if len(due) >= settings.reconcile_max_jobs:
+                break
+            if customer_id not in busy and await _take_cooldown(r, box_id):
+                due.append((job_type, customer_id, box_id))
+        payloads = await _repair_payloads(db, [box_id for job_type, _, box_id in due if job_type == "provision"])
+
+    messages = []
+    for job_type, customer_id, box_id in due:
+        payload = {"box_id": box_id}
+        if job_type == "provision":
+            if box_id not in payloads:
+                logger.error("Box %s is missing from the cluster and its row could not be read", box_id)
+                continue
+            payload = {**payloads[box_id], "box_id": box_id}
+        messages.append({
+            "job_id": str(uuid.uuid4()),
+            "type": job_type,
+            "customer_id": customer_id,
+            "box_id": box_id,
+            "payload": payload,
+            "lane": "low",
+            "enqueued_at": time.time(),
+        })
+        report.jobs.append({"type": job_type, "customer_id": customer_id, "box_id": box_id})
+    if messages:
+        await enqueue(r, settings.job_queue, messages)
+    report.enqueued = len(messages)
+    report.deferred = len(fixes) - report.enqueued
+
+    report.duration_seconds = round(time.monotonic() - start, 3)
+    report.finished_at = time.time()
+    _last_report = report
+    logger.info(
+        "Reconciled %d boxes in %.3fs: %d missing, %d scaled down, %d running while suspended, "
+        "%d orphaned namespaces; enqueued %d, deferred %d",
+        report.checked, report.duration_seconds, report.missing, report.scaled_down,
+        report.running_while_suspended, report.orphaned, report.enqueued, report.deferred,
+    )
+    return report
+
+
+def last_report() -> dict | None:
+    return asdict(_last_report) if _last_report else None
+
+
+async def reconcile_loop(
+    session_factory: async_sessionmaker[AsyncSession],
+    r: aioredis.Redis,
+    busy: Collection[str] = (),
+) -> None:
+    """Run a reconciliation pass every ``reconcile_interval`` seconds."""
+    logger.info("Reconciler started (every %ss)", settings.reconcile_interval)
+    while True:
+        await asyncio.sleep(settings.reconcile_interval)
+        try:
+            await reconcile_once(session_factory, r, busy=busy)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error in reconciliation pass")
@@ -0,0 +1,216 @@
+"""Right-size gateway requests from observed usage.
+
+``TIER_RESOURCES`` requests are sized for a busy box, and the namespace quota
+matches them. Most gateways use a fraction of that, so nodes fill up on
+requests while their CPU sits idle. Every ``rightsize_interval`` seconds the
+operator takes, per active box, the ``rightsize_percentile`` of its hourly
+peak CPU and memory over the last ``rightsize_window_days`` days
+(``pod_metrics_hourly``). It adds ``rightsize_headroom`` on top and rounds up.
+The result is clamped between the ``rightsize_min_*`` floors and the tier's
+own requests. Limits are never touched, so a box can still burst to its tier
+limit.
+
+Boxes whose recommendation differs from their current requests by more than
+``rightsize_tolerance`` are reported at ``/rightsize``. With
+``rightsize_apply`` set, up to ``rightsize_max_jobs`` of them (largest CPU
+savings first) get a ``rightsize`` job on the low lane. The job patches the
+Deployment and stores the requests on the box, and fleet rollouts keep them.
+Resizing the box to another tier clears them.
+"""
+
+import asyncio
+import logging
+import math
+import time
+import uuid
+from collections.abc import Collection
+from dataclasses import asdict, dataclass, field
+
+import redis.asyncio as aioredis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .config import settings
+from .jobqueue import enqueue
+from .metrics import parse_cpu, parse_memory
+from .tiers import TIER_RESOURCES
+
+logger = logging.getLogger(__name__)
+
+# Recommendations are rounded up to these steps so small swings in usage
+# don't produce a new value every pass.
+CPU_STEP = 10  # millicores
+MEMORY_STEP = 16 * 1024**2  # bytes
+
+USAGE_PERCENTILES = text("""
+    SELECT b.id, b.customer_id, s.tier, b.cpu_request, b.memory_request,
+           percentile_cont(:pct) WITHIN GROUP (ORDER BY h.max_cpu),
+           percentile_cont(:pct) WITHIN GROUP (ORDER BY h.max_memory)
+    FROM boxes b
+    JOIN subscriptions s ON s.id = b.subscription_id
+    JOIN pod_metrics_hourly h ON h.customer_id = b.customer_id
+        AND h.hour > now() - make_interval(days => :days)
+    WHERE b.status = 'active'
+    GROUP BY b.id, b.customer_id, s.tier, b.cpu_request, b.memory_request
+    HAVING count(*) >= :min_samples
+""")
+
+
+def format_cpu(millicores: int) -> str:
+    return f"{millicores}m"
+
+
+def format_memory(n: int) -> str:
+    return f"{n // 1024**2}Mi"
+
+
+def _round_up(value: float, step: int) -> int:
+    return math.ceil(value / step) * step
+
+
+def recommend(tier: str, cpu_pct: float, memory_pct: float) -> tuple[int, int]:
+    """Recommended CPU millicores and memory bytes for a box of ``tier``."""
+    res = TIER_RESOURCES[tier]
+    headroom = 1 + settings.rightsize_headroom
+    cpu = _round_up(cpu_pct * headroom, CPU_STEP)
+    memory = _round_up(memory_pct * headroom, MEMORY_STEP)
+    cpu = min(max(cpu, settings.rightsize_min_cpu), parse_cpu(res.cpu_request))
+    memory = min(max(memory, settings.rightsize_min_memory), parse_memory(res.memory_request))
+    return cpu, memory
+
+
+def _drifted(current: int, recommended: int) -> bool:
+    return abs(recommended - current) > current * settings.rightsize_tolerance
+
+
+@dataclass
+class Recommendation:
+    box_id: str
+    customer_id: str
+    tier: str
+    cpu_request: str
+    memory_request: str
+    recommended_cpu_request: str
+    recommended_memory_request: str
+    cpu_savings: int = 0
+
+
+@dataclass
+class RightsizeReport:
+    boxes: int = 0
+    requested_cpu_millicores: int = 0
+    requested_memory_bytes: int = 0
+    recommended_cpu_millicores: int = 0
+    recommended_memory_bytes: int = 0
+    enqueued: int = 0
+    recommendations: list[Recommendation] = field(default_factory=list)
+    finished_at: float = 0.0
+
+
+_report = RightsizeReport()
+
+
+def last_report() -> dict:
+    return asdict(_report)
+
+
+def _message(rec: Recommendation) -> dict:
+    return {
+        "job_id": str(uuid.uuid4()),
+        "type": "rightsize",
+        "customer_id": rec.customer_id,
+        "box_id": rec.box_id,
+        "payload": {
+            "box_id": rec.box_id,
+            "tier": rec.tier,
+            "cpu_request": rec.recommended_cpu_request,
+            "memory_request": rec.recommended_memory_request,
+        },
+        "lane": "low",
+        "enqueued_at": time.time(),
+    }
+
+
+async def rightsize_once(
+    session_factory: async_sessionmaker[AsyncSession],
+    r: aioredis.Redis,
+    *,
+    busy: Collection[str] = (),
+) -> RightsizeReport:
+    """Recommend requests for every active box with enough history, and
+    enqueue ``rightsize`` jobs if ``rightsize_apply`` is set.
+
+    Customers in ``busy`` have a job in flight and are left alone this pass.
+    """
+    async with session_factory() as db:
+        result = await db.execute(USAGE_PERCENTILES, {
+            "pct": settings.rightsize_percentile,
+            "days": settings.rightsize_window_days,
+            "min_samples": settings.rightsize_min_samples,
+        })
+        rows = result.fetchall()
+
+    report = RightsizeReport()
+    for box_id, customer_id, tier, cpu_request, memory_request, cpu_pct, memory_pct in rows:
+        tier = str(tier)
+        res = TIER_RESOURCES.get(tier)
+        if res is None:
+            continue
+        cpu_request = cpu_request or res.cpu_request
+        memory_request = memory_request or res.memory_request
+        current_cpu, current_memory = parse_cpu(cpu_request), parse_memory(memory_request)
+        cpu, memory = recommend(tier, float(cpu_pct), float(memory_pct))
+
+        report.boxes += 1
+        report.requested_cpu_millicores += current_cpu
+        report.requested_memory_bytes += current_memory
+        if not (_drifted(current_cpu, cpu) or _drifted(current_memory, memory)):
+            report.recommended_cpu_millicores += current_cpu
+            report.recommended_memory_bytes += current_memory
+            continue
+        report.recommended_cpu_millicores += cpu
+        report.recommended_memory_bytes += memory
+        report.recommendations.append(Recommendation(
+            box_id=str(box_id),
+            customer_id=str(customer_id),
+            tier=tier,
+            cpu_request=cpu_request,
+            memory_request=memory_request,
+            recommended_cpu_request=format_cpu(cpu),
+            recommended_memory_request=format_memory(memory),
+            cpu_savings=current_cpu - cpu,
+        ))
+    report.recommendations.sort(key=lambda rec: rec.cpu_savings, reverse=True)
+
+    if settings.rightsize_apply:
+        due = [rec for rec in report.recommendations if rec.customer_id not in busy]
+        messages = [_message(rec) for rec in due[:settings.rightsize_max_jobs]]
+        if messages:
+            await enqueue(r, settings.job_queue, messages)
+        report.enqueued = len(messages)
+
+    report.finished_at = time.time()
+    global _report
+    _report = report
+    logger.info(
+        "Right-sizing: %d boxes, %d to change, CPU requests %dm -> %dm, %d jobs enqueued",
+        report.boxes, len(report.recommendations),
+        report.requested_cpu_millicores, report.recommended_cpu_millicores, report.enqueued,
+    )
+    return report
+
+
+async def rightsize_loop(
+    session_factory: async_sessionmaker[AsyncSession],
+    r: aioredis.Redis,
+    busy: Collection[str] = (),
+) -> None:
+    """Recompute recommendations every ``rightsize_interval`` seconds."""
+    while True:
+        await asyncio.sleep(settings.rightsize_interval)
+        try:
+            await rightsize_once(session_factory, r, busy=busy)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error right-sizing boxes")
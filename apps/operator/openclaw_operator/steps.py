@@ -0,0 +1,83 @@
+"""Job steps: per-step timing capture and dependency-ordered execution."""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+_timings: ContextVar[dict[str, float] | None] = ContextVar("step_timings", default=None)
+
+
+@dataclass(frozen=True)
+class Step:
+    run: Callable[[], Awaitable[Any]]
+    after: tuple[str, ...] = ()
+
+
+@contextmanager
+def record_steps() -> Iterator[dict[str, float]]:
+    """Collect the duration (seconds) of every step run inside the block."""
+    timings: dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def step(name: str) -> Iterator[None]:
+    """Time the enclosed block as step ``name`` of the current job."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = round(time.monotonic() - start, 3)
+
+
+def _check_graph(graph: dict[str, Step]) -> None:
+    remaining = {name: set(s.after) for name, s in graph.items()}
+    for name, deps in remaining.items():
+        unknown = deps - graph.keys()
+        if unknown:
+            raise ValueError(f"Step {name!r} depends on unknown steps {sorted(unknown)}")
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Dependency cycle between steps {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+async def run_graph(graph: dict[str, Step]) -> None:
+    """Run each step as soon as all the steps it comes ``after`` have finished.
+
+    Independent steps run concurrently. If any step fails, the steps still
+    running are cancelled and the first error is raised.
+    """
+    _check_graph(graph)
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def _run(name: str) -> None:
+        s = graph[name]
+        if s.after:
+            await asyncio.gather(*(tasks[dep] for dep in s.after))
+        with step(name):
+            await s.run()
+
+    for name in graph:
+        tasks[name] = asyncio.create_task(_run(name))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for t in tasks.values():
+            t.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
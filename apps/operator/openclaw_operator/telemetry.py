@@ -0,0 +1,91 @@
+"""Prometheus metrics for the job pipeline, served at ``/metrics``.
+
+These are the numbers for sizing operator replicas: how long jobs wait in
+each lane, how long they wait for the customer lock, how long each handler
+and each of its steps take, and how long K8s API calls take.
+"""
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+_WAIT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+_K8S_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+QUEUE_WAIT = Histogram(
+    "operator_job_queue_wait_seconds",
+    "Time from enqueue to first pop, per lane.",
+    ["lane"],
+    buckets=_WAIT_BUCKETS,
+)
+LOCK_WAIT = Histogram(
+    "operator_job_lock_wait_seconds",
+    "Time spent acquiring the per-customer job lock.",
+    ["acquired"],
+    buckets=_WAIT_BUCKETS,
+)
+JOB_DURATION = Histogram(
+    "operator_job_duration_seconds",
+    "Handler run time per job type and outcome.",
+    ["job_type", "status"],
+    buckets=_DURATION_BUCKETS,
+)
+STEP_DURATION = Histogram(
+    "operator_job_step_seconds",
+    "Run time of each named step of a handler.",
+    ["job_type", "step"],
+    buckets=_DURATION_BUCKETS,
+)
+JOBS_PARKED = Counter(
+    "operator_jobs_parked",
+    "Jobs parked because another job held the customer lock.",
+)
+K8S_CALL = Histogram(
+    "operator_k8s_call_seconds",
+    "K8s API call latency per verb.",
+    ["verb"],
+    buckets=_K8S_BUCKETS,
+)
+BOX_WAKE = Histogram(
+    "operator_box_wake_seconds",
+    "Time from spotting a Telegram update for a sleeping box to its gateway being ready.",
+    buckets=_WAIT_BUCKETS,
+)
+SLEEPING_BOXES = Gauge(
+    "operator_sleeping_boxes",
+    "Boxes scaled to zero while idle.",
+)
+RECLAIMED_REQUESTS = Gauge(
+    "operator_reclaimed_requests",
+    "Resource requests freed by sleeping boxes (cpu in millicores, memory in bytes).",
+    ["resource"],
+)
+QUEUE_DEPTH = Gauge(
+    "operator_queue_depth",
+    "Jobs waiting in each lane, and in the processing, delayed and dead lists.",
+    ["lane"],
+)
+
+
+def k8s_verb(fn) -> str:
+    """``patch_namespaced_secret`` -> ``patch``; raw ``call_api`` is only used for apply."""
+    name = getattr(fn, "__name__", "")
+    if name == "call_api":
+        return "apply"
+    return name.split("_", 1)[0] or "call"
+
+
+def observe_steps(job_type: str, timings: dict[str, float]) -> None:
+    for name, seconds in timings.items():
+        STEP_DURATION.labels(job_type, name).observe(seconds)
+
+
+def set_queue_depth(stats: dict) -> None:
+    """Update the depth gauges from ``JobQueue.stats()``."""
+    for lane, lane_stats in stats["lanes"].items():
+        QUEUE_DEPTH.labels(lane).set(lane_stats["depth"])
+    for state in ("processing", "delayed", "dead"):
+        QUEUE_DEPTH.labels(state).set(stats[state])
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
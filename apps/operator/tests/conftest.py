@@ -14,6 +14,7 @@ def mock_db():
     # Make fetchall work on execute result
     result = MagicMock()
     result.fetchall.return_value = []
+    result.scalar.return_value = None
     db.execute.return_value = result
     return db
 
@@ -38,16 +39,32 @@ def mock_networking_v1():
 
 @pytest.fixture
 def mock_redis():
-    """Mock Redis client."""
-    r = MagicMock()
-    lock = MagicMock()
+    """Mock redis.asyncio client."""
+    r = AsyncMock()
+    lock = AsyncMock()
     lock.acquire.return_value = True
     lock.release.return_value = None
-    r.lock.return_value = lock
-    r.blpop.return_value = None
+    r.lock = MagicMock(return_value=lock)
+    # pipeline() and register_script() are synchronous; the pipeline buffers
+    # commands until execute().
+    r.pipeline = MagicMock(return_value=MagicMock(execute=AsyncMock()))
+    r.register_script = MagicMock(return_value=AsyncMock())
     return r
 
 
+@pytest.fixture(autouse=True)
+def _reset_namespaces():
+    """Start every test with an empty customer → namespace map and warm pool."""
+    from openclaw_operator import k8s, pool
+
+    with (
+        patch.dict(k8s._namespaces, clear=True),
+        patch.dict(pool._idle, clear=True),
+        patch.object(pool, "_stats", pool.PoolStats()),
+    ):
+        yield
+
+
 @pytest.fixture(autouse=True)
 def _patch_settings():
     """Ensure settings have sensible test defaults."""
@@ -60,6 +77,44 @@ def _patch_settings():
         s.job_queue = "operator:jobs"
         s.health_port = 8081
         s.pod_ready_timeout = 60
+        s.job_concurrency = 8
+        s.job_visibility_timeout = 300
+        s.job_max_attempts = 3
+        s.job_retry_backoff = 10
+        s.job_retry_backoff_max = 300
+        s.job_sweep_interval = 5
+        s.job_poll_interval = 0.2
+        s.job_lock_timeout = 60
+        s.job_coalesce_window = 3
+        s.job_lane_weights = {"high": 6, "normal": 3, "low": 1}
+        s.audit_batch_size = 100
+        s.audit_flush_interval = 0.5
+        s.k8s_threads = 16
+        s.k8s_call_timeout = 30
+        s.warm_pool = {}
+        s.warm_pool_refill = 2
+        s.warm_pool_interval = 30
+        s.reconcile_interval = 300
+        s.reconcile_max_jobs = 20
+        s.reconcile_cooldown = 900
+        s.fleet_interval = 5
+        s.fleet_box_timeout = 600
+        s.sleep_idle_after = 21600
+        s.sleep_cpu_threshold = 25
+        s.sleep_check_interval = 300
+        s.sleep_max_jobs = 50
+        s.wake_poll_interval = 3
+        s.telegram_api_url = "https://api.telegram.org"
+        s.rightsize_interval = 3600
+        s.rightsize_window_days = 7
+        s.rightsize_percentile = 0.95
+        s.rightsize_headroom = 0.3
+        s.rightsize_min_samples = 24
+        s.rightsize_min_cpu = 50
+        s.rightsize_min_memory = 128 * 1024**2
+        s.rightsize_tolerance = 0.15
+        s.rightsize_apply = False
+        s.rightsize_max_jobs = 20
         s.nango_server_url = "http://nango-server:8080"
         s.nango_secret_key = "test-nango-secret"
         s.agent_api_secret = "test-agent-secret"
@@ -0,0 +1,96 @@
+"""Tests for openclaw_operator.audit."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from openclaw_operator.audit import JOB_UPSERT, AuditWriter, job_row
+
+
+def _row(job_id="job-1", status="running", **kw):
+    return job_row(
+        job_id=job_id,
+        customer_id="cust1",
+        box_id=kw.pop("box_id", "box-1"),
+        job_type="provision",
+        status=status,
+        payload=kw.pop("payload", {"tier": "starter"}),
+        started_at=datetime.now(timezone.utc),
+        **kw,
+    )
+
+
+@pytest.fixture
+def session_factory(mock_db):
+    mock_db.__aenter__.return_value = mock_db
+    return MagicMock(return_value=mock_db)
+
+
+class TestJobRow:
+    def test_params(self):
+        row = _row(status="failed", error_log="Traceback ...", step_timings={"namespace": 0.2, "wait_ready": 8.5})
+        assert row["id"] == "job-1"
+        assert row["customer_id"] == "cust1"
+        assert row["status"] == "failed"
+        assert json.loads(row["payload"]) == {"tier": "starter"}
+        assert row["error_log"] == "Traceback ..."
+        assert json.loads(row["step_timings"]) == {"namespace": 0.2, "wait_ready": 8.5}
+        assert row["completed_at"] is not None
+
+    def test_running_is_not_completed(self):
+        row = _row(box_id=None)
+        assert row["box_id"] is None
+        assert row["completed_at"] is None
+        assert row["step_timings"] is None
+
+    def test_upsert_keyed_on_id(self):
+        assert "ON CONFLICT (id) DO UPDATE" in str(JOB_UPSERT)
+
+
+class TestAuditWriter:
+    @pytest.mark.asyncio
+    async def test_flush_writes_latest_status_per_job_in_one_statement(self, session_factory, mock_db):
+        writer = AuditWriter(session_factory)
+        writer.record(_row("job-1", "running"))
+        writer.record(_row("job-2", "running"))
+        writer.record(_row("job-1", "complete"))
+
+        assert await writer.flush() == 2
+
+        mock_db.execute.assert_called_once()
+        rows = mock_db.execute.call_args[0][1]
+        assert [(r["id"], r["status"]) for r in rows] == [("job-2", "running"), ("job-1", "complete")]
+        mock_db.commit.assert_called_once()
+        assert await writer.flush() == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_falls_back_to_single_rows(self, session_factory, mock_db):
+        mock_db.execute.side_effect = [Exception("batch"), None, Exception("bad row")]
+        writer = AuditWriter(session_factory)
+        writer.record(_row("job-1"))
+        writer.record(_row("job-2"))
+
+        await writer.flush()
+
+        assert [call[0][1]["id"] for call in mock_db.execute.call_args_list[1:]] == ["job-1", "job-2"]
+        mock_db.rollback.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_run_flushes_full_batch_and_on_stop(self, session_factory, mock_db):
+        writer = AuditWriter(session_factory, batch_size=2, flush_interval=10)
+        task = asyncio.create_task(writer.run())
+        await asyncio.sleep(0)
+
+        writer.record(_row("job-1"))
+        writer.record(_row("job-2"))
+        await asyncio.sleep(0.01)
+        assert mock_db.execute.call_count == 1
+
+        writer.record(_row("job-3"))
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert mock_db.execute.call_count == 2
@@ -0,0 +1,54 @@
+"""Tests for openclaw_operator.bundles."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from openclaw_operator import bundles
+from openclaw_operator.bundles import resolve_bundle
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    bundles._cache.clear()
+    yield
+    bundles._cache.clear()
+
+
+def _row(version: int, soul: str = "Be helpful."):
+    result = MagicMock()
+    result.fetchone.return_value = ("b-1", "general", version, {"soul": soul}, {}, ["web"])
+    return result
+
+
+class TestResolveBundle:
+    @pytest.mark.asyncio
+    async def test_reads_row_once_per_version(self, mock_db):
+        mock_db.execute.return_value = _row(1)
+
+        first = await resolve_bundle(mock_db, "b-1", 1)
+        second = await resolve_bundle(mock_db, "b-1", 1)
+
+        assert first is second
+        assert first.prompts == {"soul": "Be helpful."}
+        assert first.skills == ["web"]
+        mock_db.execute.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_newer_version_reads_again(self, mock_db):
+        mock_db.execute.return_value = _row(1)
+        await resolve_bundle(mock_db, "b-1", 1)
+
+        mock_db.execute.return_value = _row(2, soul="Be brief.")
+        spec = await resolve_bundle(mock_db, "b-1", 2)
+
+        assert spec.version == 2
+        assert spec.prompts == {"soul": "Be brief."}
+        assert mock_db.execute.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_missing_bundle(self, mock_db):
+        mock_db.execute.return_value.fetchone.return_value = None
+
+        assert await resolve_bundle(mock_db, "gone", 1) is None
+        assert "gone" not in bundles._cache
@@ -0,0 +1,100 @@
+"""Tests for openclaw_operator.coalesce."""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from openclaw_operator.coalesce import Coalescer, merge
+
+
+def _job(job_type, job_id, *, customer_id="cust1", box_id="box-1", payload=None):
+    return json.dumps({
+        "job_id": job_id, "type": job_type, "customer_id": customer_id,
+        "box_id": box_id, "payload": payload or {},
+    })
+
+
+def test_merge_last_writer_wins():
+    earlier = {"job_id": "j1", "payload": {"box_id": "b", "secret_data": {"A": "1", "B": "1"}}}
+    later = {"job_id": "j2", "payload": {"box_id": "b", "secret_data": {"B": "2"}}}
+
+    merged = merge(earlier, later)
+
+    assert merged["job_id"] == "j2"
+    assert merged["payload"]["secret_data"] == {"A": "1", "B": "2"}
+    assert merged["coalesced"] == ["j1"]
+
+
+class TestCoalescer:
+    @pytest.mark.asyncio
+    async def test_collapses_jobs_within_window(self):
+        released = []
+        c = Coalescer(0.05, lambda raw, deliveries: released.append((json.loads(raw), deliveries)))
+
+        for n in range(3):
+            assert c.hold(_job("update_connections", f"j{n}"), 1)
+        assert c.stats()["held"] == 1
+        await asyncio.sleep(0.1)
+
+        assert len(released) == 1
+        job, deliveries = released[0]
+        assert job["job_id"] == "j2"
+        assert job["coalesced"] == ["j0", "j1"]
+        assert [json.loads(raw)["job_id"] for raw, _ in deliveries] == ["j0", "j1", "j2"]
+        assert c.stats() == {"held": 0, "released": 1, "collapsed": {"update_connections": 2}}
+
+    @pytest.mark.asyncio
+    async def test_keys_by_type_and_box(self):
+        released = []
+        c = Coalescer(10, lambda raw, deliveries: released.append(json.loads(raw)["job_id"]))
+
+        c.hold(_job("update_connections", "j1", box_id="box-1"), 1)
+        c.hold(_job("update_connections", "j2", box_id="box-2"), 1)
+        c.hold(_job("update", "j3", box_id="box-1"), 1)
+        c.flush_all()
+
+        assert sorted(released) == ["j1", "j2", "j3"]
+
+    @pytest.mark.asyncio
+    async def test_other_job_flushes_customer_first(self):
+        released = []
+        c = Coalescer(10, lambda raw, deliveries: released.append(json.loads(raw)["job_id"]))
+
+        c.hold(_job("update_connections", "j1"), 1)
+        c.hold(_job("update_connections", "j2", customer_id="cust2", box_id="box-2"), 1)
+
+        assert not c.hold(_job("suspend", "j3"), 1)
+        assert released == ["j1"]
+        assert c.stats()["held"] == 1
+        c.flush_all()
+
+    @pytest.mark.asyncio
+    async def test_disabled_with_zero_window(self):
+        c = Coalescer(0, MagicMock())
+        assert not c.hold(_job("update_connections", "j1"), 1)
+
+
+@pytest.mark.asyncio
+async def test_three_connections_restart_once():
+    """Three update_connections for one box run the handler once and ack all three."""
+    import openclaw_operator.main as m
+
+    raws = [_job("update_connections", f"j{n}") for n in range(3)]
+    queue = AsyncMock()
+    slots = asyncio.Semaphore(2)
+    process = AsyncMock(return_value=True)
+    c = Coalescer(0.05, lambda raw, deliveries: m.dispatch_job(
+        raw, slots, queue, deliveries=deliveries, acquired=False,
+    ))
+
+    with patch.object(m, "process_job", process):
+        for raw in raws:
+            assert c.hold(raw, 1)
+        await asyncio.sleep(0.1)
+        await asyncio.gather(*m._inflight)
+
+    process.assert_called_once()
+    assert [call[0][0] for call in queue.ack.call_args_list] == raws
+    assert slots._value == 2
@@ -0,0 +1,143 @@
+"""Tests for openclaw_operator.fleet."""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from openclaw_operator import fleet
+
+ROLLOUT = ("ro-1", "openclaw-gateway:v2", False, 2, 0.1)
+
+
+def _session_factory(*, rollout=ROLLOUT, rolling=(), counts=(), pending=()):
+    """A session whose SELECTs return the given rows, in the order the coordinator issues them."""
+    db = AsyncMock()
+    db.__aenter__.return_value = db
+
+    def execute(query, params=None):
+        sql = str(query)
+        result = MagicMock()
+        if "FROM fleet_rollouts" in sql and "FOR UPDATE" in sql:
+            result.fetchone.return_value = rollout
+        elif "FROM fleet_rollouts" in sql:
+            result.fetchall.return_value = [(rollout[0],)] if rollout else []
+        elif "status = 'rolling'" in sql and sql.lstrip().startswith("SELECT"):
+            result.fetchall.return_value = list(rolling)
+        elif "GROUP BY status" in sql:
+            result.fetchall.return_value = list(counts)
+        elif "JOIN subscriptions" in sql:
+            result.fetchall.return_value = list(pending)
+        return result
+
+    db.execute.side_effect = execute
+    return MagicMock(return_value=db), db
+
+
+def _statements(db) -> list[tuple[str, dict]]:
+    return [(str(call[0][0]), call[0][1] if len(call[0]) > 1 else {}) for call in db.execute.call_args_list]
+
+
+def _rollout_update(db) -> dict:
+    return next(params for sql, params in _statements(db) if "UPDATE fleet_rollouts" in sql)
+
+
+@pytest.fixture(autouse=True)
+def fleet_settings():
+    with patch.object(fleet, "settings") as s:
+        s.job_queue = "operator:jobs"
+        s.fleet_box_timeout = 600
+        yield s
+
+
+class TestAdvanceRollout:
+    @pytest.mark.asyncio
+    async def test_enqueues_up_to_max_in_flight(self, mock_redis):
+        factory, db = _session_factory(
+            counts=[("pending", 5), ("rolling", 1)],
+            pending=[("box-1", "cust1", "pro")],
+        )
+
+        counts = await fleet.advance_rollout(factory, mock_redis, "ro-1")
+
+        key, raw = mock_redis.pipeline.return_value.rpush.call_args[0]
+        assert key == "operator:jobs:low"
+        job = json.loads(raw)
+        assert job["type"] == "rollout"
+        assert job["lane"] == "low"
+        assert job["payload"] == {
+            "box_id": "box-1", "rollout_id": "ro-1", "tier": "pro", "image": "openclaw-gateway:v2", "restart": False,
+        }
+        assert counts["queued"] == 1
+        assert _rollout_update(db)["status"] == "running"
+        db.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_full_window_enqueues_nothing(self, mock_redis):
+        factory, _ = _session_factory(counts=[("pending", 5), ("queued", 1), ("rolling", 1)])
+
+        await fleet.advance_rollout(factory, mock_redis, "ro-1")
+
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_marks_finished_boxes_complete(self, mock_redis):
+        factory, db = _session_factory(
+            rolling=[("box-1", "cust1", 3), ("box-2", "cust2", 3)],
+            counts=[("complete", 1), ("rolling", 1)],
+        )
+        done = MagicMock(metadata=MagicMock(generation=3))
+
+        with (
+            patch.object(fleet, "read_gateway", AsyncMock(side_effect=[done, None])),
+            patch.object(fleet, "rollout_done", return_value=True),
+        ):
+            await fleet.advance_rollout(factory, mock_redis, "ro-1")
+
+        completed = [params for sql, params in _statements(db) if "SET status = 'complete'" in sql]
+        assert completed[0]["box_ids"] == ["box-1"]
+
+    @pytest.mark.asyncio
+    async def test_pauses_on_failure_ratio(self, mock_redis):
+        factory, db = _session_factory(counts=[("pending", 50), ("complete", 2), ("failed", 1)])
+
+        await fleet.advance_rollout(factory, mock_redis, "ro-1")
+
+        update = _rollout_update(db)
+        assert update["status"] == "paused"
+        assert update["reason"] == "1 of 3 boxes failed"
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_failure_under_ratio_keeps_going(self, mock_redis):
+        factory, db = _session_factory(counts=[("pending", 50), ("complete", 19), ("failed", 1)])
+
+        await fleet.advance_rollout(factory, mock_redis, "ro-1")
+
+        assert _rollout_update(db)["status"] == "running"
+
+    @pytest.mark.asyncio
+    async def test_completes_when_nothing_left(self, mock_redis):
+        factory, db = _session_factory(counts=[("complete", 9), ("skipped", 1)])
+
+        await fleet.advance_rollout(factory, mock_redis, "ro-1")
+
+        update = _rollout_update(db)
+        assert (update["status"], update["succeeded"], update["failed"]) == ("complete", 9, 0)
+
+    @pytest.mark.asyncio
+    async def test_skips_rollout_locked_elsewhere(self, mock_redis):
+        factory, db = _session_factory(rollout=None)
+
+        assert await fleet.advance_rollout(factory, mock_redis, "ro-1") is None
+        db.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fleet_once_advances_running_rollouts(mock_redis):
+    factory, _ = _session_factory()
+
+    with patch.object(fleet, "advance_rollout", AsyncMock()) as advance:
+        await fleet.fleet_once(factory, mock_redis)
+
+    advance.assert_called_once_with(factory, mock_redis, "ro-1")
@@ -0,0 +1,238 @@
+"""Tests for openclaw_operator.idle."""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from openclaw_operator import idle
+
+_AsyncClient = httpx.AsyncClient
+
+
+def _session_factory(*, idle_boxes=(), requests=(), sleeping=()):
+    db = AsyncMock()
+    db.__aenter__.return_value = db
+
+    def execute(query, params=None):
+        sql = str(query)
+        result = MagicMock()
+        if "GROUP BY s.tier" in sql:
+            result.fetchall.return_value = list(requests)
+        elif "status = 'active'" in sql:
+            result.fetchall.return_value = list(idle_boxes)
+        elif "status = 'sleeping'" in sql:
+            result.fetchall.return_value = list(sleeping)
+        return result
+
+    db.execute.side_effect = execute
+    return MagicMock(return_value=db), db
+
+
+def _pushed(r, lane: str) -> list[dict]:
+    return [
+        json.loads(m)
+        for call in r.pipeline.return_value.rpush.call_args_list if call[0][0] == f"operator:jobs:{lane}"
+        for m in call[0][1:]
+    ]
+
+
+@pytest.fixture(autouse=True)
+def idle_settings():
+    with (
+        patch.object(idle, "settings") as s,
+        patch.object(idle, "_report", idle.SleepReport()),
+    ):
+        s.job_queue = "operator:jobs"
+        s.sleep_idle_after = 21600
+        s.sleep_cpu_threshold = 25
+        s.sleep_max_jobs = 50
+        s.pod_ready_timeout = 60
+        s.telegram_api_url = "https://api.telegram.org"
+        yield s
+
+
+class TestReclaimed:
+    def test_sums_requests_per_tier(self):
+        cpu, memory = idle.reclaimed([("starter", None, None, 2), ("team", None, None, 1)])
+        assert cpu == 250 * 2 + 1000
+        assert memory == 512 * 2**20 * 2 + 2**30
+
+    def test_right_sized_requests(self):
+        cpu, memory = idle.reclaimed([("pro", "120m", "256Mi", 2), ("pro", None, None, 1)])
+        assert cpu == 120 * 2 + 500
+        assert memory == 256 * 2**20 * 2 + 512 * 2**20
+
+    def test_unknown_tier_ignored(self):
+        assert idle.reclaimed([("enterprise", None, None, 3)]) == (0, 0)
+
+
+class TestSleepOnce:
+    @pytest.mark.asyncio
+    async def test_enqueues_idle_boxes_on_low_lane(self, mock_redis):
+        factory, db = _session_factory(idle_boxes=[("box-1", "cust1"), ("box-2", "cust2")])
+
+        report = await idle.sleep_once(factory, mock_redis)
+
+        jobs = _pushed(mock_redis, "low")
+        assert [(j["type"], j["box_id"], j["customer_id"]) for j in jobs] == [
+            ("sleep", "box-1", "cust1"), ("sleep", "box-2", "cust2"),
+        ]
+        assert report.idle == 2 and report.enqueued == 2
+        params = db.execute.call_args_list[0][0][1]
+        assert params == {"idle": 21600.0, "cpu": 25, "limit": 50}
+
+    @pytest.mark.asyncio
+    async def test_skips_busy_customers(self, mock_redis):
+        factory, _ = _session_factory(idle_boxes=[("box-1", "cust1"), ("box-2", "cust2")])
+
+        report = await idle.sleep_once(factory, mock_redis, busy={"cust1": object()})
+
+        assert [j["box_id"] for j in _pushed(mock_redis, "low")] == ["box-2"]
+        assert report.idle == 2 and report.enqueued == 1
+
+    @pytest.mark.asyncio
+    async def test_reports_reclaimed_requests(self, mock_redis):
+        factory, _ = _session_factory(requests=[("pro", None, None, 3)])
+
+        report = await idle.sleep_once(factory, mock_redis)
+
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
+        assert report.sleeping == 3
+        assert report.reclaimed_cpu_millicores == 1500
+        assert idle.last_report()["reclaimed_memory_bytes"] == 3 * 512 * 2**20
+
+
+class TestWakeWatcher:
+    def _client(self, pending: dict[str, int], calls: list[str]):
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            token = request.url.path.split("/")[1].removeprefix("bot")
+            return httpx.Response(200, json={"ok": True, "result": {"url": "", "pending_update_count": pending[token]}})
+
+        return lambda **kw: _AsyncClient(transport=httpx.MockTransport(handler), **kw)
+
+    @pytest.mark.asyncio
+    async def test_wakes_boxes_with_pending_updates(self, mock_redis):
+        factory, _ = _session_factory(sleeping=[("box-1", "cust1"), ("box-2", "cust2")])
+        calls: list[str] = []
+        secrets = {"cust1": {"TELEGRAM_BOT_TOKEN": "t1"}, "cust2": {"TELEGRAM_BOT_TOKEN": "t2"}}
+        watcher = idle.WakeWatcher()
+
+        with (
+            patch.object(idle, "read_config_secret", AsyncMock(side_effect=lambda c: secrets[c])),
+            patch.object(idle.httpx, "AsyncClient", self._client({"t1": 2, "t2": 0}, calls)),
+        ):
+            woken = await watcher.poll_once(factory, mock_redis)
+
+        assert woken == 1
+        assert sorted(calls) == ["/bott1/getWebhookInfo", "/bott2/getWebhookInfo"]
+        [job] = _pushed(mock_redis, "high")
+        assert (job["type"], job["box_id"], job["lane"]) == ("wake", "box-1", "high")
+        assert job["payload"]["detected_at"] > 0
+
+    @pytest.mark.asyncio
+    async def test_does_not_wake_twice(self, mock_redis):
+        factory, _ = _session_factory(sleeping=[("box-1", "cust1")])
+        calls: list[str] = []
+        read_secret = AsyncMock(return_value={"TELEGRAM_BOT_TOKEN": "t1"})
+        watcher = idle.WakeWatcher()
+
+        with (
+            patch.object(idle, "read_config_secret", read_secret),
+            patch.object(idle.httpx, "AsyncClient", self._client({"t1": 1}, calls)),
+        ):
+            await watcher.poll_once(factory, mock_redis)
+            await watcher.poll_once(factory, mock_redis)
+
+        assert len(_pushed(mock_redis, "high")) == 1
+        assert len(calls) == 1
+        read_secret.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_telegram_error_skips_box(self, mock_redis):
+        factory, _ = _session_factory(sleeping=[("box-1", "cust1")])
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(502)
+
+        with (
+            patch.object(idle, "read_config_secret", AsyncMock(return_value={"TELEGRAM_BOT_TOKEN": "t1"})),
+            patch.object(
+                idle.httpx, "AsyncClient",
+                lambda **kw: _AsyncClient(transport=httpx.MockTransport(handler), **kw),
+            ),
+        ):
+            woken = await idle.WakeWatcher().poll_once(factory, mock_redis)
+
+        assert woken == 0
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_error_log_leaves_out_token(self, mock_redis, caplog):
+        factory, _ = _session_factory(sleeping=[("box-1", "cust1")])
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(401)
+
+        with (
+            patch.object(idle, "read_config_secret", AsyncMock(return_value={"TELEGRAM_BOT_TOKEN": "secret-token"})),
+            patch.object(
+                idle.httpx, "AsyncClient",
+                lambda **kw: _AsyncClient(transport=httpx.MockTransport(handler), **kw),
+            ),
+        ):
+            await idle.WakeWatcher().poll_once(factory, mock_redis)
+
+        assert "HTTPStatusError (401)" in caplog.text
+        assert "secret-token" not in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_only_the_leader_polls(self, mock_redis):
+        factory, _ = _session_factory(sleeping=[("box-1", "cust1")])
+        calls: list[str] = []
+        leader, follower = idle.WakeWatcher(), idle.WakeWatcher()
+        lease: dict[str, str] = {}
+
+        async def set_(key, value, nx=False, ex=None):
+            if nx and key in lease:
+                return None
+            lease[key] = value
+            return True
+
+        mock_redis.set = AsyncMock(side_effect=set_)
+        mock_redis.get = AsyncMock(side_effect=lambda key: lease.get(key))
+
+        with (
+            patch.object(idle, "read_config_secret", AsyncMock(return_value={"TELEGRAM_BOT_TOKEN": "t1"})),
+            patch.object(idle.httpx, "AsyncClient", self._client({"t1": 0}, calls)),
+        ):
+            await leader.poll_once(factory, mock_redis)
+            await follower.poll_once(factory, mock_redis)
+            await leader.poll_once(factory, mock_redis)
+
+        assert len(calls) == 2
+        assert mock_redis.expire.call_args[0][0] == idle.WAKE_LEADER_KEY
+
+    @pytest.mark.asyncio
+    async def test_box_without_token_is_not_polled(self, mock_redis):
+        factory, _ = _session_factory(sleeping=[("box-1", "cust1")])
+        calls: list[str] = []
+
+        with (
+            patch.object(idle, "read_config_secret", AsyncMock(return_value={})),
+            patch.object(idle.httpx, "AsyncClient", self._client({}, calls)),
+        ):
+            woken = await idle.WakeWatcher().poll_once(factory, mock_redis)
+
+        assert woken == 0 and calls == []
+
+
+class TestSleepLoop:
+    @pytest.mark.asyncio
+    async def test_disabled(self, idle_settings, mock_redis):
+        idle_settings.sleep_idle_after = 0
+        with patch.object(idle, "sleep_once") as once:
+            await idle.sleep_loop(MagicMock(), mock_redis)
+        once.assert_not_called()
@@ -0,0 +1,179 @@
+"""Tests for openclaw_operator.informers."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from kubernetes.client.exceptions import ApiException
+
+from openclaw_operator import informers, k8s, metrics
+
+
+def _obj(ns, name="openclaw-gateway", *, rv="1", generation=1, ready=0, labels=None):
+    obj = MagicMock()
+    obj.metadata.namespace = ns
+    obj.metadata.name = name
+    obj.metadata.resource_version = rv
+    obj.metadata.generation = generation
+    obj.metadata.labels = labels or {}
+    obj.status.ready_replicas = ready
+    return obj
+
+
+def _listing(*items, rv="100"):
+    result = MagicMock()
+    result.items = list(items)
+    result.metadata.resource_version = rv
+    return result
+
+
+def _fake_watch(informer, *streams):
+    """Watch() replacement replaying ``streams``, then stopping the informer."""
+    streams = list(streams)
+    calls = []
+
+    class _W:
+        def stream(self, func, **kwargs):
+            calls.append(kwargs)
+            if not streams:
+                informer._stop.set()
+                return
+            for item in streams.pop(0):
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+        def stop(self):
+            pass
+
+    return _W, calls
+
+
+@pytest.fixture
+def informer():
+    return informers.Informer("deployments", MagicMock(), "app=openclaw-gateway")
+
+
+class TestStore:
+    def test_replace_and_apply(self, informer):
+        informer._replace([_obj("customer-a"), _obj("customer-b")])
+        assert informer.synced
+        assert informer.get("customer-a", "openclaw-gateway") is not None
+
+        informer._apply("MODIFIED", _obj("customer-a", rv="2"))
+        assert informer.get("customer-a", "openclaw-gateway").metadata.resource_version == "2"
+
+        informer._apply("DELETED", _obj("customer-b"))
+        assert informer.get("customer-b", "openclaw-gateway") is None
+        assert [o.metadata.namespace for o in informer.values()] == ["customer-a"]
+        assert informer.values("customer-b") == []
+
+    @pytest.mark.asyncio
+    async def test_wait_for_wakes_on_event(self, informer):
+        informer._replace([_obj("customer-a")])
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.02, informer._apply, "MODIFIED", _obj("customer-a", ready=1))
+
+        ready = await informer.wait_for(
+            "customer-a", "openclaw-gateway", lambda d: d.status.ready_replicas >= 1, timeout=1,
+        )
+        assert ready
+
+    @pytest.mark.asyncio
+    async def test_wait_for_times_out(self, informer):
+        informer._replace([_obj("customer-a")])
+        ready = await informer.wait_for(
+            "customer-a", "openclaw-gateway", lambda d: d.status.ready_replicas >= 1, timeout=0.05,
+        )
+        assert not ready
+
+
+class TestRun:
+    async def _run(self, informer):
+        informer._loop = asyncio.get_running_loop()
+        await asyncio.get_running_loop().run_in_executor(None, informer._run)
+        await asyncio.sleep(0)  # let posted updates land
+
+    @pytest.mark.asyncio
+    async def test_list_then_watch(self, informer):
+        list_fn = informer._list_fn.return_value
+        list_fn.return_value = _listing(_obj("customer-a"), rv="10")
+        W, calls = _fake_watch(informer, [
+            {"type": "ADDED", "object": _obj("customer-b", rv="11")},
+            {"type": "DELETED", "object": _obj("customer-a", rv="12")},
+        ])
+        with patch.object(informers.watch, "Watch", W):
+            await self._run(informer)
+
+        assert [o.metadata.namespace for o in informer.values()] == ["customer-b"]
+        assert calls[0]["resource_version"] == "10"
+        assert calls[0]["label_selector"] == "app=openclaw-gateway"
+        # The second stream resumes from the last event seen.
+        assert calls[1]["resource_version"] == "12"
+        list_fn.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_relists_on_gone(self, informer):
+        list_fn = informer._list_fn.return_value
+        list_fn.side_effect = [_listing(_obj("customer-a"), rv="10"), _listing(_obj("customer-c"), rv="50")]
+        W, calls = _fake_watch(informer, [ApiException(status=410)])
+        with patch.object(informers.watch, "Watch", W):
+            await self._run(informer)
+
+        assert list_fn.call_count == 2
+        assert [o.metadata.namespace for o in informer.values()] == ["customer-c"]
+        assert calls[-1]["resource_version"] == "50"
+
+
+class TestWaitersUseCache:
+    @pytest.fixture(autouse=True)
+    def cached(self):
+        inf = informers.Informer("deployments", MagicMock(), "app=openclaw-gateway")
+        with patch.object(informers, "deployments", inf), patch.dict(k8s._generations, clear=True):
+            yield inf
+
+    @pytest.mark.asyncio
+    async def test_pod_ready_from_cache(self, cached, mock_apps_v1):
+        cached._replace([_obj("customer-cust1", ready=1)])
+        with patch.object(k8s, "_apps_v1", mock_apps_v1):
+            assert await k8s.wait_for_pod_ready("cust1", timeout=1)
+        mock_apps_v1.list_namespaced_deployment.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_ignores_object_older_than_our_write(self, cached, mock_apps_v1):
+        cached._replace([_obj("customer-cust1", generation=1, ready=1)])
+        mock_apps_v1.patch_namespaced_deployment.return_value = _obj("customer-cust1", generation=2)
+        with patch.object(k8s, "_apps_v1", mock_apps_v1):
+            await k8s.scale_deployment("cust1", replicas=1)
+            assert not await k8s.wait_for_pod_ready("cust1", timeout=0.05)
+
+            asyncio.get_running_loop().call_later(
+                0.02, cached._apply, "MODIFIED", _obj("customer-cust1", generation=2, ready=1),
+            )
+            assert await k8s.wait_for_pod_ready("cust1", timeout=1)
+
+
+class TestMetricsUsePodCache:
+    @pytest.mark.asyncio
+    async def test_customer_from_pod_label(self):
+        pods = informers.Informer("pods", MagicMock(), "app=openclaw-gateway")
+        pods._replace([_obj("openclaw-pool-aaaa", "gw-1", labels={"openclaw/customer": "cust1"})])
+        usage = {"items": [
+            {"metadata": {"namespace": "openclaw-pool-aaaa", "name": "gw-1"},
+             "containers": [{"usage": {"cpu": "5m", "memory": "1Mi"}}]},
+            {"metadata": {"namespace": "kube-system", "name": "coredns"},
+             "containers": [{"usage": {"cpu": "5m", "memory": "1Mi"}}]},
+        ]}
+        db = AsyncMock()
+        factory = MagicMock(return_value=db)
+        db.__aenter__.return_value = db
+
+        with (
+            patch.object(metrics, "pods", pods),
+            patch.object(metrics, "k8s_call", AsyncMock(return_value=usage)),
+            patch.object(metrics.client, "CustomObjectsApi"),
+        ):
+            assert await metrics.collect_pod_metrics(factory) == 1
+
+        rows = db.execute.call_args[0][1]
+        assert rows[0]["customer_id"] == "cust1"
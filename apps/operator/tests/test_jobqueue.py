@@ -0,0 +1,290 @@
+"""Tests for openclaw_operator.jobqueue."""
+
+import json
+import uuid
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from openclaw_operator import jobqueue
+from openclaw_operator.jobqueue import JobQueue
+
+
+@pytest.fixture
+def scripts(mock_redis):
+    """The Lua scripts registered by JobQueue, by name."""
+    registered = {}
+
+    def register(src):
+        if "LMOVE" in src:
+            name = "pop"
+        elif "ZRANGEBYSCORE" in src:
+            name = "sweep"
+        elif "SADD" in src:
+            name = "park"
+        else:
+            name = "release"
+        registered[name] = script = AsyncMock()
+        return script
+
+    mock_redis.register_script.side_effect = register
+    return registered
+
+
+@pytest.fixture
+def queue(mock_redis, scripts):
+    mock_redis.pipeline.return_value.execute.return_value = [1, 2]
+    return JobQueue(mock_redis, "operator:jobs")
+
+
+def _lanes_tried(script) -> list[str]:
+    return script.call_args[1]["keys"][3:]
+
+
+@pytest.fixture(autouse=True)
+def queue_settings():
+    with patch.object(jobqueue, "settings") as s:
+        s.job_visibility_timeout = 300
+        s.job_max_attempts = 3
+        s.job_retry_backoff = 10
+        s.job_retry_backoff_max = 300
+        s.job_poll_interval = 0.01
+        s.job_lane_weights = {"high": 6, "normal": 3, "low": 1}
+        yield s
+
+
+class TestPop:
+    @pytest.mark.asyncio
+    async def test_moves_to_processing_with_deadline(self, queue, scripts):
+        scripts["pop"].return_value = ["job-1", 2, 1]
+
+        with patch.object(jobqueue.time, "time", return_value=1000.0):
+            assert await queue.pop(timeout=1) == ("job-1", 2)
+
+        kwargs = scripts["pop"].call_args[1]
+        assert kwargs["keys"][:3] == ["operator:jobs:processing", "operator:jobs:deadlines", "operator:jobs:attempts"]
+        deadline, job_id = kwargs["args"]
+        assert deadline == 1300.0
+        # Only used if the message has no id of its own.
+        assert uuid.UUID(job_id)
+        assert _lanes_tried(scripts["pop"]) == ["operator:jobs:high", "operator:jobs", "operator:jobs:low"]
+
+    @pytest.mark.asyncio
+    async def test_empty(self, queue, scripts):
+        scripts["pop"].return_value = None
+        assert await queue.pop(timeout=0.03) is None
+        assert scripts["pop"].call_count > 1
+
+    @pytest.mark.asyncio
+    async def test_weighted_lane_order(self, queue, scripts):
+        # Every lane has work: each pop is served by the first lane tried.
+        firsts = []
+
+        def pop(keys, args):
+            firsts.append(keys[3])
+            return [f"job-{len(firsts)}", 1, 1]
+
+        scripts["pop"].side_effect = pop
+        for _ in range(10):
+            await queue.pop()
+
+        assert firsts.count("operator:jobs:high") == 6
+        assert firsts.count("operator:jobs") == 3
+        assert firsts.count("operator:jobs:low") == 1
+        # Interleaved rather than six highs in a row.
+        assert firsts[:3] != ["operator:jobs:high"] * 3
+
+    @pytest.mark.asyncio
+    async def test_empty_lane_does_not_bank_credit(self, queue, scripts):
+        # The high lane is empty for a while, then a burst arrives.
+        served = []
+
+        def pop(keys, args):
+            lanes = keys[3:]
+            if len(served) < 10 and lanes[0] == "operator:jobs:high":
+                lanes = lanes[1:]
+                index = 2
+            else:
+                index = 1
+            served.append(lanes[0])
+            return [f"job-{len(served)}", 1, index]
+
+        scripts["pop"].side_effect = pop
+        for _ in range(20):
+            await queue.pop()
+
+        # Normal and low split the idle period 3:1 ...
+        assert served[:10].count("operator:jobs") in (7, 8)
+        # ... and the burst gets its share without starving the other lanes.
+        assert 5 <= served[10:].count("operator:jobs:high") <= 7
+        assert served[10:].count("operator:jobs") >= 2
+
+    @pytest.mark.asyncio
+    async def test_records_lane_wait(self, queue, scripts, mock_redis):
+        raw = json.dumps({"job_id": "j", "lane": "high", "enqueued_at": 990.0})
+        scripts["pop"].return_value = [raw, 1, 1]
+        mock_redis.pipeline.return_value.execute.return_value = [4, 0, 1, 2, 1, 0, 3]
+        observed = REGISTRY.get_sample_value("operator_job_queue_wait_seconds_sum", {"lane": "high"}) or 0
+
+        with patch.object(jobqueue.time, "time", return_value=1000.0):
+            await queue.pop()
+        stats = await queue.stats()
+
+        assert REGISTRY.get_sample_value("operator_job_queue_wait_seconds_sum", {"lane": "high"}) == observed + 10
+
+        assert stats["lanes"]["high"] == {"depth": 4, "popped": 1, "wait_seconds_avg": 10.0, "wait_seconds_max": 10.0}
+        assert stats["lanes"]["low"]["wait_seconds_avg"] is None
+        assert (stats["processing"], stats["delayed"], stats["dead"]) == (2, 1, 0)
+        assert stats["parked_customers"] == 3
+
+    @pytest.mark.asyncio
+    async def test_enqueue_records_sequence(self, mock_redis):
+        job = {"job_id": "j1", "type": "suspend", "customer_id": "cust1", "lane": "normal", "enqueued_at": 5.0}
+
+        await jobqueue.enqueue(mock_redis, "operator:jobs", [job])
+
+        mock_redis.pipeline.assert_called_once_with(transaction=True)
+        pipe = mock_redis.pipeline.return_value
+        pipe.zadd.assert_called_once_with("operator:jobs:order:cust1", {"j1": 5.0})
+        key, raw = pipe.rpush.call_args[0]
+        assert key == "operator:jobs"
+        assert json.loads(raw) == job
+        assert jobqueue.lane_key("operator:jobs", "normal") == "operator:jobs"
+        assert jobqueue.lane_key("operator:jobs", "low") == "operator:jobs:low"
+
+
+class TestSettle:
+    @pytest.mark.asyncio
+    async def test_ack(self, queue, mock_redis):
+        await queue.ack("job-1")
+        pipe = mock_redis.pipeline.return_value
+        pipe.lrem.assert_called_once_with("operator:jobs:processing", 1, "job-1")
+        pipe.zrem.assert_called_once_with("operator:jobs:deadlines", "job-1")
+        pipe.hdel.assert_called_once_with("operator:jobs:attempts", "job-1")
+        pipe.execute.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_ack_settles_sequence_and_releases_next(self, queue, mock_redis, scripts):
+        raw = json.dumps({"job_id": "j1", "customer_id": "cust1"})
+        mock_redis.llen.return_value = 1
+        scripts["release"].return_value = 1
+
+        await queue.ack(raw)
+
+        pipe = mock_redis.pipeline.return_value
+        pipe.zrem.assert_any_call("operator:jobs:order:cust1", "j1")
+        assert scripts["release"].call_args[1]["args"][0] == "cust1"
+
+    @pytest.mark.asyncio
+    async def test_retry_keeps_sequence(self, queue, mock_redis):
+        raw = json.dumps({"job_id": "j1", "customer_id": "cust1"})
+        await queue.fail(raw, attempt=1, error="boom")
+
+        pipe = mock_redis.pipeline.return_value
+        assert all(c[0][0] != "operator:jobs:order:cust1" for c in pipe.zrem.call_args_list)
+
+    @pytest.mark.asyncio
+    async def test_fail_schedules_retry_with_backoff(self, queue, mock_redis):
+        with patch.object(jobqueue.time, "time", return_value=1000.0):
+            assert await queue.fail("job-1", attempt=2, error="boom")
+
+        pipe = mock_redis.pipeline.return_value
+        pipe.zadd.assert_called_once_with("operator:jobs:delayed", {"job-1": 1020.0})
+        pipe.lpush.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_fail_dead_letters_after_max_attempts(self, queue, mock_redis):
+        assert not await queue.fail("job-1", attempt=3, error="boom")
+
+        pipe = mock_redis.pipeline.return_value
+        pipe.zadd.assert_not_called()
+        dead_key, entry = pipe.lpush.call_args[0]
+        assert dead_key == "operator:jobs:dead"
+        assert json.loads(entry)["job"] == "job-1"
+        assert json.loads(entry)["error"] == "boom"
+        pipe.hdel.assert_called_once_with("operator:jobs:attempts", "job-1")
+
+    def test_backoff_is_capped(self):
+        assert [jobqueue.backoff(n) for n in (1, 2, 3, 10)] == [10, 20, 40, 300]
+
+
+class TestPending:
+    @pytest.mark.asyncio
+    async def test_park_behind_lock_holder(self, queue, scripts):
+        scripts["park"].return_value = -1
+
+        assert await queue.park("job-1", "cust1")
+
+        kwargs = scripts["park"].call_args[1]
+        assert kwargs["keys"] == [
+            "operator:lock:cust1", "operator:jobs:pending:cust1", "operator:jobs:pending", "operator:jobs",
+            "operator:jobs:order:cust1",
+            "operator:jobs:processing", "operator:jobs:deadlines", "operator:jobs:attempts",
+            "operator:jobs:high", "operator:jobs", "operator:jobs:low",
+        ]
+        assert kwargs["args"] == ["cust1", "job-1", "high", "normal", "low"]
+
+    @pytest.mark.asyncio
+    async def test_park_after_lock_released_requeues(self, queue, scripts):
+        scripts["park"].return_value = 2
+        assert not await queue.park("job-1", "cust1")
+
+    @pytest.mark.asyncio
+    async def test_release_pending(self, queue, scripts):
+        scripts["release"].return_value = 2
+
+        assert await queue.release_pending("cust1") == 2
+
+        kwargs = scripts["release"].call_args[1]
+        assert kwargs["keys"][:3] == ["operator:lock:cust1", "operator:jobs:pending:cust1", "operator:jobs:pending"]
+        assert kwargs["args"] == ["cust1", "high", "normal", "low"]
+
+    @pytest.mark.asyncio
+    async def test_release_pending_while_locked(self, queue, scripts):
+        scripts["release"].return_value = -1
+        assert await queue.release_pending("cust1") == 0
+
+    @pytest.mark.asyncio
+    async def test_may_run_only_oldest_in_sequence(self, queue, mock_redis):
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.return_value = [[b"j1"], 2.0]
+        assert not await queue.may_run("cust1", ["j2"])
+        pipe.zrange.assert_called_once_with("operator:jobs:order:cust1", 0, 0)
+
+        pipe.execute.return_value = [[b"j1"], 1.0, None]
+        assert await queue.may_run("cust1", ["j1", "j0"])
+
+    @pytest.mark.asyncio
+    async def test_may_run_untracked_waits_for_parked(self, queue, mock_redis):
+        mock_redis.pipeline.return_value.execute.return_value = [[b"j1"], None]
+        mock_redis.llen.return_value = 1
+        assert not await queue.may_run("cust1", ["legacy"])
+        mock_redis.llen.return_value = 0
+        assert await queue.may_run("cust1", ["legacy"])
+
+    @pytest.mark.asyncio
+    async def test_release_orphans(self, queue, scripts, mock_redis):
+        mock_redis.smembers.return_value = {b"cust1", b"cust2"}
+        scripts["release"].side_effect = [1, -1]
+
+        assert await queue.release_orphans() == 1
+        released = sorted(call[1]["args"][0] for call in scripts["release"].call_args_list)
+        assert released == ["cust1", "cust2"]
+
+
+class TestSweep:
+    @pytest.mark.asyncio
+    async def test_runs_script_over_queue_keys(self, queue, scripts):
+        script = scripts["sweep"]
+        script.return_value = [2, 1, 3]
+
+        assert await queue.sweep(limit=50) == (2, 1, 3)
+
+        kwargs = script.call_args[1]
+        assert kwargs["keys"] == [
+            "operator:jobs:deadlines", "operator:jobs:processing", "operator:jobs:delayed",
+            "operator:jobs:attempts", "operator:jobs:dead", "operator:jobs",
+            "operator:jobs:high", "operator:jobs", "operator:jobs:low",
+        ]
+        assert kwargs["args"][1:] == [300, 3, 10, 300, 50, "operator:jobs:order:", "high", "normal", "low"]
@@ -1,10 +1,20 @@
 """Tests for openclaw_operator.k8s."""
 
+import asyncio
+import json
+import threading
 import time
 from unittest.mock import MagicMock, patch
 
 import pytest
-from kubernetes.client import V1Deployment, V1DeploymentSpec, V1DeploymentStatus
+from kubernetes.client import (
+    V1Deployment,
+    V1DeploymentSpec,
+    V1DeploymentStatus,
+    V1Namespace,
+    V1NamespaceList,
+    V1ObjectMeta,
+)
 
 from openclaw_operator import k8s
 
@@ -52,22 +62,46 @@ class TestNamespaceHelpers:
     def test_namespace_name(self):
         assert k8s.namespace_name("abc123") == "customer-abc123"
 
-    def test_create_namespace(self, mock_core_v1):
-        k8s.create_namespace("cust1", "starter")
-        mock_core_v1.create_namespace.assert_called_once()
-        ns_arg = mock_core_v1.create_namespace.call_args[0][0]
-        assert ns_arg.metadata.name == "customer-cust1"
-        assert ns_arg.metadata.labels["openclaw/customer"] == "cust1"
-        assert ns_arg.metadata.labels["openclaw/tier"] == "starter"
+    def test_render_namespace(self):
+        ns = k8s.render_customer_objects("cust1", tier="starter", image="img")["namespace"]
+        assert ns["apiVersion"] == "v1"
+        assert ns["kind"] == "Namespace"
+        assert ns["metadata"]["name"] == "customer-cust1"
+        assert "namespace" not in ns["metadata"]
+        assert ns["metadata"]["labels"]["openclaw/customer"] == "cust1"
+        assert ns["metadata"]["labels"]["openclaw/tier"] == "starter"
+
+    @pytest.mark.asyncio
+    async def test_delete_namespace(self, mock_core_v1):
+        await k8s.delete_namespace("cust1")
+        mock_core_v1.delete_namespace.assert_called_once()
+        assert mock_core_v1.delete_namespace.call_args[0] == ("customer-cust1",)
+
+    @pytest.mark.asyncio
+    async def test_delete_bound_namespace(self, mock_core_v1):
+        k8s.bind_namespace("cust1", "openclaw-pool-aaaa")
+        await k8s.delete_namespace("cust1")
+        assert mock_core_v1.delete_namespace.call_args[0] == ("openclaw-pool-aaaa",)
+        assert k8s.namespace_name("cust1") == "customer-cust1"
+
+    @pytest.mark.asyncio
+    async def test_resolve_namespace_from_label(self, mock_core_v1):
+        mock_core_v1.list_namespace.return_value = V1NamespaceList(
+            items=[V1Namespace(metadata=V1ObjectMeta(name="openclaw-pool-aaaa"))]
+        )
+        assert await k8s.resolve_namespace("cust1") == "openclaw-pool-aaaa"
+        assert mock_core_v1.list_namespace.call_args[1]["label_selector"] == "openclaw/customer=cust1"
 
-    def test_delete_namespace(self, mock_core_v1):
-        k8s.delete_namespace("cust1")
-        mock_core_v1.delete_namespace.assert_called_once_with("customer-cust1")
+    @pytest.mark.asyncio
+    async def test_resolve_namespace_forgets_deleted(self, mock_core_v1):
+        k8s.bind_namespace("cust1", "openclaw-pool-aaaa")
+        mock_core_v1.list_namespace.return_value = V1NamespaceList(items=[])
+        assert await k8s.resolve_namespace("cust1") == "customer-cust1"
 
 
 class TestSecretHelpers:
-    def test_create_config_secret(self, mock_core_v1):
-        k8s.create_config_secret(
+    def test_config_secret_data(self):
+        data = k8s.config_secret_data(
             "cust1",
             telegram_bot_token="tok123",
             telegram_allow_from="user1",
@@ -75,20 +109,24 @@ class TestSecretHelpers:
             model="gpt-4",
             thinking="high",
         )
-        mock_core_v1.create_namespaced_secret.assert_called_once()
-        call_kwargs = mock_core_v1.create_namespaced_secret.call_args[1]
-        assert call_kwargs["namespace"] == "customer-cust1"
-        body = call_kwargs["body"]
-        assert body.string_data["TELEGRAM_BOT_TOKEN"] == "tok123"
-        assert body.string_data["TELEGRAM_ALLOW_FROM"] == "user1"
-        assert body.string_data["KIMI_API_KEY"] == "proxy-tok"
-        assert body.string_data["OPENCLAW_MODEL"] == "gpt-4"
-        assert body.string_data["OPENCLAW_THINKING"] == "high"
-        assert body.string_data["NODE_OPTIONS"] == "--max-old-space-size=896"
-        assert "token-proxy" in body.string_data["KIMI_BASE_URL"]
-
-    def test_patch_config_secret(self, mock_core_v1):
-        k8s.patch_config_secret("cust1", {"FOO": "bar"})
+        assert data["TELEGRAM_BOT_TOKEN"] == "tok123"
+        assert data["TELEGRAM_ALLOW_FROM"] == "user1"
+        assert data["KIMI_API_KEY"] == "proxy-tok"
+        assert data["OPENCLAW_MODEL"] == "gpt-4"
+        assert data["OPENCLAW_THINKING"] == "high"
+        assert data["NODE_OPTIONS"] == "--max-old-space-size=896"
+        assert "token-proxy" in data["KIMI_BASE_URL"]
+        assert "OPENCLAW_SYSTEM_PROMPT" not in data
+
+    def test_render_config_secret(self):
+        secret = k8s.render_config_secret("cust1", {"FOO": "bar"})
+        assert secret["kind"] == "Secret"
+        assert secret["metadata"] == {"name": "openclaw-config", "namespace": "customer-cust1"}
+        assert secret["stringData"] == {"FOO": "bar"}
+
+    @pytest.mark.asyncio
+    async def test_patch_config_secret(self, mock_core_v1):
+        await k8s.patch_config_secret("cust1", {"FOO": "bar"})
         mock_core_v1.patch_namespaced_secret.assert_called_once()
         call_kwargs = mock_core_v1.patch_namespaced_secret.call_args[1]
         assert call_kwargs["name"] == "openclaw-config"
@@ -96,18 +134,29 @@ class TestSecretHelpers:
         assert call_kwargs["body"].string_data == {"FOO": "bar"}
 
 
-class TestResourceQuotaHelpers:
-    def test_create_resource_quota(self, mock_core_v1):
-        k8s.create_resource_quota("cust1", "starter")
-        mock_core_v1.create_namespaced_resource_quota.assert_called_once()
-        call_kwargs = mock_core_v1.create_namespaced_resource_quota.call_args[1]
-        assert call_kwargs["namespace"] == "customer-cust1"
-        body = call_kwargs["body"]
-        assert body.metadata.name == "tier-limits"
-        assert body.spec.hard["requests.cpu"] == "250m"
+class TestReadConfigSecret:
+    @pytest.mark.asyncio
+    async def test_decodes_values(self, mock_core_v1):
+        import base64
 
-    def test_patch_resource_quota(self, mock_core_v1):
-        k8s.patch_resource_quota("cust1", "pro")
+        mock_core_v1.read_namespaced_secret.return_value = MagicMock(
+            data={"TELEGRAM_BOT_TOKEN": base64.b64encode(b"123:abc").decode()},
+        )
+        assert await k8s.read_config_secret("cust1") == {"TELEGRAM_BOT_TOKEN": "123:abc"}
+        kwargs = mock_core_v1.read_namespaced_secret.call_args[1]
+        assert (kwargs["name"], kwargs["namespace"]) == ("openclaw-config", "customer-cust1")
+
+
+class TestResourceQuotaHelpers:
+    def test_render_resource_quota(self):
+        quota = k8s.render_customer_objects("cust1", tier="starter", image="img")["quota"]
+        assert quota["kind"] == "ResourceQuota"
+        assert quota["metadata"] == {"name": "tier-limits", "namespace": "customer-cust1"}
+        assert quota["spec"]["hard"]["requests.cpu"] == "250m"
+
+    @pytest.mark.asyncio
+    async def test_patch_resource_quota(self, mock_core_v1):
+        await k8s.patch_resource_quota("cust1", "pro")
         mock_core_v1.patch_namespaced_resource_quota.assert_called_once()
         call_kwargs = mock_core_v1.patch_namespaced_resource_quota.call_args[1]
         assert call_kwargs["name"] == "tier-limits"
@@ -117,33 +166,74 @@ class TestResourceQuotaHelpers:
 
 
 class TestNetworkPolicyHelpers:
-    def test_create_network_policy(self, mock_networking_v1):
-        k8s.create_network_policy("cust1")
-        mock_networking_v1.create_namespaced_network_policy.assert_called_once()
-        call_kwargs = mock_networking_v1.create_namespaced_network_policy.call_args[1]
-        assert call_kwargs["namespace"] == "customer-cust1"
-        body = call_kwargs["body"]
-        assert body.metadata.name == "customer-isolation"
-        assert body.spec.policy_types == ["Ingress", "Egress"]
+    def test_render_network_policy(self):
+        netpol = k8s.render_customer_objects("cust1", tier="starter", image="img")["netpol"]
+        assert netpol["apiVersion"] == "networking.k8s.io/v1"
+        assert netpol["metadata"] == {"name": "customer-isolation", "namespace": "customer-cust1"}
+        assert netpol["spec"]["policyTypes"] == ["Ingress", "Egress"]
         # 6 egress rules: token-proxy, nango, browser-proxy, api, public 443, dns
-        assert len(body.spec.egress) == 6
+        assert len(netpol["spec"]["egress"]) == 6
+        assert netpol["spec"]["egress"][4]["to"][0]["ipBlock"]["except"] == [
+            "10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16",
+        ]
+
+
+class TestServerSideApply:
+    def test_render_bundle(self):
+        objects = k8s.render_customer_objects(
+            "cust1", tier="starter", image="img", secret_data={"FOO": "bar"},
+        )
+        assert set(objects) == {"namespace", "secret", "quota", "netpol", "deployment"}
+        assert "secret" not in k8s.render_customer_objects("cust1", tier="starter", image="img")
+
+    @pytest.mark.asyncio
+    async def test_apply_manifest(self, mock_core_v1):
+        mock_core_v1.api_client.call_api.return_value = {"kind": "Deployment"}
+        dep = k8s.render_customer_objects("cust1", tier="starter", image="img")["deployment"]
+
+        result = await k8s.apply_manifest(dep)
+
+        assert result == {"kind": "Deployment"}
+        args, kwargs = mock_core_v1.api_client.call_api.call_args
+        assert args == ("/apis/apps/v1/namespaces/customer-cust1/deployments/openclaw-gateway", "PATCH")
+        assert kwargs["header_params"]["Content-Type"] == "application/apply-patch+yaml"
+        assert ("fieldManager", k8s.FIELD_MANAGER) in kwargs["query_params"]
+        assert ("force", "true") in kwargs["query_params"]
+        assert kwargs["body"] is dep
+        assert kwargs["_request_timeout"] == k8s.settings.k8s_call_timeout
+
+    @pytest.mark.asyncio
+    async def test_apply_paths(self, mock_core_v1):
+        objects = k8s.render_customer_objects(
+            "cust1", tier="starter", image="img", secret_data={"FOO": "bar"},
+        )
+        for manifest in objects.values():
+            await k8s.apply_manifest(manifest)
+        paths = {c[0][0] for c in mock_core_v1.api_client.call_api.call_args_list}
+        assert paths == {
+            "/api/v1/namespaces/customer-cust1",
+            "/api/v1/namespaces/customer-cust1/secrets/openclaw-config",
+            "/api/v1/namespaces/customer-cust1/resourcequotas/tier-limits",
+            "/apis/networking.k8s.io/v1/namespaces/customer-cust1/networkpolicies/customer-isolation",
+            "/apis/apps/v1/namespaces/customer-cust1/deployments/openclaw-gateway",
+        }
 
 
 class TestDeploymentHelpers:
-    def test_create_deployment(self, mock_apps_v1):
-        k8s.create_deployment("cust1", "starter", "myimage:latest")
-        mock_apps_v1.create_namespaced_deployment.assert_called_once()
-        call_kwargs = mock_apps_v1.create_namespaced_deployment.call_args[1]
-        assert call_kwargs["namespace"] == "customer-cust1"
-        body = call_kwargs["body"]
-        assert body.metadata.name == "openclaw-gateway"
-        container = body.spec.template.spec.containers[0]
-        assert container.image == "myimage:latest"
-        assert container.image_pull_policy == "IfNotPresent"
-        assert container.resources.requests["cpu"] == "250m"
-
-    def test_patch_deployment_resources(self, mock_apps_v1):
-        k8s.patch_deployment_resources("cust1", "pro")
+    def test_render_deployment(self):
+        dep = k8s.render_customer_objects("cust1", tier="starter", image="myimage:latest")["deployment"]
+        assert dep["apiVersion"] == "apps/v1"
+        assert dep["kind"] == "Deployment"
+        assert dep["metadata"]["name"] == "openclaw-gateway"
+        assert dep["metadata"]["namespace"] == "customer-cust1"
+        container = dep["spec"]["template"]["spec"]["containers"][0]
+        assert container["image"] == "myimage:latest"
+        assert container["imagePullPolicy"] == "IfNotPresent"
+        assert container["resources"]["requests"]["cpu"] == "250m"
+
+    @pytest.mark.asyncio
+    async def test_patch_deployment_resources(self, mock_apps_v1):
+        await k8s.patch_deployment_resources("cust1", "pro")
         mock_apps_v1.patch_namespaced_deployment.assert_called_once()
         call_kwargs = mock_apps_v1.patch_namespaced_deployment.call_args[1]
         assert call_kwargs["name"] == "openclaw-gateway"
@@ -152,113 +242,351 @@ class TestDeploymentHelpers:
         resources = body["spec"]["template"]["spec"]["containers"][0]["resources"]
         assert resources["requests"]["cpu"] == "500m"
 
-    def test_scale_deployment(self, mock_apps_v1):
-        k8s.scale_deployment("cust1", 0)
+    @pytest.mark.asyncio
+    async def test_patch_deployment_image(self, mock_apps_v1):
+        await k8s.patch_deployment_resources("cust1", "pro", image="openclaw-gateway:v2")
+        container = mock_apps_v1.patch_namespaced_deployment.call_args[1]["body"]["spec"]["template"]["spec"]["containers"][0]
+        assert container["image"] == "openclaw-gateway:v2"
+        assert container["resources"]["requests"]["cpu"] == "500m"
+
+    @pytest.mark.asyncio
+    async def test_patch_deployment_right_sized_requests(self, mock_apps_v1):
+        await k8s.patch_deployment_resources("cust1", "pro", requests={"cpu": "120m", "memory": "256Mi"})
+        container = mock_apps_v1.patch_namespaced_deployment.call_args[1]["body"]["spec"]["template"]["spec"]["containers"][0]
+        assert container["resources"]["requests"] == {"cpu": "120m", "memory": "256Mi"}
+        assert container["resources"]["limits"]["cpu"] == "2000m"
+
+    def test_gateway_outdated_right_sized(self):
+        dep = k8s._build_deployment("cust1", "pro", "openclaw-gateway:v1")
+        assert k8s.gateway_outdated(dep, "pro", requests={"cpu": "120m"})
+        dep.spec.template.spec.containers[0].resources.requests["cpu"] = "120m"
+        assert not k8s.gateway_outdated(dep, "pro", requests={"cpu": "120m"})
+        assert k8s.gateway_outdated(dep, "pro")
+
+    def test_gateway_outdated(self):
+        dep = k8s._build_deployment("cust1", "pro", "openclaw-gateway:v1")
+        assert not k8s.gateway_outdated(dep, "pro")
+        assert not k8s.gateway_outdated(dep, "pro", "openclaw-gateway:v1")
+        assert k8s.gateway_outdated(dep, "pro", "openclaw-gateway:v2")
+        assert k8s.gateway_outdated(dep, "team")
+
+    @pytest.mark.asyncio
+    async def test_scale_deployment(self, mock_apps_v1):
+        await k8s.scale_deployment("cust1", 0)
         call_kwargs = mock_apps_v1.patch_namespaced_deployment.call_args[1]
         assert call_kwargs["body"] == {"spec": {"replicas": 0}}
 
-    def test_rollout_restart(self, mock_apps_v1):
-        k8s.rollout_restart("cust1")
+    @pytest.mark.asyncio
+    async def test_rollout_restart(self, mock_apps_v1):
+        await k8s.rollout_restart("cust1")
         call_kwargs = mock_apps_v1.patch_namespaced_deployment.call_args[1]
         annotations = call_kwargs["body"]["spec"]["template"]["metadata"]["annotations"]
         assert "kubectl.kubernetes.io/restartedAt" in annotations
 
+    @pytest.mark.asyncio
+    async def test_rollout_restart_sets_annotations(self, mock_apps_v1):
+        await k8s.rollout_restart("cust1", {"openclaw/config-hashes": "{}"})
+        call_kwargs = mock_apps_v1.patch_namespaced_deployment.call_args[1]
+        annotations = call_kwargs["body"]["spec"]["template"]["metadata"]["annotations"]
+        assert annotations["openclaw/config-hashes"] == "{}"
+        assert "kubectl.kubernetes.io/restartedAt" in annotations
 
-class TestWaitForPodReady:
-    def test_pod_ready_immediately(self, mock_apps_v1):
-        dep = MagicMock()
-        dep.status.ready_replicas = 1
-        mock_apps_v1.read_namespaced_deployment.return_value = dep
-
-        with patch("time.sleep"):
-            assert k8s.wait_for_pod_ready("cust1", timeout=10) is True
-
-    def test_pod_not_ready_timeout(self, mock_apps_v1):
-        dep = MagicMock()
-        dep.status.ready_replicas = 0
-        mock_apps_v1.read_namespaced_deployment.return_value = dep
-
-        with patch("time.sleep"), patch("time.monotonic") as mock_time:
-            # First call returns 0 (start), second returns 0.5 (loop), third returns 999 (past deadline)
-            mock_time.side_effect = [0, 0.5, 999]
-            assert k8s.wait_for_pod_ready("cust1", timeout=5) is False
-
-    def test_pod_ready_after_retry(self, mock_apps_v1):
-        dep_not_ready = MagicMock()
-        dep_not_ready.status.ready_replicas = 0
-        dep_ready = MagicMock()
-        dep_ready.status.ready_replicas = 1
-        mock_apps_v1.read_namespaced_deployment.side_effect = [dep_not_ready, dep_ready]
-
-        with patch("time.sleep"), patch("time.monotonic") as mock_time:
-            mock_time.side_effect = [0, 0.5, 1.0, 1.5]
-            assert k8s.wait_for_pod_ready("cust1", timeout=10) is True
 
-    def test_pod_ready_none_replicas(self, mock_apps_v1):
+class TestChangedConfig:
+    def _with_hashes(self, mock_apps_v1, hashes):
         dep = MagicMock()
-        dep.status.ready_replicas = None
+        dep.spec.template.metadata.annotations = (
+            {k8s.CONFIG_HASH_ANNOTATION: json.dumps(hashes)} if hashes is not None else None
+        )
         mock_apps_v1.read_namespaced_deployment.return_value = dep
 
-        with patch("time.sleep"), patch("time.monotonic") as mock_time:
-            mock_time.side_effect = [0, 0.5, 999]
-            assert k8s.wait_for_pod_ready("cust1", timeout=5) is False
+    @pytest.mark.asyncio
+    async def test_no_recorded_hash_is_a_change(self, mock_apps_v1):
+        self._with_hashes(mock_apps_v1, None)
+        annotations = await k8s.changed_config("cust1", {"FOO": "bar"})
+        assert json.loads(annotations[k8s.CONFIG_HASH_ANNOTATION]) == {"FOO": k8s.config_hash("bar")}
+
+    @pytest.mark.asyncio
+    async def test_identical_data_is_unchanged(self, mock_apps_v1):
+        self._with_hashes(mock_apps_v1, {"FOO": k8s.config_hash("bar"), "OTHER": k8s.config_hash("x")})
+        assert await k8s.changed_config("cust1", {"FOO": "bar"}) is None
+
+    @pytest.mark.asyncio
+    async def test_changed_key_keeps_other_hashes(self, mock_apps_v1):
+        self._with_hashes(mock_apps_v1, {"FOO": k8s.config_hash("bar"), "OTHER": k8s.config_hash("x")})
+        annotations = await k8s.changed_config("cust1", {"FOO": "baz"})
+        assert json.loads(annotations[k8s.CONFIG_HASH_ANNOTATION]) == {
+            "FOO": k8s.config_hash("baz"), "OTHER": k8s.config_hash("x"),
+        }
+
+    @pytest.mark.asyncio
+    async def test_revert_is_not_skipped_on_a_stale_cache(self, mock_apps_v1):
+        from openclaw_operator import informers
+
+        # This replica's cache still shows FOO=bar; another replica has since
+        # rolled out FOO=baz, so going back to bar is a change.
+        stale = MagicMock()
+        stale.metadata.namespace = "customer-cust1"
+        stale.metadata.name = "openclaw-gateway"
+        stale.spec.template.metadata.annotations = {
+            k8s.CONFIG_HASH_ANNOTATION: json.dumps({"FOO": k8s.config_hash("bar")}),
+        }
+        cache = informers.Informer("deployments", MagicMock(), informers.GATEWAY_SELECTOR)
+        cache._replace([stale])
+        self._with_hashes(mock_apps_v1, {"FOO": k8s.config_hash("baz")})
+        with patch.object(informers, "deployments", cache):
+            assert await k8s.changed_config("cust1", {"FOO": "bar"}) is not None
+        mock_apps_v1.read_namespaced_deployment.assert_called_once()
+        assert mock_apps_v1.read_namespaced_deployment.call_args.kwargs["namespace"] == "customer-cust1"
+
+    @pytest.mark.asyncio
+    async def test_missing_deployment(self, mock_apps_v1):
+        from kubernetes.client.exceptions import ApiException
+
+        mock_apps_v1.read_namespaced_deployment.side_effect = ApiException(status=404)
+        assert await k8s.changed_config("cust1", {"FOO": "bar"}) is not None
+
+    def test_rendered_deployment_records_secret(self):
+        objects = k8s.render_customer_objects("cust1", tier="starter", image="img", secret_data={"FOO": "bar"})
+        annotations = objects["deployment"]["spec"]["template"]["metadata"]["annotations"]
+        assert json.loads(annotations[k8s.CONFIG_HASH_ANNOTATION]) == {"FOO": k8s.config_hash("bar")}
+
+        plain = k8s.render_customer_objects("cust1", tier="starter", image="img")
+        assert "annotations" not in plain["deployment"]["spec"]["template"]["metadata"]
+
+    @pytest.mark.asyncio
+    async def test_update_after_provision_compares_with_provisioned_secret(self, mock_apps_v1):
+        # An update recorded FOO=old; a re-provision then wrote FOO=new.
+        deployment = k8s.render_customer_objects(
+            "cust1", tier="starter", image="img", secret_data={"FOO": "new", "BAR": "x"},
+        )["deployment"]
+        self._with_hashes(mock_apps_v1, json.loads(
+            deployment["spec"]["template"]["metadata"]["annotations"][k8s.CONFIG_HASH_ANNOTATION]
+        ))
+        assert await k8s.changed_config("cust1", {"FOO": "new"}) is None
+        assert await k8s.changed_config("cust1", {"FOO": "old"}) is not None
+
+
+def _dep(*, rv="1", generation=1, observed=1, replicas=1, updated=1, ready=1, unavailable=0):
+    dep = MagicMock()
+    dep.metadata.resource_version = rv
+    dep.metadata.generation = generation
+    dep.spec.replicas = replicas
+    dep.status.observed_generation = observed
+    dep.status.updated_replicas = updated
+    dep.status.ready_replicas = ready
+    dep.status.unavailable_replicas = unavailable
+    return dep
+
+
+def _listing(*deps, rv="100"):
+    result = MagicMock()
+    result.items = list(deps)
+    result.metadata.resource_version = rv
+    return result
+
+
+class FakeWatch:
+    """Replays one scripted stream per Watch() and records stream kwargs."""
+
+    def __init__(self, streams):
+        self.streams = list(streams)
+        self.calls = []
+
+    def __call__(self):
+        fake = self
+
+        class _W:
+            def stream(self, func, *args, **kwargs):
+                fake.calls.append(kwargs)
+                script = fake.streams.pop(0) if fake.streams else []
+                for item in script:
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+
+            def stop(self):
+                pass
+
+        return _W()
+
+
+@pytest.fixture
+def fake_watch():
+    def _install(*streams):
+        fw = FakeWatch(streams)
+        patcher = patch.object(k8s.watch, "Watch", fw)
+        patcher.start()
+        _install.patchers.append(patcher)
+        return fw
+
+    _install.patchers = []
+    yield _install
+    for p in _install.patchers:
+        p.stop()
 
-    def test_pod_ready_survives_api_error(self, mock_apps_v1):
-        dep_ready = MagicMock()
-        dep_ready.status.ready_replicas = 1
-        mock_apps_v1.read_namespaced_deployment.side_effect = [Exception("API error"), dep_ready]
 
-        with patch("time.sleep"), patch("time.monotonic") as mock_time:
-            mock_time.side_effect = [0, 0.5, 1.0, 1.5]
-            assert k8s.wait_for_pod_ready("cust1", timeout=10) is True
+class TestWaitForPodReady:
+    @pytest.mark.asyncio
+    async def test_ready_on_initial_list(self, mock_apps_v1, fake_watch):
+        fw = fake_watch()
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep(ready=1))
+        assert await k8s.wait_for_pod_ready("cust1", timeout=10) is True
+        assert fw.calls == []
+        call_kwargs = mock_apps_v1.list_namespaced_deployment.call_args
+        assert call_kwargs[0][0] == "customer-cust1"
+        assert call_kwargs[1]["field_selector"] == "metadata.name=openclaw-gateway"
+
+    @pytest.mark.asyncio
+    async def test_returns_on_first_ready_event(self, mock_apps_v1, fake_watch):
+        fw = fake_watch([
+            {"type": "MODIFIED", "object": _dep(rv="101", ready=0)},
+            {"type": "MODIFIED", "object": _dep(rv="102", ready=1)},
+            # Never reached — the waiter returns as soon as the pod is ready.
+            {"type": "MODIFIED", "object": _dep(rv="103", ready=0)},
+        ])
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep(ready=0), rv="100")
+
+        start = time.monotonic()
+        assert await k8s.wait_for_pod_ready("cust1", timeout=10) is True
+        assert time.monotonic() - start < 1
+        assert fw.calls[0]["resource_version"] == "100"
+
+    @pytest.mark.asyncio
+    async def test_none_replicas_times_out(self, mock_apps_v1, fake_watch):
+        fake_watch([{"type": "MODIFIED", "object": _dep(ready=None)}])
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep(ready=None))
+        with patch.object(k8s.time, "sleep"):
+            assert await k8s.wait_for_pod_ready("cust1", timeout=0.2) is False
+
+    @pytest.mark.asyncio
+    async def test_resumes_from_last_resource_version_after_disconnect(self, mock_apps_v1, fake_watch):
+        fw = fake_watch(
+            [{"type": "MODIFIED", "object": _dep(rv="105", ready=0)}, ConnectionError("reset")],
+            [{"type": "MODIFIED", "object": _dep(rv="106", ready=1)}],
+        )
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep(ready=0), rv="100")
+
+        with patch.object(k8s.time, "sleep"):
+            assert await k8s.wait_for_pod_ready("cust1", timeout=10) is True
+        assert [c["resource_version"] for c in fw.calls] == ["100", "105"]
+        # No re-list: the watch resumed where it left off.
+        mock_apps_v1.list_namespaced_deployment.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_relists_on_410_gone(self, mock_apps_v1, fake_watch):
+        from kubernetes.client.exceptions import ApiException
+
+        fake_watch([ApiException(status=410, reason="Gone")])
+        mock_apps_v1.list_namespaced_deployment.side_effect = [
+            _listing(_dep(ready=0), rv="100"),
+            _listing(_dep(ready=1), rv="200"),
+        ]
+        assert await k8s.wait_for_pod_ready("cust1", timeout=10) is True
+        assert mock_apps_v1.list_namespaced_deployment.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_survives_list_error(self, mock_apps_v1, fake_watch):
+        fake_watch()
+        mock_apps_v1.list_namespaced_deployment.side_effect = [
+            Exception("API error"),
+            _listing(_dep(ready=1)),
+        ]
+        with patch.object(k8s.time, "sleep"):
+            assert await k8s.wait_for_pod_ready("cust1", timeout=10) is True
+
+
+class TestWatchDeployment:
+    def test_stopped_waiter_does_not_watch(self, mock_apps_v1, fake_watch):
+        fw = fake_watch()
+        stop = threading.Event()
+        stop.set()
+        assert k8s._watch_deployment("customer-cust1", k8s._pod_ready, 60, stop) is False
+        assert fw.calls == []
+        mock_apps_v1.list_namespaced_deployment.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_watch_is_opened_in_chunks_on_its_own_pool(self, mock_apps_v1, fake_watch):
+        fw = fake_watch([{"type": "MODIFIED", "object": _dep(rv="101", ready=1)}])
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep(ready=0), rv="100")
+
+        with patch.object(k8s, "_get_executor", side_effect=AssertionError("shared pool used")):
+            assert await k8s.wait_for_pod_ready("cust1", timeout=300) is True
+        assert fw.calls[0]["timeout_seconds"] <= k8s.WATCH_CHUNK
 
 
 class TestWaitForRollout:
-    def test_rollout_complete_immediately(self, mock_apps_v1):
-        dep = MagicMock()
-        dep.spec.replicas = 1
-        dep.status.updated_replicas = 1
-        dep.status.ready_replicas = 1
-        dep.status.unavailable_replicas = 0
-        mock_apps_v1.read_namespaced_deployment.return_value = dep
-
-        with patch("time.sleep"):
-            assert k8s.wait_for_rollout("cust1", timeout=10) is True
-
-    def test_rollout_timeout(self, mock_apps_v1):
-        dep = MagicMock()
-        dep.spec.replicas = 1
-        dep.status.updated_replicas = 0
-        dep.status.ready_replicas = 0
-        dep.status.unavailable_replicas = 1
-        mock_apps_v1.read_namespaced_deployment.return_value = dep
-
-        with patch("time.sleep"), patch("time.monotonic") as mock_time:
-            mock_time.side_effect = [0, 0.5, 999]
-            assert k8s.wait_for_rollout("cust1", timeout=5) is False
-
-    def test_rollout_unavailable_none_treated_as_zero(self, mock_apps_v1):
-        dep = MagicMock()
-        dep.spec.replicas = 1
-        dep.status.updated_replicas = 1
-        dep.status.ready_replicas = 1
-        dep.status.unavailable_replicas = None
-        mock_apps_v1.read_namespaced_deployment.return_value = dep
-
-        with patch("time.sleep"):
-            assert k8s.wait_for_rollout("cust1", timeout=10) is True
-
-    def test_rollout_survives_api_error(self, mock_apps_v1):
-        dep = MagicMock()
-        dep.spec.replicas = 1
-        dep.status.updated_replicas = 1
-        dep.status.ready_replicas = 1
-        dep.status.unavailable_replicas = None
-        mock_apps_v1.read_namespaced_deployment.side_effect = [Exception("boom"), dep]
-
-        with patch("time.sleep"), patch("time.monotonic") as mock_time:
-            mock_time.side_effect = [0, 0.5, 1.0, 1.5]
-            assert k8s.wait_for_rollout("cust1", timeout=10) is True
+    @pytest.mark.asyncio
+    async def test_rollout_complete_immediately(self, mock_apps_v1, fake_watch):
+        fake_watch()
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep())
+        assert await k8s.wait_for_rollout("cust1", timeout=10) is True
+
+    @pytest.mark.asyncio
+    async def test_stale_status_is_not_complete(self, mock_apps_v1, fake_watch):
+        """Right after a patch the status still describes the old generation."""
+        fw = fake_watch([{"type": "MODIFIED", "object": _dep(rv="101", generation=2, observed=2)}])
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep(generation=2, observed=1))
+        assert await k8s.wait_for_rollout("cust1", timeout=10) is True
+        # Completion came from the watch event, not the stale listing.
+        assert len(fw.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_rollout_timeout(self, mock_apps_v1, fake_watch):
+        fake_watch([{"type": "MODIFIED", "object": _dep(updated=0, ready=0, unavailable=1)}])
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(
+            _dep(updated=0, ready=0, unavailable=1),
+        )
+        with patch.object(k8s.time, "sleep"):
+            assert await k8s.wait_for_rollout("cust1", timeout=0.2) is False
+
+    @pytest.mark.asyncio
+    async def test_rollout_unavailable_none_treated_as_zero(self, mock_apps_v1, fake_watch):
+        fake_watch()
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep(unavailable=None))
+        assert await k8s.wait_for_rollout("cust1", timeout=10) is True
+
+    @pytest.mark.asyncio
+    async def test_scaled_to_zero_is_complete(self, mock_apps_v1, fake_watch):
+        """A sleeping gateway takes template changes without starting a pod."""
+        fake_watch()
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep(replicas=0, updated=None, ready=None))
+        assert await k8s.wait_for_rollout("cust1", timeout=10) is True
+
+    @pytest.mark.asyncio
+    async def test_deleted_event_does_not_complete(self, mock_apps_v1, fake_watch):
+        fake_watch([{"type": "DELETED", "object": _dep()}])
+        mock_apps_v1.list_namespaced_deployment.return_value = _listing(_dep(updated=0))
+        with patch.object(k8s.time, "sleep"):
+            assert await k8s.wait_for_rollout("cust1", timeout=0.2) is False
+
+
+class TestK8sCall:
+    @pytest.mark.asyncio
+    async def test_runs_off_the_event_loop(self):
+        import threading
+
+        seen = {}
+
+        def blocking(**kwargs):
+            seen["thread"] = threading.current_thread().name
+            seen["kwargs"] = kwargs
+            return "ok"
+
+        assert await k8s.k8s_call(blocking) == "ok"
+        assert seen["thread"].startswith("k8s")
+        assert seen["kwargs"]["_request_timeout"] == k8s.settings.k8s_call_timeout
+
+    @pytest.mark.asyncio
+    async def test_times_out_without_blocking(self):
+        def slow(**kwargs):
+            time.sleep(0.5)
+
+        with patch.object(k8s.settings, "k8s_call_timeout", 0.05):
+            start = time.monotonic()
+            with pytest.raises(asyncio.TimeoutError):
+                await k8s.k8s_call(slow)
+        assert time.monotonic() - start < 0.4
 
 
 class TestAccessorAssertions:
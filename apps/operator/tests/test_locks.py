@@ -0,0 +1,88 @@
+"""Tests for openclaw_operator.locks."""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from redis.exceptions import LockError, LockNotOwnedError
+
+from openclaw_operator import locks
+from openclaw_operator.locks import CustomerBusy, CustomerLock
+
+
+@pytest.fixture(autouse=True)
+def lock_settings():
+    with patch.object(locks, "settings") as s:
+        s.job_lock_timeout = 0.03
+        yield s
+
+
+class TestCustomerLock:
+    @pytest.mark.asyncio
+    async def test_lock_parameters(self, mock_redis):
+        CustomerLock(mock_redis, "cust1")
+        mock_redis.lock.assert_called_once_with(
+"operator:lock:cust1", timeout=0.03, thread_local=False)
+
+    @pytest.mark.asyncio
+    async def test_renews_while_held(self, mock_redis):
+        inner = mock_redis.lock.return_value
+        lock = CustomerLock(mock_redis, "cust1")
+
+        assert await lock.acquire()
+        await asyncio.sleep(0.05)
+        await lock.release()
+        renewals = inner.reacquire.call_count
+        await asyncio.sleep(0.03)
+
+        assert renewals >= 2
+        assert inner.reacquire.call_count == renewals
+        inner.release.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_stops_renewing_once_lost(self, mock_redis):
+        inner = mock_redis.lock.return_value
+        inner.reacquire.side_effect = LockNotOwnedError("expired")
+        lock = CustomerLock(mock_redis, "cust1")
+
+        await lock.acquire()
+        await asyncio.sleep(0.05)
+
+        assert inner.reacquire.call_count == 1
+        await lock.release()
+
+    @pytest.mark.asyncio
+    async def test_not_acquired(self, mock_redis):
+        mock_redis.lock.return_value.acquire.return_value = False
+        lock = CustomerLock(mock_redis, "cust1")
+        assert not await lock.acquire()
+        mock_redis.lock.return_value.reacquire.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_release_ignores_lock_error(self, mock_redis):
+        mock_redis.lock.return_value.release.side_effect = LockError("gone")
+        lock = CustomerLock(mock_redis, "cust1")
+        await lock.acquire()
+        await lock.release()
+
+
+@pytest.mark.asyncio
+async def test_contended_job_does_not_wait(mock_redis):
+    """A job whose customer lock is taken is deferred at once instead of waiting."""
+    import openclaw_operator.main as m
+
+    mock_redis.lock.return_value.acquire.return_value = False
+    handler = AsyncMock()
+    job = json.dumps({"job_type": "destroy", "customer_id": "cust1", "payload": {"box_id": "box-1"}})
+
+    with (
+        patch.object(m, "get_redis", return_value=mock_redis),
+        patch.object(m, "get_session_factory", return_value=MagicMock()),
+        patch.dict(m.JOB_HANDLERS, {"destroy": handler}),
+        pytest.raises(CustomerBusy),
+    ):
+        await asyncio.wait_for(m.process_job(job), timeout=0.1)
+
+    mock_redis.lock.return_value.acquire.assert_awaited_once_with(blocking=False)
+    handler.assert_not_called()
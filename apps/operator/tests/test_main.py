@@ -1,23 +1,34 @@
 """Tests for openclaw_operator.main."""
 
+import contextlib
 import asyncio
 import json
+import time
 from datetime import datetime, timezone
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 import redis as redis_lib
 
+from openclaw_operator.locks import CustomerBusy
+
 from openclaw_operator.main import (
     JOB_HANDLERS,
     get_redis,
+    dispatch_job,
     get_session_factory,
     health,
-    log_job,
+    job_loop,
     process_job,
 )
 
 
+
+@pytest.fixture(autouse=True)
+def _resolve_namespace():
+    with patch("openclaw_operator.main.resolve_namespace", new_callable=AsyncMock) as resolve:
+        yield resolve
+
 class TestJobHandlers:
     def test_all_job_types_registered(self):
         expected = {
@@ -28,67 +39,14 @@ class TestJobHandlers:
             "update",
             "resize",
             "update_connections",
+            "rollout",
+            "sleep",
+            "wake",
+            "rightsize",
         }
         assert set(JOB_HANDLERS.keys()) == expected
 
 
-class TestLogJob:
-    @pytest.mark.asyncio
-    async def test_log_job_inserts_and_commits(self, mock_db):
-        started = datetime.now(timezone.utc)
-        await log_job(
-            mock_db,
-            customer_id="cust1",
-            box_id="box-1",
-            job_type="provision",
-            status="running",
-            payload={"tier": "starter"},
-            started_at=started,
-        )
-        mock_db.execute.assert_called_once()
-        mock_db.commit.assert_called_once()
-
-        # Verify the payload was JSON-serialized
-        call_args = mock_db.execute.call_args
-        params = call_args[0][1]
-        assert params["customer_id"] == "cust1"
-        assert params["box_id"] == "box-1"
-        assert params["job_type"] == "provision"
-        assert params["status"] == "running"
-        assert json.loads(params["payload"]) == {"tier": "starter"}
-
-    @pytest.mark.asyncio
-    async def test_log_job_with_error_log(self, mock_db):
-        started = datetime.now(timezone.utc)
-        await log_job(
-            mock_db,
-            customer_id="cust1",
-            box_id="box-1",
-            job_type="provision",
-            status="failed",
-            payload={},
-            error_log="Traceback ...",
-            started_at=started,
-        )
-        params = mock_db.execute.call_args[0][1]
-        assert params["error_log"] == "Traceback ..."
-
-    @pytest.mark.asyncio
-    async def test_log_job_without_box_id(self, mock_db):
-        started = datetime.now(timezone.utc)
-        await log_job(
-            mock_db,
-            customer_id="cust1",
-            box_id=None,
-            job_type="update_connections",
-            status="complete",
-            payload={},
-            started_at=started,
-        )
-        params = mock_db.execute.call_args[0][1]
-        assert params["box_id"] is None
-
-
 class TestProcessJob:
     @pytest.mark.asyncio
     async def test_dispatches_to_correct_handler(self, mock_redis):
@@ -117,6 +75,75 @@ class TestProcessJob:
         call_args = mock_handler.call_args[0]
         assert call_args[1] == "cust1"  # customer_id
 
+    @pytest.mark.asyncio
+    async def test_records_step_timings_on_completion(self, mock_redis):
+        from openclaw_operator.steps import step
+
+        async def handler(payload, customer_id, db):
+            with step("namespace"):
+                pass
+
+        job = json.dumps({"job_type": "provision", "customer_id": "cust1", "payload": {"box_id": "box-1"}})
+
+        mock_session = AsyncMock()
+        mock_session_factory = MagicMock()
+        mock_session_ctx = AsyncMock()
+        mock_session_ctx.__aenter__ = AsyncMock(return_value=mock_session)
+        mock_session_ctx.__aexit__ = AsyncMock(return_value=False)
+        mock_session_factory.return_value = mock_session_ctx
+
+        with (
+            patch("openclaw_operator.main.get_redis", return_value=mock_redis),
+            patch("openclaw_operator.main.get_session_factory", return_value=mock_session_factory),
+            patch("openclaw_operator.main.audit_job") as mock_audit,
+            patch.dict("openclaw_operator.main.JOB_HANDLERS", {"provision": handler}),
+        ):
+            await process_job(job)
+
+        final = mock_audit.call_args_list[-1][1]
+        assert final["status"] == "complete"
+        assert set(final["step_timings"]) == {"namespace"}
+
+    @pytest.mark.asyncio
+    async def test_audits_job_and_coalesced_rows(self, mock_redis):
+        job = json.dumps({
+            "job_id": "job-3", "coalesced": ["job-1", "job-2"],
+            "job_type": "update_connections", "customer_id": "cust1", "box_id": "box-1",
+        })
+        writer = MagicMock()
+
+        with (
+            patch("openclaw_operator.main.get_redis", return_value=mock_redis),
+            patch("openclaw_operator.main.get_session_factory", return_value=MagicMock()),
+            patch("openclaw_operator.main.get_audit_writer", return_value=writer),
+            patch.dict("openclaw_operator.main.JOB_HANDLERS", {"update_connections": AsyncMock()}),
+        ):
+            assert await process_job(job)
+
+        rows = [call[0][0] for call in writer.record.call_args_list]
+        assert [(row["id"], row["status"]) for row in rows] == [
+            ("job-3", "running"), ("job-1", "running"), ("job-2", "running"),
+            ("job-3", "complete"), ("job-1", "complete"), ("job-2", "complete"),
+        ]
+        assert rows[0]["completed_at"] is None
+        assert rows[-1]["completed_at"] is not None
+
+    @pytest.mark.asyncio
+    async def test_retries_audit_the_same_row(self, mock_redis):
+        job = json.dumps({"job_id": "job-1", "job_type": "destroy", "customer_id": "cust1", "box_id": "box-1"})
+        writer = MagicMock()
+
+        with (
+            patch("openclaw_operator.main.get_redis", return_value=mock_redis),
+            patch("openclaw_operator.main.get_session_factory", return_value=MagicMock()),
+            patch("openclaw_operator.main.get_audit_writer", return_value=writer),
+            patch.dict("openclaw_operator.main.JOB_HANDLERS", {"destroy": AsyncMock(side_effect=RuntimeError)}),
+        ):
+            assert not await process_job(job)
+            assert not await process_job(job)
+
+        assert {call[0][0]["id"] for call in writer.record.call_args_list} == {"job-1"}
+
     @pytest.mark.asyncio
     async def test_unknown_job_type_returns_early(self, mock_redis):
         job = json.dumps({
@@ -154,7 +181,7 @@ class TestProcessJob:
         mock_handler.assert_called_once()
 
     @pytest.mark.asyncio
-    async def test_lock_not_acquired_returns_early(self, mock_redis):
+    async def test_lock_not_acquired_raises_busy(self, mock_redis):
         mock_handler = AsyncMock()
         lock = mock_redis.lock.return_value
         lock.acquire.return_value = False
@@ -168,10 +195,50 @@ class TestProcessJob:
         with (
             patch("openclaw_operator.main.get_redis", return_value=mock_redis),
             patch.dict("openclaw_operator.main.JOB_HANDLERS", {"provision": mock_handler}),
+            pytest.raises(CustomerBusy),
+        ):
+            await process_job(job)
+
+        mock_handler.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_earlier_jobs_run_first(self, mock_redis):
+        mock_handler = AsyncMock()
+        queue = AsyncMock()
+        queue.may_run.return_value = False
+        job = json.dumps({
+            "job_id": "j2", "job_type": "destroy", "customer_id": "cust1", "payload": {"box_id": "box-1"},
+        })
+
+        with (
+            patch("openclaw_operator.main.get_redis", return_value=mock_redis),
+            patch("openclaw_operator.main._queue", queue),
+            patch.dict("openclaw_operator.main.JOB_HANDLERS", {"destroy": mock_handler}),
+            pytest.raises(CustomerBusy),
         ):
             await process_job(job)
 
         mock_handler.assert_not_called()
+        mock_redis.lock.return_value.release.assert_called_once()
+        queue.may_run.assert_awaited_once_with("cust1", ["j2"])
+
+    @pytest.mark.asyncio
+    async def test_requeues_parked_jobs_after_release(self, mock_redis):
+        queue = AsyncMock()
+        queue.may_run.return_value = True
+        job = json.dumps({"job_type": "destroy", "customer_id": "cust1", "payload": {"box_id": "box-1"}})
+
+        with (
+            patch("openclaw_operator.main.get_redis", return_value=mock_redis),
+            patch("openclaw_operator.main.get_session_factory", return_value=MagicMock()),
+            patch("openclaw_operator.main.audit_job"),
+            patch("openclaw_operator.main._queue", queue),
+            patch.dict("openclaw_operator.main.JOB_HANDLERS", {"destroy": AsyncMock()}),
+        ):
+            assert await process_job(job)
+
+        mock_redis.lock.return_value.release.assert_called_once()
+        queue.release_pending.assert_called_once_with("cust1")
 
     @pytest.mark.asyncio
     async def test_handler_failure_logs_error(self, mock_redis):
@@ -194,11 +261,11 @@ class TestProcessJob:
             patch("openclaw_operator.main.get_session_factory", return_value=mock_session_factory),
             patch.dict("openclaw_operator.main.JOB_HANDLERS", {"provision": mock_handler}),
         ):
-            # Should not raise — errors are caught and logged
-            await process_job(job)
+            # Should not raise — errors are caught, logged and reported for retry
+            assert await process_job(job) is False
 
     @pytest.mark.asyncio
-    async def test_lock_released_after_success(self, mock_redis):
+    async def test_lock_released_after_success(self, mock_redis, _resolve_namespace):
         mock_handler = AsyncMock()
         job = json.dumps({
             "job_type": "provision",
@@ -221,6 +288,9 @@ class TestProcessJob:
             await process_job(job)
 
         mock_redis.lock.return_value.release.assert_called_once()
+        mock_redis.pipeline.return_value.delete.assert_any_call("api:cache:cust1")
+        mock_redis.pipeline.return_value.incr.assert_any_call("api:cache:cust1:gen")
+        _resolve_namespace.assert_awaited_once_with("cust1")
 
     @pytest.mark.asyncio
     async def test_lock_released_after_failure(self, mock_redis):
@@ -246,6 +316,8 @@ class TestProcessJob:
             await process_job(job)
 
         mock_redis.lock.return_value.release.assert_called_once()
+        mock_redis.pipeline.return_value.delete.assert_any_call("api:cache:cust1")
+        mock_redis.pipeline.return_value.incr.assert_any_call("api:cache:cust1:gen")
 
     @pytest.mark.asyncio
     async def test_lock_not_owned_error_suppressed(self, mock_redis):
@@ -355,6 +427,216 @@ class TestProcessJob:
         assert call_args[0] == {}
 
 
+class FakeK8s:
+    """Stands in for the K8s layer: every API call costs ``latency`` seconds.
+
+    Also tracks the handlers running at once, overall and per customer.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls: list[tuple[str, str]] = []
+        self.running: list[str] = []
+        self.max_running = 0
+        self.overlapping: set[str] = set()
+
+    async def call(self, verb: str, customer_id: str) -> None:
+        self.calls.append((verb, customer_id))
+        await asyncio.sleep(self.latency)
+
+    @contextlib.contextmanager
+    def handler(self, customer_id: str):
+        if customer_id in self.running:
+            self.overlapping.add(customer_id)
+        self.running.append(customer_id)
+        self.max_running = max(self.max_running, len(self.running))
+        try:
+            yield
+        finally:
+            self.running.remove(customer_id)
+
+
+def _job(customer_id: str, n: int = 0) -> str:
+    return json.dumps({"job_type": "provision", "customer_id": customer_id, "n": n})
+
+
+async def _drain_with_loop(raws: list[str], concurrency: int, fake: FakeK8s) -> None:
+    """Feed ``raws`` through job_loop with a fake K8s layer."""
+    import openclaw_operator.main as m
+
+    pending = list(raws)
+    done = asyncio.Event()
+    finished: list[str] = []
+
+    async def fake_process(raw: str) -> None:
+        job = json.loads(raw)
+        # A provision-shaped handler: a few API round-trips plus a readiness wait.
+        with fake.handler(job["customer_id"]):
+            for verb in ("create_namespace", "create_secret", "create_deployment", "wait_ready"):
+                await fake.call(verb, job["customer_id"])
+        finished.append(raw)
+        if len(finished) == len(raws):
+            done.set()
+
+    def pop(keys, args):
+        return [pending.pop(0), 1, 1] if pending else None
+
+    r = MagicMock()
+    r.register_script.side_effect = lambda src: AsyncMock(
+        side_effect=pop if "LMOVE" in src else None, return_value=[0, 0, 0],
+    )
+    r.pipeline.return_value.execute = AsyncMock()
+
+    m._shutdown_event.clear()
+    with (
+        patch("openclaw_operator.main.get_redis", return_value=r),
+        patch("openclaw_operator.main.process_job", side_effect=fake_process),
+        patch("openclaw_operator.main.settings") as s,
+    ):
+        s.job_queue = "operator:jobs"
+        s.job_concurrency = concurrency
+        s.job_coalesce_window = 3
+        loop_task = asyncio.create_task(job_loop())
+        await asyncio.wait_for(done.wait(), timeout=10)
+        m._shutdown_event.set()
+        await loop_task
+    m._shutdown_event.clear()
+
+
+class TestJobLoop:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("concurrency", [1, 4])
+    async def test_runs_up_to_job_concurrency_handlers(self, concurrency):
+        """12 provisions over 6 customers, two each."""
+        fake = FakeK8s(0.01)
+        raws = [_job(f"cust{i % 6}", i // 6) for i in range(12)]
+
+        await _drain_with_loop(raws, concurrency=concurrency, fake=fake)
+
+        assert len(fake.calls) == 12 * 4
+        # The pool fills up but never past job_concurrency...
+        assert fake.max_running == concurrency
+        # ...and never runs two jobs for one customer at once.
+        assert fake.overlapping == set()
+
+    @pytest.mark.asyncio
+    async def test_same_customer_jobs_keep_order(self):
+        fake = FakeK8s(0.01)
+        raws = [_job("cust1", n) for n in range(3)] + [_job("cust2")]
+
+        await _drain_with_loop(raws, concurrency=4, fake=fake)
+
+        cust1_calls = [verb for verb, cid in fake.calls if cid == "cust1"]
+        # Each cust1 job completes all four calls before the next one starts.
+        assert cust1_calls == ["create_namespace", "create_secret", "create_deployment", "wait_ready"] * 3
+
+    @pytest.mark.asyncio
+    async def test_dispatch_chains_same_customer(self):
+        import openclaw_operator.main as m
+
+        order: list[int] = []
+
+        async def fake_process(raw: str) -> None:
+            n = json.loads(raw)["n"]
+            await asyncio.sleep(0.01 if n == 0 else 0)
+            order.append(n)
+
+        slots = asyncio.Semaphore(2)
+        with patch("openclaw_operator.main.process_job", side_effect=fake_process):
+            await slots.acquire()
+            first = dispatch_job(_job("cust1", 0), slots)
+            await slots.acquire()
+            second = dispatch_job(_job("cust1", 1), slots)
+            await asyncio.gather(first, second)
+
+        assert order == [0, 1]
+        assert "cust1" not in m._customer_tails
+        # Both slots were returned.
+        assert slots._value == 2
+
+    @pytest.mark.asyncio
+    async def test_chained_jobs_do_not_hold_slots(self):
+        release_first = asyncio.Event()
+        ran: list[str] = []
+
+        async def fake_process(raw: str) -> None:
+            job = json.loads(raw)
+            if job["customer_id"] == "cust1" and job["n"] == 0:
+                await release_first.wait()
+            ran.append(f'{job["customer_id"]}:{job["n"]}')
+
+        slots = asyncio.Semaphore(2)
+        with patch("openclaw_operator.main.process_job", side_effect=fake_process):
+            await slots.acquire()
+            busy = dispatch_job(_job("cust1", 0), slots)
+            await slots.acquire()
+            waiting = dispatch_job(_job("cust1", 1), slots)
+            await asyncio.sleep(0)
+
+            # cust1's second job waits without a slot, so cust2 still gets one.
+            await asyncio.wait_for(slots.acquire(), timeout=1)
+            await dispatch_job(_job("cust2"), slots)
+            assert ran == ["cust2:0"]
+
+            release_first.set()
+            await asyncio.gather(busy, waiting)
+
+        assert ran == ["cust2:0", "cust1:0", "cust1:1"]
+        assert slots._value == 2
+
+    @pytest.mark.asyncio
+    async def test_job_error_releases_slot(self):
+        slots = asyncio.Semaphore(1)
+        with patch("openclaw_operator.main.process_job", side_effect=Exception("boom")):
+            await slots.acquire()
+            await dispatch_job(_job("cust1"), slots)
+        assert not slots.locked()
+
+    @pytest.mark.asyncio
+    async def test_acks_successful_job(self):
+        queue = AsyncMock()
+        slots = asyncio.Semaphore(1)
+        with patch("openclaw_operator.main.process_job", return_value=True):
+            await slots.acquire()
+            await dispatch_job(_job("cust1"), slots, queue, attempt=1)
+        queue.ack.assert_called_once_with(_job("cust1"))
+        queue.fail.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_failed_job_is_retried(self):
+        queue = AsyncMock()
+        slots = asyncio.Semaphore(1)
+        with patch("openclaw_operator.main.process_job", return_value=False):
+            await slots.acquire()
+            await dispatch_job(_job("cust1"), slots, queue, attempt=2)
+        queue.fail.assert_called_once_with(_job("cust1"), 2, "job failed")
+        queue.ack.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_crashing_job_is_retried(self):
+        queue = AsyncMock()
+        slots = asyncio.Semaphore(1)
+        with patch("openclaw_operator.main.process_job", side_effect=ValueError("bad json")):
+            await slots.acquire()
+            await dispatch_job(_job("cust1"), slots, queue, attempt=1)
+        raw, attempt, error = queue.fail.call_args[0]
+        assert attempt == 1
+        assert "bad json" in error
+        assert not slots.locked()
+
+    @pytest.mark.asyncio
+    async def test_busy_customer_job_is_parked(self):
+        queue = AsyncMock()
+        slots = asyncio.Semaphore(1)
+        with patch("openclaw_operator.main.process_job", side_effect=CustomerBusy("cust1")):
+            await slots.acquire()
+            await dispatch_job(_job("cust1"), slots, queue, attempt=1)
+        queue.park.assert_called_once_with(_job("cust1"), "cust1")
+        queue.fail.assert_not_called()
+        queue.ack.assert_not_called()
+        assert not slots.locked()
+
+
 class TestHealth:
     @pytest.mark.asyncio
     async def test_healthy(self):
@@ -382,6 +664,122 @@ class TestHealth:
         finally:
             m._healthy = original
 
+    @pytest.mark.asyncio
+    async def test_pool_stats(self):
+        import openclaw_operator.main as m
+        from openclaw_operator import pool
+
+        pool._idle["starter"] = ["openclaw-pool-aaaa"]
+        resp = await m.pool(MagicMock())
+        body = json.loads(resp.body)
+        assert body["tiers"]["starter"]["idle"] == 1
+        assert body["hits"] == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_stats(self):
+        import openclaw_operator.main as m
+
+        queue = AsyncMock()
+        queue.stats.return_value = {"lanes": {"high": {"depth": 3}}}
+        with patch.object(m, "_queue", None):
+            assert (await m.queue_stats(MagicMock())).status_code == 503
+        with patch.object(m, "_queue", queue):
+            resp = await m.queue_stats(MagicMock())
+        assert json.loads(resp.body)["lanes"]["high"]["depth"] == 3
+
+    @pytest.mark.asyncio
+    async def test_loop_not_blocked_while_provisioning(self, mock_db):
+        """K8s round-trips run off the event loop, so it keeps running while the pool is saturated."""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        import httpx
+
+        import openclaw_operator.main as m
+        from openclaw_operator import k8s
+        from openclaw_operator.jobs.provision import handle_provision
+
+        beats = 0
+        busy, max_busy = 0, 0
+        beats_per_call: list[int] = []
+        lock = threading.Lock()
+
+        async def heartbeat():
+            nonlocal beats
+            while True:
+                beats += 1
+                await asyncio.sleep(0.005)
+
+        def slow(*args, **kwargs):
+            nonlocal busy, max_busy
+            # Readiness waits run on the separate watch pool; count k8s_call threads only.
+            pooled = threading.current_thread().name.startswith("k8s-test")
+            with lock:
+                busy += pooled
+                max_busy = max(max_busy, busy)
+            before = beats
+            time.sleep(0.1)  # a sluggish API server
+            beats_per_call.append(beats - before)
+            with lock:
+                busy -= pooled
+            dep = MagicMock()
+            dep.status.ready_replicas = 1
+            listing = MagicMock()
+            listing.items = [dep]
+            return listing
+
+        core, apps, net = MagicMock(), MagicMock(), MagicMock()
+        for api in (core, apps, net):
+            api.configure_mock(**{
+                name: MagicMock(side_effect=slow)
+                for name in ("api_client.call_api", "list_namespaced_deployment")
+            })
+
+        token_resp = MagicMock()
+        token_resp.json.return_value = {"token": "proxy-tok"}
+        token_client = AsyncMock()
+        token_client.post = AsyncMock(return_value=token_resp)
+        token_client.__aenter__ = AsyncMock(return_value=token_client)
+        token_client.__aexit__ = AsyncMock(return_value=False)
+
+        payload = {"box_id": "box-1", "tier": "starter", "telegram_bot_token": "t", "telegram_allow_from": "1"}
+        pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="k8s-test")
+        original = m._healthy
+        m._healthy = True
+        transport = httpx.ASGITransport(app=m.app)
+        probes = 0
+        ticker = asyncio.create_task(heartbeat())
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://operator") as http:
+                with (
+                    patch.object(k8s, "_core_v1", core),
+                    patch.object(k8s, "_apps_v1", apps),
+                    patch.object(k8s, "_networking_v1", net),
+                    patch.object(k8s, "_executor", pool),
+                    patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=token_client),
+                ):
+                    # Twice as many provisions as threads, so calls queue for the pool.
+                    provisions = asyncio.gather(*(
+                        handle_provision(payload, f"cust{i}", mock_db) for i in range(4)
+                    ))
+                    while not provisions.done():
+                        resp = await http.get("/healthz")
+                        assert resp.status_code == 200
+                        probes += 1
+                        await asyncio.sleep(0.01)
+                    await provisions
+        finally:
+            ticker.cancel()
+            pool.shutdown()
+            m._healthy = original
+
+        assert max_busy == 2
+        # Every blocking call let the loop tick on (~20 beats per 100ms call;
+        # a call made on the loop thread would see none), and probes kept answering.
+        assert len(beats_per_call) >= 4 * 6
+        assert min(beats_per_call) > 0
+        assert probes > 20
+
 
 class TestGetRedis:
     def test_creates_redis_client(self):
@@ -390,7 +788,7 @@ class TestGetRedis:
         original = m._redis
         m._redis = None
         try:
-            with patch("openclaw_operator.main.redis.from_url") as mock_from_url:
+            with patch("openclaw_operator.main.aioredis.from_url") as mock_from_url:
                 mock_from_url.return_value = MagicMock()
                 r = get_redis()
                 mock_from_url.assert_called_once()
@@ -0,0 +1,79 @@
+"""Tests for openclaw_operator.metrics."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from openclaw_operator import informers, metrics
+
+
+def _item(ns: str, name: str) -> dict:
+    return {"metadata": {"namespace": ns, "name": name}, "containers": [{"usage": {"cpu": "5m", "memory": "1Mi"}}]}
+
+
+def _listing(items: list[dict]) -> dict:
+    return {"metadata": {}, "items": items}
+
+
+@pytest.fixture
+def session():
+    db = AsyncMock()
+    db.__aenter__.return_value = db
+    return MagicMock(return_value=db), db
+
+
+@pytest.fixture(autouse=True)
+def _no_pod_cache():
+    with patch.object(metrics, "pods", informers.Informer("pods", MagicMock(), "app=openclaw-gateway")):
+        yield
+
+
+class TestParse:
+    def test_cpu(self):
+        assert metrics.parse_cpu("125m") == 125
+        assert metrics.parse_cpu("2") == 2000
+        assert metrics.parse_cpu("5000000n") == 5
+
+    def test_memory(self):
+        assert metrics.parse_memory("256Mi") == 256 * 1024**2
+        assert metrics.parse_memory("1G") == 1_000_000_000
+
+
+class TestCollectPodMetrics:
+    @pytest.mark.asyncio
+    async def test_lists_gateway_pods(self, session):
+        factory, db = session
+        listing = _listing([_item("customer-cust1", "gw-1"), _item("customer-cust2", "gw-2")])
+        call = AsyncMock(return_value=listing)
+
+        with (
+            patch.object(metrics, "k8s_call", call),
+            patch.object(metrics.client, "CustomObjectsApi"),
+        ):
+            assert await metrics.collect_pod_metrics(factory) == 2
+
+        assert call.call_args[1] == {"label_selector": "app=openclaw-gateway"}
+        assert len(db.execute.call_args[0][1]) == 2
+        db.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_skips_namespaces_without_customer(self, session):
+        factory, db = session
+        page = _listing([_item("openclaw-pool-aaaa", "gw-1")])
+
+        with (
+            patch.object(metrics, "k8s_call", AsyncMock(return_value=page)),
+            patch.object(metrics.client, "CustomObjectsApi"),
+        ):
+            assert await metrics.collect_pod_metrics(factory) == 0
+        db.execute.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_metrics_server_unavailable(self, session):
+        factory, _ = session
+
+        with (
+            patch.object(metrics, "k8s_call", AsyncMock(side_effect=Exception("404"))),
+            patch.object(metrics.client, "CustomObjectsApi"),
+        ):
+            assert await metrics.collect_pod_metrics(factory) == 0
@@ -0,0 +1,186 @@
+"""Tests for openclaw_operator.pool."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from kubernetes.client import ApiException, V1Namespace, V1NamespaceList, V1NamespaceStatus, V1ObjectMeta
+
+from openclaw_operator import k8s, pool
+
+
+def _ns(name: str, labels: dict, phase: str = "Active") -> V1Namespace:
+    return V1Namespace(metadata=V1ObjectMeta(name=name, labels=labels), status=V1NamespaceStatus(phase=phase))
+
+
+@pytest.fixture
+def pool_settings():
+    with patch.object(pool, "settings") as s:
+        s.warm_pool = {"starter": 3}
+        s.warm_pool_refill = 2
+        s.openclaw_image = "openclaw-gateway:test"
+        yield s
+
+
+class TestClaim:
+    @pytest.fixture
+    def api(self, mock_core_v1):
+        def read_namespace(name, **kwargs):
+            ns = _ns(name, {"openclaw/pool": "starter"})
+            ns.metadata.resource_version = "7"
+            return ns
+
+        mock_core_v1.read_namespace.side_effect = read_namespace
+        with patch.object(k8s, "_core_v1", mock_core_v1):
+            yield mock_core_v1
+
+    @pytest.mark.asyncio
+    async def test_hit_binds_namespace(self, api):
+        pool._idle["starter"] = ["openclaw-pool-aaaa"]
+        assert await pool.claim("cust1", "starter") == "openclaw-pool-aaaa"
+        assert k8s.namespace_name("cust1") == "openclaw-pool-aaaa"
+        assert k8s.customer_for_namespace("openclaw-pool-aaaa") == "cust1"
+        assert pool._idle["starter"] == []
+        assert pool._stats.hits == 1
+        assert api.patch_namespace.call_args[0] == ("openclaw-pool-aaaa", {"metadata": {
+            "resourceVersion": "7",
+            "labels": {"openclaw/pool": None, "openclaw/customer": "cust1"},
+        }})
+
+    @pytest.mark.asyncio
+    async def test_miss_keeps_default_namespace(self, api):
+        pool._idle["pro"] = ["openclaw-pool-bbbb"]
+        assert await pool.claim("cust1", "starter") is None
+        assert k8s.namespace_name("cust1") == "customer-cust1"
+        assert pool._stats.misses == 1
+        api.read_namespace.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_conflict_moves_to_next_namespace(self, api):
+        pool._idle["starter"] = ["openclaw-pool-bbbb", "openclaw-pool-aaaa"]
+        api.patch_namespace.side_effect = [ApiException(status=409), None]
+        assert await pool.claim("cust1", "starter") == "openclaw-pool-bbbb"
+        assert k8s.customer_for_namespace("openclaw-pool-aaaa") is None
+        assert pool._stats.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_skips_namespace_claimed_elsewhere(self, api):
+        pool._idle["starter"] = ["openclaw-pool-aaaa"]
+        api.read_namespace.side_effect = lambda name, **kw: _ns(name, {"openclaw/customer": "cust9"})
+        assert await pool.claim("cust1", "starter") is None
+        api.patch_namespace.assert_not_called()
+        assert pool._stats.misses == 1
+
+
+class TestSync:
+    @pytest.mark.asyncio
+    async def test_rebuilds_idle_and_bound(self, mock_core_v1):
+        def list_namespace(label_selector, **kwargs):
+            if label_selector == pool.POOL_LABEL:
+                return V1NamespaceList(items=[
+                    _ns("openclaw-pool-aaaa", {"openclaw/pool": "starter"}),
+                    _ns("openclaw-pool-dead", {"openclaw/pool": "starter"}, phase="Terminating"),
+                ])
+            return V1NamespaceList(items=[
+                _ns("openclaw-pool-cccc", {"openclaw/customer": "cust1"}),
+                _ns("customer-cust2", {"openclaw/customer": "cust2"}),
+            ])
+
+        mock_core_v1.list_namespace.side_effect = list_namespace
+        with patch.object(k8s, "_core_v1", mock_core_v1), patch.object(pool, "_synced", False):
+            await pool.sync()
+            assert pool._synced
+
+        assert pool._idle == {"starter": ["openclaw-pool-aaaa"]}
+        assert k8s.namespace_name("cust1") == "openclaw-pool-cccc"
+        assert k8s.has_namespace("cust2")
+
+
+class TestRefill:
+    @pytest.mark.asyncio
+    async def test_creates_up_to_refill_batch(self, pool_settings):
+        with patch.object(pool, "apply_manifest", new_callable=AsyncMock) as apply:
+            assert await pool.refill() == 2
+
+        assert len(pool._idle["starter"]) == 2
+        assert pool._stats.created == 2
+        kinds = [c[0][0]["kind"] for c in apply.call_args_list]
+        assert kinds.count("Namespace") == 2
+        assert kinds.count("Deployment") == 2
+        dep = next(c[0][0] for c in apply.call_args_list if c[0][0]["kind"] == "Deployment")
+        assert dep["spec"]["replicas"] == 0
+        assert "openclaw/customer" not in dep["metadata"]["labels"]
+
+    @pytest.mark.asyncio
+    async def test_stops_at_target(self, pool_settings):
+        pool._idle["starter"] = ["a", "b", "c"]
+        with patch.object(pool, "apply_manifest", new_callable=AsyncMock) as apply:
+            assert await pool.refill() == 0
+        apply.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_failure_is_counted(self, pool_settings):
+        pool_settings.warm_pool_refill = 1
+        with patch.object(pool, "apply_manifest", new_callable=AsyncMock, side_effect=RuntimeError("boom")):
+            assert await pool.refill() == 0
+        assert pool._idle.get("starter", []) == []
+        assert pool._stats.refill_failures == 1
+
+    def test_stats(self, pool_settings):
+        pool._idle["starter"] = ["a"]
+        pool._stats.hits = 4
+        stats = pool.stats()
+        assert stats["tiers"] == {"starter": {"target": 3, "idle": 1}}
+        assert stats["hits"] == 4
+
+
+class TestProvisionClaim:
+    @pytest.fixture
+    def token_client(self):
+        resp = MagicMock()
+        resp.json.return_value = {"token": "proxy-tok"}
+        c = AsyncMock()
+        c.post = AsyncMock(return_value=resp)
+        c.__aenter__ = AsyncMock(return_value=c)
+        c.__aexit__ = AsyncMock(return_value=False)
+        return c
+
+    @pytest.mark.asyncio
+    async def test_provision_applies_over_claimed_namespace(self, mock_db, mock_core_v1, token_client):
+        from openclaw_operator.jobs.provision import handle_provision
+
+        pool._idle["starter"] = ["openclaw-pool-aaaa"]
+        mock_core_v1.read_namespace.return_value = _ns("openclaw-pool-aaaa", {"openclaw/pool": "starter"})
+        payload = {"box_id": "box-1", "tier": "starter", "telegram_bot_token": "t", "telegram_allow_from": "1"}
+        with (
+            patch.object(k8s, "_core_v1", mock_core_v1),
+            patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=token_client),
+            patch("openclaw_operator.jobs.provision.apply_manifest") as apply,
+            patch("openclaw_operator.jobs.provision.wait_for_pod_ready", return_value=True),
+        ):
+            await handle_provision(payload, "cust1", mock_db)
+            await handle_provision(payload, "cust1", mock_db)
+
+        namespaces = {c[0][0]["metadata"].get("namespace") for c in apply.call_args_list} - {None}
+        assert namespaces == {"openclaw-pool-aaaa"}
+        ns = next(c[0][0] for c in apply.call_args_list if c[0][0]["kind"] == "Namespace")
+        assert ns["metadata"]["name"] == "openclaw-pool-aaaa"
+        assert ns["metadata"]["labels"] == {"openclaw/customer": "cust1", "openclaw/tier": "starter"}
+        # The re-run reused the bound namespace instead of claiming again.
+        assert pool._stats.hits == 1
+        assert pool._stats.misses == 0
+
+    @pytest.mark.asyncio
+    async def test_provision_without_pool_binds_default(self, mock_db, token_client):
+        from openclaw_operator.jobs.provision import handle_provision
+
+        payload = {"box_id": "box-1", "tier": "pro", "telegram_bot_token": "t", "telegram_allow_from": "1"}
+        with (
+            patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=token_client),
+            patch("openclaw_operator.jobs.provision.apply_manifest"),
+            patch("openclaw_operator.jobs.provision.wait_for_pod_ready", return_value=True),
+        ):
+            await handle_provision(payload, "cust1", mock_db)
+
+        assert pool._stats.misses == 1
+        assert k8s.has_namespace("cust1")
+        assert k8s.namespace_name("cust1") == "customer-cust1"
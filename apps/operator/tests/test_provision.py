@@ -1,12 +1,19 @@
 """Tests for openclaw_operator.jobs.provision."""
 
+import json
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
 import pytest
 
+from openclaw_operator.bundles import BundleSpec
+from openclaw_operator.jobs import provision as provision_module
 from openclaw_operator.jobs.provision import handle_provision
+from openclaw_operator.k8s import config_hash
+from openclaw_operator.niches import NICHES
+from openclaw_operator.steps import record_steps
+from openclaw_operator.tiers import TIER_RESOURCES
 
 
 @pytest.fixture
@@ -24,24 +31,20 @@ def provision_payload():
 @pytest.fixture
 def _patch_k8s():
     with (
-        patch("openclaw_operator.jobs.provision.create_namespace") as ns,
-        patch("openclaw_operator.jobs.provision.create_config_secret") as sec,
-        patch("openclaw_operator.jobs.provision.create_resource_quota") as rq,
-        patch("openclaw_operator.jobs.provision.create_network_policy") as np,
-        patch("openclaw_operator.jobs.provision.create_deployment") as dep,
+        patch("openclaw_operator.jobs.provision.apply_manifest") as apply,
         patch("openclaw_operator.jobs.provision.wait_for_pod_ready") as wait,
     ):
         wait.return_value = True
         yield {
-            "create_namespace": ns,
-            "create_config_secret": sec,
-            "create_resource_quota": rq,
-            "create_network_policy": np,
-            "create_deployment": dep,
+            "apply_manifest": apply,
             "wait_for_pod_ready": wait,
         }
 
 
+def _applied(apply) -> dict[str, dict]:
+    return {c[0][0]["kind"]: c[0][0] for c in apply.call_args_list}
+
+
 class TestHandleProvision:
     @pytest.mark.asyncio
     async def test_happy_path(self, mock_db, provision_payload, _patch_k8s, _patch_settings):
@@ -63,17 +66,105 @@ class TestHandleProvision:
         assert "internal/tokens" in post_kwargs[0][0]
 
         # Verify K8s calls
-        _patch_k8s["create_namespace"].assert_called_once_with("cust1", "starter")
-        _patch_k8s["create_config_secret"].assert_called_once()
-        _patch_k8s["create_resource_quota"].assert_called_once_with("cust1", "starter")
-        _patch_k8s["create_network_policy"].assert_called_once_with("cust1")
-        _patch_k8s["create_deployment"].assert_called_once()
+        applied = _applied(_patch_k8s["apply_manifest"])
+        assert _patch_k8s["apply_manifest"].call_count == 5
+        assert set(applied) == {"Namespace", "Secret", "ResourceQuota", "NetworkPolicy", "Deployment"}
+        assert applied["Namespace"]["metadata"]["labels"]["openclaw/tier"] == "starter"
+        assert applied["Secret"]["stringData"]["KIMI_API_KEY"] == "proxy-tok-123"
+        container = applied["Deployment"]["spec"]["template"]["spec"]["containers"][0]
+        assert container["image"] == provision_module.settings.openclaw_image
+        # The pod template records the secret it was provisioned with.
+        annotations = applied["Deployment"]["spec"]["template"]["metadata"]["annotations"]
+        recorded = json.loads(annotations["openclaw/config-hashes"])
+        assert recorded == {key: config_hash(value) for key, value in applied["Secret"]["stringData"].items()}
         _patch_k8s["wait_for_pod_ready"].assert_called_once()
 
-        # Verify DB update
-        mock_db.execute.assert_called_once()
+        # Verify DB reads (image) and update
+        assert mock_db.execute.call_args_list[0][0][0] is provision_module.BOX_IMAGE
+        assert "status = 'active'" in str(mock_db.execute.call_args[0][0])
         mock_db.commit.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_keeps_rolled_out_image(self, mock_db, provision_payload, _patch_k8s, _patch_settings):
+        mock_db.execute.return_value.scalar.return_value = "openclaw-gateway:v2"
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"token": "tok"}
+        mock_response.raise_for_status = MagicMock()
+
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+        mock_client.__aexit__ = AsyncMock(return_value=False)
+
+        with patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client):
+            await handle_provision(provision_payload, "cust1", mock_db)
+
+        container = _applied(_patch_k8s["apply_manifest"])["Deployment"]["spec"]["template"]["spec"]["containers"][0]
+        assert container["image"] == "openclaw-gateway:v2"
+
+    @pytest.mark.asyncio
+    async def test_keeps_right_sized_requests(self, mock_db, provision_payload, _patch_k8s, _patch_settings):
+        mock_db.execute.return_value.fetchone.return_value = ("150m", "384Mi")
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"token": "tok"}
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+        mock_client.__aexit__ = AsyncMock(return_value=False)
+
+        with patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client):
+            await handle_provision(provision_payload, "cust1", mock_db)
+
+        container = _applied(_patch_k8s["apply_manifest"])["Deployment"]["spec"]["template"]["spec"]["containers"][0]
+        assert container["resources"]["requests"] == {"cpu": "150m", "memory": "384Mi"}
+        res = TIER_RESOURCES[provision_payload["tier"]]
+        assert container["resources"]["limits"] == {"cpu": res.cpu_limit, "memory": res.memory_limit}
+        assert mock_db.execute.call_args_list[1][0][0] is provision_module.BOX_REQUESTS
+
+    @pytest.mark.asyncio
+    async def test_steps_follow_dependency_graph(self, mock_db, provision_payload, _patch_k8s, _patch_settings):
+        order: list[str] = []
+        _patch_k8s["apply_manifest"].side_effect = lambda m: order.append(m["kind"])
+        _patch_k8s["wait_for_pod_ready"].side_effect = lambda *a, **kw: order.append("wait") or True
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"token": "proxy-tok-123"}
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+        mock_client.__aexit__ = AsyncMock(return_value=False)
+
+        with (
+            patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client),
+            record_steps() as timings,
+        ):
+            await handle_provision(provision_payload, "cust1", mock_db)
+
+        assert order[0] == "Namespace"
+        assert set(order[1:4]) == {"Secret", "ResourceQuota", "NetworkPolicy"}
+        assert order[4:] == ["Deployment", "wait"]
+        assert set(timings) == {"token", "namespace", "secret", "quota", "netpol", "deployment", "wait_ready"}
+
+    @pytest.mark.asyncio
+    async def test_rerun_applies_identical_manifests(self, mock_db, provision_payload, _patch_k8s, _patch_settings):
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"token": "proxy-tok-123"}
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+        mock_client.__aexit__ = AsyncMock(return_value=False)
+
+        with patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client):
+            await handle_provision(provision_payload, "cust1", mock_db)
+            first = _applied(_patch_k8s["apply_manifest"])
+            _patch_k8s["apply_manifest"].reset_mock()
+            await handle_provision(provision_payload, "cust1", mock_db)
+
+        # Same desired state both times, so the second apply is a no-op diff.
+        assert _applied(_patch_k8s["apply_manifest"]) == first
+
     @pytest.mark.asyncio
     async def test_pod_not_ready_raises_timeout(self, mock_db, provision_payload, _patch_settings):
         mock_response = MagicMock()
@@ -87,11 +178,7 @@ class TestHandleProvision:
 
         with (
             patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client),
-            patch("openclaw_operator.jobs.provision.create_namespace"),
-            patch("openclaw_operator.jobs.provision.create_config_secret"),
-            patch("openclaw_operator.jobs.provision.create_resource_quota"),
-            patch("openclaw_operator.jobs.provision.create_network_policy"),
-            patch("openclaw_operator.jobs.provision.create_deployment"),
+            patch("openclaw_operator.jobs.provision.apply_manifest"),
             patch("openclaw_operator.jobs.provision.wait_for_pod_ready", return_value=False),
         ):
             with pytest.raises(TimeoutError, match="Pod not ready"):
@@ -118,8 +205,37 @@ class TestHandleProvision:
         with patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client):
             await handle_provision(payload, "cust1", mock_db)
 
-        secret_call = _patch_k8s["create_config_secret"].call_args
-        assert secret_call[1]["telegram_allow_from"] == "fallback-user"
+        secret = _applied(_patch_k8s["apply_manifest"])["Secret"]
+        assert secret["stringData"]["TELEGRAM_ALLOW_FROM"] == "fallback-user"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("niche, expected", [
+        ("pharmacy", NICHES["pharmacy"].system_prompt),
+        (None, None),
+    ])
+    async def test_bundle_reference_leaves_prompt_alone(
+        self, mock_db, provision_payload, _patch_k8s, _patch_settings, niche, expected,
+    ):
+        provision_payload.update(niche=niche, bundle_id="b-1", bundle_version=3)
+        bundle = BundleSpec(id="b-1", slug="pharmacy", version=3, prompts={"soul": "Bundle soul."})
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"token": "tok"}
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+        mock_client.__aexit__ = AsyncMock(return_value=False)
+
+        with (
+            patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client),
+            patch("openclaw_operator.jobs.provision.resolve_bundle", AsyncMock(return_value=bundle)) as resolve,
+        ):
+            await handle_provision(provision_payload, "cust1", mock_db)
+
+        resolve.assert_awaited_once_with(mock_db, "b-1", 3)
+        # The prompt is chosen as before bundle references: from the niche only.
+        secret = _applied(_patch_k8s["apply_manifest"])["Secret"]
+        assert secret["stringData"].get("OPENCLAW_SYSTEM_PROMPT") == expected
 
     @pytest.mark.asyncio
     async def test_default_model_and_thinking(self, mock_db, _patch_k8s, _patch_settings):
@@ -142,9 +258,9 @@ class TestHandleProvision:
         with patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client):
             await handle_provision(payload, "cust1", mock_db)
 
-        secret_call = _patch_k8s["create_config_secret"].call_args
-        assert secret_call[1]["model"] == "kimi-coding/k2p5"
-        assert secret_call[1]["thinking"] == "medium"
+        secret = _applied(_patch_k8s["apply_manifest"])["Secret"]
+        assert secret["stringData"]["OPENCLAW_MODEL"] == "kimi-coding/k2p5"
+        assert secret["stringData"]["OPENCLAW_THINKING"] == "medium"
 
     @pytest.mark.asyncio
     async def test_token_proxy_http_error_propagates(self, mock_db, provision_payload, _patch_settings):
@@ -161,3 +277,40 @@ class TestHandleProvision:
         with patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client):
             with pytest.raises(httpx.HTTPStatusError):
                 await handle_provision(provision_payload, "cust1", mock_db)
+
+    @pytest.mark.asyncio
+    async def test_repair_reads_bot_token_from_secret(self, mock_db, provision_payload, _patch_k8s, _patch_settings):
+        del provision_payload["telegram_bot_token"]
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"token": "tok"}
+        mock_response.raise_for_status = MagicMock()
+
+        mock_client = AsyncMock()
+        mock_client.post = AsyncMock(return_value=mock_response)
+        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
+        mock_client.__aexit__ = AsyncMock(return_value=False)
+
+        with (
+            patch("openclaw_operator.jobs.provision.httpx.AsyncClient", return_value=mock_client),
+            patch("openclaw_operator.jobs.provision.has_namespace", return_value=True),
+            patch(
+                "openclaw_operator.jobs.provision.read_config_secret",
+                AsyncMock(return_value={"TELEGRAM_BOT_TOKEN": "stored-tok"}),
+            ),
+        ):
+            await handle_provision(provision_payload, "cust1", mock_db)
+
+        secret = _applied(_patch_k8s["apply_manifest"])["Secret"]
+        assert secret["stringData"]["TELEGRAM_BOT_TOKEN"] == "stored-tok"
+
+    @pytest.mark.asyncio
+    async def test_repair_without_namespace_reads_bot_token_from_db(self, mock_db, _patch_settings):
+        mock_db.execute.return_value = MagicMock(scalar=MagicMock(return_value="db-tok"))
+
+        assert await provision_module._stored_bot_token("cust1", "box-1", mock_db) == "db-tok"
+        assert mock_db.execute.call_args[0][1] == {"box_id": "box-1"}
+
+        mock_db.execute.return_value = MagicMock(scalar=MagicMock(return_value=None))
+        with pytest.raises(ValueError):
+            await provision_module._stored_bot_token("cust1", "box-1", mock_db)
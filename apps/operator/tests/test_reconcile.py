@@ -0,0 +1,198 @@
+"""Tests for openclaw_operator.reconcile."""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from openclaw_operator import informers, k8s, reconcile
+
+
+def _ns(customer_id, name=None):
+    return SimpleNamespace(metadata=SimpleNamespace(
+        name=name or f"customer-{customer_id}", labels={"openclaw/customer": customer_id},
+    ))
+
+
+def _dep(ns, replicas):
+    return SimpleNamespace(
+        metadata=SimpleNamespace(namespace=ns, name="openclaw-gateway"),
+        spec=SimpleNamespace(replicas=replicas),
+    )
+
+
+def _session_factory(boxes, box_rows=()):
+    db = AsyncMock()
+    db.__aenter__.return_value = db
+
+    def execute(query, params=None):
+        result = MagicMock()
+        if "FROM boxes b" not in str(query):
+            result.fetchall.return_value = boxes
+        else:
+            result.fetchall.return_value = list(box_rows)
+        return result
+
+    db.execute.side_effect = execute
+    return MagicMock(return_value=db), db
+
+
+@pytest.fixture
+def mock_redis(mock_redis):
+    """SET NX with an in-memory key space, for the cooldown."""
+    keys: dict[str, str] = {}
+
+    async def set_(key, value, nx=False, ex=None):
+        if nx and key in keys:
+            return None
+        keys[key] = value
+        return True
+
+    mock_redis.set.side_effect = set_
+    mock_redis.keys_ = keys
+    return mock_redis
+
+
+@pytest.fixture(autouse=True)
+def _reset_state(mock_core_v1, mock_apps_v1):
+    with (
+        patch.object(reconcile, "_last_report", None),
+        patch.object(k8s, "_core_v1", mock_core_v1),
+        patch.object(k8s, "_apps_v1", mock_apps_v1),
+        patch.object(reconcile, "settings") as s,
+    ):
+        s.job_queue = "operator:jobs"
+        s.reconcile_max_jobs = 20
+        s.reconcile_cooldown = 900
+        yield s
+
+
+def _cluster(mock_core_v1, mock_apps_v1, namespaces, deployments):
+    mock_core_v1.list_namespace.return_value = MagicMock(items=namespaces)
+    mock_apps_v1.list_deployment_for_all_namespaces.return_value = MagicMock(items=deployments)
+
+
+def _pushed(r) -> list[dict]:
+    return [json.loads(call[0][1]) for call in r.pipeline.return_value.rpush.call_args_list]
+
+
+class TestReconcileOnce:
+    @pytest.mark.asyncio
+    async def test_enqueues_corrective_jobs(self, mock_core_v1, mock_apps_v1, mock_redis):
+        _cluster(
+            mock_core_v1, mock_apps_v1,
+            [_ns("ok"), _ns("down"), _ns("awake"), _ns("gone-dep"), _ns("stray")],
+            [_dep("customer-ok", 1), _dep("customer-down", 0), _dep("customer-awake", 1), _dep("customer-stray", 1)],
+        )
+        factory, _ = _session_factory(
+            [
+                ("b-ok", "ok", "active"),
+                ("b-down", "down", "active"),
+                ("b-awake", "awake", "suspended"),
+                ("b-gone", "gone", "active"),
+                ("b-gone-dep", "gone-dep", "active"),
+                ("b-gone-susp", "gone-susp", "suspended"),
+            ],
+            [("b-gone", "starter", [111, 222], "kimi-coding/k2p5", "high", "en", "bundle-1", 3)],
+        )
+
+        report = await reconcile.reconcile_once(factory, mock_redis)
+
+        assert report.checked == 6
+        assert report.missing == 3
+        assert report.scaled_down == 1
+        assert report.running_while_suspended == 1
+        assert report.orphaned == 1
+        # b-gone-dep's row could not be read, so it is skipped.
+        jobs = {(j["type"], j["box_id"]) for j in _pushed(mock_redis)}
+        assert jobs == {("reactivate", "b-down"), ("suspend", "b-awake"), ("provision", "b-gone")}
+        mock_redis.pipeline.return_value.execute.assert_called_once()
+        assert {c[0][0] for c in mock_redis.pipeline.return_value.rpush.call_args_list} == {"operator:jobs:low"}
+        provision = next(j for j in _pushed(mock_redis) if j["type"] == "provision")
+        # Built from the box's row, without the bot token.
+        assert provision["payload"] == {
+            "box_id": "b-gone",
+            "tier": "starter",
+            "telegram_allow_from": "111,222",
+            "model": "kimi-coding/k2p5",
+            "thinking": "high",
+            "language": "en",
+            "bundle_id": "bundle-1",
+            "bundle_version": 3,
+        }
+        assert reconcile.last_report()["enqueued"] == 3
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_and_cooldown(self, mock_core_v1, mock_apps_v1, mock_redis, _reset_state):
+        _reset_state.reconcile_max_jobs = 1
+        _cluster(mock_core_v1, mock_apps_v1, [_ns("a"), _ns("b")], [_dep("customer-a", 0), _dep("customer-b", 0)])
+        factory, _ = _session_factory([("b-a", "a", "active"), ("b-b", "b", "active")])
+
+        first = await reconcile.reconcile_once(factory, mock_redis)
+        second = await reconcile.reconcile_once(factory, mock_redis)
+        third = await reconcile.reconcile_once(factory, mock_redis)
+
+        assert (first.enqueued, first.deferred) == (1, 1)
+        assert (second.enqueued, second.deferred) == (1, 1)
+        assert (third.enqueued, third.deferred) == (0, 2)
+        assert [j["box_id"] for j in _pushed(mock_redis)] == ["b-a", "b-b"]
+        assert set(mock_redis.keys_) == {"operator:reconcile:cooldown:b-a", "operator:reconcile:cooldown:b-b"}
+        assert mock_redis.set.call_args[1] == {"nx": True, "ex": 900}
+
+    @pytest.mark.asyncio
+    async def test_cooldown_shared_between_replicas(self, mock_core_v1, mock_apps_v1, mock_redis):
+        _cluster(mock_core_v1, mock_apps_v1, [_ns("a")], [_dep("customer-a", 0)])
+        factory, _ = _session_factory([("b-a", "a", "active")])
+        # Another replica repaired b-a a moment ago.
+        mock_redis.keys_["operator:reconcile:cooldown:b-a"] = "1"
+
+        report = await reconcile.reconcile_once(factory, mock_redis)
+
+        assert (report.enqueued, report.deferred) == (0, 1)
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_skips_busy_customers(self, mock_core_v1, mock_apps_v1, mock_redis):
+        _cluster(mock_core_v1, mock_apps_v1, [_ns("a")], [_dep("customer-a", 0)])
+        factory, _ = _session_factory([("b-a", "a", "active")])
+
+        report = await reconcile.reconcile_once(factory, mock_redis, busy={"a"})
+
+        assert report.scaled_down == 1
+        assert report.enqueued == 0
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_reads_deployments_from_cache(self, mock_core_v1, mock_apps_v1, mock_redis):
+        cache = informers.Informer("deployments", MagicMock(), informers.GATEWAY_SELECTOR)
+        cache._replace([_dep("openclaw-pool-aaaa", 1)])
+        _cluster(mock_core_v1, mock_apps_v1, [_ns("a", "openclaw-pool-aaaa")], [])
+        factory, _ = _session_factory([("b-a", "a", "active")])
+
+        with patch.object(informers, "deployments", cache):
+            report = await reconcile.reconcile_once(factory, mock_redis)
+
+        assert report.missing == 0
+        mock_apps_v1.list_deployment_for_all_namespaces.assert_not_called()
+        assert k8s.namespace_name("a") == "openclaw-pool-aaaa"
+
+    @pytest.mark.asyncio
+    async def test_full_pass_at_10k_boxes(self, mock_core_v1, mock_apps_v1, mock_redis):
+        n = 10_000
+        boxes = [(f"box-{i}", f"c{i}", "active" if i % 2 else "suspended") for i in range(n)]
+        namespaces = [_ns(f"c{i}") for i in range(n)]
+        deployments = [_dep(f"customer-c{i}", i % 2) for i in range(n)]
+        deployments[0].spec.replicas = 1  # one suspended box still running
+        _cluster(mock_core_v1, mock_apps_v1, namespaces, deployments)
+        factory, db = _session_factory(boxes)
+
+        report = await reconcile.reconcile_once(factory, mock_redis)
+
+        assert report.checked == n
+        assert report.running_while_suspended == 1
+        assert report.enqueued == 1
+        # One query for boxes and one list call per kind, with no per-box reads.
+        assert db.execute.call_count == 1
+        assert [c[0] for c in mock_core_v1.method_calls] == ["list_namespace"]
+        assert [c[0] for c in mock_apps_v1.method_calls] == ["list_deployment_for_all_namespaces"]
@@ -35,7 +35,8 @@ class TestHandleResize:
         _patch_k8s["patch_deployment_resources"].assert_called_once_with("cust1", "pro")
         _patch_k8s["rollout_restart"].assert_called_once_with("cust1")
         _patch_k8s["wait_for_rollout"].assert_called_once_with("cust1", timeout=60)
-        mock_db.execute.assert_called_once()
+        assert mock_db.execute.call_count == 2
+        assert "cpu_request = NULL" in str(mock_db.execute.call_args[0][0])
         mock_db.commit.assert_called_once()
 
     @pytest.mark.asyncio
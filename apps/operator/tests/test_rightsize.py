@@ -0,0 +1,132 @@
+"""Tests for openclaw_operator.rightsize and openclaw_operator.jobs.rightsize."""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from openclaw_operator import rightsize
+from openclaw_operator.jobs.rightsize import handle_rightsize
+
+MiB = 1024**2
+
+
+def _session_factory(rows=()):
+    db = AsyncMock()
+    db.__aenter__.return_value = db
+    result = MagicMock()
+    result.fetchall.return_value = list(rows)
+    db.execute.return_value = result
+    return MagicMock(return_value=db), db
+
+
+@pytest.fixture(autouse=True)
+def rightsize_settings():
+    with patch.object(rightsize, "settings") as s:
+        s.job_queue = "operator:jobs"
+        s.rightsize_window_days = 7
+        s.rightsize_percentile = 0.95
+        s.rightsize_headroom = 0.3
+        s.rightsize_min_samples = 24
+        s.rightsize_min_cpu = 50
+        s.rightsize_min_memory = 128 * MiB
+        s.rightsize_tolerance = 0.15
+        s.rightsize_apply = False
+        s.rightsize_max_jobs = 20
+        yield s
+
+
+class TestRecommend:
+    def test_adds_headroom_and_rounds_up(self):
+        cpu, memory = rightsize.recommend("pro", 100, 200 * MiB)
+        assert cpu == 130
+        assert memory == 272 * MiB
+
+    def test_floors(self):
+        assert rightsize.recommend("pro", 1, 10 * MiB) == (50, 128 * MiB)
+
+    def test_capped_at_tier_requests(self):
+        # The namespace quota is sized to the tier's requests.
+        assert rightsize.recommend("starter", 900, 900 * MiB) == (250, 512 * MiB)
+
+    def test_formatting(self):
+        assert rightsize.format_cpu(130) == "130m"
+        assert rightsize.format_memory(272 * MiB) == "272Mi"
+
+
+class TestRightsizeOnce:
+    @pytest.mark.asyncio
+    async def test_reports_boxes_that_drifted(self, mock_redis):
+        factory, db = _session_factory([
+            ("box-1", "cust1", "pro", None, None, 40.0, 150 * MiB),
+            # Already right-sized: within tolerance of the recommendation.
+            ("box-2", "cust2", "pro", "60m", "208Mi", 45.0, 150 * MiB),
+        ])
+
+        report = await rightsize.rightsize_once(factory, mock_redis)
+
+        assert report.boxes == 2
+        [rec] = report.recommendations
+        assert (rec.box_id, rec.cpu_request, rec.recommended_cpu_request) == ("box-1", "500m", "60m")
+        assert rec.recommended_memory_request == "208Mi"
+        assert report.requested_cpu_millicores == 560
+        assert report.recommended_cpu_millicores == 120
+        assert db.execute.call_args[0][1] == {"pct": 0.95, "days": 7, "min_samples": 24}
+        mock_redis.pipeline.return_value.rpush.assert_not_called()
+        assert rightsize.last_report()["recommendations"][0]["box_id"] == "box-1"
+
+    @pytest.mark.asyncio
+    async def test_apply_enqueues_largest_savings_first(self, rightsize_settings, mock_redis):
+        rightsize_settings.rightsize_apply = True
+        rightsize_settings.rightsize_max_jobs = 2
+        factory, _ = _session_factory([
+            ("box-1", "cust1", "starter", None, None, 40.0, 150 * MiB),
+            ("box-2", "cust2", "team", None, None, 40.0, 150 * MiB),
+            ("box-3", "cust3", "pro", None, None, 40.0, 150 * MiB),
+            ("box-4", "cust4", "team", None, None, 40.0, 150 * MiB),
+        ])
+
+        report = await rightsize.rightsize_once(factory, mock_redis, busy={"cust4": object()})
+
+        calls = mock_redis.pipeline.return_value.rpush.call_args_list
+        assert {c[0][0] for c in calls} == {"operator:jobs:low"}
+        jobs = [json.loads(c[0][1]) for c in calls]
+        assert [j["box_id"] for j in jobs] == ["box-2", "box-3"]
+        assert jobs[0]["type"] == "rightsize"
+        assert jobs[0]["payload"] == {"box_id": "box-2", "tier": "team", "cpu_request": "60m", "memory_request": "208Mi"}
+        assert report.enqueued == 2
+
+    @pytest.mark.asyncio
+    async def test_unknown_tier_skipped(self, mock_redis):
+        factory, _ = _session_factory([("box-1", "cust1", "enterprise", None, None, 40.0, 150 * MiB)])
+
+        report = await rightsize.rightsize_once(factory, mock_redis)
+
+        assert report.boxes == 0
+
+
+PAYLOAD = {"box_id": "box-1", "tier": "pro", "cpu_request": "60m", "memory_request": "208Mi"}
+
+
+class TestHandleRightsize:
+    @pytest.mark.asyncio
+    async def test_happy_path(self, mock_db):
+        mock_db.execute.return_value.fetchone.return_value = ("box-1",)
+
+        with patch("openclaw_operator.jobs.rightsize.patch_deployment_resources") as pdr:
+            await handle_rightsize(PAYLOAD, "cust1", mock_db)
+
+        pdr.assert_called_once_with("cust1", "pro", requests={"cpu": "60m", "memory": "208Mi"})
+        params = mock_db.execute.call_args[0][1]
+        assert params == {"box_id": "box-1", "tier": "pro", "cpu": "60m", "memory": "208Mi"}
+        mock_db.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_skips_changed_box(self, mock_db):
+        mock_db.execute.return_value.fetchone.return_value = None
+
+        with patch("openclaw_operator.jobs.rightsize.patch_deployment_resources") as pdr:
+            await handle_rightsize(PAYLOAD, "cust1", mock_db)
+
+        pdr.assert_not_called()
+        mock_db.commit.assert_not_called()
@@ -0,0 +1,83 @@
+"""Tests for openclaw_operator.jobs.rollout."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from openclaw_operator.jobs.rollout import handle_rollout
+
+PAYLOAD = {"box_id": "box-1", "rollout_id": "ro-1", "tier": "pro", "image": "openclaw-gateway:v2", "restart": False}
+
+
+@pytest.fixture
+def _patch_k8s():
+    with (
+        patch("openclaw_operator.jobs.rollout.read_gateway", return_value=MagicMock()) as rg,
+        patch("openclaw_operator.jobs.rollout.gateway_outdated", return_value=True) as go,
+        patch("openclaw_operator.jobs.rollout.patch_deployment_resources") as pdr,
+        patch("openclaw_operator.jobs.rollout.rollout_restart") as rr,
+        patch("openclaw_operator.jobs.rollout.written_generation", return_value=7),
+    ):
+        yield {"read_gateway": rg, "gateway_outdated": go, "patch_deployment_resources": pdr, "rollout_restart": rr}
+
+
+def _status(mock_db) -> dict:
+    return mock_db.execute.call_args[0][1]
+
+
+class TestHandleRollout:
+    @pytest.mark.asyncio
+    async def test_patches_outdated_gateway(self, mock_db, _patch_k8s):
+        await handle_rollout(PAYLOAD, "cust1", mock_db)
+
+        _patch_k8s["patch_deployment_resources"].assert_called_once_with(
+            "cust1", "pro", image="openclaw-gateway:v2", requests=None,
+        )
+        _patch_k8s["rollout_restart"].assert_not_called()
+        assert _status(mock_db)["status"] == "rolling"
+        assert _status(mock_db)["generation"] == 7
+        mock_db.commit.assert_called_once()
+        # Recorded for provision, which must not revert the box to an older image.
+        assert {"image": "openclaw-gateway:v2", "box_id": "box-1"} in [c[0][1] for c in mock_db.execute.call_args_list]
+
+    @pytest.mark.asyncio
+    async def test_keeps_right_sized_requests(self, mock_db, _patch_k8s):
+        mock_db.execute.return_value.fetchone.return_value = ("120m", None)
+
+        await handle_rollout(PAYLOAD, "cust1", mock_db)
+
+        _patch_k8s["gateway_outdated"].assert_called_once_with(
+            _patch_k8s["read_gateway"].return_value, "pro", "openclaw-gateway:v2", {"cpu": "120m"},
+        )
+        _patch_k8s["patch_deployment_resources"].assert_called_once_with(
+            "cust1", "pro", image="openclaw-gateway:v2", requests={"cpu": "120m"},
+        )
+
+    @pytest.mark.asyncio
+    async def test_current_gateway_is_complete(self, mock_db, _patch_k8s):
+        _patch_k8s["gateway_outdated"].return_value = False
+
+        await handle_rollout(PAYLOAD, "cust1", mock_db)
+
+        _patch_k8s["patch_deployment_resources"].assert_not_called()
+        _patch_k8s["rollout_restart"].assert_not_called()
+        assert _status(mock_db)["status"] == "complete"
+
+    @pytest.mark.asyncio
+    async def test_restart_requested(self, mock_db, _patch_k8s):
+        _patch_k8s["gateway_outdated"].return_value = False
+
+        await handle_rollout({**PAYLOAD, "restart": True}, "cust1", mock_db)
+
+        _patch_k8s["rollout_restart"].assert_called_once_with("cust1")
+        assert _status(mock_db)["status"] == "rolling"
+
+    @pytest.mark.asyncio
+    async def test_missing_gateway_fails_box(self, mock_db, _patch_k8s):
+        _patch_k8s["read_gateway"].return_value = None
+
+        await handle_rollout(PAYLOAD, "cust1", mock_db)
+
+        _patch_k8s["patch_deployment_resources"].assert_not_called()
+        assert _status(mock_db)["status"] == "failed"
+        assert "not found" in _status(mock_db)["error"]
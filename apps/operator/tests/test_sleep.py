@@ -0,0 +1,46 @@
+"""Tests for openclaw_operator.jobs.sleep."""
+
+from unittest.mock import patch
+
+import pytest
+
+from openclaw_operator.jobs.sleep import handle_sleep
+
+
+@pytest.fixture
+def _patch_k8s():
+    with patch("openclaw_operator.jobs.sleep.scale_deployment") as sd:
+        yield {"scale_deployment": sd}
+
+
+class TestHandleSleep:
+    @pytest.mark.asyncio
+    async def test_happy_path(self, mock_db, _patch_k8s):
+        mock_db.execute.return_value.fetchone.return_value = ("box-1",)
+
+        await handle_sleep({"box_id": "box-1"}, "cust1", mock_db)
+
+        _patch_k8s["scale_deployment"].assert_called_once_with("cust1", replicas=0)
+        assert "status = 'sleeping'" in str(mock_db.execute.call_args[0][0])
+        mock_db.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_skips_box_no_longer_active(self, mock_db, _patch_k8s):
+        mock_db.execute.return_value.fetchone.return_value = None
+
+        await handle_sleep({"box_id": "box-1"}, "cust1", mock_db)
+
+        _patch_k8s["scale_deployment"].assert_not_called()
+        mock_db.commit.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_scale_failure_leaves_box_active(self, mock_db):
+        mock_db.execute.return_value.fetchone.return_value = ("box-1",)
+
+        with patch(
+            "openclaw_operator.jobs.sleep.scale_deployment",
+            side_effect=Exception("scale fail"),
+        ):
+            with pytest.raises(Exception, match="scale fail"):
+                await handle_sleep({"box_id": "box-1"}, "cust1", mock_db)
+        mock_db.commit.assert_not_called()
@@ -0,0 +1,104 @@
+"""Tests for openclaw_operator.steps."""
+
+import asyncio
+
+import pytest
+
+from openclaw_operator.steps import Step, record_steps, run_graph, step
+
+
+def _recorder(events: list[str], name: str, delay: float = 0.0):
+    async def run() -> None:
+        events.append(f"start:{name}")
+        await asyncio.sleep(delay)
+        events.append(f"end:{name}")
+
+    return run
+
+
+class TestRunGraph:
+    @pytest.mark.asyncio
+    async def test_dependencies_finish_first(self):
+        events: list[str] = []
+        await run_graph({
+            "b": Step(_recorder(events, "b"), after=("a",)),
+            "a": Step(_recorder(events, "a", 0.01)),
+            "c": Step(_recorder(events, "c"), after=("a", "b")),
+        })
+        assert events.index("end:a") < events.index("start:b")
+        assert events.index("end:b") < events.index("start:c")
+
+    @pytest.mark.asyncio
+    async def test_independent_steps_overlap(self):
+        events: list[str] = []
+        await run_graph({
+            "root": Step(_recorder(events, "root")),
+            "x": Step(_recorder(events, "x", 0.02), after=("root",)),
+            "y": Step(_recorder(events, "y", 0.02), after=("root",)),
+        })
+        # Both siblings start before either one finishes.
+        assert events.index("start:y") < events.index("end:x")
+        assert events.index("start:x") < events.index("end:y")
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_running_steps(self):
+        cancelled = asyncio.Event()
+
+        async def slow() -> None:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def boom() -> None:
+            raise RuntimeError("boom")
+
+        events: list[str] = []
+        with pytest.raises(RuntimeError, match="boom"):
+            await run_graph({
+                "slow": Step(slow),
+                "boom": Step(boom),
+                "after_boom": Step(_recorder(events, "after_boom"), after=("boom",)),
+            })
+        assert cancelled.is_set()
+        assert events == []
+
+    @pytest.mark.asyncio
+    async def test_unknown_dependency_rejected(self):
+        with pytest.raises(ValueError, match="unknown"):
+            await run_graph({"a": Step(_recorder([], "a"), after=("missing",))})
+
+    @pytest.mark.asyncio
+    async def test_cycle_rejected(self):
+        with pytest.raises(ValueError, match="cycle"):
+            await run_graph({
+                "a": Step(_recorder([], "a"), after=("b",)),
+                "b": Step(_recorder([], "b"), after=("a",)),
+            })
+
+
+class TestRecordSteps:
+    @pytest.mark.asyncio
+    async def test_graph_steps_are_timed(self):
+        with record_steps() as timings:
+            await run_graph({
+                "a": Step(_recorder([], "a", 0.01)),
+                "b": Step(_recorder([], "b"), after=("a",)),
+            })
+        assert set(timings) == {"a", "b"}
+        assert timings["a"] >= 0.01
+
+    def test_step_outside_recording_is_ignored(self):
+        with step("orphan"):
+            pass
+        with record_steps() as timings:
+            pass
+        assert timings == {}
+
+    def test_failed_step_is_still_timed(self):
+        with record_steps() as timings:
+            with pytest.raises(KeyError):
+                with step("lookup"):
+                    raise KeyError("x")
+        assert "lookup" in timings
@@ -0,0 +1,81 @@
+"""Tests for openclaw_operator.telemetry and the /metrics endpoint."""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from openclaw_operator import k8s, telemetry
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_k8s_verb():
+    def patch_namespaced_secret():
+        pass
+
+    def call_api():
+        pass
+
+    assert telemetry.k8s_verb(patch_namespaced_secret) == "patch"
+    assert telemetry.k8s_verb(call_api) == "apply"
+    assert telemetry.k8s_verb(MagicMock()) == "call"
+
+
+@pytest.mark.asyncio
+async def test_k8s_call_latency_per_verb():
+    def list_namespace(**kwargs):
+        return "ok"
+
+    before = _sample("operator_k8s_call_seconds_count", verb="list")
+    assert await k8s.k8s_call(list_namespace) == "ok"
+    assert _sample("operator_k8s_call_seconds_count", verb="list") == before + 1
+
+
+def test_observe_steps():
+    before = _sample("operator_job_step_seconds_count", job_type="provision", step="wait_ready")
+    telemetry.observe_steps("provision", {"wait_ready": 8.5, "namespace": 0.2})
+    assert _sample("operator_job_step_seconds_count", job_type="provision", step="wait_ready") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_process_job_records_lock_wait_and_duration(mock_redis):
+    import openclaw_operator.main as m
+
+    job = json.dumps({"job_type": "destroy", "customer_id": "cust1", "payload": {"box_id": "box-1"}})
+    lock_before = _sample("operator_job_lock_wait_seconds_count", acquired="true")
+    run_before = _sample("operator_job_duration_seconds_count", job_type="destroy", status="complete")
+
+    with (
+        patch.object(m, "get_redis", return_value=mock_redis),
+        patch.object(m, "get_session_factory", return_value=MagicMock()),
+        patch.object(m, "audit_job"),
+        patch.object(m, "resolve_namespace", new_callable=AsyncMock),
+        patch.dict(m.JOB_HANDLERS, {"destroy": AsyncMock()}),
+    ):
+        assert await m.process_job(job)
+
+    assert _sample("operator_job_lock_wait_seconds_count", acquired="true") == lock_before + 1
+    assert _sample("operator_job_duration_seconds_count", job_type="destroy", status="complete") == run_before + 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_queue_depth():
+    import openclaw_operator.main as m
+
+    queue = AsyncMock()
+    queue.stats.return_value = {
+        "lanes": {"high": {"depth": 4}, "normal": {"depth": 1}, "low": {"depth": 0}},
+        "processing": 2, "delayed": 1, "dead": 0,
+    }
+    with patch.object(m, "_queue", queue):
+        resp = await m.prometheus(MagicMock())
+
+    assert resp.media_type.startswith("text/plain")
+    body = resp.body.decode()
+    assert 'operator_queue_depth{lane="high"} 4.0' in body
+    assert 'operator_queue_depth{lane="processing"} 2.0' in body
+    assert "operator_job_queue_wait_seconds" in body
@@ -6,16 +6,20 @@ import pytest
 
 from openclaw_operator.jobs.update import handle_update
 
+ANNOTATIONS = {"openclaw/config-hashes": "{}"}
+
 
 @pytest.fixture
 def _patch_k8s():
     with (
+        patch("openclaw_operator.jobs.update.changed_config", return_value=ANNOTATIONS) as cc,
         patch("openclaw_operator.jobs.update.patch_config_secret") as pcs,
         patch("openclaw_operator.jobs.update.rollout_restart") as rr,
         patch("openclaw_operator.jobs.update.wait_for_rollout") as wfr,
     ):
         wfr.return_value = True
         yield {
+            "changed_config": cc,
             "patch_config_secret": pcs,
             "rollout_restart": rr,
             "wait_for_rollout": wfr,
@@ -32,16 +36,29 @@ class TestHandleUpdate:
         _patch_k8s["patch_config_secret"].assert_called_once_with(
             "cust1", {"OPENCLAW_MODEL": "new-model"}
         )
-        _patch_k8s["rollout_restart"].assert_called_once_with("cust1")
+        _patch_k8s["rollout_restart"].assert_called_once_with("cust1", ANNOTATIONS)
         _patch_k8s["wait_for_rollout"].assert_called_once_with("cust1", timeout=60)
         mock_db.execute.assert_called_once()
         mock_db.commit.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_unchanged_config_skips_restart(self, mock_db, _patch_k8s):
+        _patch_k8s["changed_config"].return_value = None
+        payload = {"box_id": "box-1", "secret_data": {"OPENCLAW_MODEL": "same-model"}}
+
+        await handle_update(payload, "cust1", mock_db)
+
+        _patch_k8s["patch_config_secret"].assert_not_called()
+        _patch_k8s["rollout_restart"].assert_not_called()
+        _patch_k8s["wait_for_rollout"].assert_not_called()
+        mock_db.commit.assert_called_once()
+
     @pytest.mark.asyncio
     async def test_rollout_timeout_raises(self, mock_db):
         payload = {"box_id": "box-1", "secret_data": {"FOO": "bar"}}
 
         with (
+            patch("openclaw_operator.jobs.update.changed_config", return_value=ANNOTATIONS),
             patch("openclaw_operator.jobs.update.patch_config_secret"),
             patch("openclaw_operator.jobs.update.rollout_restart"),
             patch("openclaw_operator.jobs.update.wait_for_rollout", return_value=False),
@@ -54,6 +71,8 @@ class TestHandleUpdate:
         payload = {"box_id": "box-1", "secret_data": {"FOO": "bar"}}
 
         with patch(
+            "openclaw_operator.jobs.update.changed_config", return_value=ANNOTATIONS,
+        ), patch(
             "openclaw_operator.jobs.update.patch_config_secret",
             side_effect=Exception("patch fail"),
         ):
@@ -7,16 +7,20 @@ import pytest
 
 from openclaw_operator.jobs.update_connections import handle_update_connections
 
+ANNOTATIONS = {"openclaw/config-hashes": "{}"}
+
 
 @pytest.fixture
 def _patch_k8s():
     with (
+        patch("openclaw_operator.jobs.update_connections.changed_config", return_value=ANNOTATIONS) as cc,
         patch("openclaw_operator.jobs.update_connections.patch_config_secret") as pcs,
         patch("openclaw_operator.jobs.update_connections.rollout_restart") as rr,
         patch("openclaw_operator.jobs.update_connections.wait_for_rollout") as wfr,
     ):
         wfr.return_value = True
         yield {
+            "changed_config": cc,
             "patch_config_secret": pcs,
             "rollout_restart": rr,
             "wait_for_rollout": wfr,
@@ -70,7 +74,7 @@ class TestHandleUpdateConnections:
         assert linear_conn["mcp"]["type"] == "http"
         assert "native_env" not in linear_conn
 
-        _patch_k8s["rollout_restart"].assert_called_once_with("cust1")
+        _patch_k8s["rollout_restart"].assert_called_once_with("cust1", ANNOTATIONS)
         _patch_k8s["wait_for_rollout"].assert_called_once()
 
     @pytest.mark.asyncio
@@ -100,6 +104,17 @@ class TestHandleUpdateConnections:
         assert "mcp" not in conn
         assert "native_env" not in conn
 
+    @pytest.mark.asyncio
+    async def test_unchanged_connections_skip_restart(self, mock_db, _patch_k8s, _patch_settings):
+        _patch_k8s["changed_config"].return_value = None
+
+        await handle_update_connections({}, "cust1", mock_db)
+
+        assert "ORDER BY provider" in str(mock_db.execute.call_args[0][0])
+        _patch_k8s["patch_config_secret"].assert_not_called()
+        _patch_k8s["rollout_restart"].assert_not_called()
+        _patch_k8s["wait_for_rollout"].assert_not_called()
+
     @pytest.mark.asyncio
     async def test_rollout_timeout_raises(self, mock_db, _patch_settings):
         result = MagicMock()
@@ -107,6 +122,7 @@ class TestHandleUpdateConnections:
         mock_db.execute.return_value = result
 
         with (
+            patch("openclaw_operator.jobs.update_connections.changed_config", return_value=ANNOTATIONS),
             patch("openclaw_operator.jobs.update_connections.patch_config_secret"),
             patch("openclaw_operator.jobs.update_connections.rollout_restart"),
             patch("openclaw_operator.jobs.update_connections.wait_for_rollout", return_value=False),
@@ -0,0 +1,68 @@
+"""Tests for openclaw_operator.jobs.wake."""
+
+import time
+from unittest.mock import patch
+
+import pytest
+
+from openclaw_operator import idle
+from openclaw_operator.jobs.wake import handle_wake
+
+
+@pytest.fixture
+def _patch_k8s():
+    with (
+        patch("openclaw_operator.jobs.wake.scale_deployment") as sd,
+        patch("openclaw_operator.jobs.wake.wait_for_pod_ready", return_value=True) as wr,
+        patch("openclaw_operator.jobs.wake.record_wake") as rw,
+    ):
+        yield {"scale_deployment": sd, "wait_for_pod_ready": wr, "record_wake": rw}
+
+
+class TestHandleWake:
+    @pytest.mark.asyncio
+    async def test_happy_path(self, mock_db, _patch_k8s):
+        mock_db.execute.return_value.fetchone.return_value = ("sleeping",)
+        detected_at = time.time() - 4
+
+        await handle_wake({"box_id": "box-1", "detected_at": detected_at}, "cust1", mock_db)
+
+        _patch_k8s["scale_deployment"].assert_called_once_with("cust1", replicas=1)
+        _patch_k8s["wait_for_pod_ready"].assert_called_once()
+        assert "status = 'active'" in str(mock_db.execute.call_args[0][0])
+        mock_db.commit.assert_called_once()
+        seconds = _patch_k8s["record_wake"].call_args[0][0]
+        assert 4 <= seconds < 10
+
+    @pytest.mark.asyncio
+    async def test_skips_box_not_sleeping(self, mock_db, _patch_k8s):
+        mock_db.execute.return_value.fetchone.return_value = ("suspended",)
+
+        await handle_wake({"box_id": "box-1"}, "cust1", mock_db)
+
+        _patch_k8s["scale_deployment"].assert_not_called()
+        mock_db.commit.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_pod_not_ready_raises(self, mock_db, _patch_k8s):
+        mock_db.execute.return_value.fetchone.return_value = ("sleeping",)
+        _patch_k8s["wait_for_pod_ready"].return_value = False
+
+        with pytest.raises(TimeoutError):
+            await handle_wake({"box_id": "box-1"}, "cust1", mock_db)
+        mock_db.commit.assert_not_called()
+        _patch_k8s["record_wake"].assert_not_called()
+
+
+class TestRecordWake:
+    def test_updates_report(self):
+        with (
+            patch.object(idle, "_report", idle.SleepReport()),
+            patch.object(idle, "_wake_seconds_total", 0.0),
+        ):
+            idle.record_wake(2.0)
+            idle.record_wake(4.0)
+            report = idle.last_report()
+        assert report["woken"] == 2
+        assert report["wake_seconds_avg"] == 3.0
+        assert report["wake_seconds_max"] == 4.0
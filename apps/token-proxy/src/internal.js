@@ -1,6 +1,7 @@
 import crypto from "node:crypto";
 import bcrypt from "bcrypt";
 import { config } from "./config.js";
+import { unflushedTokens } from "./limits.js";
 
 const TOKEN_CACHE_PREFIX = "proxy_token:";
 
@@ -87,7 +88,7 @@ export async function handleInternal(req, res, redis, pg) {
     } else {
       json(res, 200, {
         customer_id: customerId,
-        tokens_used: Number(rows[0].tokens_used),
+        tokens_used: Number(rows[0].tokens_used) + await unflushedTokens(customerId, rows[0].period_start, redis),
         tokens_limit: Number(rows[0].tokens_limit),
         period_start: String(rows[0].period_start),
         period_end: String(rows[0].period_end),
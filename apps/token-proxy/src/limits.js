@@ -1,27 +1,48 @@
-const LIMIT_CACHE_PREFIX = "limit:";
+export const LIMIT_CACHE_PREFIX = "limit:";
 const LIMIT_CACHE_TTL = 60;
 
+// Per-customer token counters not yet in usage_monthly. pushUsageEvent adds to
+// the pending hash; billing-worker renames it to the flushing one and adds that
+// to Postgres in one statement.
+// Must match billing_worker.usage and openclaw_api.routes.usage.
+export const USAGE_PENDING_KEY = "usage:pending";
+export const USAGE_FLUSHING_KEY = "usage:flushing";
+
+/**
+ * Counter field for a customer's billing period: "{customer_id}:{period_start epoch seconds}".
+ * Tokens are credited to the period the request was admitted in, not the one
+ * current when billing-worker flushes them.
+ * @param {string} customerId
+ * @param {Date|string} periodStart
+ * @returns {string}
+ */
+export function usageField(customerId, periodStart) {
+  return `${customerId}:${Math.floor(new Date(periodStart).getTime() / 1000)}`;
+}
+
 /**
  * Check token usage limits.
  * @param {string} customerId
  * @param {import("ioredis").default} redis
  * @param {import("pg").Pool} pg
- * @returns {Promise<{allowed: boolean, warning: boolean, used: number, limit: number, tier: string}>}
+ * @returns {Promise<{allowed: boolean, warning: boolean, used: number, limit: number, tier: string, period_start: string|null}>}
  */
 export async function checkLimits(customerId, redis, pg) {
   const cacheKey = `${LIMIT_CACHE_PREFIX}${customerId}`;
 
   const cached = await redis.get(cacheKey);
-  let used, limit, tier;
+  const data = cached !== null ? JSON.parse(cached) : null;
+  let used, limit, tier, periodStart;
 
-  if (cached !== null) {
-    const data = JSON.parse(cached);
+  // Entries cached before the counters were keyed by period have no period_start.
+  if (data?.period_start) {
     used = data.used;
     limit = data.limit;
     tier = data.tier;
+    periodStart = data.period_start;
   } else {
     const { rows } = await pg.query(
-      `SELECT um.tokens_used, um.tokens_limit, s.tier
+      `SELECT um.tokens_used, um.tokens_limit, um.period_start, s.tier
        FROM usage_monthly um
        JOIN subscriptions s ON s.customer_id = um.customer_id
        WHERE um.customer_id = $1
@@ -32,16 +53,17 @@ export async function checkLimits(customerId, redis, pg) {
     );
 
     if (rows.length === 0) {
-      return { allowed: false, warning: false, used: 0, limit: 0, tier: "unknown" };
+      return { allowed: false, warning: false, used: 0, limit: 0, tier: "unknown", period_start: null };
     }
 
-    used = Number(rows[0].tokens_used);
+    periodStart = new Date(rows[0].period_start).toISOString();
+    used = Number(rows[0].tokens_used) + await unflushedTokens(customerId, periodStart, redis);
     limit = Number(rows[0].tokens_limit);
     tier = String(rows[0].tier);
 
     await redis.set(
       cacheKey,
-      JSON.stringify({ used, limit, tier }),
+      JSON.stringify({ used, limit, tier, period_start: periodStart }),
       "EX",
       LIMIT_CACHE_TTL,
     );
@@ -53,5 +75,29 @@ export async function checkLimits(customerId, redis, pg) {
     used,
     limit,
     tier,
+    period_start: periodStart,
   };
 }
+
+/**
+ * Tokens counted by the proxy for a billing period that billing-worker hasn't
+ * added to usage_monthly yet.
+ * @param {string} customerId
+ * @param {Date|string} periodStart - the usage_monthly row's period_start
+ * @param {import("ioredis").default} redis
+ * @returns {Promise<number>}
+ */
+export async function unflushedTokens(customerId, periodStart, redis) {
+  const field = usageField(customerId, periodStart);
+  // Both counters in one MULTI: read apart, a flush renaming pending to
+  // flushing in between would be counted twice or not at all.
+  const results = await redis
+    .multi()
+    .hget(USAGE_PENDING_KEY, field)
+    .hget(USAGE_FLUSHING_KEY, field)
+    .exec();
+  return results.reduce((sum, [err, n]) => {
+    if (err) throw err;
+    return sum + (Number(n) || 0);
+  }, 0);
+}
@@ -123,6 +123,7 @@ async function handleProxy(req, res) {
 
     pushUsageEvent(redis, {
       customer_id: customerId,
+      period_start: limitResult.period_start,
       box_id: null,
       model,
       prompt_tokens: usage.prompt_tokens,
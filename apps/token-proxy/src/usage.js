@@ -1,15 +1,40 @@
 import { config } from "./config.js";
+import { LIMIT_CACHE_PREFIX, USAGE_PENDING_KEY, usageField } from "./limits.js";
 
 const STREAM_KEY = "usage:events";
 const CONSUMER_GROUP = "proxy-consumers";
 const CONSUMER_NAME = "proxy-worker";
 
+// Count the tokens and bump the cached limit check in one step, so a limit
+// check loaded from usage_monthly plus these counters never counts them twice.
+const COUNT_USAGE_SCRIPT = `
+local cached = redis.call('GET', KEYS[1])
+if cached then
+    local data = cjson.decode(cached)
+    data.used = data.used + tonumber(ARGV[1])
+    redis.call('SET', KEYS[1], cjson.encode(data), 'KEEPTTL')
+end
+return redis.call('HINCRBY', KEYS[2], ARGV[2], ARGV[1])
+`;
+
 /**
- * Push a usage event to the Redis stream (fire-and-forget).
+ * Count a request's tokens and push a usage event to the Redis stream (fire-and-forget).
+ * The tokens are counted against period_start, the billing period checkLimits admitted the request in.
  * @param {import("ioredis").default} redis
- * @param {{customer_id: string, box_id?: string, model: string, prompt_tokens: number, completion_tokens: number, request_id: string}} event
+ * @param {{customer_id: string, period_start: string, box_id?: string, model: string, prompt_tokens: number, completion_tokens: number, request_id: string}} event
  */
 export async function pushUsageEvent(redis, event) {
+  const total = (event.prompt_tokens || 0) + (event.completion_tokens || 0);
+  if (total > 0) {
+    await redis.eval(
+      COUNT_USAGE_SCRIPT,
+      2,
+      `${LIMIT_CACHE_PREFIX}${event.customer_id}`,
+      USAGE_PENDING_KEY,
+      total,
+      usageField(event.customer_id, event.period_start),
+    );
+  }
   await redis.xadd(
     STREAM_KEY,
     "*",
@@ -24,7 +49,7 @@ export async function pushUsageEvent(redis, event) {
 }
 
 /**
- * Background loop: consume usage events from Redis stream, batch flush to Postgres.
+ * Background loop: consume usage events from Redis stream, batch insert into usage_events.
  * @param {import("ioredis").default} redis
  * @param {import("pg").Pool} pg
  */
@@ -63,7 +88,7 @@ export async function startUsageConsumer(redis, pg) {
 
       const elapsed = Date.now() - lastFlush;
       if (batch.length > 0 && (batch.length >= config.usageFlushBatchSize || elapsed >= config.usageFlushIntervalMs)) {
-        await flushBatch(batch, redis, pg);
+        await flushBatch(batch, pg);
         const msgIds = batch.map((e) => e.msg_id);
         if (msgIds.length > 0) {
           await redis.xack(STREAM_KEY, CONSUMER_GROUP, ...msgIds);
@@ -78,7 +103,7 @@ export async function startUsageConsumer(redis, pg) {
   }
 }
 
-async function flushBatch(batch, redis, pg) {
+async function flushBatch(batch, pg) {
   if (batch.length === 0) return;
 
   const client = await pg.connect();
@@ -103,43 +128,9 @@ async function flushBatch(batch, redis, pg) {
       );
     }
 
-    // Aggregate by customer
-    const customerTotals = {};
-    for (const event of batch) {
-      const cid = event.customer_id;
-      const total = (parseInt(event.prompt_tokens) || 0) + (parseInt(event.completion_tokens) || 0);
-      customerTotals[cid] = (customerTotals[cid] || 0) + total;
-    }
-
-    for (const [customerId, totalTokens] of Object.entries(customerTotals)) {
-      await client.query(
-        `UPDATE usage_monthly
-         SET tokens_used = tokens_used + $1
-         WHERE customer_id = $2
-           AND period_start <= now()
-           AND period_end > now()`,
-        [totalTokens, customerId],
-      );
-    }
-
     await client.query("COMMIT");
 
-    // Update Redis caches
-    for (const [customerId, added] of Object.entries(customerTotals)) {
-      const cacheKey = `limit:${customerId}`;
-      const cached = await redis.get(cacheKey);
-      if (cached !== null) {
-        const data = JSON.parse(cached);
-        data.used = data.used + added;
-        // keepttl via TTL + set
-        const ttl = await redis.ttl(cacheKey);
-        if (ttl > 0) {
-          await redis.set(cacheKey, JSON.stringify(data), "EX", ttl);
-        }
-      }
-    }
-
-    console.log(`Flushed ${batch.length} usage events for ${Object.keys(customerTotals).length} customers`);
+    console.log(`Flushed ${batch.length} usage events`);
   } catch (err) {
     await client.query("ROLLBACK");
     throw err;
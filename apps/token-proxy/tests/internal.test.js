@@ -58,9 +58,23 @@ function makeRes() {
 }
 
 function makeRedis() {
-  return {
+  const redis = {
     set: vi.fn(),
+    hget: vi.fn(),
   };
+  // MULTI replays the queued HGETs through redis.hget.
+  redis.multi = vi.fn(() => {
+    const queued = [];
+    const tx = {
+      hget: (...args) => {
+        queued.push(args);
+        return tx;
+      },
+      exec: async () => Promise.all(queued.map(async (args) => [null, await redis.hget(...args)])),
+    };
+    return tx;
+  });
+  return redis;
 }
 
 function makePg() {
@@ -192,6 +206,25 @@ describe("handleInternal", () => {
       expect(res.body.tokens_limit).toBe(100000);
     });
 
+    it("includes tokens not yet flushed to usage_monthly", async () => {
+      pg.query.mockResolvedValue({
+        rows: [{
+          tokens_used: "5000",
+          tokens_limit: "100000",
+          period_start: "2026-02-01T00:00:00Z",
+          period_end: "2026-03-01T00:00:00Z",
+        }],
+      });
+      redis.hget.mockImplementation(async (key) => (key === "usage:pending" ? "700" : null));
+      const req = makeReq("GET", "/internal/tokens/cust-1/usage");
+      const res = makeRes();
+
+      await handleInternal(req, res, redis, pg);
+
+      expect(res.body.tokens_used).toBe(5700);
+      expect(redis.hget).toHaveBeenCalledWith("usage:pending", "cust-1:1769904000");
+    });
+
     it("returns 404 when no usage record exists", async () => {
       pg.query.mockResolvedValue({ rows: [] });
       const req = makeReq("GET", "/internal/tokens/cust-new/usage");
@@ -1,11 +1,27 @@
 import { describe, it, expect, vi, beforeEach } from "vitest";
-import { checkLimits } from "../src/limits.js";
+import { checkLimits, unflushedTokens, usageField } from "../src/limits.js";
+
+const PERIOD_START = "2026-10-01T00:00:00.000Z";
 
 function makeRedis() {
-  return {
+  const redis = {
     get: vi.fn(),
     set: vi.fn(),
+    hget: vi.fn(),
   };
+  // MULTI replays the queued HGETs through redis.hget.
+  redis.multi = vi.fn(() => {
+    const queued = [];
+    const tx = {
+      hget: (...args) => {
+        queued.push(args);
+        return tx;
+      },
+      exec: async () => Promise.all(queued.map(async (args) => [null, await redis.hget(...args)])),
+    };
+    return tx;
+  });
+  return redis;
 }
 
 function makePg() {
@@ -24,7 +40,7 @@ describe("checkLimits", () => {
   });
 
   it("returns allowed=true when under limit (from cache)", async () => {
-    redis.get.mockResolvedValue(JSON.stringify({ used: 500, limit: 1000, tier: "starter" }));
+    redis.get.mockResolvedValue(JSON.stringify({ used: 500, limit: 1000, tier: "starter", period_start: PERIOD_START }));
 
     const result = await checkLimits("cust-1", redis, pg);
     expect(result).toEqual({
@@ -33,27 +49,28 @@ describe("checkLimits", () => {
       used: 500,
       limit: 1000,
       tier: "starter",
+      period_start: PERIOD_START,
     });
     expect(redis.get).toHaveBeenCalledWith("limit:cust-1");
     expect(pg.query).not.toHaveBeenCalled();
   });
 
   it("returns allowed=false when at limit", async () => {
-    redis.get.mockResolvedValue(JSON.stringify({ used: 1000, limit: 1000, tier: "starter" }));
+    redis.get.mockResolvedValue(JSON.stringify({ used: 1000, limit: 1000, tier: "starter", period_start: PERIOD_START }));
 
     const result = await checkLimits("cust-1", redis, pg);
     expect(result.allowed).toBe(false);
   });
 
   it("returns allowed=false when over limit", async () => {
-    redis.get.mockResolvedValue(JSON.stringify({ used: 1500, limit: 1000, tier: "starter" }));
+    redis.get.mockResolvedValue(JSON.stringify({ used: 1500, limit: 1000, tier: "starter", period_start: PERIOD_START }));
 
     const result = await checkLimits("cust-1", redis, pg);
     expect(result.allowed).toBe(false);
   });
 
   it("returns warning=true when at 90% usage", async () => {
-    redis.get.mockResolvedValue(JSON.stringify({ used: 900, limit: 1000, tier: "starter" }));
+    redis.get.mockResolvedValue(JSON.stringify({ used: 900, limit: 1000, tier: "starter", period_start: PERIOD_START }));
 
     const result = await checkLimits("cust-1", redis, pg);
     expect(result.allowed).toBe(true);
@@ -61,7 +78,7 @@ describe("checkLimits", () => {
   });
 
   it("returns warning=false when below 90%", async () => {
-    redis.get.mockResolvedValue(JSON.stringify({ used: 899, limit: 1000, tier: "starter" }));
+    redis.get.mockResolvedValue(JSON.stringify({ used: 899, limit: 1000, tier: "starter", period_start: PERIOD_START }));
 
     const result = await checkLimits("cust-1", redis, pg);
     expect(result.warning).toBe(false);
@@ -70,7 +87,7 @@ describe("checkLimits", () => {
   it("falls back to DB on cache miss and caches the result", async () => {
     redis.get.mockResolvedValue(null);
     pg.query.mockResolvedValue({
-      rows: [{ tokens_used: 200, tokens_limit: 5000, tier: "pro" }],
+      rows: [{ tokens_used: 200, tokens_limit: 5000, period_start: new Date(PERIOD_START), tier: "pro" }],
     });
 
     const result = await checkLimits("cust-1", redis, pg);
@@ -80,15 +97,42 @@ describe("checkLimits", () => {
       used: 200,
       limit: 5000,
       tier: "pro",
+      period_start: PERIOD_START,
     });
     expect(redis.set).toHaveBeenCalledWith(
       "limit:cust-1",
-      JSON.stringify({ used: 200, limit: 5000, tier: "pro" }),
+      JSON.stringify({ used: 200, limit: 5000, tier: "pro", period_start: PERIOD_START }),
       "EX",
       60,
     );
   });
 
+  it("adds tokens not yet flushed to usage_monthly on cache miss", async () => {
+    redis.get.mockResolvedValue(null);
+    redis.hget.mockImplementation(async (key) => (key === "usage:pending" ? "40" : "10"));
+    pg.query.mockResolvedValue({
+      rows: [{ tokens_used: 200, tokens_limit: 5000, period_start: new Date(PERIOD_START), tier: "pro" }],
+    });
+
+    const result = await checkLimits("cust-1", redis, pg);
+    expect(result.used).toBe(250);
+    expect(redis.hget).toHaveBeenCalledWith("usage:pending", "cust-1:1790812800");
+    expect(redis.hget).toHaveBeenCalledWith("usage:flushing", "cust-1:1790812800");
+    expect(redis.multi).toHaveBeenCalledOnce();
+  });
+
+  it("reloads cache entries written without a period", async () => {
+    redis.get.mockResolvedValue(JSON.stringify({ used: 500, limit: 1000, tier: "starter" }));
+    pg.query.mockResolvedValue({
+      rows: [{ tokens_used: 600, tokens_limit: 1000, period_start: new Date(PERIOD_START), tier: "starter" }],
+    });
+
+    const result = await checkLimits("cust-1", redis, pg);
+    expect(result.used).toBe(600);
+    expect(result.period_start).toBe(PERIOD_START);
+    expect(pg.query).toHaveBeenCalledTimes(1);
+  });
+
   it("returns allowed=false with zeros when no DB rows", async () => {
     redis.get.mockResolvedValue(null);
     pg.query.mockResolvedValue({ rows: [] });
@@ -100,6 +144,7 @@ describe("checkLimits", () => {
       used: 0,
       limit: 0,
       tier: "unknown",
+      period_start: null,
     });
     expect(redis.set).not.toHaveBeenCalled();
   });
@@ -107,7 +152,7 @@ describe("checkLimits", () => {
   it("converts DB values to numbers/strings", async () => {
     redis.get.mockResolvedValue(null);
     pg.query.mockResolvedValue({
-      rows: [{ tokens_used: "300", tokens_limit: "10000", tier: "enterprise" }],
+      rows: [{ tokens_used: "300", tokens_limit: "10000", period_start: new Date(PERIOD_START), tier: "enterprise" }],
     });
 
     const result = await checkLimits("cust-1", redis, pg);
@@ -132,3 +177,23 @@ describe("checkLimits", () => {
     expect(params).toEqual(["cust-42"]);
   });
 });
+
+describe("unflushedTokens", () => {
+  it("only counts the given billing period", async () => {
+    const redis = makeRedis();
+    const counters = {
+      [usageField("cust-1", "2026-09-01T00:00:00Z")]: "900",
+      [usageField("cust-1", PERIOD_START)]: "40",
+    };
+    redis.hget.mockImplementation(async (key, field) => (key === "usage:pending" ? counters[field] : null));
+
+    expect(await unflushedTokens("cust-1", new Date(PERIOD_START), redis)).toBe(40);
+  });
+});
+
+describe("usageField", () => {
+  it("keys the counter by customer and period start in epoch seconds", () => {
+    expect(usageField("cust-1", PERIOD_START)).toBe("cust-1:1790812800");
+    expect(usageField("cust-1", new Date("2026-10-01T00:00:00.250Z"))).toBe("cust-1:1790812800");
+  });
+});
@@ -8,10 +8,12 @@ vi.mock("../src/config.js", () => ({
 }));
 
 import { pushUsageEvent } from "../src/usage.js";
+import { USAGE_PENDING_KEY } from "../src/limits.js";
 
 function makeRedis() {
   return {
     xadd: vi.fn(),
+    eval: vi.fn(),
     xgroup: vi.fn(),
     xreadgroup: vi.fn(),
     xack: vi.fn(),
@@ -109,4 +111,41 @@ describe("pushUsageEvent", () => {
     expect(ts).toBeGreaterThanOrEqual(before);
     expect(ts).toBeLessThanOrEqual(after);
   });
+
+  it("counts the request's tokens in the pending hash and limit cache", async () => {
+    redis.xadd.mockResolvedValue("ok");
+
+    await pushUsageEvent(redis, {
+      customer_id: "cust-1",
+      period_start: "2026-10-01T00:00:00.000Z",
+      model: "m1",
+      prompt_tokens: 100,
+      completion_tokens: 50,
+      request_id: "r1",
+    });
+
+    expect(redis.eval).toHaveBeenCalledWith(
+      expect.stringContaining("HINCRBY"),
+      2,
+      "limit:cust-1",
+      USAGE_PENDING_KEY,
+      150,
+      "cust-1:1790812800",
+    );
+  });
+
+  it("skips the counter for requests without tokens", async () => {
+    redis.xadd.mockResolvedValue("ok");
+
+    await pushUsageEvent(redis, {
+      customer_id: "c1",
+      model: "m1",
+      prompt_tokens: 0,
+      completion_tokens: 0,
+      request_id: "r1",
+    });
+
+    expect(redis.eval).not.toHaveBeenCalled();
+    expect(redis.xadd).toHaveBeenCalledTimes(1);
+  });
 });
@@ -2,6 +2,7 @@ import { cn } from "@/lib/utils";
 
 const statusStyles: Record<string, string> = {
   active: "bg-emerald-500/15 text-emerald-700 dark:text-emerald-400",
+  sleeping: "bg-sky-500/15 text-sky-700 dark:text-sky-400",
   suspended: "bg-amber-500/15 text-amber-700 dark:text-amber-400",
   pending: "bg-blue-500/15 text-blue-700 dark:text-blue-400",
   destroyed: "bg-red-500/15 text-red-700 dark:text-red-400",
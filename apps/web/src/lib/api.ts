@@ -82,6 +82,7 @@ export interface Bundle {
   mcp_servers: Record<string, unknown>;
   skills: string[];
   sort_order: number;
+  version: number;
   created_at: string;
   updated_at: string;
 }
@@ -140,6 +141,7 @@ export interface AnalyticsData {
   };
   pod_metrics_latest: PodMetricsPoint | null;
   pod_metrics_series: PodMetricsPoint[];
+  pod_metrics_bucket_seconds: number;
   tier: string;
 }
 
@@ -186,9 +186,11 @@ export default function DashboardPage() {
   const statusColor =
     box.status === "active"
       ? "bg-emerald-500"
-      : box.status === "suspended"
-        ? "bg-amber-500"
-        : "bg-red-500";
+      : box.status === "sleeping"
+        ? "bg-sky-500"
+        : box.status === "suspended"
+          ? "bg-amber-500"
+          : "bg-red-500";
 
   const connectedCount = connections.filter(
     (c) => c.status === "connected",
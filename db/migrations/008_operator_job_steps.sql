@@ -0,0 +1,4 @@
+-- 008_operator_job_steps.sql: per-step durations for operator jobs
+-- e.g. {"namespace": 0.21, "secret": 0.08, "deployment": 0.11, "wait_ready": 9.84} (seconds)
+
+ALTER TABLE operator_jobs ADD COLUMN step_timings JSONB;
@@ -0,0 +1,35 @@
+-- 009_fleet_rollouts.sql: fleet-wide gateway rollouts
+-- One row per rollout, one row per box it covers. The operator's fleet
+-- coordinator moves boxes pending -> queued -> rolling -> complete/failed.
+
+ALTER TYPE job_type ADD VALUE IF NOT EXISTS 'rollout';
+
+CREATE TABLE fleet_rollouts (
+    id                UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    image             TEXT,                            -- NULL keeps each box's current image
+    restart           BOOLEAN NOT NULL DEFAULT false,  -- restart boxes whose spec is already current
+    status            TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'paused', 'complete')),
+    max_in_flight     INT NOT NULL DEFAULT 50,
+    max_failure_ratio REAL NOT NULL DEFAULT 0.05,
+    total             INT NOT NULL DEFAULT 0,
+    succeeded         INT NOT NULL DEFAULT 0,
+    failed            INT NOT NULL DEFAULT 0,
+    paused_reason     TEXT,
+    created_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+    completed_at      TIMESTAMPTZ
+);
+
+CREATE TABLE fleet_rollout_boxes (
+    rollout_id  UUID NOT NULL REFERENCES fleet_rollouts(id) ON DELETE CASCADE,
+    box_id      UUID NOT NULL REFERENCES boxes(id),
+    customer_id UUID NOT NULL REFERENCES customers(id),
+    status      TEXT NOT NULL DEFAULT 'pending'
+                CHECK (status IN ('pending', 'queued', 'rolling', 'complete', 'failed', 'skipped')),
+    generation  BIGINT,                                -- Deployment generation written by the rollout job
+    error       TEXT,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (rollout_id, box_id)
+);
+
+CREATE INDEX idx_fleet_rollout_boxes_status ON fleet_rollout_boxes (rollout_id, status);
@@ -0,0 +1,11 @@
+-- 010_box_sleep.sql: scale idle gateways to zero
+-- The operator moves idle active boxes to 'sleeping' (gateway at 0 replicas)
+-- and back to 'active' when a Telegram update arrives for the bot.
+
+ALTER TYPE box_status ADD VALUE IF NOT EXISTS 'sleeping';
+ALTER TYPE job_type ADD VALUE IF NOT EXISTS 'sleep';
+ALTER TYPE job_type ADD VALUE IF NOT EXISTS 'wake';
+
+ALTER TABLE boxes
+    ADD COLUMN IF NOT EXISTS slept_at TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS woke_at TIMESTAMPTZ;
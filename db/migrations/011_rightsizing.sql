@@ -0,0 +1,9 @@
+-- 011_rightsizing.sql: per-box gateway requests from observed usage
+-- NULL means the tier's requests from TIER_RESOURCES. The operator's
+-- right-sizing pass sets them; a tier resize clears them.
+
+ALTER TYPE job_type ADD VALUE IF NOT EXISTS 'rightsize';
+
+ALTER TABLE boxes
+    ADD COLUMN IF NOT EXISTS cpu_request TEXT,
+    ADD COLUMN IF NOT EXISTS memory_request TEXT;
@@ -0,0 +1,5 @@
+-- 012_bundle_version.sql: bundle revisions referenced by operator jobs
+-- Provision jobs carry (bundle_id, bundle_version) instead of the bundle's
+-- prompts, MCP servers and skills. Every admin update bumps the version.
+
+ALTER TABLE bundles ADD COLUMN IF NOT EXISTS version INT NOT NULL DEFAULT 1;
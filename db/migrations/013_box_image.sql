@@ -0,0 +1,6 @@
+-- 013_box_image.sql: the gateway image each box was rolled out to
+-- Fleet rollouts record the image they patch in. Provision reads it back,
+-- falling back to the last completed rollout's image and then the operator's
+-- OPENCLAW_IMAGE, so re-provisioning a box never reverts a rollout.
+
+ALTER TABLE boxes ADD COLUMN IF NOT EXISTS image TEXT;
@@ -0,0 +1,12 @@
+-- 014_usage_flushes.sql: usage snapshots already added to usage_monthly
+-- billing-worker records each usage:flushing snapshot's id in the same
+-- transaction that adds it to usage_monthly. A snapshot that is flushed
+-- again (its Redis delete failed, or two workers raced) is then skipped
+-- instead of counted twice. Rows older than a week are pruned by the flush.
+
+CREATE TABLE IF NOT EXISTS usage_flushes (
+    snapshot_id TEXT PRIMARY KEY,
+    applied_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_usage_flushes_applied_at ON usage_flushes (applied_at);
@@ -11,6 +11,11 @@ in {
         selector.matchLabels.app = "operator";
         template = {
           metadata.labels.app = "operator";
+          metadata.annotations = {
+            "prometheus.io/scrape" = "true";
+            "prometheus.io/port"   = "8081";
+            "prometheus.io/path"   = "/metrics";
+          };
           spec = {
             serviceAccountName = "operator";
             containers.operator = {
@@ -27,6 +32,8 @@ in {
                 { name = "WEB_URL";          valueFrom.secretKeyRef = { name = "platform-secrets"; key = "web_url"; }; }
                 { name = "KUBE_NAMESPACE_PREFIX"; value = "customer-"; }
                 { name = "OPENCLAW_IMAGE";  value = "ghcr.io/andreabadesso/openclaw-cloud/openclaw-gateway:latest"; }
+                { name = "JOB_CONCURRENCY"; value = "8"; }
+                { name = "WARM_POOL";       value = ''{"starter": 2}''; }
               ];
               resources = {
                 requests = { cpu = "25m"; memory = "64Mi"; };
@@ -46,8 +53,8 @@ in {
     clusterRoles.operator = {
       metadata.name = "openclaw:operator";
       rules = [
-        { apiGroups = [ "" ];       resources = [ "namespaces" "secrets" "pods" "resourcequotas" ]; verbs = [ "create" "get" "list" "delete" "patch" ]; }
-        { apiGroups = [ "apps" ];   resources = [ "deployments" ];               verbs = [ "create" "get" "list" "update" "delete" "patch" ]; }
+        { apiGroups = [ "" ];       resources = [ "namespaces" "secrets" "pods" "resourcequotas" ]; verbs = [ "create" "get" "list" "watch" "delete" "patch" ]; }
+        { apiGroups = [ "apps" ];   resources = [ "deployments" ];               verbs = [ "create" "get" "list" "watch" "update" "delete" "patch" ]; }
         { apiGroups = [ "networking.k8s.io" ]; resources = [ "networkpolicies" ]; verbs = [ "create" "get" "list" "delete" "patch" ]; }
         { apiGroups = [ "metrics.k8s.io" ];    resources = [ "pods" ];           verbs = [ "get" "list" ]; }
       ];